@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 RSK Labs Ltd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import argparse
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# Corpus manager for the TCPSigner fuzzing testcases.
+#
+# Replica files (as written by the TCPSigner's --replicafile option and read
+# back by its --inputfile option) are a sequence of |1 byte length| |data|
+# records, one per received APDU. This script knows how to:
+#
+# - ingest: dedupe a set of replica captures both by content hash and by APDU
+#   sequence shape (the CLA/CMD/OP bytes of each APDU), keeping the smallest
+#   capture for each shape.
+# - minimize: run afl-tmin over a set of testcases using all available cores.
+# - dict: grow the fuzzing dictionary with tokens that recur across the corpus
+#   (APDU op bytes, RLP list prefixes and the merge mining tag).
+
+FUZZ_ROOT = os.path.dirname(os.path.realpath(__file__))
+HSM_ROOT = os.path.realpath(os.path.join(FUZZ_ROOT, "..", ".."))
+DOCKER_IMAGE = "hsm:afl"
+
+DEFAULT_RAW = os.path.join(FUZZ_ROOT, "testcases-raw")
+DEFAULT_DEDUP = os.path.join(FUZZ_ROOT, "testcases-dedup")
+DEFAULT_UNIQUE = os.path.join(FUZZ_ROOT, "testcases-unique")
+DEFAULT_TESTCASES = os.path.join(FUZZ_ROOT, "testcases")
+DEFAULT_DICT = os.path.join(FUZZ_ROOT, "dict")
+
+# Minimized testcases above this size are discarded (they slow fuzzing
+# down too much to be worth it)
+DEFAULT_MAX_SIZE = 100*1024
+
+# APDU header: CLA, CMD, OP
+APDU_HEADER_LENGTH = 3
+RSK_TAG = b"RSKBLOCK:"
+AUTO_DICT_PREFIX = "auto"
+MAX_RLP_LENGTH_BYTES = 3
+# AFL++ ignores dictionary entries bigger than this
+MAX_DICT_TOKEN_LENGTH = 128
+
+
+class CorpusError(RuntimeError):
+    pass
+
+
+def parse_replica(data):
+    apdus = []
+    offset = 0
+    while offset < len(data):
+        length = data[offset]
+        offset += 1
+        if offset + length > len(data):
+            raise CorpusError(f"Truncated APDU at offset {offset-1}: announced "
+                              f"{length} bytes but only {len(data)-offset} left")
+        apdus.append(data[offset:offset+length])
+        offset += length
+    return apdus
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def shape_hash(apdus):
+    shape = hashlib.sha256()
+    for apdu in apdus:
+        header = apdu[:APDU_HEADER_LENGTH]
+        shape.update(bytes([len(header)]) + header)
+    return shape.hexdigest()
+
+
+def list_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(os.path.join(path, name) for name in os.listdir(path)
+                            if os.path.isfile(os.path.join(path, name)))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            raise CorpusError(f"No such file or directory: {path}")
+    return files
+
+
+def ingest(sources, output):
+    os.makedirs(output, exist_ok=True)
+
+    # Existing testcases in the output directory also take part in the
+    # deduplication, so that ingesting is incremental
+    existing = set(os.path.realpath(f) for f in list_files([output]))
+    # Only existing testcases that take part in the deduplication can
+    # be superseded (anything else in there is left alone)
+    considered = set()
+    by_content = {}
+    by_shape = {}
+    invalid = 0
+    for path in list_files([output]) + list_files(sources):
+        with open(path, "rb") as f:
+            data = f.read()
+        try:
+            apdus = parse_replica(data)
+        except CorpusError as e:
+            print(f"Skipping {path}: {e}")
+            invalid += 1
+            continue
+        if len(apdus) == 0:
+            continue
+        considered.add(os.path.realpath(path))
+
+        chash = content_hash(data)
+        if chash in by_content:
+            continue
+        by_content[chash] = path
+
+        shash = shape_hash(apdus)
+        if shash not in by_shape or len(data) < by_shape[shash][1]:
+            by_shape[shash] = (path, len(data))
+
+    kept = set(os.path.realpath(path) for path, _ in by_shape.values())
+    added = 0
+    for path, _ in by_shape.values():
+        if os.path.realpath(path) in existing:
+            continue
+        with open(path, "rb") as f:
+            chash = content_hash(f.read())
+        shutil.copyfile(path, os.path.join(output, f"{chash[:16]}.out"))
+        added += 1
+
+    # Existing testcases superseded by an identical one or
+    # by a smaller one with the same shape
+    removed = 0
+    for path in (existing & considered) - kept:
+        os.remove(path)
+        removed += 1
+
+    print(f"{len(by_content)} distinct captures, {len(by_shape)} distinct shapes "
+          f"({invalid} invalid). Added {added}, removed {removed} testcases "
+          f"in {output}")
+
+
+def _docker_tmin_command(input_dir, output_dir, name):
+    cmd = f"afl-tmin -i /testcases-in/{name} -o /testcases-out/{name} " \
+          "-- ./tcpsigner -i @@"
+    return ["docker", "run", "--rm",
+            "--user", f"{os.getuid()}:{os.getgid()}",
+            "-w", "/hsm2/firmware/src/tcpsigner",
+            "-v", f"{HSM_ROOT}:/hsm2",
+            "-v", f"{input_dir}:/testcases-in",
+            "-v", f"{output_dir}:/testcases-out",
+            DOCKER_IMAGE, "/bin/bash", "-c", cmd]
+
+
+def _minimize_one(input_dir, output_dir, name):
+    result = subprocess.run(_docker_tmin_command(input_dir, output_dir, name),
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    return result.returncode, result.stdout.decode(errors="replace")
+
+
+# Same check as docker/check-image
+def _check_docker_image():
+    try:
+        result = subprocess.run(["docker", "images", "-q", DOCKER_IMAGE],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except OSError as e:
+        raise CorpusError(f"Unable to run docker: {e}")
+    if result.returncode != 0 or result.stdout.strip() == b"":
+        raise CorpusError(f"Docker image does not exist: {DOCKER_IMAGE}. "
+                          "Have you built it?")
+
+
+def minimize(input_dir, output_dir, jobs, max_size, force):
+    _check_docker_image()
+
+    input_dir = os.path.realpath(input_dir)
+    output_dir = os.path.realpath(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Testcases already minimized in a previous run are skipped, unless
+    # the input changed since then
+    pending = []
+    for path in list_files([input_dir]):
+        name = os.path.basename(path)
+        out_path = os.path.join(output_dir, name)
+        if not force and os.path.isfile(out_path) and \
+           os.path.getmtime(out_path) >= os.path.getmtime(path):
+            continue
+        pending.append(name)
+
+    print(f"Minimizing {len(pending)} testcases using {jobs} jobs...")
+    failed = []
+    # Each job spends its time waiting on its own afl-tmin container,
+    # so threads are enough to keep all cores busy
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [(name, executor.submit(_minimize_one, input_dir, output_dir, name))
+                   for name in pending]
+        for index, (name, future) in enumerate(futures):
+            returncode, output = future.result()
+            if returncode != 0:
+                failed.append(name)
+                print(f"[{index+1}/{len(pending)}] {name}: FAILED")
+                print(output)
+                continue
+            print(f"[{index+1}/{len(pending)}] {name}: "
+                  f"{os.path.getsize(os.path.join(input_dir, name))} => "
+                  f"{os.path.getsize(os.path.join(output_dir, name))} bytes")
+
+    for path in list_files([output_dir]):
+        if os.path.getsize(path) > max_size:
+            print(f"Removing {path} (bigger than {max_size} bytes)")
+            os.remove(path)
+
+    if len(failed) > 0:
+        raise CorpusError(f"Failed to minimize {len(failed)} testcases: "
+                          f"{', '.join(failed)}")
+
+
+def rlp_list_prefix(data):
+    # Only canonical list prefixes: short lists, or long lists whose length
+    # fits in at most MAX_RLP_LENGTH_BYTES bytes with no leading zeroes
+    if len(data) == 0 or data[0] < 0xc0:
+        return None
+    if data[0] <= 0xf7:
+        return data[:1]
+    length_bytes = data[0] - 0xf7
+    if length_bytes > MAX_RLP_LENGTH_BYTES or len(data) < 1 + length_bytes or \
+       data[1] == 0 or int.from_bytes(data[1:1+length_bytes], "big") < 56:
+        return None
+    return data[:1+length_bytes]
+
+
+def extract_tokens(apdus):
+    tokens = set()
+    previous_header = None
+    for apdu in apdus:
+        if len(apdu) < APDU_HEADER_LENGTH:
+            previous_header = None
+            continue
+        header = apdu[:APDU_HEADER_LENGTH]
+        payload = apdu[APDU_HEADER_LENGTH:]
+        tokens.add(("op", header))
+        # Structures (block headers, receipts, ...) are sent in chunks
+        # using the same APDU header, so only the first chunk of a run
+        # starts with an RLP prefix. Looking for prefixes anywhere else
+        # just picks up noise from the chunked data.
+        if header != previous_header:
+            prefix = rlp_list_prefix(payload)
+            if prefix is not None:
+                tokens.add(("rlp", prefix))
+        if RSK_TAG in payload:
+            tokens.add(("tag", RSK_TAG))
+        previous_header = header
+    return tokens
+
+
+def grow_dict(sources, dict_dir, min_count, dry_run):
+    # Count in how many testcases each token shows up, so that
+    # a single long capture doesn't dominate the dictionary
+    counts = Counter()
+    for path in list_files(sources):
+        with open(path, "rb") as f:
+            try:
+                apdus = parse_replica(f.read())
+            except CorpusError as e:
+                print(f"Skipping {path}: {e}")
+                continue
+        counts.update(extract_tokens(apdus))
+
+    known = set()
+    for path in list_files([dict_dir]) if os.path.isdir(dict_dir) else []:
+        with open(path, "rb") as f:
+            known.add(f.read())
+
+    added = 0
+    for (kind, token), count in counts.most_common():
+        if count < min_count or token in known or \
+           len(token) > MAX_DICT_TOKEN_LENGTH:
+            continue
+        name = f"{AUTO_DICT_PREFIX}-{kind}-{token.hex()}"
+        print(f"{name} (found in {count} testcases)")
+        if not dry_run:
+            os.makedirs(dict_dir, exist_ok=True)
+            with open(os.path.join(dict_dir, name), "wb") as f:
+                f.write(token)
+        known.add(token)
+        added += 1
+
+    print(f"{added} new dictionary entries{' (dry run)' if dry_run else ''}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TCPSigner fuzzing corpus manager")
+    subparsers = parser.add_subparsers(dest="operation", required=True)
+
+    ingest_parser = subparsers.add_parser(
+        "ingest", help="Dedupe TCPSigner replica captures into a testcase directory")
+    ingest_parser.add_argument("sources", nargs="*", default=[DEFAULT_RAW],
+                               help="Replica files or directories (default: "
+                                    "testcases-raw)")
+    ingest_parser.add_argument("-o", "--output", default=DEFAULT_DEDUP,
+                               help="Output directory (default: testcases-dedup)")
+
+    minimize_parser = subparsers.add_parser(
+        "minimize", help="Minimize testcases with afl-tmin in parallel")
+    minimize_parser.add_argument("-i", "--input", default=DEFAULT_UNIQUE,
+                                 help="Input directory (default: testcases-unique)")
+    minimize_parser.add_argument("-o", "--output", default=DEFAULT_TESTCASES,
+                                 help="Output directory (default: testcases)")
+    minimize_parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+                                 help="Parallel afl-tmin jobs (default: all cores)")
+    minimize_parser.add_argument("-s", "--max-size", type=int, default=DEFAULT_MAX_SIZE,
+                                 help="Discard minimized testcases bigger than this "
+                                      f"many bytes (default: {DEFAULT_MAX_SIZE})")
+    minimize_parser.add_argument("-f", "--force", action="store_true",
+                                 help="Minimize testcases even if already minimized")
+
+    dict_parser = subparsers.add_parser(
+        "dict", help="Add recurring APDU tokens to the fuzzing dictionary")
+    dict_parser.add_argument("sources", nargs="*", default=[DEFAULT_RAW],
+                             help="Replica files or directories (default: "
+                                  "testcases-raw)")
+    dict_parser.add_argument("-d", "--dict", default=DEFAULT_DICT,
+                             help="Dictionary directory (default: dict)")
+    dict_parser.add_argument("-m", "--min-count", type=int, default=2,
+                             help="Minimum number of testcases a token must "
+                                  "appear in (default: 2)")
+    dict_parser.add_argument("-n", "--dry-run", action="store_true",
+                             help="Only print the entries that would be added")
+
+    args = parser.parse_args()
+
+    try:
+        if args.operation == "ingest":
+            ingest(args.sources, args.output)
+        elif args.operation == "minimize":
+            if args.jobs < 1:
+                raise CorpusError("Must use at least one job")
+            minimize(args.input, args.output, args.jobs, args.max_size, args.force)
+        elif args.operation == "dict":
+            grow_dict(args.sources, args.dict, args.min_count, args.dry_run)
+    except CorpusError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
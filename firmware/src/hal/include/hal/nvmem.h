@@ -43,10 +43,71 @@ bool nvmem_write(void *dst, void *src, unsigned int length);
 // BEGINNING of platform-dependent code
 #if defined(HSM_PLATFORM_X86)
 
+// Maximum number of distinct call sites and APDU types
+// tracked by the non volatile memory statistics. Writes beyond
+// these are still accounted for in the totals
+#define NVMEM_STATS_MAX_SITES 32
+#define NVMEM_STATS_MAX_APDU_TYPES 64
+
+typedef struct nvmem_write_stats_s {
+    unsigned int write_count;
+    // Bytes written, regardless of their previous value
+    unsigned int bytes_written;
+    // Bytes whose value actually changed
+    unsigned int bytes_changed;
+} nvmem_write_stats_t;
+
+typedef struct nvmem_site_stats_s {
+    const char *file;
+    unsigned int line;
+    nvmem_write_stats_t stats;
+} nvmem_site_stats_t;
+
+typedef struct nvmem_apdu_stats_s {
+    uint8_t cla;
+    uint8_t cmd;
+    uint8_t op;
+    nvmem_write_stats_t stats;
+} nvmem_apdu_stats_t;
+
 typedef struct nvmmem_stats_s {
     unsigned int write_count;
+    unsigned int bytes_written;
+    unsigned int bytes_changed;
+    unsigned int site_count;
+    nvmem_site_stats_t sites[NVMEM_STATS_MAX_SITES];
+    unsigned int apdu_type_count;
+    nvmem_apdu_stats_t apdu_types[NVMEM_STATS_MAX_APDU_TYPES];
 } nvmmem_stats_t;
 
+/**
+ * @brief Write to non volatile memory, accounting the write
+ * to the given call site in the statistics
+ *
+ * @param dst The destination address in (non volatile) memory
+ * @param src The source address to write from
+ * @param length The amount of bytes to write
+ * @param file The source file the write is issued from
+ * @param line The source line the write is issued from
+ *
+ * @returns whether the write succeeded
+ */
+bool nvmem_write_at(void *dst,
+                    void *src,
+                    unsigned int length,
+                    const char *file,
+                    unsigned int line);
+
+/**
+ * @brief Sets the APDU subsequent writes are accounted to
+ * in the statistics
+ *
+ * @param cla The APDU CLA
+ * @param cmd The APDU command
+ * @param op The APDU operation
+ */
+void nvmem_stats_set_apdu(uint8_t cla, uint8_t cmd, uint8_t op);
+
 /**
  * @brief Resets the non volatile memory statistics
  */
@@ -59,6 +120,40 @@ void nvmem_stats_reset();
  */
 nvmmem_stats_t nvmem_get_stats();
 
+/**
+ * @brief Initializes the nvmem module
+ */
+void nvmem_init();
+
+/**
+ * @brief Registers a memory block as non volatile, so that
+ * it can be saved to and loaded from disk on demand
+ *
+ * @param key a string key to uniquely identify the block
+ * @param addr the base address of the block
+ * @param size the size of the block in bytes
+ *
+ * @return whether the block was successfully registered
+ */
+bool nvmem_register_block(char *key, void *addr, size_t size);
+
+/**
+ * @brief Loads registered blocks from disk into memory.
+ * Blocks with no file on disk are left untouched
+ *
+ * @returns whether loading was successful
+ */
+bool nvmem_load();
+
+/**
+ * @brief Saves registered blocks from memory to disk.
+ * Unlike on other platforms, writes are never saved to disk
+ * automatically (and thus saving doesn't affect the statistics)
+ *
+ * @returns whether saving was successful
+ */
+bool nvmem_save();
+
 #elif defined(HSM_PLATFORM_SGX)
 
 /**
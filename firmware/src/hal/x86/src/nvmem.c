@@ -25,11 +25,19 @@
 #include "hal/nvmem.h"
 #include "hal/log.h"
 
+#include <stdio.h>
 #include <stdbool.h>
 #include <string.h>
 
 static nvmmem_stats_t nvmmem_stats;
 
+// APDU writes are currently accounted to
+static struct {
+    uint8_t cla;
+    uint8_t cmd;
+    uint8_t op;
+} current_apdu;
+
 void nvmem_stats_reset() {
     memset(&nvmmem_stats, 0, sizeof(nvmmem_stats));
     LOG("NVM stats reset OK.\n");
@@ -39,7 +47,75 @@ nvmmem_stats_t nvmem_get_stats() {
     return nvmmem_stats;
 }
 
-bool nvmem_write(void *dst, void *src, unsigned int length) {
+void nvmem_stats_set_apdu(uint8_t cla, uint8_t cmd, uint8_t op) {
+    current_apdu.cla = cla;
+    current_apdu.cmd = cmd;
+    current_apdu.op = op;
+}
+
+static nvmem_write_stats_t *site_stats(const char *file, unsigned int line) {
+    for (unsigned int i = 0; i < nvmmem_stats.site_count; i++) {
+        if (nvmmem_stats.sites[i].line == line &&
+            !strcmp(nvmmem_stats.sites[i].file, file)) {
+            return &nvmmem_stats.sites[i].stats;
+        }
+    }
+
+    if (nvmmem_stats.site_count == NVMEM_STATS_MAX_SITES) {
+        return NULL;
+    }
+
+    nvmem_site_stats_t *site = &nvmmem_stats.sites[nvmmem_stats.site_count++];
+    site->file = file;
+    site->line = line;
+    return &site->stats;
+}
+
+static nvmem_write_stats_t *apdu_stats() {
+    for (unsigned int i = 0; i < nvmmem_stats.apdu_type_count; i++) {
+        if (nvmmem_stats.apdu_types[i].cla == current_apdu.cla &&
+            nvmmem_stats.apdu_types[i].cmd == current_apdu.cmd &&
+            nvmmem_stats.apdu_types[i].op == current_apdu.op) {
+            return &nvmmem_stats.apdu_types[i].stats;
+        }
+    }
+
+    if (nvmmem_stats.apdu_type_count == NVMEM_STATS_MAX_APDU_TYPES) {
+        return NULL;
+    }
+
+    nvmem_apdu_stats_t *apdu_type =
+        &nvmmem_stats.apdu_types[nvmmem_stats.apdu_type_count++];
+    apdu_type->cla = current_apdu.cla;
+    apdu_type->cmd = current_apdu.cmd;
+    apdu_type->op = current_apdu.op;
+    return &apdu_type->stats;
+}
+
+static void account_write(nvmem_write_stats_t *stats,
+                          unsigned int length,
+                          unsigned int changed) {
+    if (stats == NULL) {
+        return;
+    }
+    stats->write_count++;
+    stats->bytes_written += length;
+    stats->bytes_changed += changed;
+}
+
+bool nvmem_write_at(void *dst,
+                    void *src,
+                    unsigned int length,
+                    const char *file,
+                    unsigned int line) {
+    // Count the bytes that are actually going to change
+    unsigned int changed = 0;
+    for (unsigned int i = 0; i < length; i++) {
+        if (((uint8_t *)dst)[i] != (src == NULL ? 0 : ((uint8_t *)src)[i])) {
+            changed++;
+        }
+    }
+
     if (src == NULL) {
         // Treat as memory reset
         memset(dst, 0, length);
@@ -47,6 +123,89 @@ bool nvmem_write(void *dst, void *src, unsigned int length) {
         // Treat as normal copy
         memmove(dst, src, length);
     }
+
     // Log the write
     nvmmem_stats.write_count++;
-}
\ No newline at end of file
+    nvmmem_stats.bytes_written += length;
+    nvmmem_stats.bytes_changed += changed;
+    account_write(site_stats(file, line), length, changed);
+    account_write(apdu_stats(), length, changed);
+    return true;
+}
+
+bool nvmem_write(void *dst, void *src, unsigned int length) {
+    return nvmem_write_at(dst, src, length, "unknown", 0);
+}
+
+#define MAX_NVM_BLOCKS 5
+#define FILE_PREFIX "nvmem-"
+
+typedef struct {
+    char *key;
+    void *addr;
+    size_t size;
+} nvm_block_t;
+
+static nvm_block_t nvm_blocks[MAX_NVM_BLOCKS];
+static unsigned int nvm_blocks_count;
+
+void nvmem_init() {
+    memset(nvm_blocks, 0, sizeof(nvm_blocks));
+    nvm_blocks_count = 0;
+}
+
+bool nvmem_register_block(char *key, void *addr, size_t size) {
+    if (nvm_blocks_count >= MAX_NVM_BLOCKS) {
+        LOG("Error registering NVM block <%s>: too many blocks\n", key);
+        return false;
+    }
+
+    nvm_blocks[nvm_blocks_count].key = key;
+    nvm_blocks[nvm_blocks_count].addr = addr;
+    nvm_blocks[nvm_blocks_count].size = size;
+    nvm_blocks_count++;
+
+    return true;
+}
+
+static FILE *open_block_file(nvm_block_t *block, const char *mode) {
+    char path[FILENAME_MAX];
+    snprintf(path, sizeof(path), "%s%s", FILE_PREFIX, block->key);
+    return fopen(path, mode);
+}
+
+bool nvmem_load() {
+    LOG("Loading NVM blocks...\n");
+    for (unsigned int i = 0; i < nvm_blocks_count; i++) {
+        FILE *file = open_block_file(&nvm_blocks[i], "rb");
+        if (file == NULL) {
+            LOG("No record found for NVM block <%s>\n", nvm_blocks[i].key);
+            continue;
+        }
+        size_t read = fread(nvm_blocks[i].addr, 1, nvm_blocks[i].size, file);
+        fclose(file);
+        if (read != nvm_blocks[i].size) {
+            LOG("Error loading NVM block <%s>\n", nvm_blocks[i].key);
+            return false;
+        }
+    }
+    return true;
+}
+
+bool nvmem_save() {
+    LOG("Saving NVM blocks...\n");
+    for (unsigned int i = 0; i < nvm_blocks_count; i++) {
+        FILE *file = open_block_file(&nvm_blocks[i], "wb");
+        if (file == NULL) {
+            LOG("Error saving NVM block <%s>\n", nvm_blocks[i].key);
+            return false;
+        }
+        size_t written =
+            fwrite(nvm_blocks[i].addr, 1, nvm_blocks[i].size, file);
+        if (fclose(file) != 0 || written != nvm_blocks[i].size) {
+            LOG("Error saving NVM block <%s>\n", nvm_blocks[i].key);
+            return false;
+        }
+    }
+    return true;
+}
@@ -0,0 +1,122 @@
+/**
+ * The MIT License (MIT)
+ *
+ * Copyright (c) 2021 RSK Labs Ltd
+ *
+ * Permission is hereby granted, free of charge, to any person obtaining a copy
+ * of this software and associated documentation files (the "Software"), to
+ * deal in the Software without restriction, including without limitation the
+ * rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+ * sell copies of the Software, and to permit persons to whom the Software is
+ * furnished to do so, subject to the following conditions:
+ *
+ * The above copyright notice and this permission notice shall be included in
+ * all copies or substantial portions of the Software.
+ *
+ * THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ * IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+ * FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+ * AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+ * LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+ * FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+ * IN THE SOFTWARE.
+ */
+
+#include <assert.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <unistd.h>
+
+#include "hal/nvmem.h"
+
+static uint8_t block_a[10];
+static uint8_t block_b[20];
+
+// Run every test within a brand new working directory,
+// since that's where blocks are saved to and loaded from
+static void setup() {
+    char dir_template[] = "/tmp/test-nvmem-XXXXXX";
+    assert(mkdtemp(dir_template) != NULL);
+    assert(chdir(dir_template) == 0);
+
+    nvmem_init();
+    memset(block_a, 0, sizeof(block_a));
+    memset(block_b, 0, sizeof(block_b));
+    assert(nvmem_register_block("a", block_a, sizeof(block_a)));
+    assert(nvmem_register_block("b", block_b, sizeof(block_b)));
+}
+
+void test_load_without_files_leaves_blocks_untouched() {
+    printf("Test load without files leaves blocks untouched...\n");
+    setup();
+
+    memset(block_a, 0xaa, sizeof(block_a));
+    assert(nvmem_load());
+    for (unsigned int i = 0; i < sizeof(block_a); i++)
+        assert(block_a[i] == 0xaa);
+    for (unsigned int i = 0; i < sizeof(block_b); i++)
+        assert(block_b[i] == 0);
+}
+
+void test_save_and_load() {
+    printf("Test save and load...\n");
+    setup();
+
+    memset(block_a, 0xaa, sizeof(block_a));
+    memset(block_b, 0xbb, sizeof(block_b));
+    assert(nvmem_save());
+    assert(access("nvmem-a", F_OK) == 0);
+    assert(access("nvmem-b", F_OK) == 0);
+
+    memset(block_a, 0, sizeof(block_a));
+    memset(block_b, 0, sizeof(block_b));
+    assert(nvmem_load());
+    for (unsigned int i = 0; i < sizeof(block_a); i++)
+        assert(block_a[i] == 0xaa);
+    for (unsigned int i = 0; i < sizeof(block_b); i++)
+        assert(block_b[i] == 0xbb);
+}
+
+void test_writes_are_not_saved() {
+    printf("Test writes are not saved...\n");
+    setup();
+
+    uint8_t value[sizeof(block_a)];
+    memset(value, 0xaa, sizeof(value));
+    assert(nvmem_write(block_a, value, sizeof(value)));
+    assert(access("nvmem-a", F_OK) != 0);
+}
+
+void test_load_truncated_block_fails() {
+    printf("Test load truncated block fails...\n");
+    setup();
+
+    FILE *file = fopen("nvmem-b", "wb");
+    assert(file != NULL);
+    assert(fwrite(block_b, 1, sizeof(block_b) - 1, file) ==
+           sizeof(block_b) - 1);
+    fclose(file);
+
+    assert(!nvmem_load());
+}
+
+void test_register_too_many_blocks_fails() {
+    printf("Test register too many blocks fails...\n");
+    setup();
+
+    uint8_t block[1];
+    for (unsigned int i = 2; i < 5; i++)
+        assert(nvmem_register_block("other", block, sizeof(block)));
+    assert(!nvmem_register_block("other", block, sizeof(block)));
+}
+
+int main() {
+    test_load_without_files_leaves_blocks_untouched();
+    test_save_and_load();
+    test_writes_are_not_saved();
+    test_load_truncated_block_fails();
+    test_register_too_many_blocks_fails();
+
+    return 0;
+}
@@ -23,6 +23,7 @@
  */
 
 #include <stdbool.h>
+#include <stddef.h>
 #include <string.h>
 
 #include "runtime.h"
@@ -31,6 +32,7 @@
 #include "hal/log.h"
 #include "nvm.h"
 #include "memutil.h"
+#include "util.h"
 
 #include "bc_state.h"
 #include "bc_err.h"
@@ -211,6 +213,76 @@ uint8_t dump_flags() {
     return 3;
 }
 
+/*
+ * Dump the part of the given state dump field that falls within the
+ * [offset, offset + size) state dump window to the APDU buffer.
+ *
+ * @arg[in] field_offset    offset of the field within the state dump
+ * @arg[in] src             field value
+ * @arg[in] src_size        field size
+ * @arg[in] offset          state dump window offset
+ * @arg[in] size            state dump window size
+ */
+static void dump_field(unsigned int field_offset,
+                       const void* src,
+                       unsigned int src_size,
+                       unsigned int offset,
+                       unsigned int size) {
+    unsigned int start = MAX(field_offset, offset);
+    unsigned int end = MIN(field_offset + src_size, offset + size);
+    if (start >= end)
+        return;
+
+    SAFE_MEMMOVE(APDU_DATA_PTR,
+                 APDU_TOTAL_DATA_SIZE_OUT,
+                 start - offset,
+                 src,
+                 src_size,
+                 start - field_offset,
+                 end - start,
+                 FAIL(PROT_INVALID));
+}
+
+#define DUMP_FIELD(field, src, src_size) \
+    dump_field(offsetof(bc_state_dump_t, field), src, src_size, offset, size)
+
+/*
+ * Dump the full blockchain state to the APDU buffer, starting at
+ * the given offset within the state dump and up to as many
+ * bytes as fit in the buffer.
+ *
+ * @arg[in] offset state dump offset
+ * @ret number of bytes dumped to APDU buffer
+ */
+unsigned int dump_all(unsigned int offset) {
+    if (offset >= sizeof(bc_state_dump_t)) {
+        FAIL(PROT_INVALID);
+    }
+
+    unsigned int size =
+        MIN(sizeof(bc_state_dump_t) - offset, APDU_TOTAL_DATA_SIZE_OUT);
+
+    DUMP_FIELD(best_block, N_bc_state.best_block, HASH_SIZE);
+    DUMP_FIELD(newest_valid_block, N_bc_state.newest_valid_block, HASH_SIZE);
+    DUMP_FIELD(ancestor_block, N_bc_state.ancestor_block, HASH_SIZE);
+    DUMP_FIELD(
+        ancestor_receipt_root, N_bc_state.ancestor_receipt_root, HASH_SIZE);
+    DUMP_FIELD(u_best_block, bc_st_updating.best_block, HASH_SIZE);
+    DUMP_FIELD(
+        u_newest_valid_block, bc_st_updating.newest_valid_block, HASH_SIZE);
+    DUMP_FIELD(
+        u_next_expected_block, bc_st_updating.next_expected_block, HASH_SIZE);
+    DUMP_FIELD(in_progress, &bc_st_updating.in_progress, 1);
+    DUMP_FIELD(already_validated, &bc_st_updating.already_validated, 1);
+    DUMP_FIELD(found_best_block, &bc_st_updating.found_best_block, 1);
+
+    uint8_t buf[sizeof(bc_st_updating.total_difficulty)];
+    dump_bigint_be(buf, bc_st_updating.total_difficulty, BIGINT_LEN);
+    DUMP_FIELD(total_difficulty, buf, sizeof(buf));
+
+    return size;
+}
+
 /*
  * Implement the get blockchain state procotol.
  *
@@ -220,7 +292,12 @@ uint8_t dump_flags() {
 unsigned int bc_get_state(volatile unsigned int rx) {
     uint8_t op = APDU_OP();
 
-    uint8_t expected_data_size = op == OP_STATE_GET_HASH ? 1 : 0;
+    uint8_t expected_data_size = 0;
+    if (op == OP_STATE_GET_HASH) {
+        expected_data_size = 1;
+    } else if (op == OP_STATE_GET_ALL) {
+        expected_data_size = STATE_DUMP_OFFSET_SIZE;
+    }
     if (APDU_DATA_SIZE(rx) != expected_data_size) {
         FAIL(PROT_INVALID);
     }
@@ -237,6 +314,11 @@ unsigned int bc_get_state(volatile unsigned int rx) {
         return TX_FOR_DATA_SIZE(dump_flags());
     }
 
+    if (op == OP_STATE_GET_ALL) {
+        return TX_FOR_DATA_SIZE(
+            dump_all(((unsigned int)APDU_DATA_PTR[0] << 8) | APDU_DATA_PTR[1]));
+    }
+
     FAIL(PROT_INVALID);
     return 0;
 }
@@ -87,6 +87,7 @@ typedef enum {
     OP_STATE_GET_HASH = 0x01,
     OP_STATE_GET_DIFF = 0x02,
     OP_STATE_GET_FLAGS = 0x03,
+    OP_STATE_GET_ALL = 0x04,
 
     OP_STATE_RESET_INIT = 0x01,
     OP_STATE_RESET_DONE = 0x02,
@@ -101,6 +102,26 @@ typedef enum {
 #define U_NEWEST_VALID_BLOCK 0x82
 #define U_NEXT_EXPECTED_BLOCK 0x84
 
+// Full blockchain state dump, as returned (possibly in
+// several pieces, depending on the APDU buffer size) by
+// OP_STATE_GET_ALL. Difficulty is dumped in big endian order.
+typedef struct {
+    uint8_t best_block[HASH_SIZE];
+    uint8_t newest_valid_block[HASH_SIZE];
+    uint8_t ancestor_block[HASH_SIZE];
+    uint8_t ancestor_receipt_root[HASH_SIZE];
+    uint8_t u_best_block[HASH_SIZE];
+    uint8_t u_newest_valid_block[HASH_SIZE];
+    uint8_t u_next_expected_block[HASH_SIZE];
+    uint8_t in_progress;
+    uint8_t already_validated;
+    uint8_t found_best_block;
+    uint8_t total_difficulty[BIGINT_LEN * sizeof(DIGIT_T)];
+} bc_state_dump_t;
+
+// Size of the offset field in OP_STATE_GET_ALL requests
+#define STATE_DUMP_OFFSET_SIZE 2
+
 /*
  * Initialize blockchain state.
  */
@@ -27,7 +27,15 @@
 
 #include "hal/nvmem.h"
 
+#if defined(HSM_PLATFORM_X86)
+// Account every write to its call site (see hal/nvmem.h)
+#define NVM_RESET(dst, size) \
+    nvmem_write_at((void*)(dst), NULL, size, __FILE__, __LINE__)
+#define NVM_WRITE(dst, src, size) \
+    nvmem_write_at((void*)(dst), (void*)(src), size, __FILE__, __LINE__)
+#else
 #define NVM_RESET(dst, size) nvmem_write((void*)(dst), NULL, size)
 #define NVM_WRITE(dst, src, size) nvmem_write((void*)(dst), (void*)(src), size)
+#endif
 
 #endif // __NVM_H
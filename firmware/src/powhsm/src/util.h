@@ -26,5 +26,6 @@
 #define __UTIL_H
 
 #define MIN(x, y) ((x) < (y) ? (x) : (y))
+#define MAX(x, y) ((x) > (y) ? (x) : (y))
 
 #endif // __UTIL_H
@@ -0,0 +1,150 @@
+/**
+ * The MIT License (MIT)
+ *
+ * Copyright (c) 2021 RSK Labs Ltd
+ *
+ * Permission is hereby granted, free of charge, to any person obtaining a copy
+ * of this software and associated documentation files (the "Software"), to
+ * deal in the Software without restriction, including without limitation the
+ * rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+ * sell copies of the Software, and to permit persons to whom the Software is
+ * furnished to do so, subject to the following conditions:
+ *
+ * The above copyright notice and this permission notice shall be included in
+ * all copies or substantial portions of the Software.
+ *
+ * THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ * IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+ * FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+ * AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+ * LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+ * FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+ * IN THE SOFTWARE.
+ */
+
+#include <assert.h>
+#include <stdio.h>
+#include <string.h>
+
+#include "apdu.h"
+#include "hal/exceptions.h"
+#include "instructions.h"
+#include "bc_err.h"
+#include "bc_state.h"
+#include "mem.h"
+
+// Maximum APDU buffer size (SGX)
+#define MAX_IO_APDU_BUFFER_SIZE (5 + 2048)
+
+// Communication mocks
+static unsigned char io_apdu_buffer[MAX_IO_APDU_BUFFER_SIZE];
+static size_t io_apdu_buffer_size;
+
+unsigned char* communication_get_msg_buffer() {
+    return io_apdu_buffer;
+}
+
+size_t communication_get_msg_buffer_size() {
+    return io_apdu_buffer_size;
+}
+
+static uint8_t expected_dump[sizeof(bc_state_dump_t)];
+
+void setup() {
+    explicit_bzero(&N_bc_state_var, sizeof(N_bc_state_var));
+    explicit_bzero(&sess_per_mem, sizeof(sess_per_mem));
+
+    memset(N_bc_state.best_block, 0x11, HASH_SIZE);
+    memset(N_bc_state.newest_valid_block, 0x22, HASH_SIZE);
+    memset(N_bc_state.ancestor_block, 0x33, HASH_SIZE);
+    memset(N_bc_state.ancestor_receipt_root, 0x44, HASH_SIZE);
+    memset(N_bc_state.last_auth_signed_btc_tx_hash, 0xee, HASH_SIZE);
+    memset(bc_st_updating.best_block, 0x55, HASH_SIZE);
+    memset(bc_st_updating.newest_valid_block, 0x66, HASH_SIZE);
+    memset(bc_st_updating.next_expected_block, 0x77, HASH_SIZE);
+    bc_st_updating.in_progress = true;
+    bc_st_updating.already_validated = false;
+    bc_st_updating.found_best_block = true;
+    for (int i = 0; i < BIGINT_LEN; i++) {
+        bc_st_updating.total_difficulty[i] = 0x01020304 * (i + 1);
+    }
+
+    uint8_t* p = expected_dump;
+    for (uint8_t b = 0x11; b <= 0x77; b += 0x11, p += HASH_SIZE) {
+        memset(p, b, HASH_SIZE);
+    }
+    *p++ = 1;
+    *p++ = 0;
+    *p++ = 1;
+    for (int i = BIGINT_LEN - 1; i >= 0; i--) {
+        DIGIT_T d = 0x01020304 * (i + 1);
+        *p++ = (uint8_t)(d >> 24);
+        *p++ = (uint8_t)(d >> 16);
+        *p++ = (uint8_t)(d >> 8);
+        *p++ = (uint8_t)d;
+    }
+    assert(p - expected_dump == sizeof(expected_dump));
+}
+
+unsigned int get_state_all(unsigned int offset) {
+    SET_APDU_CLA();
+    SET_APDU_CMD(INS_GET_STATE);
+    SET_APDU_OP(OP_STATE_GET_ALL);
+    APDU_DATA_PTR[0] = (uint8_t)(offset >> 8);
+    APDU_DATA_PTR[1] = (uint8_t)offset;
+    return bc_get_state(TX_FOR_DATA_SIZE(STATE_DUMP_OFFSET_SIZE));
+}
+
+void test_dump_all(size_t buffer_size, unsigned int expected_chunks) {
+    printf("Testing state dump with a %lu bytes APDU buffer...\n",
+           buffer_size);
+    io_apdu_buffer_size = buffer_size;
+    setup();
+
+    unsigned int offset = 0;
+    unsigned int chunks = 0;
+    while (offset < sizeof(bc_state_dump_t)) {
+        unsigned int size = get_state_all(offset) - DATA;
+        unsigned int remaining = sizeof(bc_state_dump_t) - offset;
+        assert(size == (remaining < APDU_TOTAL_DATA_SIZE_OUT
+                            ? remaining
+                            : APDU_TOTAL_DATA_SIZE_OUT));
+        assert(APDU_OP() == OP_STATE_GET_ALL);
+        assert(!memcmp(APDU_DATA_PTR, expected_dump + offset, size));
+        offset += size;
+        chunks++;
+    }
+    assert(offset == sizeof(bc_state_dump_t));
+    assert(chunks == expected_chunks);
+}
+
+void test_dump_all_invalid_offset() {
+    printf("Testing state dump with an invalid offset...\n");
+    io_apdu_buffer_size = MAX_IO_APDU_BUFFER_SIZE;
+    setup();
+
+    BEGIN_TRY {
+        TRY {
+            get_state_all(sizeof(bc_state_dump_t));
+            assert(false);
+        }
+        CATCH(PROT_INVALID) {
+            return;
+        }
+        CATCH_OTHER(e) {
+            assert(false);
+        }
+        FINALLY {
+        }
+    }
+    END_TRY;
+    assert(false);
+}
+
+int main() {
+    // Ledger and TCPSigner (80 bytes of data) and SGX (2048 bytes of data)
+    test_dump_all(5 + 80, 4);
+    test_dump_all(MAX_IO_APDU_BUFFER_SIZE, 1);
+    test_dump_all_invalid_offset();
+    return 0;
+}
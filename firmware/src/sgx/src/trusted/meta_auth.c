@@ -0,0 +1,136 @@
+/**
+ * The MIT License (MIT)
+ *
+ * Copyright (c) 2021 RSK Labs Ltd
+ *
+ * Permission is hereby granted, free of charge, to any person obtaining a copy
+ * of this software and associated documentation files (the "Software"), to
+ * deal in the Software without restriction, including without limitation the
+ * rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+ * sell copies of the Software, and to permit persons to whom the Software is
+ * furnished to do so, subject to the following conditions:
+ *
+ * The above copyright notice and this permission notice shall be included in
+ * all copies or substantial portions of the Software.
+ *
+ * THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ * IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+ * FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+ * AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+ * LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+ * FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+ * IN THE SOFTWARE.
+ */
+
+#include <stdlib.h>
+#include <stdint.h>
+#include <string.h>
+
+#include "meta_auth.h"
+
+#include "hal/exceptions.h"
+#include "hal/log.h"
+
+#include "apdu.h"
+#include "instructions.h"
+#include "err.h"
+#include "mem.h"
+#include "auth.h"
+
+#define CHUNK_OVERHEAD 5
+
+bool meta_sign_handles_op(unsigned char op) {
+    switch (op & 0xF) {
+    case P1_BTC:
+    case P1_RECEIPT:
+    case P1_MERKLEPROOF:
+        return true;
+    default:
+        return false;
+    }
+}
+
+unsigned int do_meta_sign(unsigned int rx) {
+    uint8_t op;
+    uint8_t internal_buffer[AUTH_MAX_EXCHANGE_SIZE + CHUNK_OVERHEAD];
+    uint8_t* old_buffer;
+    size_t old_buffer_size;
+
+    unsigned int total_data = APDU_DATA_SIZE(rx);
+    unsigned int data_offset = 0;
+    unsigned int chunk_size = auth.expected_bytes;
+    unsigned int irx;
+
+    // Nothing to split: this is the legacy chunked protocol
+    // (or an invalid request the protocol itself will reject)
+    if (chunk_size == 0 || total_data <= chunk_size) {
+        return auth_sign(rx);
+    }
+
+    op = APDU_OP();
+
+    // Backup message buffer spec
+    old_buffer = communication_get_msg_buffer();
+    old_buffer_size = communication_get_msg_buffer_size();
+
+    // Set new buffer
+    communication_set_msg_buffer(internal_buffer, sizeof(internal_buffer));
+
+    BEGIN_TRY {
+        TRY {
+            while (data_offset < total_data) {
+                // The merkle proof last chunk can be shorter than requested
+                if (chunk_size > total_data - data_offset) {
+                    chunk_size = total_data - data_offset;
+                }
+                if (chunk_size == 0 || chunk_size > APDU_TOTAL_DATA_SIZE) {
+                    // This shouldn't happen
+                    THROW(ERR_INTERNAL);
+                }
+                SET_APDU_CLA();
+                SET_APDU_CMD(INS_SIGN);
+                SET_APDU_OP(op);
+                memcpy(
+                    APDU_DATA_PTR, &old_buffer[DATA + data_offset], chunk_size);
+                irx = TX_FOR_DATA_SIZE(chunk_size);
+                LOG_HEX("ITX >", internal_buffer, irx);
+                irx = auth_sign(irx);
+                LOG_HEX("ITX <", internal_buffer, irx);
+                // Validate response
+                if (irx > sizeof(internal_buffer)) {
+                    LOG("Unexpected response size\n");
+                    THROW(ERR_INTERNAL);
+                }
+                data_offset += chunk_size;
+                // Done?
+                if (APDU_OP() != op) {
+                    break;
+                }
+                chunk_size = APDU_TXLEN();
+            }
+
+            // The protocol moved on but there's still data left
+            if (data_offset < total_data) {
+                LOG("Got %u bytes more than needed\n", total_data - data_offset);
+                THROW(ERR_AUTH_INVALID_DATA_SIZE);
+            }
+
+            // Restore message buffer
+            communication_set_msg_buffer(old_buffer, old_buffer_size);
+
+            // Response (either a request for more data of the current
+            // operation, a request for the next operation or the signature)
+            memcpy(old_buffer, internal_buffer, irx);
+            return irx;
+        }
+        CATCH_OTHER(e) {
+            // Restore message buffer
+            communication_set_msg_buffer(old_buffer, old_buffer_size);
+            // Forward
+            THROW(e);
+        }
+        FINALLY {
+        }
+    }
+    END_TRY;
+}
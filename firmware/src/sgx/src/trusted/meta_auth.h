@@ -0,0 +1,52 @@
+/**
+ * The MIT License (MIT)
+ *
+ * Copyright (c) 2021 RSK Labs Ltd
+ *
+ * Permission is hereby granted, free of charge, to any person obtaining a copy
+ * of this software and associated documentation files (the "Software"), to
+ * deal in the Software without restriction, including without limitation the
+ * rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+ * sell copies of the Software, and to permit persons to whom the Software is
+ * furnished to do so, subject to the following conditions:
+ *
+ * The above copyright notice and this permission notice shall be included in
+ * all copies or substantial portions of the Software.
+ *
+ * THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ * IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+ * FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+ * AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+ * LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+ * FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+ * IN THE SOFTWARE.
+ */
+
+#ifndef __TRUSTED_META_AUTH_H
+#define __TRUSTED_META_AUTH_H
+
+#include <stdbool.h>
+
+/**
+ * @brief Tell whether the given signing operation is one of
+ * the chunked operations handled by do_meta_sign
+ *
+ * @param op the APDU operation
+ *
+ * @returns whether the operation is handled
+ */
+bool meta_sign_handles_op(unsigned char op);
+
+/**
+ * @brief Feed a signing payload (BTC tx, receipt or receipts
+ * merkle proof) that can be bigger than the powHSM exchange size
+ * to the signing authorization protocol, splitting it in the
+ * chunks that the protocol requests
+ *
+ * @param rx number of received bytes from the host
+ *
+ * @returns number of transmited bytes to the host
+ */
+unsigned int do_meta_sign(unsigned int rx);
+
+#endif // __TRUSTED_META_AUTH_H
@@ -21,6 +21,7 @@
 #include "upgrade.h"
 #include "evidence.h"
 #include "meta_bc.h"
+#include "meta_auth.h"
 
 /**
  * APDU buffer (host pointer and local enclave copy)
@@ -187,6 +188,18 @@ static external_processor_result_t system_do_process_apdu(unsigned int rx) {
         reset_unless_cmd_is(APDU_CMD());
         result.tx = do_meta_advupd(rx);
         break;
+    // Signing chunked operations accept their payload in full,
+    // everything else is left to the default hsm module handler
+    case INS_SIGN:
+        REQUIRE_UNLOCKED();
+        REQUIRE_ONBOARDED();
+        reset_unless_cmd_is(INS_SIGN);
+        if (!meta_sign_handles_op(APDU_OP())) {
+            result.handled = false;
+            break;
+        }
+        result.tx = do_meta_sign(rx);
+        break;
     default:
         reset_unless_cmd_is(0);
         result.handled = false;
@@ -28,6 +28,7 @@
 #include <netdb.h>
 #include <netinet/tcp.h>
 #include <sys/ioctl.h>
+#include <sys/un.h>
 
 #include "io.h"
 #include "log.h"
@@ -42,7 +43,13 @@ unsigned char io_apdu_buffer[APDU_BUFFER_SIZE];
  */
 int serverfd;
 int connfd;
-struct sockaddr_in servaddr, cliaddr;
+struct sockaddr_in servaddr;
+struct sockaddr_storage cliaddr;
+
+/**
+ * For the Unix domain socket server (path of the socket file, if any)
+ */
+static char unix_socket_path[sizeof(((struct sockaddr_un *)0)->sun_path)];
 
 static void close_and_reset_fd(int *fd) {
     if (fd && (*fd != -1)) {
@@ -102,6 +109,48 @@ static int start_server(int port, const char *host) {
     return sockfd;
 }
 
+static int start_unix_server(const char *path) {
+    int sockfd;
+    struct sockaddr_un unaddr;
+
+    if (strlen(path) >= sizeof(unaddr.sun_path)) {
+        LOG("Unix socket path too long.\n");
+        return -1;
+    }
+
+    // socket create and verification
+    sockfd = socket(AF_UNIX, SOCK_STREAM, 0);
+    if (sockfd == -1) {
+        LOG("Socket creation failed...\n");
+        return -1;
+    }
+
+    explicit_bzero(&unaddr, sizeof(unaddr));
+    unaddr.sun_family = AF_UNIX;
+    strcpy(unaddr.sun_path, path);
+
+    // Remove any stale socket file from a previous run
+    unlink(path);
+
+    // Binding newly created socket to given path and verification
+    if ((bind(sockfd, (struct sockaddr *)&unaddr, sizeof(unaddr))) != 0) {
+        LOG("Socket bind failed...\n");
+        close(sockfd);
+        return -1;
+    }
+    strcpy(unix_socket_path, path);
+
+    // Now server is ready to listen and verification
+    if ((listen(sockfd, 5)) != 0) {
+        LOG("Listen failed...\n");
+        close(sockfd);
+        return -1;
+    }
+
+    LOG("Server listening on %s...\n", path);
+    return sockfd;
+}
+
 static bool accept_connection() {
     socklen_t len = sizeof(cliaddr);
     connfd = accept(serverfd, (struct sockaddr *)&cliaddr, &len);
@@ -116,13 +165,25 @@ static bool accept_connection() {
 
 bool io_init(int port, const char *host) {
     connfd = -1;
+    unix_socket_path[0] = 0;
     serverfd = start_server(port, host);
     return (serverfd != -1);
 }
 
+bool io_init_unix(const char *path) {
+    connfd = -1;
+    unix_socket_path[0] = 0;
+    serverfd = start_unix_server(path);
+    return (serverfd != -1);
+}
+
 void io_finalise() {
     close_and_reset_fd(&connfd);
     close_and_reset_fd(&serverfd);
+    if (unix_socket_path[0]) {
+        unlink(unix_socket_path);
+        unix_socket_path[0] = 0;
+    }
 }
 
 #define CHECK_READ_STATUS(read_result, err_prefix)                            \
@@ -43,6 +43,16 @@ extern unsigned char io_apdu_buffer[APDU_BUFFER_SIZE];
  */
 bool io_init(int port, const char *host);
 
+/**
+ * @brief Initializes the I/O module. Starts a Unix domain socket server
+ * at the given path (any existing file at that path is removed first,
+ * and the socket file is removed upon finalisation).
+ *
+ * @param path the filesystem path of the socket to listen on
+ *
+ */
+bool io_init_unix(const char *path);
+
 /**
  * @brief Exchanges bytes with the host. This function blocks until the host
  * sends a message.
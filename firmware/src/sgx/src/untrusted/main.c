@@ -45,6 +45,12 @@
 static struct argp_option options[] = {
     {"bind", 'b', "ADDRESS", 0, "Address to bind to", 0},
     {"port", 'p', "PORT", 0, "Port to listen on", 0},
+    {"unix",
+     'u',
+     "PATH",
+     0,
+     "Listen on the Unix domain socket at PATH instead of TCP",
+     0},
     {0}};
 
 // Global counter to avoid multiple calls to finalise_with
@@ -54,6 +60,7 @@ static sig_atomic_t G_signal_counter = 0;
 struct arguments {
     char *bind;
     int port;
+    char *unix_path;
     char *enclave_path;
 };
 
@@ -70,6 +77,9 @@ static error_t parse_opt(int key, char *arg, struct argp_state *state) {
             argp_failure(state, 1, 0, "Invalid numeric port given: %s", arg);
         }
         break;
+    case 'u':
+        arguments->unix_path = arg;
+        break;
     case ARGP_KEY_ARG:
         if (arguments->enclave_path) {
             argp_failure(state, 1, 0, "Too many arguments given");
@@ -131,6 +141,7 @@ int main(int argc, char **argv) {
     struct arguments arguments = {
         "127.0.0.1", // Bind address
         7777,        // Port
+        NULL,        // Unix domain socket path
         NULL,        // Enclave path
     };
 
@@ -153,7 +164,8 @@ int main(int argc, char **argv) {
     LOG("System initialised\n");
 
     LOG("Initialising server...\n");
-    if (!io_init(arguments.port, arguments.bind)) {
+    if (!(arguments.unix_path ? io_init_unix(arguments.unix_path)
+                              : io_init(arguments.port, arguments.bind))) {
         LOG("Error initialising server\n");
         goto main_error;
     }
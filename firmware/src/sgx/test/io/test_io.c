@@ -31,11 +31,14 @@
 #include <assert.h>
 #include <arpa/inet.h>
 #include <sys/socket.h>
+#include <sys/stat.h>
+#include <sys/un.h>
 
 #include "io.h"
 
 #define TEST_PORT 12345
 #define TEST_HOST "127.0.0.1"
+#define TEST_UNIX_PATH "/tmp/powhsm-test-io.sock"
 
 #define DO_IO_INIT()                             \
     {                                            \
@@ -133,6 +136,27 @@
         assert(false);                                   \
     }
 
+#define CLIENT_ASSERT_CONNECT_UNIX()                                  \
+    int __sockfd__;                                                   \
+    struct sockaddr_un __unaddr__;                                    \
+    __sockfd__ = socket(AF_UNIX, SOCK_STREAM, 0);                     \
+    if (__sockfd__ < 0) {                                             \
+        perror("Client socket creation failed");                      \
+        assert(false);                                                \
+    }                                                                 \
+                                                                      \
+    memset(&__unaddr__, 0, sizeof(__unaddr__));                       \
+    __unaddr__.sun_family = AF_UNIX;                                  \
+    strcpy(__unaddr__.sun_path, TEST_UNIX_PATH);                      \
+                                                                      \
+    if (connect(__sockfd__,                                           \
+                (struct sockaddr *)&__unaddr__,                       \
+                sizeof(__unaddr__)) < 0) {                            \
+        perror("Client connect failed");                              \
+        close(__sockfd__);                                            \
+        assert(false);                                                \
+    }
+
 #define CLIENT_ASSERT_CONNECT()      \
     int __sockfd__;                  \
     struct sockaddr_in __servaddr__; \
@@ -410,6 +434,53 @@ void test_hgup_during_payload() {
     printf("OK\n");
 }
 
+void *client_unix_request_response() {
+    CLIENT_ASSERT_CONNECT_UNIX();
+    CLIENT_SEND(MOCK_REQUEST, strlen(MOCK_REQUEST));
+
+    CLIENT_RECV_ASSERT_RESPONSE(MOCK_RESPONSE, strlen(MOCK_RESPONSE));
+
+    CLIENT_REPLY_AND_CLOSE();
+}
+
+void test_unix_request_response() {
+    printf("Testing request/response over a Unix domain socket...\n");
+
+    struct stat st;
+
+    // Stale socket files are replaced
+    FILE *stale = fopen(TEST_UNIX_PATH, "w");
+    assert(stale != NULL);
+    fclose(stale);
+
+    if (!io_init_unix(TEST_UNIX_PATH)) {
+        fprintf(stderr, "io_init_unix failed\n");
+        assert(false);
+    }
+    assert(stat(TEST_UNIX_PATH, &st) == 0 && S_ISSOCK(st.st_mode));
+
+    DO_CREATE_CLIENT(client_unix_request_response);
+    ASSERT_IO_EXCHANGE_RECV(MOCK_REQUEST, strlen(MOCK_REQUEST));
+    ASSERT_SEND_RESPONSE(MOCK_RESPONSE, strlen(MOCK_RESPONSE));
+    DO_FINALISE();
+
+    // Socket file is removed upon finalisation
+    assert(stat(TEST_UNIX_PATH, &st) != 0);
+
+    printf("OK\n");
+}
+
+void test_unix_path_too_long() {
+    printf("Testing Unix domain socket path too long...\n");
+
+    char path[sizeof(((struct sockaddr_un *)0)->sun_path) + 1];
+    memset(path, 'a', sizeof(path) - 1);
+    path[sizeof(path) - 1] = 0;
+    assert(!io_init_unix(path));
+
+    printf("OK\n");
+}
+
 int main() {
     test_request_response_ok("hello, goodbye", "Hello", 5, "Goodbye", 7);
     test_request_response_ok("empty, empty", "", 0, "", 0);
@@ -429,5 +500,8 @@ int main() {
     test_hgup_during_length();
     test_hgup_during_payload();
 
+    test_unix_request_response();
+    test_unix_path_too_long();
+
     return 0;
 }
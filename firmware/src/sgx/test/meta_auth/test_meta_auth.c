@@ -0,0 +1,326 @@
+/**
+ * The MIT License (MIT)
+ *
+ * Copyright (c) 2021 RSK Labs Ltd
+ *
+ * Permission is hereby granted, free of charge, to any person obtaining a copy
+ * of this software and associated documentation files (the "Software"), to
+ * deal in the Software without restriction, including without limitation the
+ * rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+ * sell copies of the Software, and to permit persons to whom the Software is
+ * furnished to do so, subject to the following conditions:
+ *
+ * The above copyright notice and this permission notice shall be included in
+ * all copies or substantial portions of the Software.
+ *
+ * THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ * IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+ * FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+ * AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+ * LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+ * FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+ * IN THE SOFTWARE.
+ */
+
+#include <stdio.h>
+#include <stdbool.h>
+
+#include "meta_auth.h"
+
+#include "apdu.h"
+#include "hal/exceptions.h"
+#include "apdu_utils.h"
+#include "assert_utils.h"
+#include "instructions.h"
+#include "mem.h"
+
+// Shorthands
+#define BS_A "\xAA\xAA\xBB\xBB\xCC\xCC\xDD\xDD\xEE\xEE"
+#define BS_B "\x00\x11\x22\x33\x44\x55\x66\x77\x88\x99"
+
+#define BS_A_50 BS_A BS_A BS_A BS_A BS_A
+#define BS_B_50 BS_B BS_B BS_B BS_B BS_B
+
+// Utils
+#define ASSERT_AUTH_REQUEST(ix, str_literal)                                \
+    {                                                                       \
+        assert(auth_request_count > ix);                                    \
+        assert(sizeof(str_literal) - 1 == auth_requests[ix].rx);            \
+        assert(!memcmp(                                                     \
+            auth_requests[ix].apdu, str_literal, sizeof(str_literal) - 1)); \
+    }
+
+// Globals
+static try_context_t G_try_last_open_context_var;
+try_context_t* G_try_last_open_context = &G_try_last_open_context_var;
+unsigned char G_io_apdu_buffer[IO_APDU_BUFFER_SIZE];
+mem_t mem;
+
+// Function mocks
+static unsigned char* communication_msg_buffer;
+static size_t communication_msg_buffer_size;
+static unsigned int auth_total_bytes_to_process;
+static unsigned char auth_next_op;
+static unsigned char auth_next_tx_len;
+static unsigned int auth_throw;
+static unsigned int auth_throw_at;
+
+static unsigned communication_set_msg_buffer_callcount;
+
+typedef struct {
+    unsigned int rx;
+    unsigned char apdu[100];
+} request_t;
+static request_t auth_requests[100];
+static unsigned auth_request_count;
+
+// Consumes the given chunk and either requests more data for
+// the current operation (up to the exchange size) or moves
+// on to the next operation. A SUCCESS next operation
+// replies with a fake signature instead.
+unsigned int auth_sign(volatile unsigned int rx) {
+    auth_requests[auth_request_count].rx = rx;
+    memcpy(auth_requests[auth_request_count].apdu,
+           communication_msg_buffer,
+           rx < sizeof(auth_requests[0].apdu) ? rx : 0);
+    auth_request_count++;
+
+    if (auth_throw && auth_request_count == auth_throw_at)
+        THROW(auth_throw);
+
+    auth_total_bytes_to_process -= APDU_DATA_SIZE(rx);
+    if (auth_total_bytes_to_process) {
+        SET_APDU_TXLEN(auth_total_bytes_to_process > AUTH_MAX_EXCHANGE_SIZE
+                           ? AUTH_MAX_EXCHANGE_SIZE
+                           : auth_total_bytes_to_process);
+        auth.expected_bytes = APDU_TXLEN();
+        return TX_FOR_TXLEN();
+    }
+
+    SET_APDU_OP(auth_next_op);
+    if (auth_next_op == P1_SUCCESS) {
+        memcpy(APDU_DATA_PTR, "\x30\x44\x55\x66", 4);
+        return TX_FOR_DATA_SIZE(4);
+    }
+    SET_APDU_TXLEN(auth_next_tx_len);
+    auth.expected_bytes = APDU_TXLEN();
+    return TX_FOR_TXLEN();
+}
+
+unsigned char* communication_get_msg_buffer() {
+    return communication_msg_buffer;
+}
+
+size_t communication_get_msg_buffer_size() {
+    return communication_msg_buffer_size;
+}
+
+bool communication_set_msg_buffer(unsigned char* msg_buffer,
+                                  size_t msg_buffer_size) {
+    communication_msg_buffer = msg_buffer;
+    communication_msg_buffer_size = msg_buffer_size;
+    communication_set_msg_buffer_callcount++;
+    return true;
+}
+
+void setup() {
+    communication_msg_buffer = G_io_apdu_buffer;
+    communication_msg_buffer_size = sizeof(G_io_apdu_buffer);
+    communication_set_msg_buffer_callcount = 0;
+    memset(&auth, 0, sizeof(auth));
+    auth_request_count = 0;
+    auth_total_bytes_to_process = 0;
+    auth_next_op = 0;
+    auth_next_tx_len = 0;
+    auth_throw = 0;
+    auth_throw_at = 0;
+}
+
+void assert_buffer_changed_and_restored() {
+    assert(2 == communication_set_msg_buffer_callcount);
+    assert(communication_msg_buffer == G_io_apdu_buffer);
+    assert(communication_msg_buffer_size == sizeof(G_io_apdu_buffer));
+}
+
+void test_meta_sign_handles_op() {
+    printf("Test meta_sign handles only chunked operations...\n");
+
+    assert(meta_sign_handles_op(P1_BTC));
+    assert(meta_sign_handles_op(P1_RECEIPT));
+    assert(meta_sign_handles_op(P1_MERKLEPROOF));
+    assert(!meta_sign_handles_op(P1_PATH));
+    assert(!meta_sign_handles_op(P1_SUCCESS));
+    assert(!meta_sign_handles_op(0x00));
+}
+
+void test_meta_sign_single_chunk() {
+    unsigned int rx;
+
+    setup();
+    printf("Test meta_sign with a single chunk payload...\n");
+
+    auth.expected_bytes = 50;
+    auth_total_bytes_to_process = 50;
+    auth_next_op = P1_RECEIPT;
+    auth_next_tx_len = 33;
+
+    ASSERT_DOESNT_THROW({
+        SET_APDU("\x80\x02\x02" BS_A_50, rx);
+        assert(4 == do_meta_sign(rx));
+        ASSERT_APDU("\x80\x02\x04\x21");
+        // Legacy chunks go straight to the protocol
+        assert(0 == communication_set_msg_buffer_callcount);
+        assert(1 == auth_request_count);
+        ASSERT_AUTH_REQUEST(0, "\x80\x02\x02" BS_A_50);
+    });
+}
+
+void test_meta_sign_large_payload() {
+    unsigned int rx;
+
+    setup();
+    printf("Test meta_sign with a large payload...\n");
+
+    auth.expected_bytes = 30;
+    auth_total_bytes_to_process = 210;
+    auth_next_op = P1_MERKLEPROOF;
+    auth_next_tx_len = 80;
+
+    ASSERT_DOESNT_THROW({
+        SET_APDU("\x80\x02\x04" BS_A_50 BS_B_50 BS_A_50 BS_B_50 BS_A, rx);
+        assert(4 == do_meta_sign(rx));
+        ASSERT_APDU("\x80\x02\x08\x50");
+        assert_buffer_changed_and_restored();
+        assert(4 == auth_request_count);
+        ASSERT_AUTH_REQUEST(0, "\x80\x02\x04" BS_A BS_A BS_A);
+        ASSERT_AUTH_REQUEST(1, "\x80\x02\x04" BS_A BS_A BS_B_50 BS_A);
+        ASSERT_AUTH_REQUEST(
+            2, "\x80\x02\x04" BS_A BS_A BS_A BS_A BS_B BS_B BS_B BS_B);
+        ASSERT_AUTH_REQUEST(3, "\x80\x02\x04" BS_B BS_A);
+    });
+}
+
+void test_meta_sign_large_payload_signature() {
+    unsigned int rx;
+
+    setup();
+    printf("Test meta_sign with a large payload leading to a signature...\n");
+
+    auth.expected_bytes = 80;
+    auth_total_bytes_to_process = 100;
+    auth_next_op = P1_SUCCESS;
+
+    ASSERT_DOESNT_THROW({
+        SET_APDU("\x80\x02\x08" BS_A_50 BS_B_50, rx);
+        assert(7 == do_meta_sign(rx));
+        ASSERT_APDU("\x80\x02\x81\x30\x44\x55\x66");
+        assert_buffer_changed_and_restored();
+        assert(2 == auth_request_count);
+        ASSERT_AUTH_REQUEST(0, "\x80\x02\x08" BS_A_50 BS_B BS_B BS_B);
+        ASSERT_AUTH_REQUEST(1, "\x80\x02\x08" BS_B BS_B);
+    });
+}
+
+void test_meta_sign_partial_payload() {
+    unsigned int rx;
+
+    setup();
+    printf("Test meta_sign with a payload shorter than needed...\n");
+
+    auth.expected_bytes = 40;
+    auth_total_bytes_to_process = 200;
+
+    ASSERT_DOESNT_THROW({
+        SET_APDU("\x80\x02\x02" BS_A_50 BS_B_50, rx);
+        assert(4 == do_meta_sign(rx));
+        // Request the rest of the data
+        ASSERT_APDU("\x80\x02\x02\x50");
+        assert_buffer_changed_and_restored();
+        assert(2 == auth_request_count);
+        ASSERT_AUTH_REQUEST(0, "\x80\x02\x02" BS_A BS_A BS_A BS_A);
+        ASSERT_AUTH_REQUEST(1, "\x80\x02\x02" BS_A BS_B_50);
+    });
+}
+
+void test_meta_sign_payload_too_long() {
+    unsigned int rx;
+
+    setup();
+    printf("Test meta_sign with a payload longer than needed...\n");
+
+    auth.expected_bytes = 50;
+    auth_total_bytes_to_process = 50;
+    auth_next_op = P1_RECEIPT;
+    auth_next_tx_len = 10;
+
+    ASSERT_THROWS(
+        {
+            SET_APDU("\x80\x02\x02" BS_A_50 BS_B, rx);
+            do_meta_sign(rx);
+        },
+        ERR_AUTH_INVALID_DATA_SIZE);
+
+    assert_buffer_changed_and_restored();
+    assert(1 == auth_request_count);
+    ASSERT_AUTH_REQUEST(0, "\x80\x02\x02" BS_A_50);
+}
+
+void test_meta_sign_auth_throws() {
+    unsigned int rx;
+
+    setup();
+    printf("Test meta_sign when the signing protocol throws...\n");
+
+    auth.expected_bytes = 20;
+    auth_total_bytes_to_process = 60;
+    auth_throw = ERR_AUTH_INVALID_STATE;
+    auth_throw_at = 2;
+
+    ASSERT_THROWS(
+        {
+            SET_APDU("\x80\x02\x04" BS_A_50 BS_B, rx);
+            do_meta_sign(rx);
+        },
+        ERR_AUTH_INVALID_STATE);
+
+    assert_buffer_changed_and_restored();
+    assert(2 == auth_request_count);
+    ASSERT_AUTH_REQUEST(0, "\x80\x02\x04" BS_A BS_A);
+    ASSERT_AUTH_REQUEST(1, "\x80\x02\x04" BS_A BS_A BS_A BS_B);
+}
+
+void test_meta_sign_no_expected_bytes() {
+    unsigned int rx;
+
+    setup();
+    printf("Test meta_sign when no data was requested...\n");
+
+    auth_throw = ERR_AUTH_INVALID_STATE;
+    auth_throw_at = 1;
+
+    ASSERT_THROWS(
+        {
+            SET_APDU("\x80\x02\x02" BS_A_50, rx);
+            do_meta_sign(rx);
+        },
+        ERR_AUTH_INVALID_STATE);
+
+    assert(0 == communication_set_msg_buffer_callcount);
+    assert(1 == auth_request_count);
+    ASSERT_AUTH_REQUEST(0, "\x80\x02\x02" BS_A_50);
+}
+
+int main() {
+    test_meta_sign_handles_op();
+
+    test_meta_sign_single_chunk();
+    test_meta_sign_large_payload();
+    test_meta_sign_large_payload_signature();
+    test_meta_sign_partial_payload();
+
+    test_meta_sign_payload_too_long();
+    test_meta_sign_auth_throws();
+    test_meta_sign_no_expected_bytes();
+
+    return 0;
+}
@@ -2,7 +2,7 @@
 
 if [[ $1 == "exec" ]]; then
     BASEDIR=$(realpath $(dirname $0))
-    TESTDIRS="aes_gcm ecall io keyvalue_store meta_bc migrate upgrade sync system"
+    TESTDIRS="aes_gcm ecall io keyvalue_store meta_bc meta_auth migrate upgrade sync system"
     for d in $TESTDIRS; do
         echo "******************************"
         echo "Testing $d..."
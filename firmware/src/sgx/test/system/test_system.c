@@ -73,6 +73,7 @@ typedef struct mock_calls_counter {
     int evidence_init_count;
     int upgrade_reset_count;
     int do_meta_advupd_count;
+    int do_meta_sign_count;
 } mock_calls_counter_t;
 
 typedef struct nvmem_register_block_args {
@@ -363,6 +364,16 @@ unsigned int do_meta_advupd(unsigned int rx) {
     return 3;
 }
 
+bool meta_sign_handles_op(unsigned char op) {
+    return op == 0x02 || op == 0x04 || op == 0x08;
+}
+
+unsigned int do_meta_sign(unsigned int rx) {
+    NUM_CALLS(do_meta_sign)++;
+    SET_APDU_OP(APDU_OP() * 7);
+    return 3;
+}
+
 // Helper functions
 static void setup() {
     memset(&G_mock_data, 0, sizeof(G_mock_data));
@@ -1344,6 +1355,72 @@ void test_upd_ancestor_resets_when_other_cmds_in_between() {
     assert(NUM_CALLS(do_meta_advupd) == 4);
 }
 
+void test_sign_chunked_op_handled() {
+    setup();
+    printf("Test sign command chunked operation success...\n");
+
+    system_init(G_io_apdu_buffer, sizeof(G_io_apdu_buffer));
+    SEED_SET_AVAILABLE(true);
+    ACCESS_UNLOCK();
+    unsigned int rx = 0;
+    SET_APDU("\x80\x02\x04\x11\x22\x33\x44", rx); // INS_SIGN
+    assert(3 == system_process_apdu(rx));
+    ASSERT_HANDLED();
+    ASSERT_APDU("\x80\x02\x1C");
+    assert(NUM_CALLS(do_meta_sign) == 1);
+    assert(NUM_CALLS(hsm_reset_if_starting) == 1);
+    assert(G_mock_data.mock_call_args->hsm_reset_if_starting_args.cmd ==
+           INS_SIGN);
+
+    teardown();
+}
+
+void test_sign_other_op_not_handled() {
+    setup();
+    printf("Test sign command non chunked operation is ignored...\n");
+
+    system_init(G_io_apdu_buffer, sizeof(G_io_apdu_buffer));
+    SEED_SET_AVAILABLE(true);
+    ACCESS_UNLOCK();
+    unsigned int rx = 0;
+    SET_APDU("\x80\x02\x01\x11\x22\x33\x44", rx); // INS_SIGN
+    assert(0 == system_process_apdu(rx));
+    ASSERT_NOT_HANDLED();
+    ASSERT_NOT_CALLED(do_meta_sign);
+    assert(NUM_CALLS(hsm_reset_if_starting) == 1);
+    assert(G_mock_data.mock_call_args->hsm_reset_if_starting_args.cmd ==
+           INS_SIGN);
+
+    teardown();
+}
+
+void test_sign_cmd_fails_when_locked() {
+    setup();
+    printf("Test sign command fails when locked...\n");
+
+    system_init(G_io_apdu_buffer, sizeof(G_io_apdu_buffer));
+    SEED_SET_AVAILABLE(true);
+    ACCESS_LOCK();
+    unsigned int rx = 0;
+    SET_APDU("\x80\x02\x02\x11\x22\x33\x44", rx); // INS_SIGN
+    BEGIN_TRY {
+        TRY {
+            system_process_apdu(rx);
+            ASSERT_FAIL();
+        }
+        CATCH_OTHER(e) {
+            assert(e == ERR_DEVICE_LOCKED);
+        }
+        FINALLY {
+            ASSERT_NOT_HANDLED();
+            ASSERT_NOT_CALLED(do_meta_sign);
+            teardown();
+            return;
+        }
+    }
+    END_TRY;
+}
+
 void test_invalid_cmd_not_handled() {
     setup();
     printf("Test invalid command is ignored...\n");
@@ -1399,6 +1476,9 @@ int main() {
     test_upd_ancestor_cmd_fails_when_not_onboarded();
     test_upd_ancestor_cmd_fails_when_locked();
     test_upd_ancestor_resets_when_other_cmds_in_between();
+    test_sign_chunked_op_handled();
+    test_sign_other_op_not_handled();
+    test_sign_cmd_fails_when_locked();
     test_invalid_cmd_not_handled();
 
     return 0;
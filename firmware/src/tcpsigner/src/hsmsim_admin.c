@@ -26,6 +26,7 @@
 
 #include "hal/seed.h"
 #include "hal/log.h"
+#include "hal/nvmem.h"
 #include "hsmsim_admin.h"
 #include "apdu.h"
 #include "bc_state.h"
@@ -62,10 +63,109 @@ static unsigned int hsmsim_admin_ok(unsigned int tx) {
     return tx;
 }
 
+// Write the given value as a fixed size big endian
+// unsigned integer at the given data offset
+static unsigned int write_uint(unsigned int offset, unsigned int value) {
+    VAR_BIGENDIAN_TO(APDU_DATA_PTR + offset, value, sizeof(value));
+    return offset + sizeof(value);
+}
+
+static unsigned int write_write_stats(unsigned int offset,
+                                      nvmem_write_stats_t *stats) {
+    offset = write_uint(offset, stats->write_count);
+    offset = write_uint(offset, stats->bytes_written);
+    return write_uint(offset, stats->bytes_changed);
+}
+
+/*
+ * NVM stats. Depending on the operation:
+ * - Totals: the total number of writes, bytes written and bytes changed,
+ *   each one prepended by its length in bytes, followed by the number
+ *   of call sites and of APDU types tracked (one byte each).
+ * - Call site (index in the first data byte): line, writes, bytes written
+ *   and bytes changed (four bytes each) followed by the source file name.
+ * - APDU type (index in the first data byte): CLA, CMD and OP (one byte
+ *   each) followed by writes, bytes written and bytes changed
+ *   (four bytes each).
+ */
+static unsigned int hsmsim_admin_nvm_stats(unsigned int rx) {
+    static nvmmem_stats_t nvmmem_stats;
+    unsigned int offset = 0;
+    unsigned int index;
+    const char *file_name;
+    size_t file_name_length;
+
+    nvmmem_stats = nvmem_get_stats();
+
+    if (APDU_OP() == HSMSIM_ADMIN_OP_NVM_TOTALS) {
+        APDU_DATA_PTR[offset++] =
+            (unsigned char)sizeof(nvmmem_stats.write_count);
+        offset = write_uint(offset, nvmmem_stats.write_count);
+        APDU_DATA_PTR[offset++] =
+            (unsigned char)sizeof(nvmmem_stats.bytes_written);
+        offset = write_uint(offset, nvmmem_stats.bytes_written);
+        APDU_DATA_PTR[offset++] =
+            (unsigned char)sizeof(nvmmem_stats.bytes_changed);
+        offset = write_uint(offset, nvmmem_stats.bytes_changed);
+        APDU_DATA_PTR[offset++] = (unsigned char)nvmmem_stats.site_count;
+        APDU_DATA_PTR[offset++] = (unsigned char)nvmmem_stats.apdu_type_count;
+        LOG("ADMIN: got NVM stats - %u writes, %u bytes written, "
+            "%u bytes changed.\n",
+            nvmmem_stats.write_count,
+            nvmmem_stats.bytes_written,
+            nvmmem_stats.bytes_changed);
+        return hsmsim_admin_ok(TX_FOR_DATA_SIZE(offset));
+    }
+
+    if (APDU_OP() != HSMSIM_ADMIN_OP_NVM_SITE &&
+        APDU_OP() != HSMSIM_ADMIN_OP_NVM_APDU_TYPE) {
+        LOG("ADMIN: Invalid NVM stats OP: %d.\n", APDU_OP());
+        return hsmsim_admin_error(HSMSIM_ADMIN_ERROR_INVALID_PROTOCOL);
+    }
+
+    if (APDU_DATA_SIZE(rx) != 1) {
+        LOG("ADMIN: Invalid NVM stats index size. Expected 1 "
+            "byte, got %d.\n",
+            APDU_DATA_SIZE(rx));
+        return hsmsim_admin_error(HSMSIM_ADMIN_ERROR_DATA_SIZE);
+    }
+    index = APDU_DATA_PTR[0];
+
+    if (APDU_OP() == HSMSIM_ADMIN_OP_NVM_SITE) {
+        if (index >= nvmmem_stats.site_count) {
+            LOG("ADMIN: Invalid NVM stats call site index: %u.\n", index);
+            return hsmsim_admin_error(HSMSIM_ADMIN_ERROR_INVALID_INDEX);
+        }
+        offset = write_uint(offset, nvmmem_stats.sites[index].line);
+        offset = write_write_stats(offset, &nvmmem_stats.sites[index].stats);
+
+        // Only the base name of the file, as much as fits
+        file_name = strrchr(nvmmem_stats.sites[index].file, '/');
+        file_name = file_name == NULL ? nvmmem_stats.sites[index].file
+                                      : file_name + 1;
+        file_name_length = strlen(file_name);
+        if (file_name_length > APDU_TOTAL_DATA_SIZE_OUT - offset) {
+            file_name_length = APDU_TOTAL_DATA_SIZE_OUT - offset;
+        }
+        memcpy(APDU_DATA_PTR + offset, file_name, file_name_length);
+        offset += file_name_length;
+    } else {
+        if (index >= nvmmem_stats.apdu_type_count) {
+            LOG("ADMIN: Invalid NVM stats APDU type index: %u.\n", index);
+            return hsmsim_admin_error(HSMSIM_ADMIN_ERROR_INVALID_INDEX);
+        }
+        APDU_DATA_PTR[offset++] = nvmmem_stats.apdu_types[index].cla;
+        APDU_DATA_PTR[offset++] = nvmmem_stats.apdu_types[index].cmd;
+        APDU_DATA_PTR[offset++] = nvmmem_stats.apdu_types[index].op;
+        offset =
+            write_write_stats(offset, &nvmmem_stats.apdu_types[index].stats);
+    }
+
+    return hsmsim_admin_ok(TX_FOR_DATA_SIZE(offset));
+}
+
 unsigned int hsmsim_admin_process_apdu(unsigned int rx) {
     unsigned int tx;
-    unsigned int offset;
-    nvmmem_stats_t nvmmem_stats;
 
     if (APDU_CLA() != HSMSIM_ADMIN_CLA) {
         LOG("ADMIN: Invalid CLA: %d.\n", APDU_CLA());
@@ -115,17 +215,7 @@ unsigned int hsmsim_admin_process_apdu(unsigned int rx) {
         tx = TX_FOR_DATA_SIZE(0);
         break;
     case HSMSIM_ADMIN_CMD_GET_NVM_STATS:
-        offset = 0;
-        nvmmem_stats = nvmem_get_stats();
-        APDU_DATA_PTR[offset++] =
-            (unsigned char)sizeof(nvmmem_stats.write_count);
-        VAR_BIGENDIAN_TO(APDU_DATA_PTR + offset,
-                         nvmmem_stats.write_count,
-                         sizeof(nvmmem_stats.write_count));
-        offset += sizeof(nvmmem_stats.write_count);
-        tx = TX_FOR_DATA_SIZE(offset);
-        LOG("ADMIN: got NVM stats - %u writes.\n", nvmmem_stats.write_count);
-        break;
+        return hsmsim_admin_nvm_stats(rx);
     case HSMSIM_ADMIN_CMD_GET_IS_ONBOARDED:
         APDU_DATA_PTR[0] = (unsigned char)seed_available();
         tx = TX_FOR_DATA_SIZE(1);
@@ -143,6 +233,14 @@ unsigned int hsmsim_admin_process_apdu(unsigned int rx) {
             (unsigned char)seed_available());
         tx = TX_FOR_DATA_SIZE(0);
         break;
+    case HSMSIM_ADMIN_CMD_SAVE_NVM:
+        if (!nvmem_save()) {
+            LOG("ADMIN: Error saving NVM.\n");
+            return hsmsim_admin_error(HSMSIM_ADMIN_ERROR_INVALID_STATE);
+        }
+        LOG("ADMIN: NVM saved.\n");
+        tx = TX_FOR_DATA_SIZE(0);
+        break;
     default:
         LOG("ADMIN: Invalid CMD: %d.\n", APDU_CMD());
         return hsmsim_admin_error(HSMSIM_ADMIN_ERROR_INVALID_PROTOCOL);
@@ -40,11 +40,18 @@
 #define HSMSIM_ADMIN_CMD_GET_NVM_STATS 0x04
 #define HSMSIM_ADMIN_CMD_GET_IS_ONBOARDED 0x05
 #define HSMSIM_ADMIN_CMD_SET_IS_ONBOARDED 0x06
+#define HSMSIM_ADMIN_CMD_SAVE_NVM 0x07
+
+// NVM stats operations (HSMSIM_ADMIN_CMD_GET_NVM_STATS)
+#define HSMSIM_ADMIN_OP_NVM_TOTALS 0x00
+#define HSMSIM_ADMIN_OP_NVM_SITE 0x01
+#define HSMSIM_ADMIN_OP_NVM_APDU_TYPE 0x02
 
 #define HSMSIM_ADMIN_ERROR_INVALID_PROTOCOL 0x6f00
 #define HSMSIM_ADMIN_ERROR_DATA_SIZE 0x6f01
 #define HSMSIM_ADMIN_ERROR_INVALID_STATE 0x6f02
 #define HSMSIM_ADMIN_ERROR_BUFFER_OVERFLOW 0x6f03
+#define HSMSIM_ADMIN_ERROR_INVALID_INDEX 0x6f04
 
 typedef struct hsmsim_admin_data_s {
     bool ancestor_receipts_root_set;
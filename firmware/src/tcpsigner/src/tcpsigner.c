@@ -41,12 +41,14 @@
 #include "hal/seed.h"
 #include "hal/endorsement.h"
 #include "hal/log.h"
+#include "hal/nvmem.h"
 
 #include "hsmsim_io.h"
 #include "hsmsim_nu.h"
 #include "hsmsim_admin.h"
 
 #include "hsm.h"
+#include "apdu.h"
 #include "ui_heartbeat.h"
 #include "bc_advance.h"
 #include "bc_state.h"
@@ -284,6 +286,8 @@ static void signer_main_loop() {
 
     while (!hsm_exit_requested()) {
         rtx = hsmsim_io_exchange(rtx);
+        // Account NVM writes to the APDU about to be processed
+        nvmem_stats_set_apdu(APDU_CLA(), APDU_CMD(), APDU_OP());
         rtx = hsm_process_apdu(rtx);
     }
 }
@@ -408,6 +412,19 @@ void main(int argc, char **argv) {
         exit(1);
     }
 
+    // Initialize non volatile memory, loading any
+    // previously saved blocks (see the SAVE_NVM admin command)
+    nvmem_init();
+    if (!nvmem_register_block(
+            "bcstate", &N_bc_state_var, sizeof(N_bc_state_var)) ||
+        !nvmem_register_block("bcstate_updating",
+                              &N_bc_state_updating_backup_var,
+                              sizeof(N_bc_state_updating_backup_var)) ||
+        !nvmem_load()) {
+        LOG("Error during NVM initialization\n");
+        exit(1);
+    }
+
     // Initialize admin
     hsmsim_admin_init();
 
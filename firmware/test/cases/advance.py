@@ -30,9 +30,11 @@ class AdvanceBlockchain(TestCase):
         return "advanceBlockchain"
 
     def __init__(self, spec):
+        # Blocks can also be given as the name of a block batch file
+        # holding both the blocks and their brothers
         self.blocks = spec["blocks"]
-        self.brothers = spec["brothers"]
-        self.chunk_size = spec.get("chunkSize", len(self.blocks))
+        self.brothers = None if type(self.blocks) == str else spec["brothers"]
+        self.chunk_size = spec.get("chunkSize", None)
         self.partial = spec.get("partial", False)
         self.reset_before = spec.get("resetBefore", False)
         self.skip_brother_sorting = spec.get("skipBrotherSorting", False)
@@ -53,6 +55,11 @@ class AdvanceBlockchain(TestCase):
         return bs.hex()
 
     def run(self, dongle, debug, run_args):
+        if type(self.blocks) == str:
+            (self.blocks, self.brothers) = self._read_block_batch(self.blocks)
+        if self.chunk_size is None:
+            self.chunk_size = len(self.blocks)
+
         try:
             if self.reset_before:
                 debug("Resetting advance blockchain before starting")
@@ -21,7 +21,9 @@
 # SOFTWARE.
 
 import json
+import os
 from comm.bip32 import BIP32Path
+from ledger.block_batch import BlockBatchReader, BlockBatchError
 
 
 class TestCase:
@@ -48,14 +50,28 @@ class TestCase:
     op_mapping = None
     PATHS = None
 
+    # Whether cases of this kind start a new group of cases when
+    # partitioning a suite (see TestSuite.partition)
+    STARTS_GROUP = False
+    # Whether cases of this kind (might) change the device state that
+    # later cases depend upon (see TestSuite.run_parallel)
+    MODIFIES_STATE = True
+
     @classmethod
     def op_name(cls):
         pass
 
+    # Overrides (if given) are merged into the spec read from the file
     @classmethod
-    def from_json_file(cls, path):
+    def from_json_file(cls, path, overrides=None):
         with open(path, "r") as f:
-            return cls.create(json.load(f))
+            spec = json.load(f)
+        if overrides is not None:
+            spec.update(overrides)
+        case = cls.create(spec)
+        case.source = os.path.basename(path)
+        case.base_path = os.path.dirname(path)
+        return case
 
     @classmethod
     def create(cls, spec):
@@ -75,6 +91,10 @@ class TestCase:
 
     def __init__(self, spec):
         self.name = spec["name"]
+        # Where the case comes from (its file name when loaded from one)
+        self.source = self.name
+        # Where files the case references are relative to
+        self.base_path = "."
         self.run_on = spec.get(self.RUN_ON_KEY, [self.RUN_ON_VALUE_ALL])
 
         # Normalize run on value
@@ -109,6 +129,20 @@ class TestCase:
     def run(self, dongle, debug, run_args):
         raise RuntimeError(f"Unable to run generic test case {self.name}")
 
+    # Read the blocks (and their brothers) from the given
+    # block batch file (see ledger.block_batch), as hex strings
+    def _read_block_batch(self, file_name):
+        try:
+            with BlockBatchReader(os.path.join(self.base_path, file_name)) as reader:
+                blocks = []
+                brothers = []
+                for entry in reader:
+                    blocks.append(entry.header.hex())
+                    brothers.append(list(map(lambda b: b.hex(), entry.brothers)))
+                return (blocks, brothers)
+        except (OSError, BlockBatchError) as e:
+            raise TestCaseError(f"Unable to read blocks from {file_name}: {e}")
+
     def _parse_int(self, s):
         if s.startswith("0x"):
             return int(s, 16)
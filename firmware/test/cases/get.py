@@ -24,6 +24,8 @@ from .case import TestCase, TestCaseError
 
 
 class GetBlockchainState(TestCase):
+    MODIFIES_STATE = False
+
     @classmethod
     def op_name(cls):
         return "getState"
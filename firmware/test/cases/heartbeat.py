@@ -27,6 +27,8 @@ import hashlib
 
 
 class Heartbeat(TestCase):
+    MODIFIES_STATE = False
+
     EXPECTED_HEADER = "HSM:SIGNER:HB:5.5:"
     EHL = len(EXPECTED_HEADER)
 
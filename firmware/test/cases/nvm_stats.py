@@ -21,7 +21,7 @@
 # SOFTWARE.
 
 from .case import TestCase, TestCaseError
-from misc.tcpsigner_admin import TcpSignerAdmin
+from misc.tcpsigner_admin import TcpSignerAdmin, parse_nvm_stats
 import output
 
 
@@ -37,6 +37,9 @@ class NvmStats(TestCase):
 
         super().__init__(spec)
 
+        # Only resetting the stats changes the device state
+        self.MODIFIES_STATE = self.subop == "reset"
+
     def run(self, dongle, debug, run_args):
         try:
             self._subops[self.subop](self, dongle, debug, run_args)
@@ -53,27 +56,17 @@ class NvmStats(TestCase):
         result = dongle.dongle.exchange(
             bytes([TcpSignerAdmin.CLA,
                    TcpSignerAdmin.CMD_GET_NVM,
-                   TcpSignerAdmin.OP_NONE]))
-
-        # We're expecting a single unsigned BE value at the data position prepended
-        # by its length in bytes.
-        # That corresponds to the total number of NVM writes
-        doff = TcpSignerAdmin.APDU_OFFSET_DATA
-        if len(result) <= doff:
-            raise TestCaseError(f"Invalid NVM stats returned from dongle: {result.hex()}")
+                   TcpSignerAdmin.OP_NVM_TOTALS]))
 
-        nvm_writes_length = result[doff]
-        if nvm_writes_length < 1 or \
-           nvm_writes_length > (len(result)-doff+1):
+        try:
+            nvm_stats = parse_nvm_stats(result)
+        except ValueError:
             raise TestCaseError(f"Invalid NVM stats returned from dongle: {result.hex()}")
 
-        nvm_writes = int.from_bytes(
-            result[doff+1:doff+1+nvm_writes_length],
-            byteorder="big",
-            signed=False)
-
         output.info("\n********************************\n")
-        output.info(f"Total NVM writes: {nvm_writes}\n")
+        output.info(f"Total NVM writes: {nvm_stats['writes']}\n")
+        output.info(f"Total NVM bytes written: {nvm_stats['bytes_written']}\n")
+        output.info(f"Total NVM bytes changed: {nvm_stats['bytes_changed']}\n")
         output.info("********************************\n")
 
     _subops = {
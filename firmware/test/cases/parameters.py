@@ -24,6 +24,8 @@ from .case import TestCase, TestCaseError
 
 
 class GetBlockchainParameters(TestCase):
+    MODIFIES_STATE = False
+
     @classmethod
     def op_name(cls):
         return "blockchainParameters"
@@ -27,6 +27,8 @@ import output
 
 
 class ReconnectDongle(TestCase):
+    MODIFIES_STATE = False
+
     @classmethod
     def op_name(cls):
         return "reconnectDongle"
@@ -24,6 +24,8 @@ from .case import TestCase, TestCaseError
 
 
 class ResetAdvanceBlockchain(TestCase):
+    STARTS_GROUP = True
+
     @classmethod
     def op_name(cls):
         return "resetAdvanceBlockchain"
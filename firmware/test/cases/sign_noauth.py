@@ -26,6 +26,7 @@ from comm.bip32 import BIP32Path
 
 
 class SignUnauthorized(TestCase):
+    MODIFIES_STATE = False
 
     PATHS = {
         "rsk": BIP32Path("m/44'/137'/0'/0/0"),
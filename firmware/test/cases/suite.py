@@ -22,6 +22,7 @@
 
 import os
 import output
+from concurrent.futures import Future, ThreadPoolExecutor
 from .case import TestCase, TestCaseError
 
 
@@ -35,7 +36,7 @@ def debug(s):
 
 class TestSuite:
     @classmethod
-    def load_from_path(cls, path, flt):
+    def load_from_path(cls, path, flt, overrides=None):
         prefixes = flt.split(",")
         cases_paths = filter(lambda p: os.path.splitext(p)[1] == ".json",
                              os.listdir(path))
@@ -48,13 +49,22 @@ class TestSuite:
         cases_paths.sort()
         return cls(
             list(map(
-                lambda case_path: TestCase.from_json_file(os.path.join(path, case_path)),
+                lambda case_path: TestCase.from_json_file(os.path.join(path, case_path),
+                                                          overrides),
                 cases_paths,
             )))
 
     def __init__(self, cases):
         self.cases = cases
         self.debug = False
+        # Set to a PerfReport to have every case measured
+        self.report = None
+
+    def _run_case(self, case, dongle, debug_fn, run_args):
+        if self.report is None:
+            case.run(dongle, debug_fn, run_args)
+        else:
+            self.report.measure(case, dongle, debug_fn, run_args)
 
     def run(self, dongle, run_on, run_args):
         debug_fn = debug if self.debug else noop
@@ -65,7 +75,7 @@ class TestSuite:
             for case in self.cases:
                 output.info(case.name)
                 if case.runs_on(run_on):
-                    case.run(dongle, debug_fn, run_args)
+                    self._run_case(case, dongle, debug_fn, run_args)
                     output.ok()
                     self._passed += 1
                 else:
@@ -77,6 +87,137 @@ class TestSuite:
             self._failed += 1
             return False
 
+    # Split the cases into groups, starting a new group at every group
+    # starting case (i.e., a blockchain reset). Cases within a group keep
+    # their original order. Note that groups are NOT independent of each
+    # other: a blockchain reset leaves e.g. the best block, the newest valid
+    # block and the ancestor untouched (see run_parallel).
+    def partition(self):
+        groups = []
+        for case in self.cases:
+            if len(groups) == 0 or case.STARTS_GROUP:
+                groups.append([])
+            groups[-1].append(case)
+        return groups
+
+    # Run the suite's groups concurrently, at most jobs at a time, each on
+    # a freshly started device. new_device(snapshot) must return a context
+    # manager yielding a pair (dongle, take_snapshot): a connected dongle to
+    # a brand new device started from the given snapshot (or from scratch if
+    # None), and a function returning a snapshot of that device's current
+    # state (the device is disposed of on exit). Since a group depends on the
+    # device state earlier groups leave behind, every group but the first
+    # starts from a snapshot the previous group takes right after its last
+    # state modifying case, and from then on both run concurrently.
+    # Unlike run(), failures don't abort the run: every group runs to
+    # completion and all failures are reported, in the original case order,
+    # once all groups are done.
+    def run_parallel(self, jobs, new_device, run_on, run_args):
+        self._passed = 0
+        self._failed = 0
+        self._skipped = 0
+
+        self._results = self._run_groups(self.partition(), jobs, new_device,
+                                         run_on, run_args, measure=True)
+
+        for (case, status, message, debug_lines) in self._results:
+            output.info(case.name)
+            for line in debug_lines:
+                debug(line)
+            if status == self._STATUS_PASSED:
+                output.ok()
+                self._passed += 1
+            elif status == self._STATUS_SKIPPED:
+                output.skipped()
+                self._skipped += 1
+            else:
+                output.error(message)
+                self._failed += 1
+
+        return self._failed == 0
+
+    # Run the whole suite serially (i.e., as a single group) on a freshly
+    # started device and check that every case ends up with the same
+    # status it got on the last run_parallel, reporting any differences.
+    # Cases are not measured.
+    def verify_parallel(self, new_device, run_on, run_args):
+        results = self._run_groups([self.cases], 1, new_device,
+                                   run_on, run_args, measure=False)
+
+        mismatches = 0
+        for (serial, parallel) in zip(results, self._results):
+            (case, serial_status, serial_message, _) = serial
+            (_, parallel_status, parallel_message, _) = parallel
+            if serial_status != parallel_status:
+                output.info(case.name)
+                output.error(f"{serial_status} when run serially "
+                             f"({serial_message}) but {parallel_status} when run "
+                             f"in parallel ({parallel_message})")
+                mismatches += 1
+
+        return mismatches == 0
+
+    # Run the given groups (at most jobs at a time, see run_parallel) and
+    # return the results for all of their cases in the original order
+    def _run_groups(self, groups, jobs, new_device, run_on, run_args, measure):
+        # snapshots[i] is the state group i starts from
+        snapshots = [Future() for _ in groups]
+        snapshots[0].set_result(None)
+
+        def run_group(index):
+            group = groups[index]
+            # Cases after the group's last state modifying case
+            # can run concurrently with the next group
+            boundary = max([i + 1 for (i, case) in enumerate(group)
+                            if case.MODIFIES_STATE and case.runs_on(run_on)],
+                           default=0)
+            next_snapshot = snapshots[index + 1] if index + 1 < len(groups) else None
+
+            try:
+                with new_device(snapshots[index].result()) as (dongle, take_snapshot):
+                    results = list(map(
+                        lambda case: self._run_buffered(case, dongle, run_on,
+                                                        run_args, measure),
+                        group[:boundary]))
+                    if next_snapshot is not None:
+                        next_snapshot.set_result(take_snapshot())
+                    return results + list(map(
+                        lambda case: self._run_buffered(case, dongle, run_on,
+                                                        run_args, measure),
+                        group[boundary:]))
+            except BaseException as e:
+                # Don't leave the next group waiting forever
+                if next_snapshot is not None and not next_snapshot.done():
+                    next_snapshot.set_exception(e)
+                raise
+
+        # Groups are picked up in order, so a group waiting for its
+        # snapshot only ever waits for a group that is already running
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(run_group, range(len(groups))))
+
+        return [result for group_results in results for result in group_results]
+
+    _STATUS_PASSED = "passed"
+    _STATUS_FAILED = "failed"
+    _STATUS_SKIPPED = "skipped"
+
+    def _run_buffered(self, case, dongle, run_on, run_args, measure):
+        debug_lines = []
+        debug_fn = debug_lines.append if self.debug else noop
+
+        if not case.runs_on(run_on):
+            return (case, self._STATUS_SKIPPED, None, debug_lines)
+
+        try:
+            if measure:
+                self._run_case(case, dongle, debug_fn, run_args)
+            else:
+                case.run(dongle, debug_fn, run_args)
+            return (case, self._STATUS_PASSED, None, debug_lines)
+        except TestCaseError as e:
+            return (case, self._STATUS_FAILED, str(e), debug_lines)
+
     def get_stats(self):
         return {
             "passed": self._passed,
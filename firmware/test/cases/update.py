@@ -29,12 +29,18 @@ class UpdateAncestor(TestCase):
         return "updateAncestor"
 
     def __init__(self, spec):
+        # Blocks can also be given as the name of a block batch file
         self.blocks = spec["blocks"]
-        self.chunk_size = spec.get("chunkSize", len(self.blocks))
+        self.chunk_size = spec.get("chunkSize", None)
 
         super().__init__(spec)
 
     def run(self, dongle, debug, run_args):
+        if type(self.blocks) == str:
+            self.blocks = self._read_block_batch(self.blocks)[0]
+        if self.chunk_size is None:
+            self.chunk_size = len(self.blocks)
+
         try:
             debug(f"About to send {len(self.blocks)} blocks")
             offset = 0
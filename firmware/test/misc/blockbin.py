@@ -24,29 +24,17 @@
 
 This command is specially designed to produce test data for
 firmware/src/powhsm/src/{bc_advance.c,bc_update.c}
+
+Optionally, produce a block batch file instead (see
+middleware/ledger/block_batch.py). In that case, the json file can also be
+an advance blockchain test case, whose blocks' brothers are then included.
 """
 
 import click
 import json
 import sys
-import rlp
-
-
-def rlp_mm_payload_size(block_rlp):
-    block = rlp.decode(block_rlp)
-    block_without_mm_fields = block[:-3]
-    block_without_mm_fields_rlp = rlp.encode(block_without_mm_fields)
-    b = block_without_mm_fields_rlp[0]
-    if b >= 0xC0 and b <= 0xF7:
-        L = b - 0xC0
-    elif b >= 0xF8 and b <= 0xFF:
-        N = b - 0xF7
-        L = 0
-        for i in range(N):
-            L = (L << 8) | block_without_mm_fields_rlp[1 + i]
-    else:
-        assert False, "Invalid RLP encoding for block without MM fields"
-    return L
+from ledger.block_utils import rlp_mm_payload_size
+from ledger.block_batch import write_block_batch
 
 
 def output_name(blocks_file):
@@ -81,7 +69,7 @@ def dump_mm_rlp_lengths(file_name, binary_blocks):
             first = False
         else:
             print(", ", end="")
-        mm_rlp_size = rlp_mm_payload_size(block)
+        mm_rlp_size = rlp_mm_payload_size(block.hex())
         print(mm_rlp_size, end="")
     print("}")
 
@@ -97,9 +85,32 @@ def dump_mm_rlp_lengths(file_name, binary_blocks):
     default=sys.maxsize,
     help="How many blocks to dump",
 )
-def blockbin(blocks_file, output_file, cutoff):
+@click.option(
+    "-B",
+    "--batch",
+    "batch",
+    is_flag=True,
+    default=False,
+    help="Output a block batch file",
+)
+def blockbin(blocks_file, output_file, cutoff, batch):
     with open(blocks_file, "r") as f:
         blocks = json.load(f)
+
+    if batch:
+        brothers = None
+        if type(blocks) == dict:
+            brothers = blocks.get("brothers")
+            blocks = blocks["blocks"]
+        blocks = blocks[:cutoff]
+        if brothers is not None:
+            brothers = brothers[:cutoff]
+        batch_file = output_file if output_file is not None \
+            else output_name(blocks_file)
+        write_block_batch(batch_file, blocks, brothers)
+        print(f"{batch_file}: {len(blocks)} blocks")
+        return
+
     binary_blocks = [bytes.fromhex(b) for i, b in enumerate(blocks) if i < cutoff]
     rlp_file = output_file if output_file is not None else output_name(blocks_file)
     with open(rlp_file, "wb") as f:
@@ -32,7 +32,7 @@ import json
 import os
 import re
 import rlp
-from comm.utils import keccak_256
+from ledger.block_utils import get_block_metadata
 
 
 @click.command()
@@ -48,16 +48,14 @@ def blockdump(split_dir):
         with open(os.path.join(split_dir, split_name), "r") as f:
             blocks = json.load(f)
             for j, block_rlp in enumerate(blocks):
-                block = rlp.decode(bytes.fromhex(block_rlp))
-
-                block_hash = keccak_256(rlp.encode(block[:-2])).hex()
-                print(f"Block #{j} hash = {block_hash}")
+                metadata = get_block_metadata(bytes.fromhex(block_rlp))
+                print(f"Block #{j} hash = {metadata.hash}")
 
                 if j == len(blocks) - 1:
+                    block = rlp.decode(bytes.fromhex(block_rlp))
                     print(f"  Last block Receipt root = {block[5].hex()}")
 
-                diff = int.from_bytes(block[7], byteorder="big", signed=False)
-                split_diff += diff
+                split_diff += metadata.difficulty
             total_diff += split_diff
             print(f"  Split diff = {hex(split_diff)}")
             print(f"  Total diff = {hex(total_diff)}")
@@ -0,0 +1,139 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 RSK Labs Ltd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Gather per block metadata from (possibly huge) block header exports.
+
+The input is either a json list of hex encoded block headers or a text file
+with one hex encoded block header per line. Headers are read lazily and
+processed across worker processes. For each block, the metadata the firmware
+needs is output (offset within the concatenated binary headers, size, number,
+hash, difficulty, merge mining RLP payload size and coinbase transaction
+hash), either as CSV or, along with the headers themselves, as a block batch
+file (see middleware/ledger/block_batch.py).
+"""
+
+import click
+import csv
+import os
+import sys
+from functools import partial
+from multiprocessing import Pool
+from comm.utils import iter_json_array
+from ledger.block_utils import get_block_metadata
+from ledger.block_batch import BlockBatchWriter
+
+CSV_FIELDS = ["index", "offset", "size", "number", "hash", "difficulty",
+              "mm_payload_size", "coinbase_tx_hash"]
+
+
+def iter_headers(input_file):
+    with open(input_file, "r") as f:
+        is_json = f.read(1024).lstrip().startswith("[")
+        f.seek(0)
+        if is_json:
+            yield from iter_json_array(f)
+        else:
+            for line in f:
+                line = line.strip()
+                if line != "":
+                    yield line
+
+
+# Workers yield (raw header if keeping it, metadata, error message if invalid)
+def process_header(header_hex, keep_header):
+    try:
+        raw_header = bytes.fromhex(header_hex)
+        return (raw_header if keep_header else None, get_block_metadata(raw_header),
+                None)
+    except (TypeError, ValueError) as e:
+        return (None, None, str(e))
+
+
+@click.command()
+@click.option("-i", "--input", "input_file", required=True,
+              help="Block headers file (json list or one header per line)")
+@click.option("-o", "--output", "output_file", required=False,
+              help="Output file name (defaults to the standard output for CSV)")
+@click.option("-f", "--format", "output_format", type=click.Choice(["csv", "batch"]),
+              default="csv", help="Output format (default csv)")
+@click.option("-j", "--jobs", "jobs", type=int, default=os.cpu_count(),
+              help="Number of worker processes (defaults to the number of CPUs)")
+@click.option("-c", "--chunk-size", "chunk_size", type=int, default=256,
+              help="Number of headers handed to a worker at a time (default 256)")
+def blockmeta(input_file, output_file, output_format, jobs, chunk_size):
+    if output_format == "batch" and output_file is None:
+        raise click.UsageError("An output file is required for the batch format")
+    if jobs < 1 or chunk_size < 1:
+        raise click.UsageError("Jobs and chunk size must be positive")
+
+    worker = partial(process_header, keep_header=output_format == "batch")
+    pool = Pool(jobs) if jobs > 1 else None
+    if pool is None:
+        results = map(worker, iter_headers(input_file))
+    else:
+        results = pool.imap(worker, iter_headers(input_file), chunk_size)
+
+    if output_format == "batch":
+        output = BlockBatchWriter(output_file)
+    elif output_file is None:
+        output = sys.stdout
+    else:
+        output = open(output_file, "w", newline="")
+
+    completed = False
+    try:
+        if output_format == "csv":
+            writer = csv.writer(output)
+            writer.writerow(CSV_FIELDS)
+
+        count = 0
+        offset = 0
+        for (raw_header, metadata, error) in results:
+            if error is not None:
+                raise click.ClickException(f"Invalid block #{count}: {error}")
+
+            if output_format == "batch":
+                output.add(raw_header, metadata=metadata)
+            else:
+                writer.writerow([
+                    count, offset, metadata.size, metadata.number, metadata.hash,
+                    metadata.difficulty, metadata.mm_payload_size,
+                    metadata.coinbase_tx_hash or "",
+                ])
+            count += 1
+            offset += metadata.size
+        completed = True
+    finally:
+        if pool is not None:
+            pool.terminate()
+        if output_format == "batch" and not completed:
+            # Leave no (seemingly valid) partial block batch behind
+            output.file.close()
+            os.remove(output_file)
+        elif output is not sys.stdout:
+            output.close()
+
+    click.echo(f"Processed {count} blocks ({offset} bytes)", err=True)
+
+
+if __name__ == "__main__":
+    blockmeta()
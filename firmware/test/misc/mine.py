@@ -22,12 +22,14 @@
 
 import ledger.block_utils as block_utils
 import comm.pow as pow
-import rsk_netparams as netparams
-import rsk_block as rsk_block
+import ledger.rsk_netparams as netparams
+import ledger.rsk_block as rsk_block
 import rlp
 import sys
 import hashlib
 import json
+from argparse import ArgumentParser
+from multiprocessing import Pool
 from comm.utils import keccak_256
 
 sys.path.append("../../../../middleware")
@@ -44,6 +46,16 @@ BTC_TX_TEMPLATE = ("711101000000000000000000000000000000000000000000000000000000
 
 regtest = netparams.NetworkParameters.REGTEST
 
+# The nonce is the last four bytes of the merge mining (BTC) header
+# (big endian encoded, see mine)
+NONCE_SIZE = 4
+MAX_NONCE = 2**(NONCE_SIZE*8)
+
+# Nonces are searched in ranges of this many nonces at a time
+# (when mining with a pool of processes, each range is handled
+# by a single worker)
+NONCE_RANGE_SIZE = 20000
+
 
 def byte_length(n):
     return ((n.bit_length()-1)//8)+1
@@ -57,7 +69,52 @@ def from_bytes(b):
     return int.from_bytes(b, byteorder='big', signed=False)
 
 
-def mine(block_hex, np, mm_mp_nodes, brothers_difficulties):
+# Search the given nonce range for the first nonce that, appended to
+# the given merge mining header prefix, yields a header hash that meets
+# the given target. Only the nonce bytes are hashed for each candidate,
+# on top of the precomputed SHA256 state of the (constant) prefix.
+# Returns None if there's no such nonce in the range.
+def search_nonce(header_prefix, target, start, end):
+    prefix_state = hashlib.sha256(header_prefix)
+    for nonce in range(start, end):
+        state = prefix_state.copy()
+        state.update(nonce.to_bytes(NONCE_SIZE, byteorder="big", signed=False))
+        header_hash = hashlib.sha256(state.digest()).digest()
+        if int.from_bytes(header_hash, byteorder="little", signed=False) <= target:
+            return nonce
+    return None
+
+
+def _search_nonce_range(args):
+    return search_nonce(*args)
+
+
+# Find the lowest nonce that makes the merge mining header with the
+# given prefix meet the given target, optionally spreading the search
+# across the given pool of worker processes (pool_size ranges at a time,
+# so that no work is left queued once a valid nonce is found)
+def find_nonce(header_prefix, target, pool=None, pool_size=1):
+    ranges = map(
+        lambda start: (header_prefix, target, start,
+                       min(start + NONCE_RANGE_SIZE, MAX_NONCE)),
+        range(0, MAX_NONCE, NONCE_RANGE_SIZE))
+
+    while True:
+        batch = [r for (_, r) in zip(range(pool_size), ranges)]
+        if len(batch) == 0:
+            raise ValueError("Unable to find a valid nonce")
+
+        if pool is None:
+            results = map(_search_nonce_range, batch)
+        else:
+            results = pool.map(_search_nonce_range, batch)
+
+        for nonce in results:
+            if nonce is not None:
+                return nonce
+
+
+def mine(block_hex, np, mm_mp_nodes, brothers_difficulties, pool=None, pool_size=1):
     new_block = rlp.decode(
         block_utils.remove_mm_fields_if_present(
             block_hex, leave_btcblock=False, hex=False)) + [b"", b"", b""]
@@ -75,7 +132,7 @@ def mine(block_hex, np, mm_mp_nodes, brothers_difficulties):
             brother[7] = to_bytes(brother_difficulty)
             brothers.append(
                 rlp.decode(bytes.fromhex(
-                    mine(rlp.encode(brother).hex(), np, 1, None)[0]
+                    mine(rlp.encode(brother).hex(), np, 1, None, pool, pool_size)[0]
                 ))
             )
             brother_index += 1
@@ -95,21 +152,29 @@ def mine(block_hex, np, mm_mp_nodes, brothers_difficulties):
     new_block[-1] = bytes.fromhex(cbtx)
     new_block[-2] = mm_mp
 
-    nonce = 0
-    while True:
-        new_block[-3] = bytes.fromhex(btctx[:-8]) + nonce.to_bytes(
-            4, byteorder="big", signed=False)
-        if rsk_block.RskBlockHeader(rlp.encode(new_block).hex(), np).pow_is_valid():
-            break
-        nonce += 1
+    # Everything but the nonce is fixed at this point, and
+    # the coinbase transaction and merkle proof are valid by construction,
+    # so only the merge mining header hash needs to meet the target
+    header_prefix = bytes.fromhex(btctx[:-NONCE_SIZE*2])
+    target = pow.difficulty_to_target(new_block_obj.difficulty)
+    nonce = find_nonce(header_prefix, target, pool, pool_size)
+    new_block[-3] = header_prefix + nonce.to_bytes(
+        NONCE_SIZE, byteorder="big", signed=False)
 
     return (rlp.encode(new_block).hex(), list(map(
         lambda bro: rlp.encode(bro).hex(), brothers)))
 
 
-def mine_chain(first_block_hex, np, total_blocks):
-    current_block = mine(first_block_hex, np, 0, None)[0]
+# Mine a chain of total_blocks blocks on top of the given first block,
+# each of them (the first included) with brothers of the given
+# difficulties (if any). Returns the blocks (newest first) and,
+# for each of them, its brothers.
+def mine_chain_with_brothers(first_block_hex, np, total_blocks, mm_mp_nodes=0,
+                             brothers_difficulties=None, pool=None, pool_size=1):
+    (current_block, current_brothers) = mine(first_block_hex, np, mm_mp_nodes,
+                                             brothers_difficulties, pool, pool_size)
     blocks = [current_block]
+    brothers = [current_brothers]
     ba = rlp.decode(bytes.fromhex(current_block))
     for i in range(total_blocks - 1):
         cbo = rsk_block.RskBlockHeader(current_block, np)
@@ -119,29 +184,75 @@ def mine_chain(first_block_hex, np, total_blocks):
                                     byteorder="big",
                                     signed=False)
         ba[5] = bytes.fromhex("00" * 32)  # Receipts root does not matter
-        current_block = mine(rlp.encode(ba).hex(), np, 0, None)[0]
+        (current_block, current_brothers) = mine(rlp.encode(ba).hex(), np, mm_mp_nodes,
+                                                 brothers_difficulties, pool, pool_size)
         blocks.insert(0, current_block)
+        brothers.insert(0, current_brothers)
 
-    return blocks
+    return (blocks, brothers)
+
+
+def mine_chain(first_block_hex, np, total_blocks, pool=None, pool_size=1):
+    return mine_chain_with_brothers(first_block_hex, np, total_blocks,
+                                    pool=pool, pool_size=pool_size)[0]
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print(
-            f"Usage: {sys.argv[0]} <BLOCK_TO_MINE> "
-            "[MM_MP_NODES] [BROTHERS_DIFFICULTIES]")
-        sys.exit(1)
+    parser = ArgumentParser(description="Mine a block (or a chain of blocks)")
+    parser.add_argument("block", metavar="BLOCK_TO_MINE",
+                        help="Block to mine (RLP encoded, in hex)")
+    parser.add_argument("mm_mp_nodes", metavar="MM_MP_NODES", nargs="?", type=int,
+                        default=0, help="Merge mining merkle proof nodes (default 0)")
+    parser.add_argument("brothers_difficulties", metavar="BROTHERS_DIFFICULTIES",
+                        nargs="?", default=None,
+                        help="Comma-separated list of brothers difficulties")
+    parser.add_argument("-j", "--jobs", dest="jobs", type=int, default=1,
+                        help="Number of worker processes to mine with (default 1)")
+    parser.add_argument("-c", "--chain", dest="chain", type=int, default=None,
+                        help="Mine a chain of this many blocks on top of (and "
+                             "including) the given block, and output it in JSON "
+                             "format (blocks newest first, along with their brothers)")
+    parser.add_argument("-o", "--output", dest="output", default=None,
+                        help="Write the mined chain to this file instead of to the "
+                             "standard output (only used for -c option)")
+    options = parser.parse_args()
 
-    mm_mp_nodes = 0
-    if len(sys.argv) > 2:
-        mm_mp_nodes = int(sys.argv[2])
+    if options.jobs < 1:
+        parser.error("Number of jobs must be positive")
+    if options.chain is not None and options.chain < 1:
+        parser.error("Chain length must be positive")
 
     brothers_difficulties = None
-    if len(sys.argv) > 3:
-        brothers_difficulties = list(map(lambda d: int(d, 10), sys.argv[3].split(",")))
+    if options.brothers_difficulties is not None:
+        brothers_difficulties = list(map(lambda d: int(d, 10),
+                                         options.brothers_difficulties.split(",")))
+
+    pool = Pool(options.jobs) if options.jobs > 1 else None
+    try:
+        if options.chain is not None:
+            (blocks, brothers) = mine_chain_with_brothers(
+                options.block, regtest, options.chain,
+                mm_mp_nodes=options.mm_mp_nodes,
+                brothers_difficulties=brothers_difficulties,
+                pool=pool, pool_size=options.jobs)
+            chain = {"blocks": blocks}
+            if brothers_difficulties is not None:
+                chain["brothers"] = brothers
+            if options.output is None:
+                print(json.dumps(chain, indent=2))
+            else:
+                with open(options.output, "w") as f:
+                    json.dump(chain, f, indent=2)
+            sys.exit(0)
+
+        res = mine(options.block, regtest, mm_mp_nodes=options.mm_mp_nodes,
+                   brothers_difficulties=brothers_difficulties,
+                   pool=pool, pool_size=options.jobs)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
 
-    res = mine(sys.argv[1], regtest, mm_mp_nodes=mm_mp_nodes,
-               brothers_difficulties=brothers_difficulties)
     print("RESULT:")
     print("=======")
     print(f"BLOCK: {res[0]}")
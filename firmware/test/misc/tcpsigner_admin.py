@@ -32,7 +32,99 @@ class TcpSignerAdmin(IntEnum):
     CMD_GET_NVM = 0x04
     CMD_GET_IS_ONBOARDED = 0x05
     CMD_SET_IS_ONBOARDED = 0x06
+    CMD_SAVE_NVM = 0x07
 
     OP_NONE = 0x00
 
+    # CMD_GET_NVM operations
+    OP_NVM_TOTALS = 0x00
+    OP_NVM_SITE = 0x01
+    OP_NVM_APDU_TYPE = 0x02
+
     APDU_OFFSET_DATA = 3
+
+
+def _read_uint(data, offset, length):
+    if length < 1 or offset+length > len(data):
+        raise ValueError("Not enough data")
+    return (int.from_bytes(data[offset:offset+length], byteorder="big", signed=False),
+            offset+length)
+
+
+def _read_prefixed_uint(data, offset):
+    if offset >= len(data):
+        raise ValueError("Not enough data")
+    return _read_uint(data, offset+1, data[offset])
+
+
+def _read_write_stats(data, offset):
+    stats = {}
+    for key in ["writes", "bytes_written", "bytes_changed"]:
+        (stats[key], offset) = _read_uint(data, offset, 4)
+    return (stats, offset)
+
+
+# Parse the response to CMD_GET_NVM (OP_NVM_TOTALS): the total number of
+# writes, bytes written and bytes changed (unsigned BE values, each one
+# prepended by its length in bytes) followed by the number of call sites
+# and of APDU types with detailed stats (one byte each)
+def parse_nvm_stats(response):
+    try:
+        data = response[TcpSignerAdmin.APDU_OFFSET_DATA:]
+        stats = {}
+        offset = 0
+        for key in ["writes", "bytes_written", "bytes_changed"]:
+            (stats[key], offset) = _read_prefixed_uint(data, offset)
+        (stats["site_count"], offset) = _read_uint(data, offset, 1)
+        (stats["apdu_type_count"], offset) = _read_uint(data, offset, 1)
+        return stats
+    except ValueError:
+        raise ValueError(f"Invalid NVM stats: {response.hex()}")
+
+
+# Parse the response to CMD_GET_NVM (OP_NVM_SITE): the line, writes,
+# bytes written and bytes changed (four bytes BE each) followed by
+# the source file name
+def parse_nvm_site(response):
+    try:
+        data = response[TcpSignerAdmin.APDU_OFFSET_DATA:]
+        (line, offset) = _read_uint(data, 0, 4)
+        (stats, offset) = _read_write_stats(data, offset)
+        stats["site"] = f"{data[offset:].decode('ascii')}:{line}"
+        return stats
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"Invalid NVM call site stats: {response.hex()}")
+
+
+# Parse the response to CMD_GET_NVM (OP_NVM_APDU_TYPE): the CLA, CMD and OP
+# (one byte each) followed by the writes, bytes written and bytes changed
+# (four bytes BE each)
+def parse_nvm_apdu_type(response):
+    try:
+        data = response[TcpSignerAdmin.APDU_OFFSET_DATA:]
+        if len(data) < 3:
+            raise ValueError("Not enough data")
+        (stats, _) = _read_write_stats(data, 3)
+        stats["apdu"] = data[:3].hex()
+        return stats
+    except ValueError:
+        raise ValueError(f"Invalid NVM APDU type stats: {response.hex()}")
+
+
+# Gather the complete NVM stats (totals, per call site and per APDU type)
+# using the given function to exchange admin APDUs (which must return
+# the response's data, raising on error)
+def read_nvm_profile(exchange):
+    def get_nvm(op, data=b""):
+        return exchange(bytes([TcpSignerAdmin.CLA, TcpSignerAdmin.CMD_GET_NVM, op]) +
+                        data)
+
+    profile = parse_nvm_stats(get_nvm(TcpSignerAdmin.OP_NVM_TOTALS))
+    profile["sites"] = list(map(
+        lambda i: parse_nvm_site(get_nvm(TcpSignerAdmin.OP_NVM_SITE, bytes([i]))),
+        range(profile.pop("site_count"))))
+    profile["apdu_types"] = list(map(
+        lambda i: parse_nvm_apdu_type(get_nvm(TcpSignerAdmin.OP_NVM_APDU_TYPE,
+                                              bytes([i]))),
+        range(profile.pop("apdu_type_count"))))
+    return profile
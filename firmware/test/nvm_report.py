@@ -0,0 +1,200 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 RSK Labs Ltd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import sys
+from argparse import ArgumentParser
+from misc.tcpsigner_admin import read_nvm_profile
+from replay_bench import ReplayClient, apdu_type
+import output
+
+# NVM write amplification report for the TCPSigner.
+#
+# Shows the NVM stats gathered by the TCPSigner's x86 HAL (number of writes,
+# bytes written and bytes that actually changed value) per call site and per
+# APDU type, either from a replay benchmark report (see replay_bench.py) or
+# straight from a running TCPSigner. Writes are also normalized per advanced
+# block and per signature, taking the number of blocks and signatures from
+# the replayed APDUs (or from the command line when reading from a running
+# TCPSigner). Optionally, plots the stats to an image file (requires
+# matplotlib).
+
+# Number of blocks and signatures, from the replayed APDU types:
+# one header meta per advanced block, one path per signature
+BLOCKS_APDU_TYPE = "advance/HEADER_META"
+SIGNATURES_APDU_TYPE = "sign/PATH"
+
+BAR_WIDTH = 30
+
+
+def apdu_type_name(apdu_hex):
+    apdu = bytes.fromhex(apdu_hex)
+    # Writes issued before any APDU was processed
+    if apdu[0] == 0:
+        return "(none)"
+    return apdu_type(apdu)
+
+
+def load_profile(options):
+    if options.report_path is not None:
+        try:
+            with open(options.report_path, "r") as f:
+                report = json.load(f)
+            profile = report["nvm_profile"]
+            counts = {name: stats["count"]
+                      for (name, stats) in report["apdu_types"].items()}
+            return (profile,
+                    counts.get(BLOCKS_APDU_TYPE, 0),
+                    counts.get(SIGNATURES_APDU_TYPE, 0))
+        except (OSError, ValueError, KeyError) as e:
+            raise RuntimeError(f"Unable to load report from {options.report_path}: {e}")
+
+    try:
+        client = ReplayClient(options.host, options.port)
+        profile = read_nvm_profile(client.admin_exchange)
+        client.close()
+    except OSError as e:
+        raise RuntimeError(f"Error connecting to the TCPSigner: {e}")
+    except ValueError as e:
+        raise RuntimeError(str(e))
+    return (profile, options.blocks, options.signatures)
+
+
+def amplification(stats):
+    if stats["bytes_changed"] == 0:
+        return "-"
+    return f"{stats['bytes_written']/stats['bytes_changed']:.1f}x"
+
+
+def print_table(title, rows, max_bytes):
+    output.info(f"{title:<36}{'writes':>8}{'written':>10}{'changed':>10}"
+                f"{'ampl.':>8}  bytes written", nl=True)
+    for (name, stats) in rows:
+        bar = "#"*round(BAR_WIDTH*stats["bytes_written"]/max_bytes) \
+            if max_bytes > 0 else ""
+        output.info(f"{name:<36}{stats['writes']:>8}{stats['bytes_written']:>10}"
+                    f"{stats['bytes_changed']:>10}{amplification(stats):>8}  {bar}",
+                    nl=True)
+    output.info("", nl=True)
+
+
+def print_per_unit(unit, count, rows):
+    if count == 0:
+        return
+    writes = sum(map(lambda r: r[1]["writes"], rows))
+    written = sum(map(lambda r: r[1]["bytes_written"], rows))
+    changed = sum(map(lambda r: r[1]["bytes_changed"], rows))
+    output.info(f"Per {unit} ({count}): {writes/count:.2f} writes, "
+                f"{written/count:.1f} bytes written, "
+                f"{changed/count:.1f} bytes changed", nl=True)
+
+
+def print_profile(profile, blocks, signatures):
+    output.header("NVM totals")
+    output.info(f"{profile['writes']} writes, {profile['bytes_written']} bytes written, "
+                f"{profile['bytes_changed']} bytes changed "
+                f"(write amplification {amplification(profile)})", nl=True)
+
+    sites = sorted(map(lambda s: (s["site"], s), profile["sites"]),
+                   key=lambda r: -r[1]["bytes_written"])
+    apdu_types = sorted(map(lambda t: (apdu_type_name(t["apdu"]), t),
+                            profile["apdu_types"]),
+                        key=lambda r: -r[1]["bytes_written"])
+    max_bytes = max(map(lambda r: r[1]["bytes_written"], sites + apdu_types),
+                    default=0)
+
+    output.header("NVM writes per call site")
+    print_table("Call site", sites, max_bytes)
+    output.header("NVM writes per APDU type")
+    print_table("APDU type", apdu_types, max_bytes)
+
+    if blocks > 0 or signatures > 0:
+        output.header("NVM writes per operation")
+        print_per_unit("advanced block", blocks,
+                       list(filter(lambda r: r[0].startswith("advance/"), apdu_types)))
+        print_per_unit("signature", signatures,
+                       list(filter(lambda r: r[0].startswith("sign/"), apdu_types)))
+
+
+def plot_profile(profile, path):
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        raise RuntimeError("Plotting requires matplotlib (pip install matplotlib)")
+
+    sections = [
+        ("call site", list(map(lambda s: (s["site"], s), profile["sites"]))),
+        ("APDU type", list(map(lambda t: (apdu_type_name(t["apdu"]), t),
+                               profile["apdu_types"]))),
+    ]
+    (figure, axes) = plt.subplots(len(sections), 1, figsize=(10, 10))
+    for (ax, (title, rows)) in zip(axes, sections):
+        names = list(map(lambda r: r[0], rows))
+        positions = range(len(rows))
+        ax.barh([p - 0.2 for p in positions],
+                list(map(lambda r: r[1]["bytes_written"], rows)),
+                height=0.4, label="bytes written")
+        ax.barh([p + 0.2 for p in positions],
+                list(map(lambda r: r[1]["bytes_changed"], rows)),
+                height=0.4, label="bytes changed")
+        ax.set_yticks(list(positions))
+        ax.set_yticklabels(names)
+        ax.invert_yaxis()
+        ax.set_title(f"NVM bytes per {title}")
+        ax.legend()
+    figure.tight_layout()
+    figure.savefig(path)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Report the TCPSigner's NVM write stats")
+    parser.add_argument("-i", "--report", dest="report_path",
+                        help="Read the stats from this replay benchmark report "
+                             "(see replay_bench.py) instead of from a running "
+                             "TCPSigner")
+    parser.add_argument("-p", "--port", dest="port", type=int, default=8888,
+                        help="Running TCPSigner's port (default 8888)")
+    parser.add_argument("-s", "--server", dest="host", default="localhost",
+                        help="Running TCPSigner's host (default 'localhost')")
+    parser.add_argument("-b", "--blocks", dest="blocks", type=int, default=0,
+                        help="Number of blocks advanced, to normalize the stats "
+                             "(only when reading from a running TCPSigner)")
+    parser.add_argument("-n", "--signatures", dest="signatures", type=int, default=0,
+                        help="Number of signatures, to normalize the stats "
+                             "(only when reading from a running TCPSigner)")
+    parser.add_argument("-P", "--plot", dest="plot_path",
+                        help="Also plot the stats to this image file "
+                             "(requires matplotlib)")
+    options = parser.parse_args()
+
+    try:
+        (profile, blocks, signatures) = load_profile(options)
+        print_profile(profile, blocks, signatures)
+        if options.plot_path is not None:
+            output.info(f"Plotting to {options.plot_path}")
+            plot_profile(profile, options.plot_path)
+            output.ok()
+    except RuntimeError as e:
+        output.error(str(e))
+        sys.exit(1)
@@ -30,11 +30,13 @@ class OptionParser:
         default_tests_path="./resources",
         default_port=8888,
         default_host="localhost",
+        default_tcpsigner_path="../src/tcpsigner/tcpsigner",
     ):
         self.description = description
         self.default_tests_path = default_tests_path
         self.default_port = default_port
         self.default_host = default_host
+        self.default_tcpsigner_path = default_tcpsigner_path
 
     def parse(self):
         parser = ArgumentParser(description=self.description)
@@ -107,7 +109,72 @@ class OptionParser:
             default=False,
             help="Dongle exchange verbose mode (defaults to no)",
         )
+        parser.add_argument(
+            "-j",
+            "--jobs",
+            dest="jobs",
+            type=int,
+            default=0,
+            help="Run groups of test cases (split at every blockchain reset) "
+                 "concurrently, each on a freshly spawned local TCPSigner instance "
+                 "(at most this many at a time, listening on consecutive ports "
+                 "starting at the given port), reporting all failures "
+                 "(only for the \"tcpsigner\" device, defaults to 0, i.e., "
+                 "run serially against an already running instance)",
+        )
+        parser.add_argument(
+            "-V",
+            "--verify-jobs",
+            dest="verify_jobs",
+            action="store_true",
+            default=False,
+            help="After running concurrently, also run all test cases serially on "
+                 "a freshly spawned TCPSigner instance and fail unless every test "
+                 "case gets the same result both ways (only used for -j option, "
+                 "defaults to no)",
+        )
+        parser.add_argument(
+            "-t",
+            "--tcpsigner",
+            dest="tcpsigner_path",
+            default=self.default_tcpsigner_path,
+            help="TCPSigner binary to spawn (only used for -j option, default "
+                 f"'{self.default_tcpsigner_path}')",
+        )
+        parser.add_argument(
+            "-o",
+            "--report",
+            dest="report_path",
+            help="Measure every test case (wall time and number of APDU exchanges) "
+                 "and write the results to this JSON file",
+        )
+        parser.add_argument(
+            "-b",
+            "--baseline",
+            dest="baseline_path",
+            help="Measure every test case and compare the results against this "
+                 "previously written report, failing on regressions",
+        )
+        parser.add_argument(
+            "-T",
+            "--time-tolerance",
+            dest="time_tolerance",
+            type=float,
+            default=20,
+            help="Wall time increase (as a percentage of the baseline) tolerated "
+                 "before flagging a regression (only used for -b option, and not "
+                 "for wall times measured concurrently with -j, default 20)",
+        )
 
         options = parser.parse_args()
 
+        if options.jobs < 0:
+            parser.error("Number of jobs must be non-negative")
+        if options.jobs > 0 and options.device != "tcpsigner":
+            parser.error("Jobs are only supported for the \"tcpsigner\" device")
+        if options.verify_jobs and options.jobs == 0:
+            parser.error("Verifying jobs requires the jobs option")
+        if options.time_tolerance < 0:
+            parser.error("Time tolerance must be non-negative")
+
         return options
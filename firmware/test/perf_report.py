@@ -0,0 +1,174 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 RSK Labs Ltd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import time
+import output
+
+
+# Counts the APDU exchanges issued to a dongle, whether through
+# its transport's exchange (single commands and raw exchanges from
+# the test cases themselves) or pipelined in batches.
+# Connecting the dongle replaces its transport, so the counting hook
+# is installed on the current transport and on every new one
+# (e.g., when a test case reconnects the dongle).
+class ExchangeCounter:
+    def __init__(self, dongle):
+        self.dongle = dongle
+        self.count = 0
+
+        send_commands_fn = dongle._send_commands
+
+        def counting_send_commands(command, datas, *args, **kwargs):
+            before = self.count
+            result = send_commands_fn(command, datas, *args, **kwargs)
+            # Pipelined batches bypass the transport's exchange
+            if self.count == before:
+                self.count += len(datas)
+            return result
+
+        dongle._send_commands = counting_send_commands
+
+        connect_fn = dongle.connect
+
+        def counting_connect(*args, **kwargs):
+            result = connect_fn(*args, **kwargs)
+            self._install()
+            return result
+
+        dongle.connect = counting_connect
+        self._install()
+
+    def _install(self):
+        transport = self.dongle.dongle
+        if transport is None:
+            return
+        exchange_fn = transport.exchange
+
+        def counting_exchange(*args, **kwargs):
+            self.count += 1
+            return exchange_fn(*args, **kwargs)
+
+        transport.exchange = counting_exchange
+
+
+# Per test case measurements (wall time and number of APDU exchanges),
+# which can be written as a JSON report and compared against a previously
+# written report (the baseline) to spot performance regressions.
+# Wall times of cases measured while others run concurrently (i.e., on
+# several devices at once) are skewed by contention, so they are flagged
+# as such and never compared.
+class PerfReport:
+    VERSION = 1
+
+    # Wall time regressions smaller than this are considered noise
+    MIN_TIME_DELTA = 0.05  # seconds
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, "r") as f:
+                report = json.load(f)
+            if report.get("version") != cls.VERSION or \
+               type(report.get("cases")) != dict:
+                raise ValueError("unsupported format")
+            return cls(report["cases"])
+        except (OSError, ValueError) as e:
+            raise RuntimeError(f"Unable to load report from {path}: {e}")
+
+    def __init__(self, cases=None, concurrent=False):
+        self.cases = {} if cases is None else cases
+        self.concurrent = concurrent
+        self._counters = {}
+
+    # Run the given test case against the given dongle,
+    # recording its wall time and number of exchanges
+    # (regardless of whether it passes)
+    def measure(self, case, dongle, debug, run_args):
+        counter = self._counters.get(id(dongle))
+        if counter is None:
+            counter = ExchangeCounter(dongle)
+            self._counters[id(dongle)] = counter
+
+        start_count = counter.count
+        start = time.monotonic()
+        passed = False
+        try:
+            case.run(dongle, debug, run_args)
+            passed = True
+        finally:
+            self.cases[case.source] = {
+                "name": case.name,
+                "passed": passed,
+                "time": round(time.monotonic() - start, 6),
+                "exchanges": counter.count - start_count,
+                "concurrent": self.concurrent,
+            }
+
+    def save(self, path):
+        try:
+            with open(path, "w") as f:
+                json.dump({
+                    "version": self.VERSION,
+                    "cases": self.cases,
+                }, f, indent=2, sort_keys=True)
+                f.write("\n")
+        except OSError as e:
+            raise RuntimeError(f"Unable to write report to {path}: {e}")
+
+    # Compare against a baseline report, returning a list of
+    # (case, description) regressions. Only cases that passed in both
+    # reports are compared. Any increase in the number of exchanges is
+    # a regression; wall time regresses when it grows by more than the
+    # given tolerance (a fraction of the baseline time), and is only
+    # compared when neither report measured it concurrently
+    def compare(self, baseline, time_tolerance):
+        regressions = []
+        for source in sorted(self.cases):
+            current = self.cases[source]
+            previous = baseline.cases.get(source)
+            if previous is None or not current["passed"] or not previous["passed"]:
+                continue
+
+            if current["exchanges"] > previous["exchanges"]:
+                regressions.append((source, f"exchanges {previous['exchanges']} -> "
+                                            f"{current['exchanges']}"))
+
+            if current.get("concurrent") or previous.get("concurrent"):
+                continue
+
+            delta = current["time"] - previous["time"]
+            if delta > self.MIN_TIME_DELTA and \
+               delta > previous["time"]*time_tolerance:
+                regressions.append((source, f"time {previous['time']:.3f}s -> "
+                                            f"{current['time']:.3f}s"))
+
+        return regressions
+
+    def print_summary(self):
+        total_time = sum(map(lambda c: c["time"], self.cases.values()))
+        total_exchanges = sum(map(lambda c: c["exchanges"], self.cases.values()))
+        output.info(f"( {len(self.cases)} cases measured, {total_time:.3f}s, "
+                    f"{total_exchanges} exchanges )", nl=True)
+        if any(map(lambda c: c.get("concurrent"), self.cases.values())):
+            output.info("( wall times measured concurrently, "
+                        "not comparable across runs )", nl=True)
@@ -0,0 +1,397 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 RSK Labs Ltd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import os
+import socket
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from cases import TestSuite, TestCase
+from ledger.hsm2dongle import HSM2Dongle
+from ledger.hsm2dongle_tcp import HSM2DongleTCP
+from ledger.tcp_transport import TCPTransport
+from misc.tcpsigner_admin import TcpSignerAdmin, read_nvm_profile
+from tcpsigner_pool import TCPSignerPool, CHECKPOINT, DIFFICULTY, NETWORK
+import output
+
+import logging
+
+logging.disable(logging.CRITICAL)
+
+# Deterministic replay benchmark for the TCPSigner.
+#
+# A benchmark session (see bench/*.json) is a list of steps, each one running
+# (optionally repeatedly) a set of test cases through the harness. Recording
+# a session runs it against a freshly spawned TCPSigner with a replica file
+# (--replicafile), which ends up holding every APDU the firmware received.
+# Replaying feeds those exact APDUs to freshly spawned TCPSigners, both
+# from the replica file itself (--inputfile, measuring pure firmware time)
+# and over TCP (measuring every APDU, grouped by type, and querying the
+# NVM stats through the admin interface). Since both the inputs and the
+# initial device state are always the same, results are comparable across
+# runs and builds without a physical device.
+
+REPORT_VERSION = 1
+
+# Commands whose ops are given a name in the report
+_COMMAND_OPS = {
+    HSM2Dongle.CMD.SIGN: ("sign", HSM2Dongle.OP.SIGN),
+    HSM2Dongle.CMD.GET_STATE: ("getState", HSM2Dongle.OP.GST),
+    HSM2Dongle.CMD.RESET_AB: ("resetAdvance", HSM2Dongle.OP.RAV),
+    HSM2Dongle.CMD.ADVANCE: ("advance", HSM2Dongle.OP.ADVANCE),
+    HSM2Dongle.CMD.UPD_ANCESTOR: ("updateAncestor", HSM2Dongle.OP.UPD_ANCESTOR),
+}
+
+
+# Human readable type of the given APDU, from its CLA, CMD and OP
+def apdu_type(apdu):
+    if len(apdu) < 2:
+        return f"malformed ({apdu.hex()})"
+
+    cla, cmd = apdu[0], apdu[1]
+    op = apdu[2] if len(apdu) > 2 else None
+
+    if cla == TcpSignerAdmin.CLA:
+        names = [m.name for m in TcpSignerAdmin
+                 if m.name.startswith("CMD_") and m.value == cmd]
+        return "admin/" + (names[0][4:] if len(names) > 0 else f"0x{cmd:02x}")
+
+    if cla != HSM2Dongle.CLA:
+        return f"0x{cla:02x}/0x{cmd:02x}"
+
+    if cmd in _COMMAND_OPS:
+        (name, ops) = _COMMAND_OPS[cmd]
+        if op is None:
+            return name
+        op_names = [m.name for m in ops if m.value == op]
+        return f"{name}/" + (op_names[0] if len(op_names) > 0 else f"0x{op:02x}")
+
+    try:
+        return HSM2Dongle.CMD(cmd).name
+    except ValueError:
+        return f"0x{cmd:02x}"
+
+
+def admin_apdu(cmd):
+    return bytes([TcpSignerAdmin.CLA, cmd, TcpSignerAdmin.OP_NONE])
+
+
+# Parse a replica file (a sequence of |1 byte length| |data| records,
+# one per APDU received by the TCPSigner)
+def read_replica(path):
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        raise RuntimeError(f"Unable to read replica {path}: {e}")
+
+    apdus = []
+    offset = 0
+    while offset < len(data):
+        length = data[offset]
+        if offset + 1 + length > len(data):
+            raise RuntimeError(f"Truncated replica {path} at offset {offset}")
+        apdus.append(data[offset+1:offset+1+length])
+        offset += 1 + length
+    return apdus
+
+
+class Session:
+    def __init__(self, path):
+        try:
+            with open(path, "r") as f:
+                spec = json.load(f)
+            self.name = spec.get("name", os.path.basename(path))
+            self.checkpoint = spec.get("checkpoint", CHECKPOINT)
+            self.difficulty = spec.get("difficulty", DIFFICULTY)
+            self.network = spec.get("network", NETWORK)
+            self.steps = spec["steps"]
+        except (OSError, ValueError, KeyError) as e:
+            raise RuntimeError(f"Unable to load session from {path}: {e}")
+        self.base_path = os.path.dirname(path)
+
+    def tcpsigner_args(self):
+        return ["--checkpoint", self.checkpoint,
+                "--difficulty", self.difficulty,
+                "--network", self.network]
+
+    def tcpsigner_pool(self, options, extra_args=[]):
+        return TCPSignerPool(options.tcpsigner_path, options.host, options.port, 1,
+                             self.checkpoint, self.difficulty, self.network,
+                             extra_args)
+
+    # All the session's cases, in order (repeated steps included)
+    def load_suite(self):
+        cases = []
+        for step in self.steps:
+            suite = TestSuite.load_from_path(
+                os.path.join(self.base_path, step["resources"]),
+                step.get("filter", ""), step.get("overrides", None))
+            cases += suite.cases*step.get("repeat", 1)
+        return TestSuite(cases)
+
+
+# Minimal client for the TCPSigner's framed protocol. Unlike the dongle
+# classes, APDUs are sent as they are and error status words are just
+# returned, since replayed sessions can include expected failures
+class ReplayClient:
+    def __init__(self, host, port):
+        self.socket = socket.create_connection((host, port))
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def exchange(self, apdu):
+        self.socket.sendall(struct.pack(">I", len(apdu)) + apdu)
+        size = struct.unpack(">I", self._recv_exactly(4))[0]
+        response = self._recv_exactly(size)
+        sw = struct.unpack(">H", self._recv_exactly(2))[0]
+        return (response, sw)
+
+    # Exchange an admin APDU, returning its response (raising on error)
+    def admin_exchange(self, apdu):
+        (response, sw) = self.exchange(apdu)
+        if sw != TCPTransport.SW_OK:
+            raise RuntimeError(f"Admin command {apdu.hex()} failed with "
+                               f"status 0x{sw:04x}")
+        return response
+
+    def close(self):
+        self.socket.close()
+
+    def _recv_exactly(self, size):
+        buf = bytearray()
+        while len(buf) < size:
+            chunk = self.socket.recv(size - len(buf))
+            if len(chunk) == 0:
+                raise RuntimeError("Connection closed by the TCPSigner")
+            buf += chunk
+        return bytes(buf)
+
+
+def record(session, options):
+    replica_path = os.path.abspath(options.replica_path)
+    # The TCPSigner appends to existing replica files
+    if os.path.exists(replica_path):
+        os.remove(replica_path)
+
+    output.info(f"Starting TCPSigner recording to {replica_path}")
+    pool = session.tcpsigner_pool(options, ["--replicafile", replica_path])
+    pool.start()
+    output.ok()
+    try:
+        suite = session.load_suite()
+        dongle = HSM2DongleTCP(options.host, options.port, False)
+        dongle.connect()
+        output.header(f"Recording session '{session.name}' "
+                      f"({len(suite.cases)} cases)")
+        passed = suite.run(dongle, TestCase.RUN_ON_VALUE_TCPSIGNER, {
+            TestCase.RUN_ARGS_DEVICE_KIND_KEY: "tcpsigner"
+        })
+        dongle.disconnect()
+    finally:
+        pool.stop()
+
+    if not passed:
+        os.remove(replica_path)
+        raise RuntimeError("Session failed, nothing recorded")
+
+    output.info(f"Recorded {len(read_replica(replica_path))} APDUs "
+                f"to {replica_path}", nl=True)
+
+
+# Replay the whole replica file through the TCPSigner's input file mode,
+# returning the wall time it took
+def replay_from_file(session, options, replica_path):
+    with tempfile.TemporaryDirectory(prefix="tcpsigner-") as workdir:
+        start = time.perf_counter()
+        result = subprocess.run(
+            [os.path.abspath(options.tcpsigner_path)] + session.tcpsigner_args() +
+            ["--inputfile", replica_path],
+            cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"TCPSigner exited with code {result.returncode} "
+                           "replaying from file")
+    return elapsed
+
+
+# Replay the given APDUs one by one over TCP, returning the per APDU type
+# stats (number of APDUs, bytes, error status words and time), the total
+# time and the NVM stats (see misc.tcpsigner_admin.read_nvm_profile)
+def replay_over_tcp(session, options, apdus):
+    types = {}
+    pool = session.tcpsigner_pool(options)
+    pool.start()
+    try:
+        client = ReplayClient(options.host, options.port)
+        client.admin_exchange(admin_apdu(TcpSignerAdmin.CMD_RESET_NVM))
+        total = 0
+        for apdu in apdus:
+            start = time.perf_counter()
+            (_, sw) = client.exchange(apdu)
+            elapsed = time.perf_counter() - start
+            total += elapsed
+
+            stats = types.setdefault(apdu_type(apdu), {
+                "count": 0, "bytes": 0, "errors": 0, "time": 0})
+            stats["count"] += 1
+            stats["bytes"] += len(apdu)
+            stats["errors"] += 0 if sw == TCPTransport.SW_OK else 1
+            stats["time"] += elapsed
+
+        nvm_profile = read_nvm_profile(client.admin_exchange)
+        client.close()
+    except OSError as e:
+        raise RuntimeError(f"Error replaying over TCP: {e}")
+    except ValueError as e:
+        raise RuntimeError(str(e))
+    finally:
+        pool.stop()
+
+    return (types, total, nvm_profile)
+
+
+def replay(session, options):
+    replica_path = os.path.abspath(options.replica_path)
+    apdus = read_replica(replica_path)
+    output.header(f"Replaying session '{session.name}' ({len(apdus)} APDUs, "
+                  f"{options.runs} runs)")
+
+    file_times = []
+    tcp_times = []
+    nvm_profiles = []
+    runs_types = []
+    for run in range(options.runs):
+        output.info(f"Run {run+1}/{options.runs}")
+        file_times.append(replay_from_file(session, options, replica_path))
+        (types, total, nvm_profile) = replay_over_tcp(session, options, apdus)
+        tcp_times.append(total)
+        nvm_profiles.append(nvm_profile)
+        runs_types.append(types)
+        output.info(f" (file {file_times[-1]:.3f}s, TCP {total:.3f}s, "
+                    f"{nvm_profile['writes']} NVM writes)")
+        output.ok()
+
+    # Per APDU type, keep the median time across runs (counts are the same
+    # for every run, since the replayed APDUs are)
+    types = {}
+    for name in sorted(runs_types[0]):
+        stats = dict(runs_types[0][name])
+        stats["time"] = statistics.median(map(lambda t: t[name]["time"], runs_types))
+        stats["throughput"] = stats["count"]/stats["time"] if stats["time"] > 0 else 0
+        types[name] = stats
+
+    report = {
+        "version": REPORT_VERSION,
+        "session": session.name,
+        "apdus": len(apdus),
+        "runs": options.runs,
+        "file_replay_time": file_times,
+        "tcp_replay_time": tcp_times,
+        "nvm_writes": list(map(lambda p: p["writes"], nvm_profiles)),
+        "nvm_profile": nvm_profiles[0],
+        "apdu_types": types,
+    }
+
+    print_report(report)
+
+    if options.report_path is not None:
+        output.info(f"Writing report to {options.report_path}")
+        try:
+            with open(options.report_path, "w") as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+                f.write("\n")
+        except OSError as e:
+            raise RuntimeError(f"Unable to write report to {options.report_path}: {e}")
+        output.ok()
+
+    # The same inputs must always lead to the same NVM writes
+    if any(map(lambda p: p != nvm_profiles[0], nvm_profiles)):
+        raise RuntimeError(f"NVM writes differ across runs: {report['nvm_writes']}")
+
+
+def print_report(report):
+    output.header("Results")
+    file_median = statistics.median(report["file_replay_time"])
+    tcp_median = statistics.median(report["tcp_replay_time"])
+    output.info(f"File replay: {file_median:.3f}s median "
+                f"({min(report['file_replay_time']):.3f}s - "
+                f"{max(report['file_replay_time']):.3f}s), "
+                f"{report['apdus']/file_median:.0f} APDUs/s", nl=True)
+    output.info(f"TCP replay:  {tcp_median:.3f}s median "
+                f"({min(report['tcp_replay_time']):.3f}s - "
+                f"{max(report['tcp_replay_time']):.3f}s), "
+                f"{report['apdus']/tcp_median:.0f} APDUs/s", nl=True)
+    output.info(f"NVM writes:  {report['nvm_writes'][0]}", nl=True)
+    output.info("", nl=True)
+
+    output.info(f"{'APDU type':<32}{'count':>8}{'errors':>8}{'bytes':>10}"
+                f"{'time (s)':>10}{'APDUs/s':>10}", nl=True)
+    for (name, stats) in sorted(report["apdu_types"].items(),
+                                key=lambda item: -item[1]["time"]):
+        output.info(f"{name:<32}{stats['count']:>8}{stats['errors']:>8}"
+                    f"{stats['bytes']:>10}{stats['time']:>10.3f}"
+                    f"{stats['throughput']:>10.0f}", nl=True)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Record and replay TCPSigner benchmark "
+                                        "sessions")
+    parser.add_argument("operation", choices=["record", "replay"])
+    parser.add_argument("-s", "--session", dest="session_path",
+                        default="./bench/sign-session.json",
+                        help="Session file (default './bench/sign-session.json')")
+    parser.add_argument("-r", "--replica", dest="replica_path",
+                        default="./session.replica",
+                        help="Replica file to record to or replay from "
+                             "(default './session.replica')")
+    parser.add_argument("-n", "--runs", dest="runs", type=int, default=5,
+                        help="Number of replays (default 5)")
+    parser.add_argument("-o", "--report", dest="report_path",
+                        help="Write the replay results to this JSON file")
+    parser.add_argument("-t", "--tcpsigner", dest="tcpsigner_path",
+                        default="../src/tcpsigner/tcpsigner",
+                        help="TCPSigner binary to spawn "
+                             "(default '../src/tcpsigner/tcpsigner')")
+    parser.add_argument("-p", "--port", dest="port", type=int, default=8888,
+                        help="Port for the spawned TCPSigners (default 8888)")
+    parser.add_argument("-S", "--server", dest="host", default="localhost",
+                        help="IP for the spawned TCPSigners to bind to "
+                             "(default 'localhost')")
+    options = parser.parse_args()
+
+    if options.runs < 1:
+        parser.error("Number of runs must be positive")
+
+    try:
+        session = Session(options.session_path)
+        if options.operation == "record":
+            record(session, options)
+        else:
+            replay(session, options)
+    except RuntimeError as e:
+        output.error(str(e))
+        sys.exit(1)
@@ -21,11 +21,15 @@
 # SOFTWARE.
 
 import sys
+from contextlib import contextmanager
 from options import OptionParser
 from cases import TestSuite, TestCase
 from ledger.hsm2dongle import HSM2Dongle
 from ledger.hsm2dongle_tcp import HSM2DongleTCP
 from sgx.hsm2dongle import HSM2DongleSGX
+from tcpsigner_pool import TCPSignerPool
+from perf_report import PerfReport
+from misc.tcpsigner_admin import TcpSignerAdmin
 import output
 
 import logging
@@ -43,9 +47,44 @@ def debug_dongle_exchange(dongle, bs, timeout):
     return result
 
 
+def _admin_exchange(dongle, cmd, data=b""):
+    return dongle.dongle.exchange(
+        bytes([TcpSignerAdmin.CLA, cmd, TcpSignerAdmin.OP_NONE]) + data)
+
+
+# Connect to a freshly spawned TCPSigner instance from the given pool,
+# optionally started from the given snapshot (see TestSuite.run_parallel)
+# and yield the connected dongle along with a function that snapshots
+# the instance's current state. A snapshot is a copy of the instance's
+# working directory once told to save its non volatile memory, along
+# with its onboarded status (which lives elsewhere)
+@contextmanager
+def fresh_tcpsigner(pool, host, verbose, snapshot=None):
+    (workdir_snapshot, is_onboarded) = snapshot if snapshot is not None \
+        else (None, True)
+    with pool.fresh_instance(workdir_snapshot) as port:
+        dongle = HSM2DongleTCP(host, port, verbose)
+        dongle.connect()
+        try:
+            if not is_onboarded:
+                _admin_exchange(dongle, TcpSignerAdmin.CMD_SET_IS_ONBOARDED,
+                                bytes([0]))
+
+            def take_snapshot():
+                result = _admin_exchange(dongle, TcpSignerAdmin.CMD_GET_IS_ONBOARDED)
+                is_onboarded = result[TcpSignerAdmin.APDU_OFFSET_DATA] != 0
+                _admin_exchange(dongle, TcpSignerAdmin.CMD_SAVE_NVM)
+                return (pool.snapshot(port), is_onboarded)
+
+            yield (dongle, take_snapshot)
+        finally:
+            dongle.disconnect()
+
+
 if __name__ == "__main__":
     options = OptionParser("Run the signer tests").parse()
 
+    pool = None
     try:
         output.header("Setup")
         run_args = {
@@ -71,6 +110,19 @@ if __name__ == "__main__":
             dongle = HSM2DongleSGX(options.host, options.port, options.dongle_verbose)
             run_on = TestCase.RUN_ON_VALUE_SGX_SIM
             output.info("Running against an SGX simulator", nl=True)
+        elif options.jobs > 0:
+            pool = TCPSignerPool(options.tcpsigner_path, options.host,
+                                 options.port, options.jobs)
+
+            def new_device(snapshot=None):
+                return fresh_tcpsigner(pool, options.host, options.dongle_verbose,
+                                       snapshot)
+
+            dongle = None
+            run_on = TestCase.RUN_ON_VALUE_TCPSIGNER
+            output.info(f"Running against up to {options.jobs} local TCP device(s) "
+                        f"on ports {options.port}-{options.port + options.jobs - 1}",
+                        nl=True)
         else:
             dongle = HSM2DongleTCP(options.host, options.port, options.dongle_verbose)
             run_on = TestCase.RUN_ON_VALUE_TCPSIGNER
@@ -83,32 +135,78 @@ if __name__ == "__main__":
         suite.debug = options.verbose
         output.ok()
 
-        output.info("Connecting to dongle")
-        dongle.connect()
-        output.ok()
-
-        if options.dongle_verbose:
-            _exchange_fn = dongle.dongle.exchange
-            dongle.dongle.exchange = debug_dongle_exchange.__get__(
-                dongle.dongle, dongle.dongle.__class__)
-
-        output.info("Getting version")
-        version = dongle.get_version()
-        output.ok()
+        baseline = None
+        if options.baseline_path is not None:
+            output.info(f"Loading baseline report from {options.baseline_path}")
+            baseline = PerfReport.load(options.baseline_path)
+            output.ok()
+        if options.report_path is not None or baseline is not None:
+            suite.report = PerfReport(concurrent=options.jobs > 1)
+
+        if pool is not None:
+            output.info("Getting version")
+            with new_device() as (d, _):
+                version = d.get_version()
+            output.ok()
+        else:
+            output.info("Connecting to dongle")
+            dongle.connect()
+            output.ok()
+
+            if options.dongle_verbose:
+                _exchange_fn = dongle.dongle.exchange
+                dongle.dongle.exchange = debug_dongle_exchange.__get__(
+                    dongle.dongle, dongle.dongle.__class__)
+
+            output.info("Getting version")
+            version = dongle.get_version()
+            output.ok()
         output.info(f"Version: {version}", nl=True)
 
         output.header("Running tests")
-        tests_passed = suite.run(dongle, run_on, run_args)
+        if pool is not None:
+            tests_passed = suite.run_parallel(options.jobs, new_device,
+                                              run_on, run_args)
+        else:
+            tests_passed = suite.run(dongle, run_on, run_args)
         stats = suite.get_stats()
         output.info(
             f"( {stats['passed']} passed, {stats['failed']} failed, "
             f"{stats['skipped']} skipped )", nl=True
         )
 
-        output.header("Teardown")
-        output.info("Disconnecting from dongle")
-        dongle.disconnect()
-        output.ok()
+        if suite.report is not None:
+            output.header("Performance")
+            suite.report.print_summary()
+            if options.report_path is not None:
+                output.info(f"Writing report to {options.report_path}")
+                suite.report.save(options.report_path)
+                output.ok()
+            if baseline is not None:
+                output.info("Comparing against baseline")
+                regressions = suite.report.compare(baseline,
+                                                   options.time_tolerance/100)
+                if len(regressions) == 0:
+                    output.ok()
+                else:
+                    output.error(f"{len(regressions)} regression(s) found")
+                    for (source, description) in regressions:
+                        output.info(f"{source}: {description}", nl=True)
+                    tests_passed = False
+
+        if options.verify_jobs:
+            output.header("Verifying against a serial run")
+            if suite.verify_parallel(new_device, run_on, run_args):
+                output.info("Serial and concurrent results match")
+                output.ok()
+            else:
+                tests_passed = False
+
+        if dongle is not None:
+            output.header("Teardown")
+            output.info("Disconnecting from dongle")
+            dongle.disconnect()
+            output.ok()
     except RuntimeError as e:
         output.error(str(e))
         sys.exit(1)
@@ -0,0 +1,161 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 RSK Labs Ltd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from queue import Queue
+
+# Blockchain parameters the test cases are built for (see README.md)
+CHECKPOINT = "0xbdcb3c17c7aee714cec8ad900341bfd987b452280220dcbd6e7191f67ea4209b"
+DIFFICULTY = "0x32"
+NETWORK = "regtest"
+
+
+# A pool of locally spawned TCPSigner processes, each one listening on its
+# own port (starting at base_port) and running within its own temporary
+# working directory, so that every instance gets its own keys, attestation
+# and blockchain state. Blockchain parameters default to the ones the
+# test cases are built for; extra_args are appended to every command line.
+# Instances can either be started all at once (start/stop) or one at a
+# time on any of the pool's free ports (fresh_instance), optionally from
+# a snapshot of an earlier instance's working directory (snapshot).
+class TCPSignerPool:
+    STARTUP_TIMEOUT = 10  # seconds
+    STARTUP_POLL_INTERVAL = 0.1  # seconds
+
+    def __init__(self, tcpsigner_path, host, base_port, size, checkpoint=CHECKPOINT,
+                 difficulty=DIFFICULTY, network=NETWORK, extra_args=[]):
+        self.tcpsigner_path = os.path.abspath(tcpsigner_path)
+        self.host = host
+        self.ports = list(range(base_port, base_port + size))
+        self.checkpoint = checkpoint
+        self.difficulty = difficulty
+        self.network = network
+        self.extra_args = extra_args
+        self.processes = []
+        self.workdirs = []
+        self._instance_workdirs = {}
+        self._free_ports = Queue()
+        for port in self.ports:
+            self._free_ports.put(port)
+
+    def start(self):
+        try:
+            for port in self.ports:
+                self._spawn(port)
+
+            for (port, process) in zip(self.ports, self.processes):
+                self._wait_for(port, process)
+        except (OSError, RuntimeError):
+            self.stop()
+            raise
+
+    def stop(self):
+        self._terminate(self.processes, self.workdirs)
+        self.processes = []
+        self.workdirs = []
+
+    # Start a brand new instance (i.e., with a brand new working directory,
+    # or a copy of the given snapshot) on one of the pool's free ports,
+    # waiting for it to be listening, and yield that port. The given
+    # snapshot is removed once copied. The instance is stopped (and its
+    # port freed) on exit.
+    # Safe to use concurrently from different threads; blocks until a port
+    # is free.
+    @contextmanager
+    def fresh_instance(self, snapshot=None):
+        port = self._free_ports.get()
+        workdir = tempfile.TemporaryDirectory(prefix="tcpsigner-")
+        process = None
+        try:
+            if snapshot is not None:
+                shutil.copytree(snapshot.name, workdir.name, dirs_exist_ok=True)
+                snapshot.cleanup()
+            process = self._popen(port, workdir)
+            self._wait_for(port, process)
+            self._instance_workdirs[port] = workdir
+            yield port
+        finally:
+            self._instance_workdirs.pop(port, None)
+            self._terminate([process] if process is not None else [], [workdir])
+            self._free_ports.put(port)
+
+    # Copy the working directory of the instance running (see fresh_instance)
+    # on the given port into a brand new temporary directory, and return it.
+    # Only what the instance has written to disk is copied: keys, attestation
+    # and whatever non volatile memory it was last told to save (see
+    # TcpSignerAdmin.CMD_SAVE_NVM)
+    def snapshot(self, port):
+        snapshot = tempfile.TemporaryDirectory(prefix="tcpsigner-snapshot-")
+        shutil.copytree(self._instance_workdirs[port].name, snapshot.name,
+                        dirs_exist_ok=True)
+        return snapshot
+
+    def _spawn(self, port):
+        workdir = tempfile.TemporaryDirectory(prefix="tcpsigner-")
+        self.workdirs.append(workdir)
+        self.processes.append(self._popen(port, workdir))
+
+    def _popen(self, port, workdir):
+        return subprocess.Popen(
+            [self.tcpsigner_path,
+             "--port", str(port),
+             "--bind", self.host,
+             "--checkpoint", self.checkpoint,
+             "--difficulty", self.difficulty,
+             "--network", self.network] + self.extra_args,
+            cwd=workdir.name,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def _terminate(self, processes, workdirs):
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=self.STARTUP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        for workdir in workdirs:
+            workdir.cleanup()
+
+    def _wait_for(self, port, process):
+        deadline = time.monotonic() + self.STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"TCPSigner on port {port} exited with code "
+                                   f"{process.returncode}")
+            try:
+                socket.create_connection((self.host, port),
+                                         timeout=self.STARTUP_POLL_INTERVAL).close()
+                return
+            except OSError:
+                time.sleep(self.STARTUP_POLL_INTERVAL)
+        raise RuntimeError(f"Timed out waiting for TCPSigner on port {port}")
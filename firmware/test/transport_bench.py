@@ -0,0 +1,201 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 RSK Labs Ltd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import socket
+import statistics
+import struct
+import sys
+import threading
+import time
+from argparse import ArgumentParser
+from contextlib import contextmanager
+from ledgerblue.commException import CommException
+from ledger.hsm2dongle import HSM2Dongle, HSM2DongleCommError
+from ledger.hsm2dongle_tcp import HSM2DongleTCP
+from ledger.tcp_transport import TCPTransport
+from tcpsigner_pool import TCPSignerPool
+import output
+
+import logging
+
+logging.disable(logging.CRITICAL)
+
+# Transport benchmark for HSM2DongleTCP.
+#
+# Measures the round trip time of APDU exchanges through each of the
+# transports HSM2DongleTCP can use: ledgerblue's commTCP and the native
+# TCPTransport, both with and without vectored writes. Exchanges go either
+# to a freshly spawned TCPSigner (a cheap, side effect free APDU, so that
+# the transport dominates) or to an in-process loopback echo "dongle"
+# (APDUs of any given size, no firmware build needed).
+
+REPORT_VERSION = 1
+
+# Transport name => HSM2DongleTCP keyword arguments
+TRANSPORTS = {
+    "commTCP": {},
+    "native": {"native_transport": True},
+    "native+writev": {"native_transport": True, "use_writev": True},
+}
+
+
+# Answers every request with its own APDU and a success status word,
+# using the TCPSigner's framing
+class EchoDongle:
+    def __init__(self, host):
+        self.server = socket.create_server((host, 0))
+        self.port = self.server.getsockname()[1]
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.close()
+
+    def _serve(self):
+        while True:
+            try:
+                (connection, _) = self.server.accept()
+            except OSError:
+                return
+            with connection:
+                connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                try:
+                    while True:
+                        size = struct.unpack(">I", self._recv_exactly(connection,
+                                                                      4))[0]
+                        apdu = self._recv_exactly(connection, size)
+                        connection.sendall(struct.pack(">I", size) + apdu +
+                                           struct.pack(">H", TCPTransport.SW_OK))
+                except (OSError, EOFError):
+                    pass
+
+    def _recv_exactly(self, connection, size):
+        buf = bytearray()
+        while len(buf) < size:
+            chunk = connection.recv(size - len(buf))
+            if len(chunk) == 0:
+                raise EOFError()
+            buf += chunk
+        return bytes(buf)
+
+
+# Yield the port of the device to benchmark against
+# and the APDU to exchange with it
+@contextmanager
+def device(options):
+    if options.echo:
+        echo = EchoDongle(options.host)
+        try:
+            yield (echo.port, bytes(options.apdu_size))
+        finally:
+            echo.close()
+    else:
+        pool = TCPSignerPool(options.tcpsigner_path, options.host, options.port, 1)
+        with pool.fresh_instance() as port:
+            yield (port, bytes([HSM2Dongle.CLA, HSM2Dongle.CMD.IS_ONBOARD]))
+
+
+# Time the given number of exchanges of the given APDU over
+# a fresh connection through each of the transports, the given number
+# of runs each, and return the times per exchange in seconds
+def benchmark(host, port, apdu, exchanges, runs):
+    results = {}
+    for (name, kwargs) in TRANSPORTS.items():
+        results[name] = []
+        for _ in range(runs):
+            dongle = HSM2DongleTCP(host, port, False, **kwargs)
+            dongle.connect()
+            try:
+                # Warm up the connection
+                dongle.dongle.exchange(apdu)
+                start = time.perf_counter()
+                for _ in range(exchanges):
+                    dongle.dongle.exchange(apdu)
+                results[name].append((time.perf_counter() - start)/exchanges)
+            finally:
+                dongle.disconnect()
+    return results
+
+
+def print_report(report):
+    output.header("Results")
+    output.info(f"{report['exchanges']} exchanges of {report['apdu_size']}-byte "
+                f"APDUs against {report['device']}, {report['runs']} run(s)",
+                nl=True)
+    output.info(f"{'transport':<16}{'median (us)':>14}{'min (us)':>12}"
+                f"{'max (us)':>12}", nl=True)
+    for (name, times) in report["transports"].items():
+        output.info(f"{name:<16}{statistics.median(times)*1e6:>14.1f}"
+                    f"{min(times)*1e6:>12.1f}{max(times)*1e6:>12.1f}", nl=True)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Benchmark the HSM2DongleTCP transports")
+    parser.add_argument("-e", "--echo", dest="echo", action="store_true",
+                        help="Exchange with an in-process loopback echo dongle "
+                             "instead of a spawned TCPSigner")
+    parser.add_argument("-s", "--size", dest="apdu_size", type=int, default=200,
+                        help="APDU size in bytes (only used for -e option, "
+                             "default 200)")
+    parser.add_argument("-x", "--exchanges", dest="exchanges", type=int,
+                        default=1000,
+                        help="Number of exchanges per run (default 1000)")
+    parser.add_argument("-n", "--runs", dest="runs", type=int, default=5,
+                        help="Number of runs per transport (default 5)")
+    parser.add_argument("-o", "--report", dest="report_path",
+                        help="Write the results to this JSON file")
+    parser.add_argument("-t", "--tcpsigner", dest="tcpsigner_path",
+                        default="../src/tcpsigner/tcpsigner",
+                        help="TCPSigner binary to spawn "
+                             "(default '../src/tcpsigner/tcpsigner')")
+    parser.add_argument("-p", "--port", dest="port", type=int, default=8888,
+                        help="Port for the spawned TCPSigner (default 8888)")
+    parser.add_argument("-S", "--server", dest="host", default="localhost",
+                        help="IP to bind to (default 'localhost')")
+    options = parser.parse_args()
+
+    if options.runs < 1 or options.exchanges < 1:
+        parser.error("Number of runs and exchanges must be positive")
+    if options.apdu_size < 1:
+        parser.error("APDU size must be positive")
+
+    try:
+        with device(options) as (port, apdu):
+            output.info("Benchmarking transports")
+            report = {
+                "version": REPORT_VERSION,
+                "device": "echo" if options.echo else "TCPSigner",
+                "apdu_size": len(apdu),
+                "exchanges": options.exchanges,
+                "runs": options.runs,
+                "transports": benchmark(options.host, port, apdu,
+                                        options.exchanges, options.runs),
+            }
+            output.ok()
+        print_report(report)
+        if options.report_path is not None:
+            with open(options.report_path, "w") as f:
+                json.dump(report, f, indent=2)
+    except (RuntimeError, OSError, CommException, HSM2DongleCommError) as e:
+        output.error(str(e))
+        sys.exit(1)
@@ -31,7 +31,8 @@ from admin.onboard import do_onboard
 from admin.pubkeys import do_get_pubkeys
 from admin.changepin import do_changepin
 from admin.ledger_attestation import do_attestation
-from admin.verify_ledger_attestation import do_verify_attestation
+from admin.verify_ledger_attestation import do_verify_attestation, \
+    do_verify_attestation_batch
 from admin.authorize_signer import do_authorize_signer
 
 
@@ -45,6 +46,7 @@ def main():
         "changepin": do_changepin,
         "attestation": do_attestation,
         "verify_attestation": do_verify_attestation,
+        "verify_attestation_batch": do_verify_attestation_batch,
         "authorize_signer": do_authorize_signer,
     }
 
@@ -70,8 +72,8 @@ def main():
         "-o",
         "--output",
         dest="output_file_path",
-        help="Output file (only valid for 'onboard', 'pubkeys' and 'attestation' "
-        "operations).",
+        help="Output file (only valid for 'onboard', 'pubkeys', 'attestation' and "
+        "'verify_attestation_batch' operations).",
     )
     parser.add_argument(
         "-u",
@@ -98,20 +100,30 @@ def main():
         "--attcert",
         dest="attestation_certificate_file_path",
         help="Attestation key certificate file (only valid for 'attestation' and "
-        "'verify_attestation' operations).",
+        "'verify_attestation' operations). Directory or manifest file of attestation "
+        "key certificates for the 'verify_attestation_batch' operation.",
     )
     parser.add_argument(
         "-r",
         "--root",
         dest="root_authority",
         help="Root attestation authority (only valid for 'verify_attestation' "
-        "operation). Defaults to Ledger's root authority.",
+        "and 'verify_attestation_batch' operations). Defaults to Ledger's root "
+        "authority.",
     )
     parser.add_argument(
         "-b",
         "--pubkeys",
         dest="pubkeys_file_path",
-        help="Public keys file (only valid for 'verify_attestation' operation).",
+        help="Public keys file (only valid for 'verify_attestation' and "
+        "'verify_attestation_batch' operations).",
+    )
+    parser.add_argument(
+        "--workers",
+        dest="workers",
+        help="Number of worker processes (only valid for 'verify_attestation_batch' "
+        "operation). Defaults to the number of CPUs.",
+        type=int,
     )
     parser.add_argument(
         "--attudsource",
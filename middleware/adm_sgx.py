@@ -31,8 +31,10 @@ from admin.onboard import do_onboard
 from admin.pubkeys import do_get_pubkeys
 from admin.changepin import do_changepin
 from admin.sgx_attestation import do_attestation
-from admin.verify_sgx_attestation import do_verify_attestation
+from admin.verify_sgx_attestation import do_verify_attestation, \
+    do_verify_attestation_batch
 from admin.migrate_db import do_migrate_db
+from sgx.hsm2dongle import EVIDENCE_CHUNK_SIZE, EVIDENCE_MAX_CHUNK_SIZE
 
 
 def main():
@@ -45,6 +47,7 @@ def main():
         "changepin": do_changepin,
         "attestation": do_attestation,
         "verify_attestation": do_verify_attestation,
+        "verify_attestation_batch": do_verify_attestation_batch,
         "migrate_db": do_migrate_db,
     }
 
@@ -85,8 +88,8 @@ def main():
         "-o",
         "--output",
         dest="output_file_path",
-        help="Output file (only valid for 'onboard', 'pubkeys' and 'attestation' "
-        "operations).",
+        help="Output file (only valid for 'onboard', 'pubkeys', 'attestation' and "
+        "'verify_attestation_batch' operations).",
     )
     parser.add_argument(
         "-u",
@@ -112,20 +115,30 @@ def main():
         "--attcert",
         dest="attestation_certificate_file_path",
         help="Attestation key certificate file (only valid for "
-        "'verify_attestation' operation).",
+        "'verify_attestation' operation). Directory or manifest file of attestation "
+        "key certificates for the 'verify_attestation_batch' operation.",
     )
     parser.add_argument(
         "-r",
         "--root",
         dest="root_authority",
         help="Root attestation authority (only valid for 'verify_attestation' "
-        "operation). Defaults to Intel SGX's root authority.",
+        "and 'verify_attestation_batch' operations). Defaults to Intel SGX's root "
+        "authority.",
     )
     parser.add_argument(
         "-b",
         "--pubkeys",
         dest="pubkeys_file_path",
-        help="Public keys file (only valid for 'verify_attestation' operation).",
+        help="Public keys file (only valid for 'verify_attestation' and "
+        "'verify_attestation_batch' operations).",
+    )
+    parser.add_argument(
+        "--workers",
+        dest="workers",
+        help="Number of worker processes (only valid for 'verify_attestation_batch' "
+        "operation). Defaults to the number of CPUs.",
+        type=int,
     )
     parser.add_argument(
         "--dest-port",
@@ -142,6 +155,15 @@ def main():
              "(only valid for 'migrate_db' operations)",
         default="localhost",
     )
+    parser.add_argument(
+        "--evidence-chunk-size",
+        dest="evidence_chunk_size",
+        help="Size in bytes of the chunks used to send evidence to each powHSM "
+             f"(between 1 and {EVIDENCE_MAX_CHUNK_SIZE}, default {EVIDENCE_CHUNK_SIZE}) "
+             "(only valid for 'migrate_db' operations)",
+        type=int,
+        default=EVIDENCE_CHUNK_SIZE,
+    )
     parser.add_argument(
         "-z",
         "--migauth",
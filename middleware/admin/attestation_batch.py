@@ -0,0 +1,160 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 RSK Labs Ltd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import json
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from .misc import info, head, AdminError
+from .certificate import HSMCertificate, HSMCertificateV2ElementX509
+
+# Batch verification of attestation certificates.
+#
+# The certificates to verify are given either as a directory (every
+# .json file within it is taken as a certificate) or as a manifest
+# file (one certificate path per line, relative to the manifest's
+# location; empty lines and lines starting with '#' are ignored).
+#
+# Platform specific verification is given as a factory that, given
+# a (picklable) context, builds the function that verifies a single,
+# loaded certificate. This factory runs once per worker process,
+# so that expensive setup (e.g., parsing the root of trust) is done only
+# once per worker and not once per certificate.
+
+MANIFEST_COMMENT = "#"
+CERTIFICATE_EXTENSION = ".json"
+
+# Per process state
+_verifier = None
+_x509_cache = {}
+
+
+def find_certificate_files(path):
+    path = Path(path)
+    if path.is_dir():
+        return sorted(str(p) for p in path.iterdir()
+                      if p.is_file() and p.suffix == CERTIFICATE_EXTENSION)
+
+    try:
+        lines = path.read_text().splitlines()
+    except Exception as e:
+        raise AdminError(f"While reading the certificates manifest: {str(e)}")
+
+    files = []
+    for line in map(str.strip, lines):
+        if line == "" or line.startswith(MANIFEST_COMMENT):
+            continue
+        files.append(str(path.parent / line))
+    return files
+
+
+# Loads a certificate, sharing X.509 elements (e.g., the PCK certificate
+# chain intermediates) with previously loaded certificates in this process
+# whenever they are the same (same fingerprint and position in the chain).
+# This way each of those is parsed only once per process.
+def load_certificate(path):
+    certificate = HSMCertificate.from_jsonfile(path)
+    for element in certificate.elements:
+        if not isinstance(element, HSMCertificateV2ElementX509):
+            continue
+        key = (element.fingerprint, element.name, element.signed_by)
+        cached = _x509_cache.get(key)
+        if cached is None:
+            _x509_cache[key] = element
+        else:
+            certificate.add_element(cached)
+    return certificate
+
+
+def _init_worker(make_verifier, context):
+    global _verifier
+    _verifier = make_verifier(context)
+
+
+def _verify_file(path):
+    try:
+        try:
+            certificate = load_certificate(path)
+        except Exception as e:
+            raise AdminError(f"While loading the attestation certificate file: {str(e)}")
+        return {"file": path, "verified": True, "values": _verifier(certificate)}
+    except Exception as e:
+        return {"file": path, "verified": False, "error": str(e)}
+
+
+def verify_certificate_files(paths, make_verifier, context, workers=None):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(paths)))
+
+    if workers == 1:
+        _init_worker(make_verifier, context)
+        return list(map(_verify_file, paths))
+
+    # Hand out certificates in chunks so that each worker
+    # makes the most of its X.509 element cache
+    chunksize = max(1, len(paths) // (workers * 4))
+    # Worker processes are spawned rather than forked, so that they
+    # don't inherit the state of whatever else the caller runs
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(make_verifier, context),
+                                   mp_context=multiprocessing.get_context("spawn"))
+    with executor:
+        return list(executor.map(_verify_file, paths, chunksize=chunksize))
+
+
+def verify_attestation_batch(options, make_verifier, context):
+    paths = find_certificate_files(options.attestation_certificate_file_path)
+    if len(paths) == 0:
+        raise AdminError("No attestation certificates found in "
+                         f"{options.attestation_certificate_file_path}")
+
+    info(f"Verifying {len(paths)} attestation certificate(s)...")
+    results = verify_certificate_files(paths, make_verifier, context, options.workers)
+
+    verified = sum(1 for result in results if result["verified"])
+    report = {
+        "root_authority": context["root_authority"],
+        "pubkeys_hash": context["pubkeys_hash"],
+        "total": len(results),
+        "verified": verified,
+        "failed": len(results) - verified,
+        "certificates": results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if options.output_file_path is None:
+        info(output)
+    else:
+        with open(options.output_file_path, "w") as file:
+            file.write("%s\n" % output)
+        info(f"Report written to {options.output_file_path}")
+
+    summary = [f"Verified: {verified}/{len(results)}"]
+    summary += [f"FAILED {r['file']}: {r['error']}" for r in results
+                if not r["verified"]]
+    head(summary, fill="-")
+
+    if verified != len(results):
+        raise AdminError(f"{len(results) - verified} attestation certificate(s) "
+                         "failed verification")
@@ -27,6 +27,15 @@ import hashlib
 from .utils import is_nonempty_hex_string
 
 
+# Hash of the contents of a certificate element or root of trust
+def content_hash(item):
+    if isinstance(item, HSMCertificateRoot):
+        content = repr(item)
+    else:
+        content = json.dumps(item.to_dict(), sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
 class HSMCertificateRoot:
     def __init__(self, raw_pubkey_hex):
         # Parse the public key
@@ -177,7 +186,30 @@ class HSMCertificate:
         if certificate_map is not None:
             self._parse(certificate_map)
 
-    def validate_and_get_values(self, root_of_trust):
+    # Validates each target's chain from the root of trust down to the target,
+    # returning each target's value (or the name of the element that failed
+    # validation).
+    # Within a call, each element is validated against its certifier only once,
+    # regardless of how many targets share it.
+    # Optionally, a (dict-like) validity_cache can be given to share validation
+    # results across calls (e.g., for different certificates sharing
+    # intermediate elements). Results are keyed by the content hashes of the
+    # element and its certifier.
+    def validate_and_get_values(self, root_of_trust, validity_cache=None):
+        validity = {}
+
+        def is_valid(element, certifier):
+            key = (id(element), id(certifier))
+            if key not in validity:
+                if validity_cache is None:
+                    validity[key] = element.is_valid(certifier)
+                else:
+                    cache_key = (content_hash(element), content_hash(certifier))
+                    if cache_key not in validity_cache:
+                        validity_cache[cache_key] = element.is_valid(certifier)
+                    validity[key] = validity_cache[cache_key]
+            return validity[key]
+
         result = {}
         for target in self._targets:
             # Build the chain from the target to the root
@@ -196,7 +228,7 @@ class HSMCertificate:
             current_certifier = root_of_trust
             while True:
                 # Validate this element
-                if not current.is_valid(current_certifier):
+                if not is_valid(current, current_certifier):
                     result[target] = (False, current.name)
                     break
                 # Reached the leaf? => valid!
@@ -209,6 +241,10 @@ class HSMCertificate:
 
         return result
 
+    @property
+    def elements(self):
+        return list(self._elements.values())
+
     def add_element(self, element):
         if not isinstance(element, self.ELEMENT_BASE_CLASS):
             raise ValueError(f"Expected an {self.ELEMENT_BASE_CLASS.__name__} "
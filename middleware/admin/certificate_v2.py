@@ -80,6 +80,7 @@ class HSMCertificateV2Element:
 class HSMCertificateV2ElementSGXQuote(HSMCertificateV2Element):
     def __init__(self, element_map):
         self._init_with_map(element_map)
+        self._quote = None
 
     def _init_with_map(self, element_map):
         super()._init_with_map(element_map)
@@ -99,7 +100,9 @@ class HSMCertificateV2ElementSGXQuote(HSMCertificateV2Element):
 
     @property
     def message(self):
-        return SgxQuote(self._message)
+        if self._quote is None:
+            self._quote = SgxQuote(self._message)
+        return self._quote
 
     @property
     def custom_data(self):
@@ -145,6 +148,8 @@ class HSMCertificateV2ElementSGXQuote(HSMCertificateV2Element):
 class HSMCertificateV2ElementSGXAttestationKey(HSMCertificateV2Element):
     def __init__(self, element_map):
         self._init_with_map(element_map)
+        self._report_body = None
+        self._verifying_key = None
 
     def _init_with_map(self, element_map):
         super()._init_with_map(element_map)
@@ -167,11 +172,16 @@ class HSMCertificateV2ElementSGXAttestationKey(HSMCertificateV2Element):
 
     @property
     def message(self):
-        return SgxReportBody(self._message)
+        if self._report_body is None:
+            self._report_body = SgxReportBody(self._message)
+        return self._report_body
 
     @property
     def key(self):
-        return ecdsa.VerifyingKey.from_string(self._key, ecdsa.NIST256p)
+        if self._verifying_key is None:
+            self._verifying_key = ecdsa.VerifyingKey.from_string(
+                self._key, ecdsa.NIST256p)
+        return self._verifying_key
 
     @property
     def auth_data(self):
@@ -198,7 +208,7 @@ class HSMCertificateV2ElementSGXAttestationKey(HSMCertificateV2Element):
             return False
 
     def get_pubkey(self):
-        return ecdsa.VerifyingKey.from_string(self._key, ecdsa.NIST256p)
+        return self.key
 
     def to_dict(self):
         return {
@@ -254,6 +264,11 @@ class HSMCertificateV2ElementX509(HSMCertificateV2Element):
                 self.HEADER_BEGIN + self.message + self.HEADER_END).encode())
         return self._certificate
 
+    # SHA-256 of the DER-encoded certificate
+    @property
+    def fingerprint(self):
+        return hashlib.sha256(self._message).hexdigest()
+
     def is_valid(self, certifier):
         try:
             # IMPORTANT: for now, we only allow verifying the validity of an
@@ -20,10 +20,75 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 from .misc import info, head, get_hsm, get_sgx_hsm, dispose_hsm, AdminError
 from .unlock import do_unlock
 from .sgx_migration_authorization import SGXMigrationAuthorization
-from sgx.hsm2dongle import SgxUpgradeRoles
+from ledger.hsm2dongle import HSM2DongleError, HSM2DongleCommError, \
+                              HSM2DongleTimeoutError
+from sgx.hsm2dongle import SgxUpgradeRoles, EVIDENCE_CHUNK_SIZE
+
+# Number of times an interrupted migration handshake is restarted
+MAX_HANDSHAKE_RESTARTS = 3
+
+# Progress is reported every time this percentage is crossed
+PROGRESS_REPORT_STEP = 25
+
+
+# Builds a progress callback that reports (thread-safely, since
+# source and destination transfers run concurrently) whenever a
+# new PROGRESS_REPORT_STEP percentage of the total is transferred
+def _progress_reporter(label, lock):
+    last_reported = 0
+
+    def report(transferred, total):
+        nonlocal last_reported
+        if not total:
+            return
+        pct = (transferred * 100 // total) // PROGRESS_REPORT_STEP * \
+            PROGRESS_REPORT_STEP
+        if pct > last_reported:
+            last_reported = pct
+            with lock:
+                info(f"{label}: {transferred}/{total} bytes ({pct}%)")
+
+    return report
+
+
+# Send both devices their migration spec and have them exchange
+# their evidence. Source and destination are independent devices with
+# their own connections, so evidence is exchanged with both concurrently
+def _handshake(hsm_src, hsm_dst, source_mre, destination_mre, signatures,
+               chunk_size):
+    info("Sending source spec...", nl=False)
+    hsm_src.migrate_db_spec(
+        SgxUpgradeRoles.EXPORTER, source_mre, destination_mre, signatures)
+    info("OK")
+    info("Sending destination spec...", nl=False)
+    hsm_dst.migrate_db_spec(
+        SgxUpgradeRoles.IMPORTER, source_mre, destination_mre, signatures)
+    info("OK")
+
+    lock = Lock()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        info("Getting source and destination evidence...", nl=False)
+        src_future = executor.submit(hsm_src.migrate_db_get_evidence)
+        dst_future = executor.submit(hsm_dst.migrate_db_get_evidence)
+        src_evidence = src_future.result()
+        dst_evidence = dst_future.result()
+        info(f"OK. Got {len(src_evidence)} and {len(dst_evidence)} bytes")
+
+        info(f"Exchanging evidence in chunks of {chunk_size} bytes...")
+        src_future = executor.submit(
+            hsm_src.migrate_db_send_evidence, dst_evidence, chunk_size,
+            _progress_reporter("Destination evidence to source", lock))
+        dst_future = executor.submit(
+            hsm_dst.migrate_db_send_evidence, src_evidence, chunk_size,
+            _progress_reporter("Source evidence to destination", lock))
+        src_future.result()
+        dst_future.result()
+        info("Evidence exchanged")
 
 
 def do_migrate_db(options):
@@ -71,28 +136,30 @@ def do_migrate_db(options):
             options.destination_sgx_port,
             options.verbose)
 
-        info("Sending source spec...", nl=False)
-        hsm_src.migrate_db_spec(
-            SgxUpgradeRoles.EXPORTER, source_mre, destination_mre, signatures)
-        info("OK")
-        info("Sending destination spec...", nl=False)
-        hsm_dst.migrate_db_spec(
-            SgxUpgradeRoles.IMPORTER, source_mre, destination_mre, signatures)
-        info("OK")
-
-        info("Getting source evidence...", nl=False)
-        src_evidence = hsm_src.migrate_db_get_evidence()
-        info(f"OK. Got {len(src_evidence)} bytes")
-        info("Getting destination evidence...", nl=False)
-        dst_evidence = hsm_dst.migrate_db_get_evidence()
-        info(f"OK. Got {len(dst_evidence)} bytes")
-
-        info("Sending destination evidence to source...", nl=False)
-        hsm_src.migrate_db_send_evidence(dst_evidence)
-        info("OK")
-        info("Sending source evidence to destination...", nl=False)
-        hsm_dst.migrate_db_send_evidence(src_evidence)
-        info("OK")
+        # Neither device tells how much of its peer's evidence it got,
+        # so if the handshake gets interrupted (e.g., an evidence chunk
+        # is processed but its ack is lost), it's restarted from scratch
+        # on both devices: a device that already got its spec or part of
+        # its peer's evidence would otherwise reject or corrupt it
+        chunk_size = options.evidence_chunk_size or EVIDENCE_CHUNK_SIZE
+        restarts = 0
+        while True:
+            try:
+                _handshake(hsm_src, hsm_dst, source_mre, destination_mre,
+                           signatures, chunk_size)
+                break
+            except (HSM2DongleError, HSM2DongleCommError,
+                    HSM2DongleTimeoutError) as e:
+                if restarts == MAX_HANDSHAKE_RESTARTS:
+                    raise
+                restarts += 1
+                info(f"Migration handshake interrupted: {str(e)}")
+                info("Restarting migration handshake "
+                     f"(attempt {restarts}/{MAX_HANDSHAKE_RESTARTS})")
+                for hsm in [hsm_src, hsm_dst]:
+                    hsm.disconnect()
+                    hsm.connect()
+                    hsm.migrate_db_reset()
 
         info("Getting data from source...", nl=False)
         migration_data = hsm_src.migrate_db_get_data()
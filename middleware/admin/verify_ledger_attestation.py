@@ -26,6 +26,7 @@ from .attestation_utils import PowHsmAttestationMessage, load_pubkeys, \
                                compute_pubkeys_hash, compute_pubkeys_output
 from .utils import is_nonempty_hex_string
 from .certificate import HSMCertificate, HSMCertificateRoot
+from .attestation_batch import verify_attestation_batch
 
 
 UI_MESSAGE_HEADER_REGEX = re.compile(b"^HSM:UI:([2345].[0-9])")
@@ -55,15 +56,7 @@ def do_verify_attestation(options):
     if options.pubkeys_file_path is None:
         raise AdminError("No public keys file given")
 
-    root_authority = DEFAULT_ROOT_AUTHORITY
-    if options.root_authority is not None:
-        if not is_nonempty_hex_string(options.root_authority):
-            raise AdminError("Invalid root authority")
-        root_authority = options.root_authority
-    try:
-        root_authority = HSMCertificateRoot(root_authority)
-    except ValueError:
-        raise AdminError("Invalid root authority")
+    root_authority = _load_root_authority(options.root_authority)
     info(f"Using {root_authority} as root authority")
 
     # Load public keys, compute their hash and format them for output
@@ -72,12 +65,7 @@ def do_verify_attestation(options):
     pubkeys_output = compute_pubkeys_output(pubkeys_map)
 
     # Find the expected UI public key
-    expected_ui_public_key = next(filter(
-        lambda pair: pair[0] == UI_DERIVATION_PATH, pubkeys_map.items()), (None, None))[1]
-    if expected_ui_public_key is None:
-        raise AdminError(
-            f"Public key with path {UI_DERIVATION_PATH} not present in public key file")
-    expected_ui_public_key = expected_ui_public_key.serialize(compressed=True).hex()
+    expected_ui_public_key = _get_expected_ui_public_key(pubkeys_map)
 
     # Load the given attestation key certificate
     try:
@@ -90,6 +78,115 @@ def do_verify_attestation(options):
     result = att_cert.validate_and_get_values(root_authority)
 
     # UI
+    ui = _verify_ui(result, expected_ui_public_key)
+
+    head(
+        [
+            "UI verified with:",
+            f"UD value: {ui['ud_value']}",
+            f"Derived public key ({UI_DERIVATION_PATH}): {ui['public_key']}",
+            f"Authorized signer hash: {ui['signer_hash']}",
+            f"Authorized signer iteration: {ui['signer_iteration']}",
+            f"Installed UI hash: {ui['hash']}",
+            f"Installed UI version: {ui['version']}",
+        ],
+        fill="-",
+    )
+
+    # Signer
+    signer = _verify_signer(result, pubkeys_hash)
+
+    signer_info = [
+        f"Hash: {pubkeys_hash.hex()}",
+        "",
+        f"Installed Signer hash: {signer['hash']}",
+        f"Installed Signer version: {signer['version']}",
+    ]
+
+    if "platform" in signer:
+        signer_info += [
+            f"Platform: {signer['platform']}",
+            f"UD value: {signer['ud_value']}",
+            f"Best block: {signer['best_block']}",
+            f"Last transaction signed: {signer['last_signed_tx']}",
+            f"Timestamp: {signer['timestamp']}",
+        ]
+
+    head(
+        ["Signer verified with public keys:"] + pubkeys_output + signer_info,
+        fill="-",
+    )
+
+
+def do_verify_attestation_batch(options):
+    head("### -> Verify UI and Signer attestations (batch)", fill="#")
+
+    if options.attestation_certificate_file_path is None:
+        raise AdminError("No attestation certificates directory or manifest given")
+
+    if options.pubkeys_file_path is None:
+        raise AdminError("No public keys file given")
+
+    root_authority = _load_root_authority(options.root_authority)
+    info(f"Using {root_authority} as root authority")
+
+    try:
+        pubkeys_map = load_pubkeys(options.pubkeys_file_path)
+        pubkeys_hash = compute_pubkeys_hash(pubkeys_map)
+    except Exception as e:
+        raise AdminError(str(e))
+
+    context = {
+        "root_authority": repr(root_authority),
+        "pubkeys_hash": pubkeys_hash.hex(),
+        "expected_ui_public_key": _get_expected_ui_public_key(pubkeys_map),
+    }
+
+    verify_attestation_batch(options, _make_batch_verifier, context)
+
+
+# Builds the function that verifies a single attestation certificate
+# within a batch. This runs once per batch worker, so that the root
+# authority is parsed only once and chain validation results are
+# shared among the worker's certificates.
+def _make_batch_verifier(context):
+    root_authority = HSMCertificateRoot(context["root_authority"])
+    pubkeys_hash = bytes.fromhex(context["pubkeys_hash"])
+    expected_ui_public_key = context["expected_ui_public_key"]
+    validity_cache = {}
+
+    def verify(att_cert):
+        result = att_cert.validate_and_get_values(root_authority, validity_cache)
+        return {
+            "ui": _verify_ui(result, expected_ui_public_key),
+            "signer": _verify_signer(result, pubkeys_hash),
+        }
+
+    return verify
+
+
+def _load_root_authority(root_authority_option):
+    root_authority = DEFAULT_ROOT_AUTHORITY
+    if root_authority_option is not None:
+        if not is_nonempty_hex_string(root_authority_option):
+            raise AdminError("Invalid root authority")
+        root_authority = root_authority_option
+    try:
+        return HSMCertificateRoot(root_authority)
+    except ValueError:
+        raise AdminError("Invalid root authority")
+
+
+def _get_expected_ui_public_key(pubkeys_map):
+    expected_ui_public_key = next(filter(
+        lambda pair: pair[0] == UI_DERIVATION_PATH, pubkeys_map.items()), (None, None))[1]
+    if expected_ui_public_key is None:
+        raise AdminError(
+            f"Public key with path {UI_DERIVATION_PATH} not present in public key file")
+    return expected_ui_public_key.serialize(compressed=True).hex()
+
+
+def _verify_ui(result, expected_ui_public_key):
     if "ui" not in result:
         raise AdminError("Certificate does not contain a UI attestation")
 
@@ -123,20 +220,17 @@ def do_verify_attestation(options):
         raise AdminError("Invalid UI attestation: unexpected public key reported. "
                          f"Expected {expected_ui_public_key} but got {ui_public_key}")
 
-    head(
-        [
-            "UI verified with:",
-            f"UD value: {ud_value}",
-            f"Derived public key ({UI_DERIVATION_PATH}): {ui_public_key}",
-            f"Authorized signer hash: {signer_hash}",
-            f"Authorized signer iteration: {signer_iteration}",
-            f"Installed UI hash: {ui_hash.hex()}",
-            f"Installed UI version: {ui_version.decode()}",
-        ],
-        fill="-",
-    )
+    return {
+        "ud_value": ud_value,
+        "public_key": ui_public_key,
+        "signer_hash": signer_hash,
+        "signer_iteration": signer_iteration,
+        "hash": ui_hash.hex(),
+        "version": ui_version.decode(),
+    }
 
-    # Signer
+
+def _verify_signer(result, pubkeys_hash):
     if "signer" not in result:
         raise AdminError("Certificate does not contain a Signer attestation")
 
@@ -179,23 +273,18 @@ def do_verify_attestation(options):
             f" but attestation reports {reported_pubkeys_hash.hex()}"
         )
 
-    signer_info = [
-        f"Hash: {pubkeys_hash.hex()}",
-        "",
-        f"Installed Signer hash: {signer_hash.hex()}",
-        f"Installed Signer version: {signer_version}",
-    ]
+    signer = {
+        "hash": signer_hash.hex(),
+        "version": signer_version,
+    }
 
     if powhsm_message is not None:
-        signer_info += [
-            f"Platform: {powhsm_message.platform}",
-            f"UD value: {powhsm_message.ud_value.hex()}",
-            f"Best block: {powhsm_message.best_block.hex()}",
-            f"Last transaction signed: {powhsm_message.last_signed_tx.hex()}",
-            f"Timestamp: {powhsm_message.timestamp}",
-        ]
+        signer.update({
+            "platform": powhsm_message.platform,
+            "ud_value": powhsm_message.ud_value.hex(),
+            "best_block": powhsm_message.best_block.hex(),
+            "last_signed_tx": powhsm_message.last_signed_tx.hex(),
+            "timestamp": powhsm_message.timestamp,
+        })
 
-    head(
-        ["Signer verified with public keys:"] + pubkeys_output + signer_info,
-        fill="-",
-    )
+    return signer
@@ -24,7 +24,8 @@ from .misc import info, head, AdminError
 from .attestation_utils import PowHsmAttestationMessage, load_pubkeys, \
                                compute_pubkeys_hash, compute_pubkeys_output, \
                                get_root_of_trust
-from .certificate import HSMCertificate
+from .certificate import HSMCertificate, HSMCertificateV2ElementX509
+from .attestation_batch import verify_attestation_batch
 
 
 # ###################################################################################
@@ -49,16 +50,7 @@ def do_verify_attestation(options):
         raise AdminError("No public keys file given")
 
     # Load root authority
-    root_authority = options.root_authority or DEFAULT_ROOT_AUTHORITY
-    info(f"Attempting to gather root authority from {root_authority}...")
-    try:
-        root_of_trust = get_root_of_trust(root_authority)
-        info("Attempting to validate self-signed root authority...")
-        if not root_of_trust.is_valid(root_of_trust):
-            raise ValueError("Failed to validate self-signed root of trust")
-    except Exception as e:
-        raise AdminError(f"Invalid root authority {root_authority}: {e}")
-    info(f"Using {root_authority} as root authority")
+    root_authority, root_of_trust = _load_root_of_trust(options.root_authority)
 
     # Load public keys, compute their hash and format them for output
     try:
@@ -79,6 +71,90 @@ def do_verify_attestation(options):
     result = att_cert.validate_and_get_values(root_of_trust)
 
     # powHSM specific validations
+    powhsm = _verify_powhsm(result, pubkeys_hash)
+
+    signer_info = [
+        f"Hash: {pubkeys_hash.hex()}",
+        "",
+        f"Installed powHSM MRENCLAVE: {powhsm['mrenclave']}",
+        f"Installed powHSM MRSIGNER: {powhsm['mrsigner']}",
+        f"Installed powHSM version: {powhsm['version']}",
+    ]
+
+    signer_info += [
+        f"Platform: {powhsm['platform']}",
+        f"UD value: {powhsm['ud_value']}",
+        f"Best block: {powhsm['best_block']}",
+        f"Last transaction signed: {powhsm['last_signed_tx']}",
+        f"Timestamp: {powhsm['timestamp']}",
+    ]
+
+    head(
+        ["powHSM verified with public keys:"] + pubkeys_output + signer_info,
+        fill="-",
+    )
+
+
+def do_verify_attestation_batch(options):
+    head("### -> Verify powHSM attestations (batch)", fill="#")
+
+    if options.attestation_certificate_file_path is None:
+        raise AdminError("No attestation certificates directory or manifest given")
+
+    if options.pubkeys_file_path is None:
+        raise AdminError("No public keys file given")
+
+    # The root authority is gathered and validated only once for the whole batch
+    root_authority, root_of_trust = _load_root_of_trust(options.root_authority)
+
+    try:
+        pubkeys_hash = compute_pubkeys_hash(load_pubkeys(options.pubkeys_file_path))
+    except Exception as e:
+        raise AdminError(str(e))
+
+    context = {
+        "root_authority": root_authority,
+        "root_of_trust": root_of_trust.to_dict(),
+        "pubkeys_hash": pubkeys_hash.hex(),
+    }
+
+    verify_attestation_batch(options, _make_batch_verifier, context)
+
+
+# Builds the function that verifies a single attestation certificate
+# within a batch. This runs once per batch worker, so that the (already
+# validated) root of trust is parsed only once and chain validation
+# results are shared among the worker's certificates.
+def _make_batch_verifier(context):
+    root_of_trust = HSMCertificateV2ElementX509(context["root_of_trust"])
+    pubkeys_hash = bytes.fromhex(context["pubkeys_hash"])
+    # Shared chain elements (e.g., the PCK certificate chain) are validated
+    # only once per worker
+    validity_cache = {}
+
+    def verify(att_cert):
+        return _verify_powhsm(
+            att_cert.validate_and_get_values(root_of_trust, validity_cache),
+            pubkeys_hash)
+
+    return verify
+
+
+def _load_root_of_trust(root_authority_option):
+    root_authority = root_authority_option or DEFAULT_ROOT_AUTHORITY
+    info(f"Attempting to gather root authority from {root_authority}...")
+    try:
+        root_of_trust = get_root_of_trust(root_authority)
+        info("Attempting to validate self-signed root authority...")
+        if not root_of_trust.is_valid(root_of_trust):
+            raise ValueError("Failed to validate self-signed root of trust")
+    except Exception as e:
+        raise AdminError(f"Invalid root authority {root_authority}: {e}")
+    info(f"Using {root_authority} as root authority")
+    return root_authority, root_of_trust
+
+
+def _verify_powhsm(result, pubkeys_hash):
     if "quote" not in result:
         raise AdminError("Certificate does not contain a powHSM attestation")
 
@@ -106,23 +182,13 @@ def do_verify_attestation(options):
             f" but attestation reports {reported_pubkeys_hash.hex()}"
         )
 
-    signer_info = [
-        f"Hash: {pubkeys_hash.hex()}",
-        "",
-        f"Installed powHSM MRENCLAVE: {sgx_quote.report_body.mrenclave.hex()}",
-        f"Installed powHSM MRSIGNER: {sgx_quote.report_body.mrsigner.hex()}",
-        f"Installed powHSM version: {powhsm_message.version}",
-    ]
-
-    signer_info += [
-        f"Platform: {powhsm_message.platform}",
-        f"UD value: {powhsm_message.ud_value.hex()}",
-        f"Best block: {powhsm_message.best_block.hex()}",
-        f"Last transaction signed: {powhsm_message.last_signed_tx.hex()}",
-        f"Timestamp: {powhsm_message.timestamp}",
-    ]
-
-    head(
-        ["powHSM verified with public keys:"] + pubkeys_output + signer_info,
-        fill="-",
-    )
+    return {
+        "mrenclave": sgx_quote.report_body.mrenclave.hex(),
+        "mrsigner": sgx_quote.report_body.mrsigner.hex(),
+        "version": powhsm_message.version,
+        "platform": powhsm_message.platform,
+        "ud_value": powhsm_message.ud_value.hex(),
+        "best_block": powhsm_message.best_block.hex(),
+        "last_signed_tx": powhsm_message.last_signed_tx.hex(),
+        "timestamp": powhsm_message.timestamp,
+    }
@@ -24,126 +24,232 @@ from argparse import ArgumentParser
 import socket
 import sys
 import json
-from math import ceil
+import time
+from comm.utils import iter_json_array
+from ledger.block_batch import BlockBatchReader, BlockBatchError, MAGIC as BATCH_MAGIC
 
 DEFAULT_HOST = "localhost"
 DEFAULT_PORT = 9999
 DEFAULT_VERBOSE = False
 CHUNK_PLACEHOLDER = "<CHUNK>"
+ENCODING = "utf-8"
 
-parser = ArgumentParser(description="Send a request to the powHSM manager")
-parser.add_argument(
-    "-a",
-    "--host",
-    dest="host",
-    help="destination host (default %s)" % DEFAULT_HOST,
-    type=str,
-    default=DEFAULT_HOST,
-)
-parser.add_argument(
-    "-p",
-    "--port",
-    dest="port",
-    help="destination port (default %d)" % DEFAULT_PORT,
-    type=int,
-    default=DEFAULT_PORT,
-)
-parser.add_argument(
-    "-v",
-    "--verbose",
-    dest="verbose",
-    help="print server address and sent data (default %s)" % DEFAULT_VERBOSE,
-    default=DEFAULT_VERBOSE,
-    action="store_const",
-    const=True,
-)
-parser.add_argument(
-    "-c",
-    "--command",
-    dest="command",
-    help="command blueprint to send. used to send data in chunks. use chunk placeholder "
-         "'%s'. when using this, the 'data' parameter is the path to a JSON file "
-         "containing the data to send."
-    % CHUNK_PLACEHOLDER,
-)
-parser.add_argument(
-    "-s",
-    "--chunksize",
-    dest="chunksize",
-    help="size of the chunks to send. must be used alongside '-c'",
-    type=int,
-)
-parser.add_argument(
-    "-o",
-    "--chunkoverlap",
-    dest="chunkoverlap",
-    help="send the last block of the previous chunk as the first block of the next one. "
-         "must be used alongside '-c'",
-    action="store_const",
-    const=True,
-)
-parser.add_argument("data", type=str, help="the data to send (only when not using '-c')")
-options = parser.parse_args()
-
-if options.command is not None:
-    if options.chunksize is None:
-        print("Must specify a chunk size with '-s' or '--chunksize'")
-        sys.exit(-1)
-
-    # Assuming the whole file fits in memory
+
+# Lazily yield the elements in the given data file, which can be either
+# a JSON file with a list of elements or a block batch file (see
+# ledger/block_batch.py), whose blocks are then yielded hex encoded
+def iter_data(path):
+    with open(path, "rb") as datafile:
+        is_batch = datafile.read(len(BATCH_MAGIC)) == BATCH_MAGIC
+
+    if is_batch:
+        with BlockBatchReader(path) as reader:
+            for index in range(len(reader)):
+                yield reader.header(index).hex()
+    else:
+        with open(path, "r") as datafile:
+            yield from iter_json_array(datafile)
+
+
+# Lazily build the commands to send for the given elements, chunk_size
+# elements at a time, yielding each along with the number of elements
+# it carries for the first time.
+# When overlapping, the last element of each chunk is also sent as
+# the first element of the next one
+def iter_chunks(elements, command, chunk_size, overlap):
+    chunk_data = []
+    carried = 0
+    for element in elements:
+        chunk_data.append(element)
+        if len(chunk_data) - carried == chunk_size:
+            yield (command.replace(CHUNK_PLACEHOLDER, json.dumps(chunk_data)),
+                   chunk_size)
+            chunk_data = [chunk_data[-1]] if overlap else []
+            carried = len(chunk_data)
+
+    if len(chunk_data) > carried:
+        yield (command.replace(CHUNK_PLACEHOLDER, json.dumps(chunk_data)),
+               len(chunk_data) - carried)
+
+
+def connect():
+    sock = socket.create_connection((options.host, options.port))
+    return (sock, sock.makefile("rb"))
+
+
+def disconnect(connection):
+    (sock, rfile) = connection
+    rfile.close()
+    sock.close()
+
+
+# Send a command and read its reply (a single line).
+# Returns None if the server closed the connection without replying
+def exchange(connection, command):
+    (sock, rfile) = connection
     try:
-        with open(options.data, "r") as datafile:
-            data = json.load(datafile)
-    except Exception as e:
-        print("Error loading data from JSON file '%s': %s" % (options.data, str(e)))
-        sys.exit(-2)
+        sock.sendall(bytes(command + "\n", ENCODING))
+        reply = rfile.readline()
+    except (BrokenPipeError, ConnectionResetError):
+        return None
 
-    # Validate data
-    if type(data) != list or len(data) == 0:
-        print("Invalid or empty data file '%s'" % options.data)
-        sys.exit(-2)
+    if reply == b"":
+        return None
+    if not reply.endswith(b"\n"):
+        raise ConnectionError("incomplete reply from server: %s" %
+                              str(reply, ENCODING))
+    return str(reply, ENCODING)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Send a request to the powHSM manager")
+    parser.add_argument(
+        "-a",
+        "--host",
+        dest="host",
+        help="destination host (default %s)" % DEFAULT_HOST,
+        type=str,
+        default=DEFAULT_HOST,
+    )
+    parser.add_argument(
+        "-p",
+        "--port",
+        dest="port",
+        help="destination port (default %d)" % DEFAULT_PORT,
+        type=int,
+        default=DEFAULT_PORT,
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        dest="verbose",
+        help="print server address and sent data (default %s)" % DEFAULT_VERBOSE,
+        default=DEFAULT_VERBOSE,
+        action="store_const",
+        const=True,
+    )
+    parser.add_argument(
+        "-c",
+        "--command",
+        dest="command",
+        help="command blueprint to send. used to send data in chunks. use chunk "
+             "placeholder '%s'. when using this, the 'data' parameter is the path to "
+             "a JSON file (or a block batch file) containing the data to send."
+        % CHUNK_PLACEHOLDER,
+    )
+    parser.add_argument(
+        "-s",
+        "--chunksize",
+        dest="chunksize",
+        help="size of the chunks to send. must be used alongside '-c'",
+        type=int,
+    )
+    parser.add_argument(
+        "-o",
+        "--chunkoverlap",
+        dest="chunkoverlap",
+        help="send the last block of the previous chunk as the first block of the "
+             "next one. must be used alongside '-c'",
+        action="store_const",
+        const=True,
+    )
+    parser.add_argument(
+        "-k",
+        "--keepalive",
+        dest="keepalive",
+        help="send all chunks through a single connection, if the server supports "
+             "it (otherwise, a connection per chunk is used)",
+        action="store_const",
+        const=True,
+    )
+    parser.add_argument("data", type=str,
+                        help="the data to send (only when not using '-c')")
+    options = parser.parse_args()
+
+    if options.command is not None:
+        if options.chunksize is None or options.chunksize < 1:
+            print("Must specify a (positive) chunk size with '-s' or '--chunksize'")
+            sys.exit(-1)
+
+        # Chunks are built as they're sent, reading the data file as needed
+        chunks = iter_chunks(iter_data(options.data), options.command, options.chunksize,
+                             options.chunkoverlap)
+        print("Chunk size: %d" % options.chunksize)
 
-    # Calculate chunks
-    chunks = []
-    for chunk_index in range(ceil(len(data)/options.chunksize)):
-        start_offset = -1 if options.chunkoverlap and chunk_index > 0 else 0
-        chunk_data = data[chunk_index*options.chunksize +
-                          start_offset:chunk_index*options.chunksize + options.chunksize]
-        chunks.append(options.command.replace(CHUNK_PLACEHOLDER, json.dumps(chunk_data)))
-    print("Data size: %d; total chunks: %d; chunk size: %d" %
-          (len(data), len(chunks), options.chunksize))
-
-else:
-    chunks = None
-    if len(options.data) < 1024:
-        try:
-            with open(options.data, "r") as datafile:
-                chunks = [datafile.read()]
-            print(f"Read command from {options.data} ({len(chunks[0])} bytes)")
-        except Exception:
-            pass
-
-    if chunks is None:
-        chunks = [options.data]
-
-if options.verbose:
-    print("Server:   %s:%s" % (options.host, options.port))
-
-total_chunks = len(chunks)
-for chunk_index, chunk in enumerate(chunks):
-    if options.verbose:
-        print("Sending chunk %d/%d:     %s" % (chunk_index + 1, total_chunks, chunk))
     else:
-        print("Sending chunk %d/%d..." % (chunk_index + 1, total_chunks))
+        chunks = None
+        if len(options.data) < 1024:
+            try:
+                with open(options.data, "r") as datafile:
+                    chunks = [(datafile.read(), 1)]
+                print(f"Read command from {options.data} ({len(chunks[0][0])} bytes)")
+            except Exception:
+                pass
 
-    # Connect to server and send chunk
-    # (protocol is in the HTTP/1.0 style - one command per connection,
-    # cannot reuse socket objects)
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-        sock.connect((options.host, options.port))
-        sock.sendall(bytes(chunk + "\n", "utf-8"))
+        if chunks is None:
+            chunks = [(options.data, 1)]
+
+    if options.verbose:
+        print("Server:   %s:%s" % (options.host, options.port))
+
+    connection = None
+    total_chunks = 0
+    total_elements = 0
+    total_bytes = 0
+    total_start = time.monotonic()
+    try:
+        for chunk_index, (chunk, elements) in enumerate(chunks):
+            if options.verbose:
+                print("Sending chunk %d:     %s" % (chunk_index + 1, chunk))
+            else:
+                print("Sending chunk %d..." % (chunk_index + 1))
 
-        # Receive data from the server
-        received = str(sock.recv(1024**2), "utf-8")
+            start = time.monotonic()
+            received = None
+            if connection is not None:
+                received = exchange(connection, chunk)
+                if received is None:
+                    # The server doesn't support more than one command per
+                    # connection (HTTP/1.0 style), so stop trying to reuse it
+                    disconnect(connection)
+                    connection = None
+                    options.keepalive = False
+                    print("Server closed the connection, using a connection per chunk")
+
+            if received is None:
+                connection = connect()
+                received = exchange(connection, chunk)
+                if received is None:
+                    raise ConnectionError("connection closed by server")
+                if not options.keepalive:
+                    disconnect(connection)
+                    connection = None
+            elapsed = time.monotonic() - start
+
+            print("Received: %s" % received.strip())
+            if options.command is not None:
+                print("Chunk %d: %d elements, %d bytes in %.3fs (%.1f elements/s)" %
+                      (chunk_index + 1, elements, len(chunk), elapsed,
+                       elements/max(elapsed, 1e-9)))
+
+            total_chunks += 1
+            total_elements += elements
+            total_bytes += len(chunk)
+    except (OSError, ValueError, BlockBatchError) as e:
+        print("Error sending chunk %d: %s" % (total_chunks + 1, str(e)))
+        sys.exit(-2)
+    finally:
+        if connection is not None:
+            disconnect(connection)
+
+    if options.command is not None and total_chunks == 0:
+        print("Invalid or empty data file '%s'" % options.data)
+        sys.exit(-2)
 
-    print("Received: %s" % received.strip())
+    if options.command is not None:
+        total_elapsed = time.monotonic() - total_start
+        print("Sent %d elements in %d chunks (%d bytes) in %.3fs "
+              "(%.1f elements/s, %.1f KiB/s)" %
+              (total_elements, total_chunks, total_bytes, total_elapsed,
+               total_elements/max(total_elapsed, 1e-9),
+               total_bytes/1024/max(total_elapsed, 1e-9)))
@@ -25,6 +25,32 @@ import struct
 import re
 
 
+# Accessor for a plain (integer or byte array) field.
+# This is a non-data descriptor, so that subclasses are
+# still able to override the parsed value with an instance attribute
+# (e.g., after converting it).
+class _CStructField:
+    def __init__(self, index):
+        self.index = index
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return instance._parsed[self.index]
+
+
+# Accessor for a nested struct field, which is parsed
+# upon first access directly from the underlying buffer
+class _CStructNestedField:
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return instance._nested_value(self.name)
+
+
 class CStruct:
     MAP = {
         "uint8_t": ["B", "s"],
@@ -35,13 +61,21 @@ class CStruct:
     SPEC = None
     TYPENAME = None
 
+    # Parses the docstring spec (once per class and endianness).
+    # The first time, this also installs an accessor for each field
+    # on the class.
+    # Nested structs are skipped (padded) in the struct format so that
+    # they are not copied when unpacking, and instead parsed lazily
+    # at their offset within the parsed value.
     @classmethod
     def _spec(cls, little=True):
-        if cls.SPEC is None or little not in cls.SPEC:
+        spec = cls.__dict__.get("SPEC")
+        if spec is None or little not in spec:
             fmt = "<" if little else ">"
             atrmap = {}
             names = []
             types = []
+            nested = {}
             index = 0
             typename = None
             for line in cls.__doc__.split("\n")[1:]:
@@ -73,23 +107,37 @@ class CStruct:
                     raise ValueError(f"Invalid type spec: {line}")
 
                 name = tspec[1].strip()
-
-                if isinstance(actual_type, list):
-                    actual_type = actual_type[0] if length == "" else actual_type[1]
-                elif not isinstance(actual_type, str) and \
-                        issubclass(actual_type, cls.__base__):
-                    actual_type = str(actual_type.get_bytelength(little)) + "s"
-
-                fmt += length + actual_type
+                if hasattr(CStruct, name):
+                    raise ValueError(f"Invalid field name: {name}")
+                # Accessors must not silently replace anything a subclass defines
+                for kls in cls.__mro__:
+                    attr = kls.__dict__.get(name)
+                    if attr is not None and \
+                       not isinstance(attr, (_CStructField, _CStructNestedField)):
+                        raise ValueError(f"Field name {name} collides with an "
+                                         f"attribute of {kls.__name__}")
+
+                if derived_type is not None:
+                    nested[name] = (struct.calcsize(fmt), derived_type)
+                    fmt += str(derived_type.get_bytelength(little)) + "x"
+                else:
+                    if isinstance(actual_type, list):
+                        actual_type = actual_type[0] if length == "" else actual_type[1]
+                    fmt += length + actual_type
+                    atrmap[name] = index
+                    index += 1
                 names.append(name)
                 types.append(derived_type)
-                atrmap[name] = index
-                index += 1
-            if cls.SPEC is None:
-                cls.SPEC = {}
-            cls.SPEC[little] = (struct.Struct(fmt), atrmap, names, types, typename)
 
-        return cls.SPEC[little]
+            if spec is None:
+                spec = {}
+                cls.SPEC = spec
+                for name in names:
+                    setattr(cls, name, _CStructNestedField(name) if name in nested
+                            else _CStructField(atrmap[name]))
+            spec[little] = (struct.Struct(fmt), atrmap, names, types, typename, nested)
+
+        return spec[little]
 
     @classmethod
     def _struct(cls, little=True):
@@ -107,9 +155,13 @@ class CStruct:
     def _types(cls, little=True):
         return cls._spec(little)[3]
 
+    @classmethod
+    def _nested(cls, little=True):
+        return cls._spec(little)[5]
+
     @classmethod
     def _typename(cls):
-        if cls.TYPENAME is None:
+        if cls.__dict__.get("TYPENAME") is None:
             for line in cls.__doc__.split("\n"):
                 line = re.sub(r"\s+", " ", line.strip())
                 if line == "":
@@ -123,24 +175,41 @@ class CStruct:
     def get_bytelength(cls, little=True):
         return cls._struct(little).size
 
+    # value: any bytes-like object. Immutable ones (e.g., bytes or
+    # memoryviews on bytes) are not copied, so memoryviews can be used to
+    # parse from larger buffers. Mutable ones are, since nested structs
+    # are parsed lazily from the very same buffer later on.
     def __init__(self, value, offset=0, little=True):
         self._offset = offset
         self._little = little
+        try:
+            if not memoryview(value).readonly:
+                value = bytes(value)
+        except TypeError as e:
+            raise ValueError(f"While parsing: {e}")
         self._raw_value = value
+        self._nested_values = {}
 
         try:
-            self._parsed = list(self._struct(little).unpack_from(value, offset))
+            self._parsed = self._struct(little).unpack_from(value, offset)
         except Exception as e:
             raise ValueError(f"While parsing: {e}")
 
-        for index, derived_type in enumerate(self._types(little)):
-            if derived_type is not None:
-                self._parsed[index] = derived_type(self._parsed[index], little=little)
+    def _nested_value(self, name):
+        value = self._nested_values.get(name)
+        if value is None:
+            field_offset, kls = self._nested(self._little)[name]
+            value = kls(self._raw_value, self._offset + field_offset,
+                        little=self._little)
+            self._nested_values[name] = value
+        return value
 
     def _value(self, name):
         amap = self._atrmap(self._little)
         if name in amap:
             return self._parsed[amap[name]]
+        if name in self._nested(self._little):
+            return self._nested_value(name)
         raise NameError(f"Property {name} does not exist")
 
     def __getattr__(self, name):
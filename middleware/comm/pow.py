@@ -131,20 +131,7 @@ def coinbase_tx_extract_merge_mining_hash(tx_hex):
 
 def coinbase_tx_get_hash(tx_hex):
     try:
-        tx = bytes.fromhex(tx_hex)
-        tx_midstate = (
-            bytes([0] * _MIDSTATE_PREFIX_SIZE)
-            + tx[:_MIDSTATE_SIZE_TRIMMED]
-            + bytes([0] * _MIDSTATE_SUFFIX_SIZE)
-        )
-        tx_tail = tx[_MIDSTATE_SIZE_TRIMMED:len(tx)]
-
-        hash_round1 = thirdparty.sha256.SHA256()
-        hash_round1.set_midstate(tx_midstate)
-        hash_round1.update(tx_tail)
-        hash_round1 = hash_round1.digest()
-
-        coinbase_tx_hash = bytes(reversed(hashlib.sha256(hash_round1).digest())).hex()
+        coinbase_tx_hash = _coinbase_tx_hash(bytes.fromhex(tx_hex)).hex()
 
         _logger.info("Coinbase TX hash: %s", coinbase_tx_hash)
 
@@ -155,6 +142,24 @@ def coinbase_tx_get_hash(tx_hex):
         raise ValueError(message)
 
 
+# Same as coinbase_tx_get_hash, but operating on a bytes-like object
+# (bytes, bytearray or memoryview) and returning the hash as bytes.
+# Errors are left for the caller to handle.
+def _coinbase_tx_hash(tx):
+    tx_midstate = (
+        bytes(_MIDSTATE_PREFIX_SIZE)
+        + tx[:_MIDSTATE_SIZE_TRIMMED]
+        + bytes(_MIDSTATE_SUFFIX_SIZE)
+    )
+
+    hash_round1 = thirdparty.sha256.SHA256()
+    hash_round1.set_midstate(tx_midstate)
+    hash_round1.update(tx[_MIDSTATE_SIZE_TRIMMED:])
+    hash_round1 = hash_round1.digest()
+
+    return hashlib.sha256(hash_round1).digest()[::-1]
+
+
 # Given a merkle proof in the format described in RSKIP92
 # (https://github.com/rsksmart/RSKIPs/blob/master/IPs/RSKIP92.md)
 # this function returns True iif the given merkle proof is a valid
@@ -178,21 +183,31 @@ def is_valid_merkle_proof(merkle_proof_hex, root_hex, coinbase_tx_hash_hex):
         _logger.info(message)
         return False
 
-    # Extract merkle proof hashes
-    hashes = []
-    for i in range(0, len(merkle_proof) // _SHA256_HASH_LENGTH):
-        start = i * _SHA256_HASH_LENGTH
-        hashes.append(merkle_proof[start:start + _SHA256_HASH_LENGTH])
+    # We should get to the root in case of a valid proof
+    return root == _merkle_proof_root(merkle_proof, coinbase_tx_hash)
 
-    # Reduce
-    current_left = coinbase_tx_hash
-    for right in hashes:
-        current_left = combine_left_right(current_left, right)
 
-    current_left = bytes(reversed(current_left))
+# Reduces the given merkle proof, starting from the given coinbase tx hash, and
+# returns the resulting merkle root. Both inputs are expected to be bytes-like
+# objects, and the merkle proof length is expected to be a multiple of the hash
+# length.
+# The result is equivalent to folding the proof with combine_left_right and
+# reversing the final value, but the whole reduction is done in internal
+# (i.e., reversed) byte order. That way the proof is reversed only once upfront
+# and each of its hashes is then hashed straight from a memoryview slice,
+# without building intermediate lists or copies.
+def _merkle_proof_root(merkle_proof, coinbase_tx_hash):
+    reversed_proof = memoryview(bytes(merkle_proof)[::-1])
 
-    # We should have gotten to the root in case of a valid proof
-    return root == current_left
+    current = bytes(coinbase_tx_hash)[::-1]
+    end = len(reversed_proof)
+    while end > 0:
+        hash_round1 = hashlib.sha256(current)
+        hash_round1.update(reversed_proof[end - _SHA256_HASH_LENGTH:end])
+        current = hashlib.sha256(hash_round1.digest()).digest()
+        end -= _SHA256_HASH_LENGTH
+
+    return current
 
 
 # Combines two hashes (representing nodes in a merkle tree) to produce a single hash
@@ -201,3 +216,109 @@ def combine_left_right(left, right):
     to_hash = bytes(reversed(left)) + bytes(reversed(right))
     double_hash = hashlib.sha256(hashlib.sha256(to_hash).digest()).digest()
     return bytes(reversed(double_hash))
+
+
+# *** Batch verification ***
+# The following functions verify merkle proofs and proof of work for a whole
+# batch of (merge mined) RSK block headers in a single call. They are meant to be
+# used as a cheap pre-check, so that an invalid batch can be rejected without
+# needing to talk to a device at all.
+# Unlike the single-value functions above, these accept every value either as a
+# hex string or as a bytes-like object (bytes, bytearray or memoryview), and never
+# raise on invalid input: an entry that can't be parsed is simply deemed invalid.
+_BTC_HEADER_SIZE = 80
+_BTC_HEADER_MERKLE_ROOT_OFFSET = 36
+
+
+def _as_buffer(value):
+    if type(value) == str:
+        return memoryview(bytes.fromhex(value))
+    return memoryview(value)
+
+
+# Given a raw BTC block header, compute its hash and return it as an integer
+# (that can be directly compared against a target)
+def btc_header_hash_as_int(raw_header):
+    header = _as_buffer(raw_header)
+    if len(header) != _BTC_HEADER_SIZE:
+        raise ValueError("Invalid BTC header length: expected %d bytes but got %d" %
+                         (_BTC_HEADER_SIZE, len(header)))
+    header_hash = hashlib.sha256(hashlib.sha256(header).digest()).digest()
+    return int.from_bytes(header_hash, byteorder="little", signed=False)
+
+
+# Given a raw BTC block header, extract its merkle root
+# (in the same byte order as comm.bitcoin.get_merkle_root)
+def btc_header_merkle_root(raw_header):
+    header = _as_buffer(raw_header)
+    if len(header) != _BTC_HEADER_SIZE:
+        raise ValueError("Invalid BTC header length: expected %d bytes but got %d" %
+                         (_BTC_HEADER_SIZE, len(header)))
+    return bytes(header[_BTC_HEADER_MERKLE_ROOT_OFFSET:
+                        _BTC_HEADER_MERKLE_ROOT_OFFSET + _SHA256_HASH_LENGTH])
+
+
+# Given a list of (merkle_proof, root, coinbase_tx_hash) tuples, return
+# a list of booleans indicating, for each of them, whether it is a valid
+# proof of the coinbase tx for the given root hash (see is_valid_merkle_proof).
+def are_valid_merkle_proofs(proofs):
+    result = []
+    for (merkle_proof, root, coinbase_tx_hash) in proofs:
+        try:
+            merkle_proof = _as_buffer(merkle_proof)
+            if len(merkle_proof) % _SHA256_HASH_LENGTH != 0:
+                result.append(False)
+                continue
+            result.append(_as_buffer(root) ==
+                          _merkle_proof_root(merkle_proof, _as_buffer(coinbase_tx_hash)))
+        except (ValueError, TypeError) as e:
+            _logger.info("Invalid merkle proof: %s", str(e))
+            result.append(False)
+    return result
+
+
+# Given a list of (btc_header, merkle_proof, coinbase_tx, difficulty) tuples,
+# each of them corresponding to the merge mining fields and difficulty of an RSK
+# block header, lazily yield whether:
+# - The BTC header hash meets the target for the given difficulty; and
+# - The merkle proof is a valid proof of the coinbase tx for the BTC header's
+#   merkle root
+# *** IMPORTANT ***: this doesn't check that the merge mining hash within the
+# coinbase tx matches the RSK block header (that requires decoding the header
+# itself).
+def _iter_pow_batch(entries):
+    for (index, (btc_header, merkle_proof, coinbase_tx, difficulty)) in \
+            enumerate(entries):
+        try:
+            if btc_header_hash_as_int(btc_header) > difficulty_to_target(difficulty):
+                _logger.info("Batch entry #%d: BTC header hash is higher than target",
+                             index)
+                yield False
+                continue
+
+            merkle_proof = _as_buffer(merkle_proof)
+            if len(merkle_proof) % _SHA256_HASH_LENGTH != 0 or \
+               btc_header_merkle_root(btc_header) != _merkle_proof_root(
+                   merkle_proof, _coinbase_tx_hash(_as_buffer(coinbase_tx))):
+                _logger.info("Batch entry #%d: invalid merkle proof", index)
+                yield False
+                continue
+
+            yield True
+        except (ValueError, TypeError) as e:
+            _logger.info("Batch entry #%d: PoW deemed invalid: %s", index, str(e))
+            yield False
+
+
+# Return a list of booleans indicating, for each of the given
+# (btc_header, merkle_proof, coinbase_tx, difficulty) tuples, whether
+# its proof of work is valid (see _iter_pow_batch for details)
+def validate_pow_batch(entries):
+    return list(_iter_pow_batch(entries))
+
+
+# Same as validate_pow_batch, but return a single boolean indicating whether
+# the proof of work for all of the given entries is valid. Stops at the
+# first invalid entry.
+def is_valid_pow_batch(entries):
+    return all(_iter_pow_batch(entries))
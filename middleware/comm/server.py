@@ -20,6 +20,7 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import os
 import socketserver
 import threading
 import socket
@@ -100,7 +101,7 @@ class _TCPServerRequestHandler(socketserver.StreamRequestHandler):
     def handle(self):
         try:
             handler = _RequestHandler(self.server.protocol, self.server.logger)
-            handler.handle(self.client_address[0], self.rfile, self.wfile)
+            handler.handle(self._client_address(), self.rfile, self.wfile)
         except RequestHandlerError as e:
             # Log the error and shutdown
             self.server.logger.critical("Error handling request: %s", format(e))
@@ -118,6 +119,12 @@ class _TCPServerRequestHandler(socketserver.StreamRequestHandler):
             # Any unknown exception should log as critical
             self.server.logger.critical("UNKNOWN error serving request: %s", format(e))
 
+    def _client_address(self):
+        # Unix domain socket clients are (usually) unnamed
+        if isinstance(self.client_address, (str, bytes)):
+            return self.client_address or "unix"
+        return self.client_address[0]
+
     def shutdown(self):
         def tgt():
             return self._do_shutdown()
@@ -133,10 +140,16 @@ class TCPServerError(RuntimeError):
 
 
 class TCPServer:
-    def __init__(self, host, port, protocol):
+    # on_ready: optional callable, invoked once the device is initialized
+    # and right before starting to serve requests
+    # unix_socket_path: if given, listen on a Unix domain socket at that
+    # path instead of on host and port
+    def __init__(self, host, port, protocol, on_ready=None, unix_socket_path=None):
         self.host = host
         self.port = port
         self.protocol = protocol
+        self.on_ready = on_ready
+        self.unix_socket_path = unix_socket_path
         self.logger = logging.getLogger(LOGGER_NAME)
         self.server = None
 
@@ -145,13 +158,15 @@ class TCPServer:
             self.logger.info("Initializing device")
             self.protocol.initialize_device()
             self.logger.info("Initializing server")
-            socketserver.TCPServer.allow_reuse_address = True
-            self.server = socketserver.TCPServer(
-                (self.host, self.port), _TCPServerRequestHandler
-            )
+            self.server = self._create_server()
             self.server.protocol = self.protocol
             self.server.logger = self.logger
-            self.logger.info("Listening on %s:%d" % (self.host, self.port))
+            if self.unix_socket_path is not None:
+                self.logger.info("Listening on %s" % self.unix_socket_path)
+            else:
+                self.logger.info("Listening on %s:%d" % (self.host, self.port))
+            if self.on_ready is not None:
+                self.on_ready()
             self.server.serve_forever()
         except socket.error as e:
             message = "Error running server: %s" % format(e)
@@ -173,3 +188,24 @@ class TCPServer:
             if self.server is not None:
                 self.logger.info("Terminating server")
                 self.server.server_close()
+                if self.unix_socket_path is not None:
+                    self._remove_socket_file()
+
+    def _create_server(self):
+        if self.unix_socket_path is None:
+            socketserver.TCPServer.allow_reuse_address = True
+            return socketserver.TCPServer(
+                (self.host, self.port), _TCPServerRequestHandler
+            )
+
+        # Remove any stale socket file from a previous run
+        self._remove_socket_file()
+        return socketserver.UnixStreamServer(
+            self.unix_socket_path, _TCPServerRequestHandler
+        )
+
+    def _remove_socket_file(self):
+        try:
+            os.unlink(self.unix_socket_path)
+        except FileNotFoundError:
+            pass
@@ -21,6 +21,7 @@
 # SOFTWARE.
 
 import re
+import json
 from Crypto.Hash import keccak
 
 
@@ -147,3 +148,66 @@ def slice_from_str(s):
 # One round Keccak-256
 def keccak_256(bs):
     return keccak.new(digest_bits=256).update(bs).digest()
+
+
+# Lazily parse the elements of the top level JSON array in the given
+# (text) file, without loading the whole file into memory
+def iter_json_array(datafile, read_size=64*1024):
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, position, eof
+        read = datafile.read(read_size)
+        eof = read == ""
+        buffer = buffer[position:] + read
+        position = 0
+
+    # Skip whitespace (reading more data as needed) and
+    # return the next character (None at the end of the data)
+    def peek():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if eof:
+                return None
+            fill()
+
+    if peek() != "[":
+        raise ValueError("data is not a JSON array")
+    position += 1
+    if peek() == "]":
+        return
+
+    while True:
+        # Decode the next element, reading more data until it's complete.
+        # An element is complete once followed by a separator: otherwise
+        # it could be a prefix of the actual element (e.g., of a number)
+        while True:
+            if peek() is None:
+                raise ValueError("unexpected end of data")
+            try:
+                (element, end) = decoder.raw_decode(buffer, position)
+                following = end
+                while following < len(buffer) and buffer[following].isspace():
+                    following += 1
+                if eof or (following < len(buffer) and buffer[following] in ",]"):
+                    break
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            fill()
+        position = end
+        yield element
+
+        separator = peek()
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError("invalid JSON array")
+        position += 1
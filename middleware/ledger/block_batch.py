@@ -0,0 +1,206 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 RSK Labs Ltd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import mmap
+import struct
+from collections import namedtuple
+from .block_utils import get_block_metadata
+
+# Block batch files hold a sequence of raw (binary RLP) block headers,
+# each along with its brothers, followed by an index that allows for
+# random access.
+#
+# All integers are big endian. Layout:
+#
+# Header:
+#   magic (4 bytes, "HSMB")
+#   version (1 byte)
+#   reserved (3 bytes)
+#   number of blocks (4 bytes)
+#   index offset within the file (8 bytes)
+# For each block:
+#   header length (4 bytes)
+#   header
+#   number of brothers (2 bytes)
+#   for each brother:
+#     brother length (4 bytes)
+#     brother
+# Index, for each block:
+#   offset of the block within the file (8 bytes)
+#   number of brothers (2 bytes)
+
+MAGIC = b"HSMB"
+VERSION = 2
+
+_HEADER = struct.Struct(">4sB3xIQ")
+_INDEX_ENTRY = struct.Struct(">QH")
+_LENGTH = struct.Struct(">I")
+_BROTHERS_COUNT = struct.Struct(">H")
+
+
+class BlockBatchError(RuntimeError):
+    pass
+
+
+# A block as read from a block batch: header and brothers as raw bytes
+BlockBatchEntry = namedtuple("BlockBatchEntry", ["header", "brothers"])
+
+
+def _as_bytes(block):
+    return bytes.fromhex(block) if type(block) == str else bytes(block)
+
+
+# Writes a block batch file block by block, so that arbitrarily long
+# block lists don't need to be held in memory
+class BlockBatchWriter:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(_HEADER.pack(MAGIC, VERSION, 0, 0))
+        self.index = bytearray()
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+
+    # Blocks (and brothers) can be given either as bytes or hex strings.
+    # Blocks are checked to be well formed block headers (see
+    # ledger.block_utils.get_block_metadata) so that broken batches
+    # are caught when writing them rather than when using them
+    def add(self, block, brothers=[]):
+        block = _as_bytes(block)
+        brothers = list(map(_as_bytes, brothers))
+
+        try:
+            get_block_metadata(block)
+        except ValueError as e:
+            raise BlockBatchError(f"Invalid block #{self.count}: {e}")
+
+        self.index += _INDEX_ENTRY.pack(self.file.tell(), len(brothers))
+        self.file.write(_LENGTH.pack(len(block)) + block)
+        self.file.write(_BROTHERS_COUNT.pack(len(brothers)))
+        for brother in brothers:
+            self.file.write(_LENGTH.pack(len(brother)) + brother)
+        self.count += 1
+
+    def close(self):
+        if self.file.closed:
+            return
+        index_offset = self.file.tell()
+        self.file.write(self.index)
+        self.file.seek(0)
+        self.file.write(_HEADER.pack(MAGIC, VERSION, self.count, index_offset))
+        self.file.close()
+
+
+# Write the given blocks (and, optionally, their brothers) to
+# a block batch file
+def write_block_batch(path, blocks, brothers=None):
+    with BlockBatchWriter(path) as writer:
+        if brothers is None:
+            for block in blocks:
+                writer.add(block)
+        else:
+            for (block, block_brothers) in zip(blocks, brothers, strict=True):
+                writer.add(block, block_brothers)
+
+
+# Memory-mapped, read-only access to a block batch file.
+# Supports both random access (by block index) and sequential iteration,
+# and only ever reads (pages in) the parts of the file that are used.
+class BlockBatchReader:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            try:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:
+                raise BlockBatchError(f"Invalid block batch file {path}: {e}")
+
+        try:
+            (magic, version, self.count, self.index_offset) = \
+                _HEADER.unpack_from(self.map, 0)
+        except struct.error:
+            self.close()
+            raise BlockBatchError(f"Invalid block batch file {path}: too short")
+
+        if magic != MAGIC or version != VERSION or \
+           self.index_offset + self.count*_INDEX_ENTRY.size != len(self.map):
+            self.close()
+            raise BlockBatchError(f"Invalid block batch file {path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.map.close()
+
+    def __len__(self):
+        return self.count
+
+    def _index_entry(self, index):
+        if index < 0:
+            index += self.count
+        if index < 0 or index >= self.count:
+            raise IndexError("Block batch index out of range")
+        return _INDEX_ENTRY.unpack_from(self.map,
+                                        self.index_offset + index*_INDEX_ENTRY.size)
+
+    def _read_item(self, offset):
+        (length,) = _LENGTH.unpack_from(self.map, offset)
+        offset += _LENGTH.size
+        return (self.map[offset:offset + length], offset + length)
+
+    def __getitem__(self, index):
+        (offset, _) = self._index_entry(index)
+
+        (header, offset) = self._read_item(offset)
+        (brothers_count,) = _BROTHERS_COUNT.unpack_from(self.map, offset)
+        offset += _BROTHERS_COUNT.size
+        brothers = []
+        for _ in range(brothers_count):
+            (brother, offset) = self._read_item(offset)
+            brothers.append(brother)
+
+        return BlockBatchEntry(header, brothers)
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+
+    # Just the block header at the given index (no brothers)
+    def header(self, index):
+        return self._read_item(self._index_entry(index)[0])[0]
+
+    # Number of brothers of the block at the given index, without
+    # touching the block data itself
+    def brothers_count(self, index):
+        return self._index_entry(index)[1]
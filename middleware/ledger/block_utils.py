@@ -21,7 +21,9 @@
 # SOFTWARE.
 
 import rlp
+from collections import namedtuple
 from comm.utils import keccak_256
+from comm.pow import coinbase_tx_get_hash
 
 
 # Compute the given block's top-level RLP encoding list payload length in bytes,
@@ -114,3 +116,77 @@ def rlp_first_element_list_payload_length(bs):
     else:
         raise ValueError("Invalid RLP encoded list - got %s as first byte" % hex(b))
     return L
+
+
+# Length in bytes of the RLP encoding of the given (decoded) item,
+# without actually encoding it when it is a byte string
+def rlp_encoded_length(item):
+    if type(item) != bytes:
+        return len(rlp.encode(item))
+    if len(item) == 1 and item[0] < 0x80:
+        return 1
+    if len(item) <= 55:
+        return 1 + len(item)
+    return 1 + (len(item).bit_length() + 7)//8 + len(item)
+
+
+# RLP prefix of a list with a payload of the given length in bytes
+def rlp_list_prefix(payload_length):
+    if payload_length <= 55:
+        return bytes([0xC0 + payload_length])
+    length_bytes = payload_length.to_bytes((payload_length.bit_length() + 7)//8,
+                                           byteorder="big", signed=False)
+    return bytes([0xF7 + len(length_bytes)]) + length_bytes
+
+
+# Offset of the payload within the given RLP encoded list
+def rlp_list_payload_offset(bs):
+    return 1 if bs[0] <= 0xF7 else 1 + bs[0] - 0xF7
+
+
+# Metadata of a block (see get_block_metadata)
+BlockMetadata = namedtuple("BlockMetadata", [
+    "size", "number", "difficulty", "hash", "mm_payload_size", "coinbase_tx_hash"
+])
+
+
+# Given a raw block (bytes), gather in a single pass everything the firmware
+# needs to process it (and that the functions above compute separately):
+# its size, number, difficulty, hash (as per get_block_hash), merge mining
+# RLP payload size (as per rlp_mm_payload_size) and coinbase transaction hash
+# (as per comm.pow.coinbase_tx_get_hash, None if the block has no merge mining
+# fields). Hashes are returned as hex strings.
+# Since a (successfully) decoded block is a valid RLP encoding of its fields,
+# the encoding of any prefix of its fields is sliced from the block's payload
+# instead of re-encoding them.
+def get_block_metadata(raw_block):
+    try:
+        block = rlp.decode(raw_block)
+    except Exception as e:
+        raise ValueError(e)
+    num_fields = len(block)
+    if type(block) != list or num_fields not in [17, 18, 19, 20]:
+        raise ValueError(
+            "Block header must have 17, 18, 19 or 20 elements, got %d" % num_fields
+        )
+
+    payload = memoryview(raw_block)[rlp_list_payload_offset(raw_block):]
+    if num_fields in [19, 20]:
+        hash_payload_size = len(payload) - \
+            rlp_encoded_length(block[-1]) - rlp_encoded_length(block[-2])
+        mm_payload_size = hash_payload_size - rlp_encoded_length(block[-3])
+        coinbase_tx_hash = coinbase_tx_get_hash(block[-1].hex())
+    else:
+        hash_payload_size = len(payload)
+        mm_payload_size = hash_payload_size - rlp_encoded_length(block[-1])
+        coinbase_tx_hash = None
+
+    return BlockMetadata(
+        size=len(raw_block),
+        number=int.from_bytes(block[8], byteorder="big", signed=False),
+        difficulty=int.from_bytes(block[7], byteorder="big", signed=False),
+        hash=keccak_256(rlp_list_prefix(hash_payload_size) +
+                        payload[:hash_payload_size]).hex(),
+        mm_payload_size=mm_payload_size,
+        coinbase_tx_hash=coinbase_tx_hash,
+    )
@@ -0,0 +1,258 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 RSK Labs Ltd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from comm.pow import coinbase_tx_extract_merge_mining_hash, validate_pow_batch
+from .rsk_block import RskBlockHeader
+from .rsk_netparams import NetworkParameters
+from .hsm2dongle import HSM2Dongle
+
+# Maximum number of brothers per block accepted by the device
+_MAX_BROTHERS = 10
+
+# Maximum block difficulty size accepted by the device
+_MAX_DIFFICULTY_BITS = 256
+
+_Response = HSM2Dongle.RESPONSE.ADVANCE
+
+
+# Decode a single raw block header (hex string) that *must* include
+# merge mining fields (see ledger.rsk_block.RskBlockHeader) and check
+# that its merge mining hash matches the one within the coinbase transaction.
+# Return a tuple (header, decode_error, pow_error), where each error is either
+# None or a tuple (advance blockchain response, message). Decoding errors
+# are always detected by the device, whereas PoW errors are not detected for
+# blocks it already knows to be valid.
+def _decode_header(raw_block_hex, network_parameters):
+    try:
+        header = RskBlockHeader(raw_block_hex, network_parameters)
+    except Exception as e:
+        return (None, (_Response.ERROR_INVALID_BLOCK, str(e)), None)
+
+    # As the device does (see bc_advance.c), reject difficulties that don't
+    # fit in 256 bits when parsing, and zero difficulties when checking the
+    # merge mining header against the difficulty (i.e., along with PoW)
+    if header.difficulty.bit_length() > _MAX_DIFFICULTY_BITS:
+        return (None, (_Response.ERROR_INVALID_BLOCK,
+                       "Block difficulty too big"), None)
+
+    if header.difficulty == 0:
+        return (header, None, (_Response.ERROR_INVALID_BLOCK,
+                               "Invalid block difficulty"))
+
+    try:
+        mm_hash = coinbase_tx_extract_merge_mining_hash(header.mm_coinbasetx)
+    except ValueError as e:
+        return (header, None, (_Response.ERROR_POW_INVALID, str(e)))
+
+    if not header.hash_for_merge_mining_matches(mm_hash):
+        return (header, None, (_Response.ERROR_POW_INVALID,
+                               "Merge mining hash mismatch"))
+
+    return (header, None, None)
+
+
+# Decode and validate (including PoW) a list of raw block headers
+# for the given network (by name).
+# Return a list of (hash, parent_hash, difficulty, decode_error, pow_error)
+# tuples, one per header (see _decode_header).
+# Module level so that it can be run in a worker process.
+def _validate_headers(raw_block_hexes, network):
+    network_parameters = NetworkParameters.by_name(network)
+    decoded = list(map(lambda raw: _decode_header(raw, network_parameters),
+                       raw_block_hexes))
+    pow_results = iter(validate_pow_batch(
+        [(header.mm_header, header.mm_merkleproof, header.mm_coinbasetx,
+          header.difficulty)
+         for (header, decode_error, pow_error) in decoded
+         if decode_error is None and pow_error is None]))
+
+    result = []
+    for (header, decode_error, pow_error) in decoded:
+        if decode_error is not None:
+            result.append((None, None, None, decode_error, None))
+            continue
+
+        if pow_error is None and not next(pow_results):
+            pow_error = (_Response.ERROR_POW_INVALID, "Invalid proof of work")
+        result.append((header.hash, header.parent_hash, header.difficulty,
+                       None, pow_error))
+    return result
+
+
+# Validates advance blockchain batches (blocks and brothers) on the
+# middleware side, before sending them to the device. This checks:
+# - That each header is well formed for its network upgrade and includes
+#   merge mining fields (see ledger.rsk_block.RskBlockHeader)
+# - That each header's merge mining hash (in the coinbase tx) matches
+# - Each header's merkle proof and difficulty
+# - Parent hash chaining between blocks (and with the blockchain
+#   advance in progress, if any)
+# - That brothers are actual brothers of their block, distinct from it
+#   and each other (i.e., strictly ascending by hash, which is the
+#   order in which HSM2Dongle.advance_blockchain sends them)
+# Validation follows the device's processing of the batch given its current
+# blockchain state, so that only those headers the device would actually
+# process are validated. That is, it stops at the block that chains to the
+# current best block, it skips PoW validation from the newest valid block
+# onwards, and it only validates a block's brothers when the device would
+# certainly ask for them (i.e., while the total difficulty accumulated can't
+# possibly have reached the minimum required difficulty).
+# Header validation can be optionally distributed among worker processes.
+class AdvanceBlockchainValidator:
+    def __init__(self, workers=1):
+        self.logger = logging.getLogger("blockvalidator")
+        self.workers = max(1, workers)
+        self._executor = None
+
+    # Validate the given blocks and brothers (as given to
+    # HSM2Dongle.advance_blockchain) against the device with the given
+    # signer parameters (see ledger.parameters.HSM2FirmwareParameters)
+    # and current blockchain state (see HSM2Dongle.get_blockchain_state).
+    # Return a tuple (success, response), response being an
+    # advance blockchain response (HSM2Dongle.RESPONSE.ADVANCE) if
+    # validation fails, and None otherwise.
+    def validate(self, blocks, brothers, signer_parameters, state):
+        if len(brothers) != len(blocks):
+            self.logger.info("Blocks and brothers lists differ in length")
+            return (False, _Response.ERROR_INVALID_BROTHERS)
+
+        # Decode and validate every header (blocks and brothers) on its own
+        headers = list(blocks) + [bro for bro_list in brothers for bro in bro_list]
+        results = self._validate_headers(headers,
+                                         signer_parameters.network.name.lower())
+
+        # Go through the results in the same order the device would process
+        # the headers, so that the first error found is also the one
+        # the device would report
+        in_progress = state["updating.in_progress"]
+        already_validated = in_progress and state["updating.already_validated"]
+        # Upper bound for the difficulty the device will have accumulated
+        # (it caps every block's difficulty before accumulating it)
+        max_total_difficulty = \
+            state["updating.total_difficulty"] if in_progress else 0
+        brothers_requested = not (in_progress and
+                                  state["updating.found_best_block"])
+        block_results = results[:len(blocks)]
+        brother_results = results[len(blocks):]
+        brothers_offset = 0
+        for (index, result) in enumerate(block_results):
+            (block_hash, parent_hash, difficulty, decode_error, pow_error) = result
+            if decode_error is not None:
+                self.logger.info("Block #%d invalid: %s", index, decode_error[1])
+                return (False, decode_error[0])
+
+            # Chaining (newest to oldest)
+            if index == 0 and in_progress and \
+               block_hash != state["updating.next_expected_block"]:
+                self.logger.info("Block #0 is not the next expected block")
+                return (False, _Response.ERROR_CHAINING_MISMATCH)
+            if index > 0 and block_results[index-1][1] != block_hash:
+                self.logger.info("Block #%d parent hash mismatch", index-1)
+                return (False, _Response.ERROR_CHAINING_MISMATCH)
+
+            if block_hash == state["newest_valid_block"]:
+                already_validated = True
+            if pow_error is not None and not already_validated:
+                self.logger.info("Block #%d invalid: %s", index, pow_error[1])
+                return (False, pow_error[0])
+
+            max_total_difficulty += difficulty
+            brothers_requested = brothers_requested and \
+                max_total_difficulty < signer_parameters.min_required_difficulty
+
+            block_brother_results = brother_results[
+                brothers_offset:brothers_offset + len(brothers[index])]
+            brothers_offset += len(brothers[index])
+            if brothers_requested:
+                (valid, response, brothers_difficulty) = self._validate_brothers(
+                    index, block_hash, parent_hash, block_brother_results)
+                if not valid:
+                    return (False, response)
+                max_total_difficulty += brothers_difficulty
+
+            # The device is done once it reaches its current best block
+            if parent_hash == state["best_block"]:
+                break
+
+        return (True, None)
+
+    # Validate the given block's brothers, in the order the device
+    # would receive them.
+    # Return a tuple (success, response, total brothers difficulty)
+    def _validate_brothers(self, index, block_hash, parent_hash, brother_results):
+        if len(brother_results) > _MAX_BROTHERS:
+            self.logger.info("Too many brothers (%d) for block #%d",
+                             len(brother_results), index)
+            return (False, _Response.ERROR_INVALID_BROTHERS, None)
+
+        for (brother_index, result) in enumerate(brother_results):
+            if result[3] is not None:
+                self.logger.info("Brother #%d of block #%d invalid: %s",
+                                 brother_index, index, result[3][1])
+                return (False, result[3][0], None)
+
+        # Hashes are same length lowercase hex strings, so sorting them
+        # sorts the underlying bytes
+        brother_results = sorted(brother_results, key=lambda result: result[0])
+        previous_brother_hash = None
+        for (brother_index, result) in enumerate(brother_results):
+            (brother_hash, brother_parent_hash, _, _, pow_error) = result
+            if brother_parent_hash != parent_hash or \
+               brother_hash == block_hash or \
+               (previous_brother_hash is not None and
+                    brother_hash <= previous_brother_hash):
+                self.logger.info("Brother #%d of block #%d is not a valid brother",
+                                 brother_index, index)
+                return (False, _Response.ERROR_INVALID_BROTHERS, None)
+            previous_brother_hash = brother_hash
+
+            if pow_error is not None:
+                self.logger.info("Brother #%d of block #%d invalid: %s",
+                                 brother_index, index, pow_error[1])
+                return (False, pow_error[0], None)
+
+        return (True, None, sum(map(lambda result: result[2], brother_results)))
+
+    def _validate_headers(self, headers, network):
+        if self.workers == 1 or len(headers) < 2*self.workers:
+            return _validate_headers(headers, network)
+
+        # Worker processes are spawned rather than forked, since the
+        # manager runs other threads (e.g., the connection watchdog)
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"))
+
+        chunk_size = -(-len(headers) // self.workers)
+        chunks = [headers[i:i+chunk_size] for i in range(0, len(headers), chunk_size)]
+        return [result for chunk_result in
+                self._executor.map(_validate_headers, chunks, [network]*len(chunks))
+                for result in chunk_result]
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
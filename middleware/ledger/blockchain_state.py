@@ -0,0 +1,75 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 RSK Labs Ltd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from comm.cstruct import CStruct
+
+
+# Full blockchain state as dumped by a powHSM
+# (see bc_state_dump_t in the firmware). Field names match
+# the blockchain state keys, with dots replaced by underscores.
+# Difficulty is an unsigned big endian integer.
+class HSM2DongleBlockchainState(CStruct):
+    """
+    bc_state_dump_t
+
+    uint8_t best_block 32
+    uint8_t newest_valid_block 32
+    uint8_t ancestor_block 32
+    uint8_t ancestor_receipts_root 32
+    uint8_t updating_best_block 32
+    uint8_t updating_newest_valid_block 32
+    uint8_t updating_next_expected_block 32
+    uint8_t updating_in_progress
+    uint8_t updating_already_validated
+    uint8_t updating_found_best_block
+    uint8_t updating_total_difficulty 36
+    """
+
+    HASH_KEYS = [
+        "best_block",
+        "newest_valid_block",
+        "ancestor_block",
+        "ancestor_receipts_root",
+        "updating.best_block",
+        "updating.newest_valid_block",
+        "updating.next_expected_block",
+    ]
+
+    FLAG_KEYS = [
+        "updating.in_progress",
+        "updating.already_validated",
+        "updating.found_best_block",
+    ]
+
+    def to_state(self):
+        state = {}
+        for key in self.HASH_KEYS:
+            state[key] = self._field(key).hex()
+        state["updating.total_difficulty"] = int.from_bytes(
+            self._field("updating.total_difficulty"), byteorder="big", signed=False
+        )
+        for key in self.FLAG_KEYS:
+            state[key] = bool(self._field(key))
+        return state
+
+    def _field(self, key):
+        return getattr(self, key.replace(".", "_"))
@@ -28,6 +28,7 @@ import hid
 from .signature import HSM2DongleSignature
 from .version import HSM2FirmwareVersion
 from .parameters import HSM2FirmwareParameters
+from .blockchain_state import HSM2DongleBlockchainState
 from .hsm2dongle_cmds import HSM2SignerHeartbeat, HSM2UIHeartbeat, PowHsmAttestation
 from .block_utils import (
     rlp_mm_payload_size,
@@ -81,6 +82,7 @@ class _GetStateOps(IntEnum):
     HASH = 0x01
     DIFF = 0x02
     FLAGS = 0x03
+    ALL = 0x04
 
 
 # Reset advance blockchain command OPs
@@ -399,12 +401,22 @@ class HSM2Dongle:
     # Dongle exchange timeout
     DONGLE_TIMEOUT = 10  # seconds
 
+    # Maximum number of commands in flight at once when sending
+    # a batch of commands (see _send_commands)
+    PIPELINE_DEPTH = 1
+
     # Maximum pages expected to conform the UI attestation message
     MAX_PAGES_UI_ATT_MESSAGE = 4
 
     # Size of the iteration parameter for the signer authorization
     SIGNER_AUTH_ITERATION_SIZE = 2
 
+    # First firmware version able to dump the whole blockchain state at once
+    BULK_STATE_VERSION = HSM2FirmwareVersion(5, 5, 2)
+
+    # Size of the offset parameter for the bulk blockchain state dump
+    BULK_STATE_OFFSET_SIZE = 2
+
     # Shorthand for externally defined commands
     ErrorResult = HSM2DongleErrorResult
 
@@ -412,6 +424,7 @@ class HSM2Dongle:
         self.logger = logging.getLogger("dongle")
         self.debug = debug
         self.last_comm_exception = None
+        self.version = None
 
     # Send command to device
     def _send_command(self, command, data=b"", timeout=DONGLE_TIMEOUT):
@@ -458,10 +471,37 @@ class HSM2Dongle:
     def send_command(self, cmd, op, data, timeout=DONGLE_TIMEOUT):
         return self._send_command(cmd, bytes([op]) + data, timeout)
 
+    # Send a batch of commands to the device, returning a list with,
+    # for each of them, either its response or the HSM2DongleErrorResult
+    # it yielded. Any other error is raised.
+    # Transports that can pipeline exchanges override this so that
+    # the whole batch pays for a single roundtrip
+    def _send_commands(self, command, datas, timeout=DONGLE_TIMEOUT):
+        results = []
+        for data in datas:
+            try:
+                results.append(self._send_command(command, data, timeout))
+            except HSM2DongleErrorResult as e:
+                results.append(e)
+        return results
+
+    # Batch send command version to be used by command classes
+    # (requests are (op, data) pairs)
+    def send_commands(self, cmd, requests, timeout=DONGLE_TIMEOUT):
+        return self._send_commands(cmd, [bytes([op]) + data for (op, data) in requests],
+                                   timeout)
+
+    # Cheap check (i.e., without exchanging commands) of whether the
+    # connection to the dongle is alive. Transports that can't tell
+    # assume it is
+    def is_connection_alive(self):
+        return True
+
     # Connect to the dongle
     def connect(self):
         try:
             self.logger.info("Connecting")
+            self.version = None
             self.dongle = getDongle(self.debug)
             self.logger.info("Connected")
         except CommException as e:
@@ -574,9 +614,12 @@ class HSM2Dongle:
     # returns an instance of HSM2FirmwareVersion representing
     # the version of the currently running firmware on the HSM2
     # that is connected (i.e., could be either the signer or ui)
+    # The last known version is kept so that newer protocol
+    # features can be used when available
     def get_version(self):
         apdu_rcv = self._send_command(self.CMD.IS_ONBOARD)
-        return HSM2FirmwareVersion(apdu_rcv[2], apdu_rcv[3], apdu_rcv[4])
+        self.version = HSM2FirmwareVersion(apdu_rcv[2], apdu_rcv[3], apdu_rcv[4])
+        return self.version
 
     # returns the number of pin retries available
     def get_retries(self):
@@ -827,7 +870,7 @@ class HSM2Dongle:
         # If we get here, we should have a signature in the data part.
         # Return success along with it.
         try:
-            return (True, HSM2DongleSignature(response[1][self.OFF.DATA:]))
+            return (True, HSM2DongleSignature(response[1], self.OFF.DATA))
         except Exception as e:
             self.logger.error("Error parsing signature: %s", str(e))
             return (False, self.RESPONSE.SIGN.ERROR_UNEXPECTED)
@@ -884,12 +927,15 @@ class HSM2Dongle:
         # If we get here, we should have a signature in the data part.
         # Return success along with it.
         try:
-            return (True, HSM2DongleSignature(response[self.OFF.DATA:]))
+            return (True, HSM2DongleSignature(response, self.OFF.DATA))
         except Exception as e:
             self.logger.error("Error parsing signature: %s", str(e))
             return (False, self.RESPONSE.SIGN.ERROR_UNEXPECTED)
 
     def get_blockchain_state(self):
+        if self.version is not None and self.version >= self.BULK_STATE_VERSION:
+            return self._get_blockchain_state_bulk()
+
         state = {}
 
         # Get hashes
@@ -943,6 +989,36 @@ class HSM2Dongle:
 
         return state
 
+    # Get the whole blockchain state in as many pieces
+    # as the device needs to send it
+    def _get_blockchain_state_bulk(self):
+        self.logger.info("Getting blockchain state")
+        state_size = HSM2DongleBlockchainState.get_bytelength()
+        data = bytearray()
+        while len(data) < state_size:
+            result = self._send_command(
+                self.CMD.GET_STATE,
+                bytes([self.OP.GST.ALL]) +
+                len(data).to_bytes(self.BULK_STATE_OFFSET_SIZE,
+                                   byteorder="big", signed=False)
+            )
+
+            if result[self.OFF.OP] != self.OP.GST.ALL or \
+               len(result) == self.OFF.DATA:
+                msg = "Invalid response for blockchain state: %s" % result.hex()
+                self.logger.error(msg)
+                raise HSM2DongleError(msg)
+
+            data += result[self.OFF.DATA:]
+
+        if len(data) != state_size:
+            msg = "Expected %d blockchain state bytes but got %d" % \
+                (state_size, len(data))
+            self.logger.error(msg)
+            raise HSM2DongleError(msg)
+
+        return HSM2DongleBlockchainState(bytes(data)).to_state()
+
     def reset_advance_blockchain(self):
         self.logger.info("Resetting advance blockchain")
         result = self._send_command(self.CMD.RESET_AB, bytes([self.OP.RAV.INIT]))
@@ -1071,7 +1147,7 @@ class HSM2Dongle:
 
         # Retrieve message
         page = 0
-        message = b""
+        message = bytearray()
         while True:
             if page == self.MAX_PAGES_UI_ATT_MESSAGE:
                 msg = (
@@ -1096,8 +1172,8 @@ class HSM2Dongle:
             "signature": attestation.hex(),
         }
 
-    def get_powhsm_attestation(self, ud_value_hex):
-        return PowHsmAttestation(self).run(ud_value_hex)
+    def get_powhsm_attestation(self, ud_value_hex, on_page=None):
+        return PowHsmAttestation(self).run(ud_value_hex, on_page)
 
     def get_signer_heartbeat(self, ud_value):
         return HSM2SignerHeartbeat(self).run(ud_value)
@@ -40,3 +40,10 @@ class HSM2DongleCommand:
             timeout = self.dongle.DONGLE_TIMEOUT
 
         return self.dongle.send_command(self.Command, op, data, timeout)
+
+    def send_many(self, requests, timeout=None):
+        # Default timeout
+        if timeout is None:
+            timeout = self.dongle.DONGLE_TIMEOUT
+
+        return self.dongle.send_commands(self.Command, requests, timeout)
@@ -39,43 +39,71 @@ LEGACY_HEADER = b"HSM:SIGNER:"
 class PowHsmAttestation(HSM2DongleCommand):
     Command = 0x50
 
-    def run(self, ud_value_hex):
+    # Maximum number of pages a message or envelope can span
+    # (page indexes are a single byte)
+    MAX_PAGES = 256
+
+    # If given, on_page(name, page) is called with a view of each
+    # message and envelope page as it is received
+    def run(self, ud_value_hex, on_page=None):
         # Retrieve attestation signature
         signature = self.send(Op.OP_GET,
                               bytes.fromhex(ud_value_hex))[self.Offset.DATA:]
 
         # Retrieve message and envelope
-        bufs = {}
-        brk = False
-        msgoffset = 1  # For legacy behavior handling
-        for (op, name) in \
-                [(Op.OP_GET_MESSAGE, "message"), (Op.OP_GET_ENVELOPE, "envelope")]:
-            # Legacy behavior handling
-            if brk:
-                bufs["envelope"] = bufs["message"]
-                break
-            bufs[name] = b''
-            more = True
-            page = 0
-            while more:
-                result = self.send(op, bytes([page]))
-                more = result[self.Offset.DATA] == 1
-                # Legacy behavior handling
-                if name == "message" and \
-                   result[self.Offset.DATA:self.Offset.DATA+len(LEGACY_HEADER)] == \
-                   LEGACY_HEADER:
-                    msgoffset = 0
-                    more = False
-                    brk = True
-                bufs[name] += result[self.Offset.DATA+msgoffset:]
-                page += 1
+        message, envelope = self._get_pages(on_page)
 
         # Get signer hash
         signer_hash = self.send(Op.OP_APP_HASH)[self.Offset.DATA:]
 
         return {
             "app_hash": signer_hash.hex(),
-            "envelope": bufs["envelope"].hex(),
-            "message": bufs["message"].hex(),
+            "envelope": envelope.hex(),
+            "message": message.hex(),
             "signature": signature.hex(),
         }
+
+    # Gather all the message and envelope pages.
+    # A page is only ever requested once it is known to exist, since
+    # requesting a page past the last one makes the device reset its
+    # whole state (attestation included): the first page of each exists,
+    # and each page tells whether there is a next one. Message and envelope
+    # are independent, so their next pages are requested together (up to
+    # as many as the dongle can pipeline). The first message page goes on
+    # its own though, since it tells whether the device exhibits legacy
+    # behavior (single unpaged message, which is also the envelope).
+    # Returns the gathered message and envelope buffers.
+    def _get_pages(self, on_page):
+        ops = {"message": Op.OP_GET_MESSAGE, "envelope": Op.OP_GET_ENVELOPE}
+        bufs = {"message": bytearray(), "envelope": bytearray()}
+        depth = max(1, self.dongle.PIPELINE_DEPTH)
+        # Next page to request for each of message and envelope, in order
+        pending = [("message", 0)]
+        while len(pending) > 0:
+            batch, pending = pending[:depth], pending[depth:]
+            results = self.send_many([(ops[name], bytes([page]))
+                                      for (name, page) in batch])
+            for ((name, page), result) in zip(batch, results):
+                if isinstance(result, Exception):
+                    raise result
+
+                data = memoryview(result)[self.Offset.DATA:]
+                # Legacy behavior handling
+                if name == "message" and page == 0 and \
+                   data[:len(LEGACY_HEADER)] == LEGACY_HEADER:
+                    bufs["message"] += data
+                    if on_page is not None:
+                        on_page(name, data)
+                    return bufs["message"], bufs["message"]
+
+                chunk = data[1:]
+                bufs[name] += chunk
+                if on_page is not None:
+                    on_page(name, chunk)
+
+                if data[0] == 1 and page + 1 < self.MAX_PAGES:
+                    pending.append((name, page + 1))
+                if name == "message" and page == 0:
+                    pending.append(("envelope", 0))
+
+        return bufs["message"], bufs["envelope"]
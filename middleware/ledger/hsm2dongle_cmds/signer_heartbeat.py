@@ -46,7 +46,7 @@ class HSM2SignerHeartbeat(HSM2DongleCommand):
             self.send(Op.UD_VALUE, bytes.fromhex(ud_value))
 
             # Retrieve signature
-            signature = self.send(Op.GET, self.NoData)[self.Offset.DATA:]
+            signature = self.send(Op.GET, self.NoData)
 
             # Retrieve message
             message = self.send(Op.GET_MESSAGE, self.NoData)[self.Offset.DATA:]
@@ -60,7 +60,7 @@ class HSM2SignerHeartbeat(HSM2DongleCommand):
             return (True, {
                 "pubKey": public_key.hex(),
                 "message": message.hex(),
-                "signature": HSM2DongleSignature(signature),
+                "signature": HSM2DongleSignature(signature, self.Offset.DATA),
                 "tweak": signer_hash.hex(),
             })
         except self.ErrorResult as e:
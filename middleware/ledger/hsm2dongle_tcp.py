@@ -23,25 +23,49 @@
 from ledgerblue.commTCP import getDongle
 from ledgerblue.commException import CommException
 from .hsm2dongle import HSM2Dongle, HSM2DongleCommError
+from .tcp_transport import TCPTransport
 
 
 class HSM2DongleTCP(HSM2Dongle):
-    def __init__(self, host, port, debug):
+    # native_transport selects the native TCPTransport instead of
+    # ledgerblue's commTCP (use_writev only applies to the former).
+    # unix_socket_path connects to a Unix domain socket instead of to
+    # host and port (always through the native transport)
+    def __init__(self, host, port, debug, native_transport=False, use_writev=False,
+                 unix_socket_path=None):
         self.host = host
         self.port = port
+        self.unix_socket_path = unix_socket_path
+        self.native_transport = native_transport or unix_socket_path is not None
+        self.use_writev = use_writev
         super().__init__(debug)
 
     # Connect to the TCP "dongle"
     def connect(self):
         try:
-            self.logger.info(f"Connecting to {self.host}:{self.port}")
-            self.dongle = getDongle(self.host, self.port, self.debug)
+            if self.unix_socket_path is not None:
+                self.logger.info(f"Connecting to {self.unix_socket_path}")
+            else:
+                self.logger.info(f"Connecting to {self.host}:{self.port}")
+            self.version = None
+            if self.native_transport:
+                self.dongle = TCPTransport(self.host, self.port, self.debug,
+                                           self.use_writev,
+                                           unix_socket_path=self.unix_socket_path)
+            else:
+                self.dongle = getDongle(self.host, self.port, self.debug)
             self.logger.info("Connected")
         except CommException as e:
             msg = "Error connecting: %s" % e.message
             self.logger.error(msg)
             raise HSM2DongleCommError(msg)
 
+    # Only the native transport is able to tell
+    def is_connection_alive(self):
+        if not self.native_transport:
+            return super().is_connection_alive()
+        return self.dongle.is_alive()
+
     # Disconnect from the TCP "dongle"
     def disconnect(self):
         try:
@@ -21,6 +21,7 @@
 # SOFTWARE.
 
 import time
+import threading
 from comm.protocol import HSM2Protocol, HSM2ProtocolError, HSM2ProtocolInterrupt
 from comm.platform import Platform
 from ledger.hsm2dongle import (
@@ -39,7 +40,7 @@ from comm.bitcoin import get_unsigned_tx, get_tx_hash
 class HSM2ProtocolLedger(HSM2Protocol):
     # Current manager supported versions for HSM UI and HSM SIGNER (<=)
     UI_VERSION = HSM2FirmwareVersion(5, 5, 1)
-    APP_VERSION = HSM2FirmwareVersion(5, 5, 1)
+    APP_VERSION = HSM2FirmwareVersion(5, 5, 2)
 
     # Amount of time to wait to make sure the app is opened
     OPEN_APP_WAIT = 1  # second
@@ -47,11 +48,29 @@ class HSM2ProtocolLedger(HSM2Protocol):
     # Required minimum number of pin retries available to proceed with unlocking
     MIN_AVAILABLE_RETRIES = 2
 
-    def __init__(self, pin, dongle):
+    def __init__(self, pin, dongle, block_validator=None):
         super().__init__()
         self.hsm2dongle = dongle
         self._comm_issue = False
         self.pin = pin
+        # Optional middleware-side advance blockchain validator
+        # (see ledger.block_validation.AdvanceBlockchainValidator)
+        self.block_validator = block_validator
+        # Serializes device access between request handling and
+        # (optional) background tasks (see ledger.watchdog.ConnectionWatchdog)
+        self.device_lock = threading.RLock()
+        self.last_request_time = time.monotonic()
+        # Verified device identity (app version and signer parameters),
+        # gathered upon the first full device initialization
+        self._dongle_app_version = None
+        self._signer_parameters = None
+
+    def handle_request(self, request):
+        with self.device_lock:
+            try:
+                return super().handle_request(request)
+            finally:
+                self.last_request_time = time.monotonic()
 
     def initialize_device(self):
         # Connection
@@ -63,6 +82,13 @@ class HSM2ProtocolLedger(HSM2Protocol):
             self.logger.error(e)
             raise HSM2ProtocolError(e)
 
+        # On reconnection, a known device identity only needs
+        # to be checked for consistency
+        if self._signer_parameters is not None:
+            if self._verify_device_identity():
+                return
+            self.clear_device_identity()
+
         # Onboard check
         try:
             is_onboarded = self.hsm2dongle.is_onboarded()
@@ -117,10 +143,40 @@ class HSM2ProtocolLedger(HSM2Protocol):
             hex(signer_parameters.min_required_difficulty),
         )
         self.logger.info("Network %s", signer_parameters.network.name)
+        self._signer_parameters = signer_parameters
+
+    # Checks that the connected device still matches the cached identity,
+    # i.e., that it is running the signer with the same version.
+    # Anything else (e.g., the device restarted into the bootloader)
+    # requires a full initialization.
+    def _verify_device_identity(self):
+        self.logger.info("Verifying device identity")
+        current_mode = self.hsm2dongle.get_current_mode()
+        if current_mode != HSM2Dongle.MODE.SIGNER:
+            self.logger.info("Mode #%s, full initialization needed", current_mode)
+            return False
+
+        version = self.hsm2dongle.get_version()
+        if version != self._dongle_app_version:
+            self.logger.info("App version changed from %s to %s, "
+                             "full initialization needed",
+                             self._dongle_app_version, version)
+            return False
+
+        self.logger.info("Device identity verified")
+        return True
+
+    def clear_device_identity(self):
+        self._dongle_app_version = None
+        self._signer_parameters = None
 
     def report_comm_issue(self):
         self._comm_issue = True
 
+    @property
+    def has_comm_issue(self):
+        return self._comm_issue
+
     def ensure_connection(self):
         if not self._comm_issue:
             return
@@ -396,9 +452,27 @@ class HSM2ProtocolLedger(HSM2Protocol):
 
         return (self.ERROR_CODE_OK, {})
 
+    # Pre-validation depends on the device's current blockchain state, so
+    # it costs reading that state once per batch on top of the advance
+    # itself: a single exchange (or a few) on firmware able to dump the whole
+    # state at once, and nine exchanges on former firmware
+    def _prevalidate_advance_blockchain(self, request):
+        return self.block_validator.validate(
+            request["blocks"], request["brothers"],
+            self._signer_parameters, self.hsm2dongle.get_blockchain_state())
+
     def _advance_blockchain(self, request):
         try:
             self.ensure_connection()
+
+            # Reject invalid batches before sending any blocks to the device
+            if self.block_validator is not None:
+                validation_result = self._prevalidate_advance_blockchain(request)
+                if not validation_result[0]:
+                    self.logger.info("Advance blockchain batch rejected by "
+                                     "pre-validation")
+                    return (self._translate_advance_result(validation_result[1]),)
+
             advance_result = self.hsm2dongle.advance_blockchain(
                 request["blocks"], request["brothers"]
             )
@@ -460,7 +534,11 @@ class HSM2ProtocolLedger(HSM2Protocol):
     def _get_blockchain_parameters(self, request):
         try:
             self.ensure_connection()
-            params = self.hsm2dongle.get_signer_parameters()
+            # Parameters are immutable for a given device, so
+            # serve them from the verified identity if available
+            params = self._signer_parameters
+            if params is None:
+                params = self.hsm2dongle.get_signer_parameters()
             return (self.ERROR_CODE_OK, {"parameters": {
                 "checkpoint": params.checkpoint,
                 "minimum_difficulty": params.min_required_difficulty,
@@ -20,13 +20,14 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import rlp
-from rsk_utils import rlp_decode_list_of_expected_length
+from .rsk_utils import rlp_decode_list_of_expected_length
 from comm.utils import bitwise_and_bytes
-from rsk_netparams import NetworkUpgrades
+from .rsk_netparams import NetworkUpgrades
 import comm.pow as pow
 import comm.bitcoin
 from comm.utils import keccak_256
+from .block_utils import rlp_encoded_length, rlp_list_prefix, \
+                         rlp_list_payload_offset
 import logging
 
 
@@ -35,14 +36,38 @@ class RskBlockHeader:
     __HASH_FOR_MM_SIZE = 32
     __HASH_FOR_MM_PREFIX_SIZE = 20
     __HASH_FOR_MM_SUFFIX_SIZE = 4
+    __HASH_FOR_MM_MIDHASH_SIZE = (__HASH_FOR_MM_SIZE - __HASH_FOR_MM_PREFIX_SIZE -
+                                  __HASH_FOR_MM_SUFFIX_SIZE)
+    __HASH_FOR_MM_MASK = (b"\xff"*__HASH_FOR_MM_PREFIX_SIZE +
+                          b"\x00"*__HASH_FOR_MM_MIDHASH_SIZE +
+                          b"\xff"*__HASH_FOR_MM_SUFFIX_SIZE).hex()
     __MAX_MERKLE_PROOF_SIZE = 960  # From Iris onwards
 
+    # Activation heights of the network upgrades the decoding depends on
+    # (wasabi, papyrus, iris), per network upgrades instance
+    __activation_heights = {}
+
+    logger = logging.getLogger("rskblockheader")
+
     def __init__(self, raw_hex_string, network_parameters, mm_is_mandatory=True):
-        self.logger = logging.getLogger("rskblockheader")
         self.__network_parameters = network_parameters
         self.__raw = bytes.fromhex(raw_hex_string)
         self.__decode(mm_is_mandatory)
 
+    @classmethod
+    def __get_activation_heights(cls, network_upgrades):
+        heights = cls.__activation_heights.get(network_upgrades)
+        if heights is None:
+            def height(upgrade):
+                abn = network_upgrades.get(upgrade)
+                return abn if abn is not None else float("inf")
+
+            heights = (height(NetworkUpgrades.wasabi),
+                       height(NetworkUpgrades.papyrus),
+                       height(NetworkUpgrades.iris))
+            cls.__activation_heights[network_upgrades] = heights
+        return heights
+
     def __decodingerror(self, message):
         self.logger.debug(message)
         raise ValueError(message)
@@ -54,7 +79,7 @@ class RskBlockHeader:
         # - Its 1st element corresponds to the parent hash
         # - Its 6th element corresponds to the receipts trie root
         # - Its 8th element corresponds to the block difficulty
-        #   (big-endian two's complement integer)
+        #   (big-endian unsigned integer)
         # - Its 9th element corresponds to the block number (big-endian unsigned integer)
         # - If UMM IS NOT active:
         #   - Its 17th element corresponds to the BTC merged mining header
@@ -65,7 +90,8 @@ class RskBlockHeader:
         #   - Its 18th element corresponds to the BTC merged mining header
         #   - Its 19th element corresponds to the merged mining merkle proof
         #   - Its 20th element corresponds to the BTC merged mining coinbase transaction
-        self.logger.debug("Decoding from %s", self.__raw.hex())
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Decoding from %s", self.__raw.hex())
 
         rlp_items = rlp_decode_list_of_expected_length(self.__raw, [17, 18, 19, 20],
                                                        "block header")
@@ -91,17 +117,14 @@ class RskBlockHeader:
 
         self.__parent_hash = rlp_items[0].hex()
         self.__receipts_trie_root = rlp_items[5].hex()
-        self.__difficulty = int.from_bytes(rlp_items[7], byteorder="big", signed=True)
+        self.__difficulty = int.from_bytes(rlp_items[7], byteorder="big", signed=False)
         self.__number = int.from_bytes(rlp_items[8], byteorder="big", signed=False)
 
-        if self.__difficulty < 0:
-            self.__decodingerror("Expected a nonnegative integer as the 8th element "
-                                 "(difficulty), instead got %d (0x%s)" %
-                                 (self.__difficulty, rlp_items[7].hex()))
+        (wasabi_height, papyrus_height, iris_height) = \
+            self.__get_activation_heights(self.network_parameters.network_upgrades)
 
         # Blocks previous to the wasabi network upgrade are disallowed
-        if not self.network_parameters.network_upgrades.is_active(
-                NetworkUpgrades.wasabi, self.number):
+        if self.number < wasabi_height:
             message = "Blocks before wasabi (#%d) are disallowed. Got #%d." % (
                 self.network_parameters.network_upgrades.get(NetworkUpgrades.wasabi),
                 self.number,
@@ -115,8 +138,7 @@ class RskBlockHeader:
         mm_header_index = 16
         mm_merkleproof_index = 17
         mm_coinbasetx_index = 18
-        umm_active = self.network_parameters.network_upgrades.is_active(
-            NetworkUpgrades.papyrus, self.number)
+        umm_active = self.number >= papyrus_height
         if umm_active:
             expected_nfields = 20
             umm_root_index = 16
@@ -149,29 +171,46 @@ class RskBlockHeader:
 
                 self.__umm_root = self.__umm_root.hex()
 
-        self.__mm_header = rlp_items[mm_header_index].hex()
-        self.__mm_merkleproof = rlp_items[mm_merkleproof_index].hex()
-        self.__mm_coinbasetx = rlp_items[mm_coinbasetx_index].hex()
+        # Merge mining fields are kept as bytes (see the corresponding properties)
+        self.__mm_header = rlp_items[mm_header_index]
+        self.__mm_merkleproof = rlp_items[mm_merkleproof_index]
+        self.__mm_coinbasetx = rlp_items[mm_coinbasetx_index]
 
         # Validate maximum length for merge mining merkle proof from Iris onwards
-        if (self.__has_merged_mining_fields
-                and self.network_parameters.network_upgrades.is_active(
-                    NetworkUpgrades.iris, self.number) and
-                len(bytes.fromhex(self.__mm_merkleproof)) > self.__MAX_MERKLE_PROOF_SIZE):
+        if (self.__has_merged_mining_fields and self.number >= iris_height
+                and len(self.__mm_merkleproof) > self.__MAX_MERKLE_PROOF_SIZE):
             message = "Maximum MM merkle proof size from Iris is %d. Got #%d." % (
                 self.__MAX_MERKLE_PROOF_SIZE,
-                len(bytes.fromhex(self.__mm_merkleproof)),
+                len(self.__mm_merkleproof),
             )
             self.logger.info(message)
             raise ValueError(message)
 
+        # Both the block hash and the hash for merge mining (see below) are
+        # hashes of the RLP encoding of a prefix of the header fields.
+        # Since decoding went fine, the raw header is a valid RLP encoding
+        # of the fields, and so the encoding of any prefix of the fields
+        # can be sliced from the raw header's payload (and prepended with
+        # the corresponding list prefix) instead of encoding the fields
+        # all over again.
+        payload = memoryview(self.__raw)[rlp_list_payload_offset(self.__raw):]
+        if not self.__has_merged_mining_fields:
+            # The last two fields were filled in (and are not part of the raw
+            # header), so the whole payload is the prefix to hash
+            block_hash_payload_size = len(payload)
+        else:
+            block_hash_payload_size = len(payload) - \
+                rlp_encoded_length(rlp_items[-1]) - rlp_encoded_length(rlp_items[-2])
+
         # *** Compute the block hash ***
         # The block hash is computed by hashing the RLP representation
         # of all the fields except for the merged mining merkle proof
         # and the merged mining coinbase transaction.
         # The fields to leave out are exactly the last two, regardless
         # of whether a UMM hash is present or not.
-        self.__hash = keccak_256(rlp.encode(rlp_items[:-2])).hex()
+        self.__hash = keccak_256(
+            rlp_list_prefix(block_hash_payload_size) +
+            payload[:block_hash_payload_size]).hex()
 
         # *** Compute the hash for merge mining and its comparison mask ***
         # *** IMPORTANT: this only applies if the merged mining fields are present ***
@@ -189,41 +228,32 @@ class RskBlockHeader:
             # The rest remains.
 
             # (1) Compute the hash leaving out merge mining fields.
-            self.__hash_for_merge_mining = keccak_256(rlp.encode(
-                rlp_items[:-3]))
+            mm_payload_size = block_hash_payload_size - \
+                rlp_encoded_length(rlp_items[-3])
+            self.__hash_for_merge_mining = keccak_256(
+                rlp_list_prefix(mm_payload_size) + payload[:mm_payload_size])
 
             # (2) Only the first 20 bytes of the original hash are to be taken
-            # into account. Also, last 4 bytes must be the current block number
-            # and also be taken into account.
-            # Ignore the middle 8 bytes using a comparison mask.
-            midhash_size = (self.__HASH_FOR_MM_SIZE - self.__HASH_FOR_MM_PREFIX_SIZE -
-                            self.__HASH_FOR_MM_SUFFIX_SIZE)
-            self.__hash_for_merge_mining = (
-                self.__hash_for_merge_mining[:self.__HASH_FOR_MM_PREFIX_SIZE] +
-                b"\x00"*midhash_size + self.number.to_bytes(
-                    self.__HASH_FOR_MM_SUFFIX_SIZE, byteorder="big", signed=False))
-
-            self.__hash_for_merge_mining_mask = (b"\xff"*self.__HASH_FOR_MM_PREFIX_SIZE +
-                                                 b"\x00"*midhash_size +
-                                                 b"\xff"*self.__HASH_FOR_MM_SUFFIX_SIZE)
-
-            # (3) Depending on UMM, include the UMM root in the calculation
-            # and trim to 20 bytes
+            # into account. Depending on UMM, include the UMM root in the
+            # calculation and trim to 20 bytes
+            self.__hash_for_merge_mining = \
+                self.__hash_for_merge_mining[:self.__HASH_FOR_MM_PREFIX_SIZE]
             if self.is_umm:
-                self.__hash_for_merge_mining = (
-                    keccak_256(
-                        self.__hash_for_merge_mining[:self.__HASH_FOR_MM_PREFIX_SIZE] +
-                        bytes.fromhex(self.__umm_root))
-                    [:self.__HASH_FOR_MM_PREFIX_SIZE] +
-                    self.__hash_for_merge_mining[self.__HASH_FOR_MM_PREFIX_SIZE:])
+                self.__hash_for_merge_mining = keccak_256(
+                    self.__hash_for_merge_mining + bytes.fromhex(self.__umm_root)
+                )[:self.__HASH_FOR_MM_PREFIX_SIZE]
 
-            # (4) We represent everything in hex strings internally
-            self.__hash_for_merge_mining = self.__hash_for_merge_mining.hex()
-            self.__hash_for_merge_mining_mask = self.__hash_for_merge_mining_mask.hex()
-
-            # (5) Apply the merge mining mask
-            self.__hash_for_merge_mining = self.__apply_merge_mining_mask(
-                self.__hash_for_merge_mining)
+            # (3) Last 4 bytes must be the current block number
+            # and also be taken into account.
+            # Ignore the middle 8 bytes using a comparison mask
+            # (they're already zeroed, so the mask needs no applying here).
+            # We represent everything in hex strings internally
+            self.__hash_for_merge_mining = (
+                self.__hash_for_merge_mining +
+                b"\x00"*self.__HASH_FOR_MM_MIDHASH_SIZE + self.number.to_bytes(
+                    self.__HASH_FOR_MM_SUFFIX_SIZE, byteorder="big", signed=False)
+            ).hex()
+            self.__hash_for_merge_mining_mask = self.__HASH_FOR_MM_MASK
 
     @property
     def network_parameters(self):
@@ -255,21 +285,21 @@ class RskBlockHeader:
 
     @property
     def mm_header(self):
-        return self.__mm_header
+        return self.__mm_header.hex()
 
     @property
     def mm_merkleproof(self):
         if not self.__has_merged_mining_fields:
             return None
 
-        return self.__mm_merkleproof
+        return self.__mm_merkleproof.hex()
 
     @property
     def mm_coinbasetx(self):
         if not self.__has_merged_mining_fields:
             return None
 
-        return self.__mm_coinbasetx
+        return self.__mm_coinbasetx.hex()
 
     @property
     def hash(self):
@@ -21,11 +21,22 @@
 # SOFTWARE.
 
 # Parses a signature received from a powHSM dongle
-
 class HSM2DongleSignature:
-    def __init__(self, signature_bytes):
+    # secp256k1 curve order
+    CURVE_ORDER = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+
+    __slots__ = ("_der", "_r_offset", "_r_length", "_s_offset", "_s_length",
+                 "_canonical", "_r", "_s")
+
+    # signature_bytes: any bytes-like object (bytes, bytearray or memoryview),
+    # optionally containing the DER-encoded signature starting at
+    # the given offset (e.g., a raw device response).
+    # canonical: whether to normalize the S component to its low-S form
+    def __init__(self, signature_bytes, offset=0, canonical=False):
+        view = memoryview(signature_bytes)[offset:]
+
         def error():
-            raise ValueError("Invalid DER-encoded signature: %s" % signature_bytes.hex())
+            raise ValueError("Invalid DER-encoded signature: %s" % view.hex())
 
         # Decode signature_bytes, which should be in DER format
         # Format:
@@ -37,42 +48,65 @@ class HSM2DongleSignature:
         #
         # IMPORTANT: due to a bug, sometimes the first byte is 0x31 and not 0x30.
         # Deal with it.
+        # All the validations are done over offsets, without slicing.
+        length = len(view)
         if (
-            len(signature_bytes) < 2
-            or signature_bytes[0] not in [0x30, 0x31]
-            or len(signature_bytes[2:]) < signature_bytes[1]
+            length < 2
+            or view[0] not in [0x30, 0x31]
+            or length - 2 < view[1]
         ):
             error()
 
         # R
         if (
-            len(signature_bytes[2:]) < 2
-            or signature_bytes[2] != 0x02
-            or len(signature_bytes[4:]) < signature_bytes[3]
+            length - 2 < 2
+            or view[2] != 0x02
+            or length - 4 < view[3]
         ):
             error()
-        r_len = signature_bytes[3]
-        rbytes = signature_bytes[4:4 + r_len]
+        r_length = view[3]
 
         # S
+        s_prefix = 4 + r_length
         if (
-            len(signature_bytes[4 + r_len:]) < 2
-            or signature_bytes[4 + r_len] != 0x02
-            or len(signature_bytes[6 + r_len:]) < signature_bytes[5 + r_len]
+            length - s_prefix < 2
+            or view[s_prefix] != 0x02
+            or length - s_prefix - 2 < view[s_prefix + 1]
         ):
             error()
-        s_len = signature_bytes[5 + r_len]
-        sbytes = signature_bytes[6 + r_len:6 + r_len + s_len]
+        s_length = view[s_prefix + 1]
+
+        # Keep the signature bytes (up to the end of S, leaving out any rubbish)
+        self._der = bytes(view[:s_prefix + 2 + s_length])
+        self._r_offset = 4
+        self._r_length = r_length
+        self._s_offset = s_prefix + 2
+        self._s_length = s_length
+        self._canonical = canonical
+        self._r = None
+        self._s = None
 
-        self._r = rbytes.hex()
-        self._s = sbytes.hex()
+    @property
+    def der(self):
+        return self._der
 
     @property
     def r(self):
+        if self._r is None:
+            self._r = self._der[self._r_offset:self._r_offset + self._r_length].hex()
         return self._r
 
     @property
     def s(self):
+        if self._s is None:
+            sbytes = self._der[self._s_offset:self._s_offset + self._s_length]
+            if self._canonical:
+                s = int.from_bytes(sbytes, byteorder="big", signed=False)
+                if s > self.CURVE_ORDER // 2:
+                    s = self.CURVE_ORDER - s
+                    sbytes = s.to_bytes((s.bit_length() + 7) // 8,
+                                        byteorder="big", signed=False)
+            self._s = sbytes.hex()
         return self._s
 
     def __repr__(self):
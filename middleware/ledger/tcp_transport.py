@@ -0,0 +1,167 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 RSK Labs Ltd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import socket
+import struct
+import logging
+from ledgerblue.commException import CommException
+
+
+# Native transport for TCP "dongles" (TCPSigner and SGX powHSM).
+# Speaks the same framing as ledgerblue's commTCP (4-byte big endian
+# length prefix on requests; length prefix, payload and 2-byte status
+# word on responses) and exposes the same interface (exchange, close,
+# opened and socket), but:
+# - disables Nagle's algorithm, so that small APDUs are not delayed
+# - reads responses into a preallocated buffer, looping on partial reads
+# - optionally writes the length prefix and the APDU with a single
+#   vectored write instead of concatenating them
+# - enables TCP keepalive so that a dead peer is eventually detected
+#   even while idle, and offers a cheap liveness check
+# It can also connect to a Unix domain socket (given
+# unix_socket_path, host and port are ignored), for when the
+# dongle runs on the same host
+class TCPTransport:
+    HEADER = struct.Struct(">I")
+    STATUS = struct.Struct(">H")
+    SW_OK = 0x9000
+    SW_TIMEOUT = 0x6F00
+
+    # Initial receive buffer size (grown on demand)
+    RECV_BUFFER_SIZE = 4096
+
+    # Keepalive settings (seconds and probe count)
+    KEEPALIVE_IDLE = 10
+    KEEPALIVE_INTERVAL = 5
+    KEEPALIVE_COUNT = 3
+
+    def __init__(self, host, port, debug=False, use_writev=False,
+                 enforce_timeouts=False, unix_socket_path=None):
+        self.logger = logging.getLogger("tcptransport")
+        self.debug = debug
+        self.enforce_timeouts = enforce_timeouts
+        self.use_writev = use_writev and hasattr(socket.socket, "sendmsg")
+        self._buffer = bytearray(self.RECV_BUFFER_SIZE)
+        self._view = memoryview(self._buffer)
+        try:
+            if unix_socket_path is not None:
+                self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self.socket.connect(unix_socket_path)
+            else:
+                self.socket = socket.create_connection((host, port))
+                self._configure_socket()
+        except OSError as e:
+            raise CommException(f"Proxy connection failed: {str(e)}")
+        self.opened = True
+
+    def _configure_socket(self):
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        # Fine-grained keepalive tuning is not available on every platform
+        for (opt, value) in [("TCP_KEEPIDLE", self.KEEPALIVE_IDLE),
+                             ("TCP_KEEPINTVL", self.KEEPALIVE_INTERVAL),
+                             ("TCP_KEEPCNT", self.KEEPALIVE_COUNT)]:
+            if hasattr(socket, opt):
+                self.socket.setsockopt(socket.IPPROTO_TCP, getattr(socket, opt), value)
+
+    # As with commTCP, the timeout is not enforced by default (some
+    # operations, e.g. onboarding, legitimately take long). Set
+    # enforce_timeouts to make exchanges fail after the given timeout
+    def exchange(self, apdu, timeout=None):
+        if self.debug:
+            self.logger.debug("=> %s", bytes(apdu).hex())
+
+        try:
+            self.socket.settimeout(timeout if self.enforce_timeouts else None)
+            self._send(apdu)
+            size = self.HEADER.unpack(self._recv(self.HEADER.size))[0]
+            response = bytearray(self._recv(size))
+            sw = self.STATUS.unpack(self._recv(self.STATUS.size))[0]
+        except socket.timeout:
+            raise CommException("Timeout", self.SW_TIMEOUT)
+        except OSError as e:
+            raise CommException(f"Communication error: {str(e)}")
+
+        if self.debug:
+            self.logger.debug("<= %s%.4x", response.hex(), sw)
+
+        if sw != self.SW_OK:
+            raise CommException("Invalid status %04x" % sw, sw, data=response)
+
+        return response
+
+    def _send(self, apdu):
+        header = self.HEADER.pack(len(apdu))
+        if not self.use_writev:
+            self.socket.sendall(header + apdu)
+            return
+
+        buffers = [memoryview(header), memoryview(apdu)]
+        while buffers:
+            sent = self.socket.sendmsg(buffers)
+            # Drop whatever was fully written and
+            # trim the partially written buffer, if any
+            while buffers and sent >= len(buffers[0]):
+                sent -= len(buffers[0])
+                buffers.pop(0)
+            if buffers:
+                buffers[0] = buffers[0][sent:]
+
+    # Reads exactly size bytes into the receive buffer and returns
+    # a view on them (only valid until the next read)
+    def _recv(self, size):
+        if size > len(self._buffer):
+            self._buffer = bytearray(size)
+            self._view = memoryview(self._buffer)
+
+        offset = 0
+        while offset < size:
+            read = self.socket.recv_into(self._view[offset:size])
+            if read == 0:
+                raise OSError("Connection closed by peer")
+            offset += read
+        return self._view[:size]
+
+    # Cheap liveness check: the peer is considered alive unless the
+    # connection was closed or reset (as detected by either a
+    # zero-length peek or a keepalive failure)
+    def is_alive(self):
+        if not self.opened:
+            return False
+
+        try:
+            self.socket.setblocking(False)
+            return len(self.socket.recv(1, socket.MSG_PEEK)) > 0
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        finally:
+            self.socket.setblocking(True)
+
+    def close(self):
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.socket.close()
+        self.opened = False
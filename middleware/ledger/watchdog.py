@@ -0,0 +1,159 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 RSK Labs Ltd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import time
+import threading
+import logging
+from comm.protocol import HSM2ProtocolInterrupt
+from ledger.hsm2dongle import HSM2Dongle, HSM2DongleBaseError
+
+
+# Periodically probes the device behind an HSM2ProtocolLedger while
+# the manager is idle, so that a lost connection is detected and
+# the device reconnected and re-initialized before the next
+# request arrives (instead of within that request's own time budget).
+# Probing uses the cheapest available APDU (current mode), and never
+# competes with request handling: if the device is in use, the
+# probe is skipped until the next round.
+class ConnectionWatchdog:
+    DEFAULT_INTERVAL = 5  # seconds
+
+    def __init__(self, protocol, interval=DEFAULT_INTERVAL):
+        self.protocol = protocol
+        self.interval = interval
+        self.logger = logging.getLogger("watchdog")
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "probes": 0,
+            "probe_failures": 0,
+            "reconnections": 0,
+            "reconnection_failures": 0,
+            "last_reconnection_time": None,
+            "total_reconnection_time": 0,
+        }
+
+    @property
+    def metrics(self):
+        with self._metrics_lock:
+            return dict(self._metrics)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self.logger.info("Starting connection watchdog (interval: %ss)", self.interval)
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="watchdog",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        self.logger.info("Connection watchdog stopped - %s", self.metrics)
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                # Never let the watchdog die on an unexpected error
+                self.logger.error("Unexpected error in watchdog: %s", format(e))
+
+    # Performs a single watchdog round.
+    # Returns True iff the device was found connected (either after
+    # a successful probe or a successful reconnection), False if it
+    # wasn't, and None if the round was skipped.
+    def check(self):
+        # Only act when the manager has been idle for at least an interval
+        idle = time.monotonic() - self.protocol.last_request_time
+        if idle < self.interval:
+            return None
+
+        # Don't wait on request handling, just try again next round
+        if not self.protocol.device_lock.acquire(blocking=False):
+            return None
+
+        try:
+            if not self.protocol.has_comm_issue and self._probe():
+                return True
+
+            self.protocol.report_comm_issue()
+            return self._reconnect()
+        finally:
+            self.protocol.device_lock.release()
+
+    def _probe(self):
+        self._increment("probes")
+        try:
+            if not self.protocol.hsm2dongle.is_connection_alive():
+                self.logger.warning("Device connection is dead")
+                self._increment("probe_failures")
+                return False
+            mode = self.protocol.hsm2dongle.get_current_mode()
+            if mode == HSM2Dongle.MODE.SIGNER:
+                return True
+            self.logger.warning("Device reported unexpected mode %s", mode)
+        except HSM2DongleBaseError as e:
+            self.logger.warning("Device probe failed: %s", format(e))
+        self._increment("probe_failures")
+        return False
+
+    def _reconnect(self):
+        self.logger.info("Proactively reconnecting device")
+        start = time.monotonic()
+        try:
+            self.protocol.ensure_connection()
+            success = True
+        except HSM2DongleBaseError as e:
+            self.logger.warning("Proactive reconnection failed: %s", format(e))
+            success = False
+        except HSM2ProtocolInterrupt:
+            # This needs user intervention. Leave it to the next
+            # request so that the manager can be shut down as usual.
+            self.logger.warning("Proactive reconnection interrupted")
+            success = False
+        elapsed = time.monotonic() - start
+
+        with self._metrics_lock:
+            if success:
+                self._metrics["reconnections"] += 1
+                self._metrics["last_reconnection_time"] = elapsed
+                self._metrics["total_reconnection_time"] += elapsed
+            else:
+                self._metrics["reconnection_failures"] += 1
+
+        if success:
+            self.logger.info("Proactive reconnection successful (%.3fs)", elapsed)
+        return success
+
+    def _increment(self, name):
+        with self._metrics_lock:
+            self._metrics[name] += 1
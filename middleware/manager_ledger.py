@@ -21,6 +21,7 @@
 # SOFTWARE.
 
 import os
+import multiprocessing
 from ledger.hsm2dongle import HSM2Dongle
 from mgr.runner import ManagerRunner
 from ledger.pin import FileBasedPin
@@ -41,6 +42,8 @@ def load_pin(user_options):
 
 
 if __name__ == "__main__":
+    # Needed by block validation worker processes on frozen builds
+    multiprocessing.freeze_support()
     Platform.set(Platform.LEDGER)
     user_options = UserOptionParser("Start the powHSM manager for Ledger",
                                     with_pin=True).parse()
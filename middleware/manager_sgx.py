@@ -21,6 +21,7 @@
 # SOFTWARE.
 
 import os
+import multiprocessing
 from sgx.hsm2dongle import HSM2DongleSGX
 from mgr.runner import ManagerRunner
 from ledger.pin import FileBasedPin
@@ -40,7 +41,18 @@ def load_pin(user_options):
     return pin
 
 
+def create_dongle(options):
+    return HSM2DongleSGX(options.tcpconn_host,
+                         options.tcpconn_port,
+                         options.io_debug,
+                         native_transport=options.native_transport,
+                         use_writev=options.use_writev,
+                         unix_socket_path=options.tcpconn_unix_socket_path)
+
+
 if __name__ == "__main__":
+    # Needed by block validation worker processes on frozen builds
+    multiprocessing.freeze_support()
     Platform.set(Platform.SGX)
     user_options = UserOptionParser("Start the powHSM manager for SGX",
                                     with_pin=True,
@@ -49,9 +61,7 @@ if __name__ == "__main__":
                                     default_tcpconn_port=7777).parse()
 
     runner = ManagerRunner("powHSM manager for SGX",
-                           lambda options: HSM2DongleSGX(options.tcpconn_host,
-                                                         options.tcpconn_port,
-                                                         options.io_debug),
+                           create_dongle,
                            load_pin)
 
     runner.run(user_options)
@@ -20,13 +20,25 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import multiprocessing
 from ledger.hsm2dongle_tcp import HSM2DongleTCP
 from mgr.runner import ManagerRunner
 from user.options import UserOptionParser
 from comm.platform import Platform
 
 
+def create_dongle(options):
+    return HSM2DongleTCP(options.tcpconn_host,
+                         options.tcpconn_port,
+                         options.io_debug,
+                         native_transport=options.native_transport,
+                         use_writev=options.use_writev,
+                         unix_socket_path=options.tcpconn_unix_socket_path)
+
+
 if __name__ == "__main__":
+    # Needed by block validation worker processes on frozen builds
+    multiprocessing.freeze_support()
     Platform.set(Platform.X86)
     user_options = UserOptionParser("Start the powHSM manager for TCPSigner",
                                     with_pin=False,
@@ -34,9 +46,7 @@ if __name__ == "__main__":
                                     host_name="TCPSigner").parse()
 
     runner = ManagerRunner("powHSM manager for TCPSigner",
-                           lambda options: HSM2DongleTCP(options.tcpconn_host,
-                                                         options.tcpconn_port,
-                                                         options.io_debug),
+                           create_dongle,
                            load_pin=lambda options: None)
 
     runner.run(user_options)
@@ -23,6 +23,8 @@
 from comm.server import TCPServer, TCPServerError
 from ledger.protocol import HSM2ProtocolLedger
 from ledger.protocol_v1 import HSM1ProtocolLedger
+from ledger.block_validation import AdvanceBlockchainValidator
+from ledger.watchdog import ConnectionWatchdog
 from comm.logging import configure_logging
 from ledger.pin import PinError
 import logging
@@ -40,6 +42,8 @@ class ManagerRunner:
 
         logger.info(f"{self.name} starting")
 
+        watchdog = None
+        block_validator = None
         try:
             pin = self.load_pin(user_options)
             dongle = self.create_dongle(user_options)
@@ -50,8 +54,18 @@ class ManagerRunner:
                 protocol = HSM1ProtocolLedger(pin, dongle)
             else:
                 logger.info("Using protocol version 2")
-                protocol = HSM2ProtocolLedger(pin, dongle)
-            server = TCPServer(user_options.host, user_options.port, protocol)
+                if user_options.prevalidate_blocks:
+                    logger.info("Advance blockchain pre-validation enabled "
+                                f"({user_options.prevalidate_workers} worker(s))")
+                    block_validator = AdvanceBlockchainValidator(
+                        user_options.prevalidate_workers)
+                protocol = HSM2ProtocolLedger(pin, dongle, block_validator)
+                if user_options.watchdog_interval > 0:
+                    watchdog = ConnectionWatchdog(protocol,
+                                                  user_options.watchdog_interval)
+            server = TCPServer(user_options.host, user_options.port, protocol,
+                               on_ready=watchdog.start if watchdog else None,
+                               unix_socket_path=user_options.unix_socket_path)
             server.run()
         except PinError as e:
             logger.critical("While loading PIN: %s", e)
@@ -60,4 +74,8 @@ class ManagerRunner:
             # and logging is handled by the server itself
             pass
         finally:
+            if watchdog is not None:
+                watchdog.stop()
+            if block_validator is not None:
+                block_validator.stop()
             logger.info(f"{self.name} terminated")
@@ -20,6 +20,7 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import re
 from comm.cstruct import CStruct
 
 
@@ -33,6 +34,10 @@ class SgxEnvelope(CStruct):
     """
 
     def __init__(self, envelope_bytes, custom_message_bytes, offset=0, little=True):
+        # Parse over a view of the given buffer so that nested
+        # structures and certificate data reference the original
+        # bytes instead of copying them
+        envelope_bytes = memoryview(envelope_bytes)
         super().__init__(envelope_bytes, offset, little)
         offset += self.get_bytelength()
 
@@ -44,7 +49,7 @@ class SgxEnvelope(CStruct):
         offset += qecd.get_total_bytelength()
         self.qe_cert_data = qecd
 
-        if envelope_bytes[offset:] != custom_message_bytes:
+        if envelope_bytes[offset:] != memoryview(custom_message_bytes):
             raise ValueError("Unexpected custom message in envelope tail")
         self.custom_message = custom_message_bytes
 
@@ -162,7 +167,8 @@ class SgxQeAuthData(CStruct):
     def __init__(self, value, offset=0, little=True):
         super().__init__(value, offset, little)
         os = offset + self.get_bytelength()
-        data = value[os:os+self.size]
+        # Data is a view on the original buffer (no copying)
+        data = memoryview(value)[os:os+self.size]
         if len(data) != self.size:
             raise ValueError(f"Expected {self.size} data bytes but only got {len(data)}")
         self.data = data
@@ -183,10 +189,23 @@ class SgxQeCertData(SgxQeAuthData):
 
     X509_START_MARKER = b"-----BEGIN CERTIFICATE-----\n"
     X509_END_MARKER = b"\n-----END CERTIFICATE-----\n"
+    X509_PATTERN = re.compile(re.escape(X509_START_MARKER) + b"(.*?)" +
+                              b"(?:" + re.escape(X509_END_MARKER) + b"|\\Z)",
+                              re.DOTALL)
 
     def __init__(self, value, offset=0, little=True):
         super().__init__(value, offset, little)
-        self.certs = list(map(lambda c: c.replace(self.X509_START_MARKER, b""),
-                              filter(lambda c:
-                                     c.strip().startswith(self.X509_START_MARKER),
-                                     self.data.split(self.X509_END_MARKER))))
+        self._certs = None
+
+    # Certificates are extracted on first access, locating the
+    # PEM markers over the data view and copying out only the
+    # body of each certificate
+    @property
+    def certs(self):
+        if self._certs is None:
+            self._certs = list(self.iter_certs())
+        return self._certs
+
+    def iter_certs(self):
+        for match in self.X509_PATTERN.finditer(self.data):
+            yield match.group(1)
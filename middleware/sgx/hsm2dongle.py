@@ -20,9 +20,14 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import socket
+import struct
 from enum import IntEnum
-from ledger.hsm2dongle import HSM2DongleError
+from ledgerblue.commException import CommException
+from ledger.hsm2dongle import HSM2DongleError, HSM2DongleCommError, \
+                              HSM2DongleTimeoutError
 from ledger.hsm2dongle_tcp import HSM2DongleTCP
+from ledger.version import HSM2FirmwareVersion
 
 
 class SgxCommand(IntEnum):
@@ -49,9 +54,83 @@ class SgxUpgradeRoles(IntEnum):
 
 EVIDENCE_LEN_BYTES = 2
 EVIDENCE_CHUNK_SIZE = 80
+# Largest chunk that fits in an APDU along with the evidence length
+EVIDENCE_MAX_CHUNK_SIZE = 2048
 
 
 class HSM2DongleSGX(HSM2DongleTCP):
+    # The SGX host reads exactly the advertised length of each
+    # framed command and processes them in order, so batches of
+    # commands can be written upfront and their responses read back
+    # afterwards. (The TCPSigner can't do this: it reads whatever
+    # is available up to its buffer size for each frame.)
+    PIPELINE_DEPTH = 8
+
+    # Status word for a successful exchange
+    SW_OK = 0x9000
+
+    # Send a batch of commands pipelining them over the connection:
+    # all the commands are written at once and then the responses
+    # are read in order. Every response is read (even after an error)
+    # so that the connection is left in sync
+    def _send_commands(self, command, datas, timeout=HSM2DongleTCP.DONGLE_TIMEOUT):
+        if len(datas) < 2:
+            return super()._send_commands(command, datas, timeout)
+
+        self.last_comm_exception = None
+        sock = self.dongle.socket
+        try:
+            sock.settimeout(timeout)
+            frames = bytearray()
+            for data in datas:
+                cmd = struct.pack("BB%ds" % len(data), self.CLA, command, data)
+                self.logger.debug("Sending command: 0x%s", cmd.hex())
+                frames += struct.pack(">I", len(cmd)) + cmd
+            sock.sendall(frames)
+
+            responses = []
+            for _ in datas:
+                size = struct.unpack(">I", self._recv_exactly(sock, 4))[0]
+                response = self._recv_exactly(sock, size)
+                sw = struct.unpack(">H", self._recv_exactly(sock, 2))[0]
+                self.logger.debug("Received: 0x%s (0x%04x)", response.hex(), sw)
+                responses.append((sw, response))
+        except socket.timeout as e:
+            raise HSM2DongleTimeoutError(str(e))
+        except OSError as e:
+            msg = "Error sending commands: %s" % str(e)
+            self.logger.error(msg)
+            raise HSM2DongleCommError(msg)
+        finally:
+            sock.settimeout(None)
+
+        results = []
+        for (sw, response) in responses:
+            if sw == self.SW_OK:
+                results.append(response)
+                continue
+
+            self.last_comm_exception = CommException(
+                "Invalid status %04x" % sw, sw, data=response)
+            if not self.ERR.is_user_defined_error(sw):
+                msg = "Error sending command: %s" % str(self.last_comm_exception)
+                self.logger.error(msg)
+                raise HSM2DongleError(msg)
+
+            self.logger.debug("Received error code: %s", hex(sw))
+            results.append(self.ErrorResult(sw))
+
+        return results
+
+    def _recv_exactly(self, sock, size):
+        buf = bytearray()
+        while len(buf) < size:
+            chunk = sock.recv(size - len(buf))
+            if len(chunk) == 0:
+                raise OSError("Connection closed by the device")
+            buf += chunk
+        return buf
+
     # Echo message
     def echo(self):
         message = bytes([0x41, 0x42, 0x43])
@@ -115,21 +194,34 @@ class HSM2DongleSGX(HSM2DongleTCP):
         if response[2] != 0:
             raise HSM2DongleError("Not enough correct signatures gathered")
 
-    def migrate_db_get_evidence(self):
-        evidence = bytes([])
+    # If given, on_progress(transferred, total) is called after
+    # each evidence chunk is exchanged (total is None when unknown)
+    def migrate_db_get_evidence(self, on_progress=None):
+        evidence = bytearray()
         while True:
             response = self._send_command(
                 SgxCommand.SGX_UPGRADE,
                 bytes([SgxUpgradeOps.IDENTIFY_SELF]))
 
-            evidence += response[3:]
+            evidence += memoryview(response)[3:]
+            if on_progress is not None:
+                on_progress(len(evidence), None)
 
             if response[2] == 0:
                 break
 
-        return evidence
+        return bytes(evidence)
+
+    # Send the given evidence in chunks of the given size.
+    # The device doesn't tell how much of the evidence it got, so an
+    # interrupted transfer can't be resumed: the whole migration
+    # handshake must be restarted instead (see migrate_db_reset)
+    def migrate_db_send_evidence(self, evidence, chunk_size=EVIDENCE_CHUNK_SIZE,
+                                 on_progress=None):
+        if chunk_size < 1 or chunk_size > EVIDENCE_MAX_CHUNK_SIZE:
+            raise HSM2DongleError(f"Invalid evidence chunk size: {chunk_size}")
 
-    def migrate_db_send_evidence(self, evidence):
+        evidence = memoryview(evidence)
         evlen = len(evidence).to_bytes(
                 EVIDENCE_LEN_BYTES, byteorder="big", signed=False)
         offset = 0
@@ -138,14 +230,23 @@ class HSM2DongleSGX(HSM2DongleTCP):
                 SgxCommand.SGX_UPGRADE,
                 bytes([SgxUpgradeOps.IDENTIFY_PEER]) +
                 (evlen if offset == 0 else bytes([])) +
-                evidence[offset:offset+EVIDENCE_CHUNK_SIZE])
-            offset += EVIDENCE_CHUNK_SIZE
+                evidence[offset:offset+chunk_size])
+            offset = min(offset + chunk_size, len(evidence))
+            if on_progress is not None:
+                on_progress(offset, len(evidence))
             if response[2] == 0 or offset >= len(evidence):
                 break
 
         if response[2] != 0:
             raise HSM2DongleError("Failed to receive evidence ack")
 
+    # Discard any ongoing migration on the device, so that it can be
+    # started over. The enclave resets its upgrade state whenever it
+    # gets a command other than an upgrade one, such as an echo
+    def migrate_db_reset(self):
+        if not self.echo():
+            raise HSM2DongleError("Failed to reset the migration state")
+
     def migrate_db_get_data(self):
         data = self._send_command(
             SgxCommand.SGX_UPGRADE,
@@ -164,9 +265,29 @@ class HSM2DongleSGX(HSM2DongleTCP):
 
     # Map from standard commands to SGX-specific commands
     SGX_SPECIFIC_COMMANDS = [
-        HSM2DongleTCP.CMD.ADVANCE, HSM2DongleTCP.CMD.UPD_ANCESTOR
+        HSM2DongleTCP.CMD.ADVANCE, HSM2DongleTCP.CMD.UPD_ANCESTOR,
+        HSM2DongleTCP.CMD.SIGN,
     ]
 
+    # Maximum data that fits in a single APDU
+    # (SGX host APDU buffer size minus the CLA, CMD and OP bytes)
+    MAX_FULL_DATA_SIZE = 2048 + 5 - 3
+
+    # First firmware version whose enclave accepts signing payloads in full
+    # (former enclaves require the chunks they request)
+    FULL_SIGN_DATA_VERSION = HSM2FirmwareVersion(5, 5, 2)
+
+    # Whether the given piece of data for the given command can be sent
+    # in full to the device
+    def _can_send_in_full(self, command, data):
+        if command not in self.SGX_SPECIFIC_COMMANDS or \
+           len(data) > self.MAX_FULL_DATA_SIZE:
+            return False
+        if command == self.CMD.SIGN:
+            return self.version is not None and \
+                self.version >= self.FULL_SIGN_DATA_VERSION
+        return True
+
     # Send a specific piece of data in chunks to the device
     # as the device requests bytes from it.
     # Validate responses wrt current operation and next possible expected operations
@@ -183,8 +304,10 @@ class HSM2DongleSGX(HSM2DongleTCP):
         data_description,
     ):
         # Same old behavior for anything that hasn't got an SGX-specific
-        # mapping
-        if command not in self.SGX_SPECIFIC_COMMANDS:
+        # mapping, that doesn't fit in a single APDU or that the running
+        # firmware can't take in full (the enclave still accepts the
+        # chunked protocol)
+        if not self._can_send_in_full(command, data):
             return super()._send_data_in_chunks(
                 command,
                 operation,
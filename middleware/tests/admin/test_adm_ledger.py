@@ -47,6 +47,7 @@ class TestAdmLedger(TestCase):
             "output_file_path": None,
             "pin": None,
             "pubkeys_file_path": None,
+            "workers": None,
             "root_authority": None,
             "signer_authorization_file_path": None,
             "verbose": False,
@@ -43,12 +43,14 @@ class TestAdmSgx(TestCase):
             "attestation_certificate_file_path": None,
             "root_authority": None,
             "pubkeys_file_path": None,
+            "workers": None,
             "operation": None,
             "output_file_path": None,
             "pin": None,
             "destination_sgx_port": 3333,
             "destination_sgx_host": "localhost",
             "migration_authorization_file_path": None,
+            "evidence_chunk_size": 80,
             "verbose": False,
         }
 
@@ -226,7 +228,10 @@ class TestAdmSgx(TestCase):
             call(Namespace(**{
                 **expected_options,
                 "destination_sgx_port": 4444,
-                "destination_sgx_host": "another.host.com"}))
+                "destination_sgx_host": "another.host.com"})),
+            call(Namespace(**{
+                **expected_options,
+                "evidence_chunk_size": 1024})),
         ]
 
         with patch("sys.argv", ["adm_sgx.py",
@@ -245,7 +250,15 @@ class TestAdmSgx(TestCase):
                 main()
         self.assertEqual(e.exception.code, 0)
 
+        with patch("sys.argv", ["adm_sgx.py",
+                                "migrate_db",
+                                "-z", "a-file-path",
+                                "--evidence-chunk-size", "1024"]):
+            with self.assertRaises(SystemExit) as e:
+                main()
+        self.assertEqual(e.exception.code, 0)
+
         self.assertTrue(do_migrate_db.called)
-        self.assertEqual(do_migrate_db.call_count, 2)
+        self.assertEqual(do_migrate_db.call_count, 3)
         for i, call_args in enumerate(expected_call_args_list):
             self.assertEqual(call_args, do_migrate_db.call_args_list[i], f"Call #{i}")
@@ -0,0 +1,186 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 RSK Labs Ltd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import json
+import shutil
+import tempfile
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import patch
+from admin.misc import AdminError
+from admin.attestation_batch import find_certificate_files, load_certificate, \
+                                    verify_certificate_files, verify_attestation_batch
+from .test_certificate_v2_resources import TEST_CERTIFICATE
+import logging
+
+logging.disable(logging.CRITICAL)
+
+
+# Module level so that it can be used from worker processes
+def make_test_verifier(context):
+    def verify(certificate):
+        if "quote" not in certificate.to_dict()["targets"]:
+            raise AdminError("Certificate does not contain a powHSM attestation")
+        return {
+            "context": context["value"],
+            "pid": os.getpid(),
+            "elements": len(certificate.elements),
+        }
+    return verify
+
+
+class TestAttestationBatch(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.valid = []
+        for i in range(4):
+            self.valid.append(self.write(f"cert-{i}.json", TEST_CERTIFICATE))
+        self.invalid = self.write("cert-invalid.json", {**TEST_CERTIFICATE,
+                                                        "targets": []})
+        self.unparseable = self.write("cert-unparseable.json", {"version": 99})
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, name, content):
+        path = os.path.join(self.dir, name)
+        with open(path, "w") as file:
+            if type(content) == str:
+                file.write(content)
+            else:
+                json.dump(content, file)
+        return path
+
+    def test_find_certificate_files_directory(self):
+        self.write("not-a-certificate.txt", "something")
+        os.mkdir(os.path.join(self.dir, "subdir.json"))
+
+        self.assertEqual(sorted(self.valid + [self.invalid, self.unparseable]),
+                         find_certificate_files(self.dir))
+
+    def test_find_certificate_files_manifest(self):
+        manifest = self.write("manifest.txt", "\n".join([
+            "# Fleet certificates",
+            "cert-1.json",
+            "",
+            "  cert-0.json  ",
+            "# cert-2.json",
+        ]))
+
+        self.assertEqual([self.valid[1], self.valid[0]],
+                         find_certificate_files(manifest))
+
+    def test_find_certificate_files_manifest_missing(self):
+        with self.assertRaises(AdminError):
+            find_certificate_files(os.path.join(self.dir, "does-not-exist.txt"))
+
+    def test_load_certificate_shares_x509_elements(self):
+        cert_a = load_certificate(self.valid[0])
+        cert_b = load_certificate(self.valid[1])
+
+        elements_a = {e.name: e for e in cert_a.elements}
+        elements_b = {e.name: e for e in cert_b.elements}
+        self.assertIs(elements_a["platform_ca"], elements_b["platform_ca"])
+        self.assertIs(elements_a["quoting_enclave"], elements_b["quoting_enclave"])
+        self.assertIsNot(elements_a["quote"], elements_b["quote"])
+        self.assertEqual(TEST_CERTIFICATE, cert_b.to_dict())
+
+    def test_verify_certificate_files_sequential(self):
+        paths = self.valid + [self.invalid, self.unparseable]
+        results = verify_certificate_files(paths, make_test_verifier,
+                                           {"value": "ctx"}, workers=1)
+
+        self.assertEqual(6, len(results))
+        for path, result in zip(self.valid, results[:4]):
+            self.assertEqual(path, result["file"])
+            self.assertTrue(result["verified"])
+            self.assertEqual("ctx", result["values"]["context"])
+            self.assertEqual(os.getpid(), result["values"]["pid"])
+            self.assertEqual(4, result["values"]["elements"])
+        self.assertEqual({
+            "file": self.invalid,
+            "verified": False,
+            "error": "Certificate does not contain a powHSM attestation",
+        }, results[4])
+        self.assertEqual(self.unparseable, results[5]["file"])
+        self.assertFalse(results[5]["verified"])
+        self.assertIn("While loading the attestation certificate file",
+                      results[5]["error"])
+
+    def test_verify_certificate_files_parallel(self):
+        paths = self.valid + [self.invalid]
+        results = verify_certificate_files(paths, make_test_verifier,
+                                           {"value": "ctx"}, workers=2)
+
+        self.assertEqual(paths, [r["file"] for r in results])
+        self.assertEqual([True]*4 + [False], [r["verified"] for r in results])
+        for result in results[:4]:
+            self.assertEqual("ctx", result["values"]["context"])
+            self.assertNotEqual(os.getpid(), result["values"]["pid"])
+
+    @patch("sys.stdout.write")
+    def test_verify_attestation_batch_ok(self, _):
+        manifest = self.write("manifest.txt", "cert-0.json\ncert-1.json\n")
+        report_path = os.path.join(self.dir, "report.json")
+        options = SimpleNamespace(attestation_certificate_file_path=manifest,
+                                  output_file_path=report_path, workers=1)
+
+        verify_attestation_batch(options, make_test_verifier, {
+            "value": "ctx", "root_authority": "a-root", "pubkeys_hash": "aabbcc"})
+
+        with open(report_path, "r") as file:
+            report = json.load(file)
+        self.assertEqual("a-root", report["root_authority"])
+        self.assertEqual("aabbcc", report["pubkeys_hash"])
+        self.assertEqual(2, report["total"])
+        self.assertEqual(2, report["verified"])
+        self.assertEqual(0, report["failed"])
+        self.assertEqual(self.valid[:2], [c["file"] for c in report["certificates"]])
+
+    @patch("sys.stdout.write")
+    def test_verify_attestation_batch_failures(self, _):
+        report_path = os.path.join(self.dir, "report.json")
+        options = SimpleNamespace(attestation_certificate_file_path=self.dir,
+                                  output_file_path=report_path, workers=1)
+
+        with self.assertRaises(AdminError) as e:
+            verify_attestation_batch(options, make_test_verifier, {
+                "value": "ctx", "root_authority": "a-root", "pubkeys_hash": "aabbcc"})
+        self.assertIn("2 attestation certificate(s) failed verification",
+                      str(e.exception))
+
+        with open(report_path, "r") as file:
+            report = json.load(file)
+        self.assertEqual(6, report["total"])
+        self.assertEqual(4, report["verified"])
+        self.assertEqual(2, report["failed"])
+
+    @patch("sys.stdout.write")
+    def test_verify_attestation_batch_empty(self, _):
+        empty_dir = os.path.join(self.dir, "empty")
+        os.mkdir(empty_dir)
+        options = SimpleNamespace(attestation_certificate_file_path=empty_dir,
+                                  output_file_path=None, workers=1)
+
+        with self.assertRaises(AdminError):
+            verify_attestation_batch(options, make_test_verifier, {})
@@ -348,6 +348,100 @@ class TestHSMCertificate(TestCase):
             'device': (False, 'device')
         }, cert.validate_and_get_values(device_pubkey))
 
+    def make_chain_certificate(self, root_privkey, device_privkey, ud_value=None):
+        device_pubkey = device_privkey.pubkey.serialize(compressed=False).hex()
+        att_pubkey = ec.PrivateKey().pubkey.serialize(compressed=False).hex()
+
+        att_msg = 'ff' + att_pubkey
+        att_sig = device_privkey.ecdsa_serialize(
+            device_privkey.ecdsa_sign(bytes.fromhex(att_msg))).hex()
+
+        device_msg = (ud_value or os.urandom(16).hex()) + device_pubkey
+        device_sig = root_privkey.ecdsa_serialize(
+            root_privkey.ecdsa_sign(bytes.fromhex(device_msg))).hex()
+
+        return HSMCertificate({
+            "version": 1,
+            "targets": ["attestation", "device"],
+            "elements": [
+                {
+                    "name": "attestation",
+                    "message": att_msg,
+                    "signature": att_sig,
+                    "signed_by": "device"
+                },
+                {
+                    "name": "device",
+                    "message": device_msg,
+                    "signature": device_sig,
+                    "signed_by": "root"
+                }]
+        }), att_pubkey, device_pubkey
+
+    def test_validate_and_get_values_validates_shared_elements_once(self):
+        root_privkey = ec.PrivateKey()
+        root_of_trust = HSMCertificateRoot(
+            root_privkey.pubkey.serialize(compressed=False).hex())
+        cert, att_pubkey, device_pubkey = self.make_chain_certificate(
+            root_privkey, ec.PrivateKey())
+
+        with patch.object(HSMCertificateElement, "is_valid", autospec=True,
+                          side_effect=HSMCertificateElement.is_valid) as is_valid:
+            self.assertEqual({
+                'attestation': (True, att_pubkey, None),
+                'device': (True, device_pubkey, None)
+            }, cert.validate_and_get_values(root_of_trust))
+
+        self.assertEqual(["device", "attestation"],
+                         [c[0][0].name for c in is_valid.call_args_list])
+
+    def test_validate_and_get_values_validity_cache(self):
+        root_privkey = ec.PrivateKey()
+        root_of_trust = HSMCertificateRoot(
+            root_privkey.pubkey.serialize(compressed=False).hex())
+        device_privkey = ec.PrivateKey()
+        ud_value = os.urandom(16).hex()
+        cert_a, att_pubkey_a, device_pubkey = self.make_chain_certificate(
+            root_privkey, device_privkey, ud_value)
+        cert_b, att_pubkey_b, _ = self.make_chain_certificate(
+            root_privkey, device_privkey, ud_value)
+        cache = {}
+
+        with patch.object(HSMCertificateElement, "is_valid", autospec=True,
+                          side_effect=HSMCertificateElement.is_valid) as is_valid:
+            self.assertEqual({
+                'attestation': (True, att_pubkey_a, None),
+                'device': (True, device_pubkey, None)
+            }, cert_a.validate_and_get_values(root_of_trust, cache))
+            self.assertEqual({
+                'attestation': (True, att_pubkey_b, None),
+                'device': (True, device_pubkey, None)
+            }, cert_b.validate_and_get_values(root_of_trust, cache))
+
+        # The device element is shared and thus validated only once
+        self.assertEqual(["device", "attestation", "attestation"],
+                         [c[0][0].name for c in is_valid.call_args_list])
+        self.assertEqual(3, len(cache))
+        self.assertTrue(all(cache.values()))
+
+    def test_validate_and_get_values_validity_cache_keeps_invalid_results(self):
+        root_of_trust = HSMCertificateRoot(
+            ec.PrivateKey().pubkey.serialize(compressed=False).hex())
+        cert, _, _ = self.make_chain_certificate(ec.PrivateKey(), ec.PrivateKey())
+        cache = {}
+
+        expected = {
+            'attestation': (False, 'device'),
+            'device': (False, 'device')
+        }
+        self.assertEqual(expected, cert.validate_and_get_values(root_of_trust, cache))
+        self.assertEqual([False], list(cache.values()))
+
+        with patch.object(HSMCertificateElement, "is_valid") as is_valid:
+            self.assertEqual(expected,
+                             cert.validate_and_get_values(root_of_trust, cache))
+        is_valid.assert_not_called()
+
     def test_add_element_ok(self):
         cert = HSMCertificate()
         self.assertEqual({'version': 1, 'targets': [], 'elements': []}, cert.to_dict())
@@ -65,6 +65,11 @@ class TestHSMCertificateV2ElementSGXAttestationKey(TestCase):
             "10095d4ee272cf3c512e36779de67dc7814982f1160d981d138a32b265e928a0562",
             self.elem.signature)
 
+    def test_parsed_props_are_cached(self):
+        self.assertIs(self.elem.message, self.elem.message)
+        self.assertIs(self.elem.key, self.elem.key)
+        self.assertIs(self.elem.key, self.elem.get_pubkey())
+
     def test_to_dict(self):
         self.assertEqual(self.source, self.elem.to_dict())
 
@@ -62,6 +62,9 @@ class TestHSMCertificateV2ElementSGXQuote(TestCase):
         self.assertEqual("ddeeff", self.elem.custom_data)
         self.assertEqual("112233", self.elem.signature)
 
+    def test_message_is_cached(self):
+        self.assertIs(self.elem.message, self.elem.message)
+
     def test_dict_ok(self):
         self.assertEqual({
             "name": "thename",
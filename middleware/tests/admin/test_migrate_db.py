@@ -22,9 +22,10 @@
 
 from types import SimpleNamespace
 from unittest import TestCase
-from unittest.mock import Mock, patch, call
+from unittest.mock import Mock, patch, call, ANY
 from admin.migrate_db import do_migrate_db
 from admin.misc import AdminError
+from ledger.hsm2dongle import HSM2DongleError, HSM2DongleTimeoutError
 
 
 @patch("sys.stdout")
@@ -41,6 +42,7 @@ class TestMigrateDb(TestCase):
         options.destination_sgx_host = "sgx-host"
         options.destination_sgx_port = 2345
         options.migration_authorization_file_path = "a-migauth-path"
+        options.evidence_chunk_size = 1024
         self.options = options
 
     def setupMocks(self, sgx_migration_authorization, dispose_hsm, get_sgx_hsm,
@@ -103,9 +105,9 @@ class TestMigrateDb(TestCase):
         self.dst_hsm.migrate_db_get_evidence.assert_called()
 
         self.src_hsm.migrate_db_send_evidence.assert_called_with(
-            b"the destination evidence")
+            b"the destination evidence", 1024, ANY)
         self.dst_hsm.migrate_db_send_evidence.assert_called_with(
-            b"the source evidence")
+            b"the source evidence", 1024, ANY)
 
         self.src_hsm.migrate_db_get_data.assert_called()
         self.dst_hsm.migrate_db_send_data.assert_called_with(b"the source data")
@@ -291,7 +293,8 @@ class TestMigrateDb(TestCase):
             [b"sig-one", b"sig-two", b"sig-three"])
 
         self.src_hsm.migrate_db_get_evidence.assert_called()
-        self.dst_hsm.migrate_db_get_evidence.assert_not_called()
+        # Evidence is gathered concurrently from both devices
+        self.dst_hsm.migrate_db_get_evidence.assert_called()
         self.src_hsm.migrate_db_send_evidence.assert_not_called()
         self.dst_hsm.migrate_db_send_evidence.assert_not_called()
         self.src_hsm.migrate_db_get_data.assert_not_called()
@@ -310,6 +313,8 @@ class TestMigrateDb(TestCase):
 
         self.assertIn("Failed to migrate DB", e.exception.args[0])
         self.assertIn("sending bad bad", e.exception.args[0])
+        self.src_hsm.migrate_db_reset.assert_not_called()
+        self.dst_hsm.migrate_db_reset.assert_not_called()
 
         self.sgx_migration_authorization.from_jsonfile.assert_called_with(
             "a-migauth-path")
@@ -331,14 +336,94 @@ class TestMigrateDb(TestCase):
         self.src_hsm.migrate_db_get_evidence.assert_called()
         self.dst_hsm.migrate_db_get_evidence.assert_called()
         self.src_hsm.migrate_db_send_evidence.assert_called_with(
-            b"the destination evidence")
+            b"the destination evidence", 1024, ANY)
         self.dst_hsm.migrate_db_send_evidence.assert_called_with(
-            b"the source evidence")
+            b"the source evidence", 1024, ANY)
+        self.src_hsm.migrate_db_get_data.assert_not_called()
+        self.dst_hsm.migrate_db_send_data.assert_not_called()
+
+        self.assert_disposed_hsms()
+
+    def test_handshake_restarted_on_lost_ack(self, *args):
+        self.setupMocks(*args[:-1])
+
+        # The destination processes an evidence chunk but its ack is lost
+        # (real transports report this as a plain HSM2DongleError)
+        manager = Mock()
+        manager.attach_mock(self.src_hsm, "src")
+        manager.attach_mock(self.dst_hsm, "dst")
+        self.dst_hsm.migrate_db_send_evidence.side_effect = [
+            HSM2DongleError("ack lost"),
+            None,
+        ]
+
+        do_migrate_db(self.options)
+
+        # Both devices are reset and the whole handshake is redone,
+        # sending the evidence from the start
+        self.assertEqual(2, self.src_hsm.migrate_db_spec.call_count)
+        self.assertEqual(2, self.dst_hsm.migrate_db_spec.call_count)
+        self.assertEqual(2, self.src_hsm.migrate_db_get_evidence.call_count)
+        self.assertEqual(2, self.dst_hsm.migrate_db_get_evidence.call_count)
+        self.assertEqual([call(b"the destination evidence", 1024, ANY)]*2,
+                         self.src_hsm.migrate_db_send_evidence.call_args_list)
+        self.assertEqual([call(b"the source evidence", 1024, ANY)]*2,
+                         self.dst_hsm.migrate_db_send_evidence.call_args_list)
+        for name in ["src", "dst"]:
+            calls = [c[0] for c in manager.mock_calls
+                     if c[0].startswith(f"{name}.")]
+            restart = calls.index(f"{name}.disconnect")
+            self.assertEqual([
+                f"{name}.disconnect",
+                f"{name}.connect",
+                f"{name}.migrate_db_reset",
+                f"{name}.migrate_db_spec",
+            ], calls[restart:restart+4])
+
+        self.src_hsm.migrate_db_get_data.assert_called()
+        self.dst_hsm.migrate_db_send_data.assert_called_with(b"the source data")
+
+        self.assert_disposed_hsms()
+
+    def test_handshake_restart_limit(self, *args):
+        self.setupMocks(*args[:-1])
+
+        self.src_hsm.migrate_db_send_evidence.side_effect = \
+            HSM2DongleTimeoutError("keeps failing")
+
+        with self.assertRaises(AdminError) as e:
+            do_migrate_db(self.options)
+
+        self.assertIn("keeps failing", e.exception.args[0])
+        self.assertEqual(4, self.src_hsm.migrate_db_spec.call_count)
+        self.assertEqual(4, self.src_hsm.migrate_db_send_evidence.call_count)
+        self.assertEqual(3, self.src_hsm.migrate_db_reset.call_count)
+        self.assertEqual(3, self.dst_hsm.migrate_db_reset.call_count)
         self.src_hsm.migrate_db_get_data.assert_not_called()
         self.dst_hsm.migrate_db_send_data.assert_not_called()
 
         self.assert_disposed_hsms()
 
+    def test_send_evidence_progress(self, *args):
+        self.setupMocks(*args[:-1])
+
+        def send_evidence(evidence, chunk_size, on_progress):
+            for transferred in [10, 20, 30, 40]:
+                on_progress(transferred, 40)
+        self.src_hsm.migrate_db_send_evidence.side_effect = send_evidence
+
+        with patch("admin.migrate_db.info") as info:
+            do_migrate_db(self.options)
+
+        progress = [c[0][0] for c in info.call_args_list
+                    if c[0][0].startswith("Destination evidence to source")]
+        self.assertEqual([
+            "Destination evidence to source: 10/40 bytes (25%)",
+            "Destination evidence to source: 20/40 bytes (50%)",
+            "Destination evidence to source: 30/40 bytes (75%)",
+            "Destination evidence to source: 40/40 bytes (100%)",
+        ], progress)
+
     def test_get_data_fails(self, *args):
         self.setupMocks(*args[:-1])
 
@@ -370,9 +455,9 @@ class TestMigrateDb(TestCase):
         self.src_hsm.migrate_db_get_evidence.assert_called()
         self.dst_hsm.migrate_db_get_evidence.assert_called()
         self.src_hsm.migrate_db_send_evidence.assert_called_with(
-            b"the destination evidence")
+            b"the destination evidence", 1024, ANY)
         self.dst_hsm.migrate_db_send_evidence.assert_called_with(
-            b"the source evidence")
+            b"the source evidence", 1024, ANY)
         self.src_hsm.migrate_db_get_data.assert_called()
         self.dst_hsm.migrate_db_send_data.assert_not_called()
 
@@ -409,9 +494,9 @@ class TestMigrateDb(TestCase):
         self.src_hsm.migrate_db_get_evidence.assert_called()
         self.dst_hsm.migrate_db_get_evidence.assert_called()
         self.src_hsm.migrate_db_send_evidence.assert_called_with(
-            b"the destination evidence")
+            b"the destination evidence", 1024, ANY)
         self.dst_hsm.migrate_db_send_evidence.assert_called_with(
-            b"the source evidence")
+            b"the source evidence", 1024, ANY)
         self.src_hsm.migrate_db_get_data.assert_called()
         self.dst_hsm.migrate_db_send_data.assert_called_with(b"the source data")
 
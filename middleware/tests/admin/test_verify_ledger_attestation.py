@@ -25,7 +25,8 @@ from unittest import TestCase
 from unittest.mock import Mock, call, patch
 from admin.misc import AdminError
 from admin.pubkeys import PATHS
-from admin.verify_ledger_attestation import do_verify_attestation
+from admin.verify_ledger_attestation import do_verify_attestation, \
+    do_verify_attestation_batch, DEFAULT_ROOT_AUTHORITY
 import ecdsa
 import secp256k1 as ec
 import hashlib
@@ -356,3 +357,68 @@ class TestVerifyLedgerAttestation(TestCase):
 
         load_pubkeys_mock.assert_called_with(self.pubkeys_path)
         self.assertIn("Signer attestation message length mismatch", str(e.exception))
+
+    @patch("admin.verify_ledger_attestation.head")
+    @patch("admin.verify_ledger_attestation.verify_attestation_batch")
+    @patch("admin.verify_ledger_attestation.load_pubkeys")
+    def test_verify_attestation_batch(self, load_pubkeys_mock,
+                                      verify_attestation_batch_mock, head_mock, _):
+        load_pubkeys_mock.return_value = self.public_keys
+        att_cert = Mock()
+        att_cert.validate_and_get_values = Mock(return_value=self.result)
+
+        do_verify_attestation_batch(self.default_options)
+
+        load_pubkeys_mock.assert_called_once_with(self.pubkeys_path)
+        options, make_verifier, context = verify_attestation_batch_mock.call_args[0]
+        self.assertEqual(self.default_options, options)
+        self.assertEqual({
+            "root_authority": DEFAULT_ROOT_AUTHORITY,
+            "pubkeys_hash": self.pubkeys_hash.hex(),
+            "expected_ui_public_key": self.expected_ui_pubkey,
+        }, context)
+
+        values = make_verifier(context)(att_cert)
+        self.assertEqual(repr(att_cert.validate_and_get_values.call_args[0][0]),
+                         DEFAULT_ROOT_AUTHORITY)
+        self.assertEqual({
+            "ud_value": "aa"*32,
+            "public_key": self.expected_ui_pubkey,
+            "signer_hash": "cc"*32,
+            "signer_iteration": 291,
+            "hash": "ee"*32,
+            "version": "5.5",
+        }, values["ui"])
+        self.assertEqual({
+            "hash": "ff"*32,
+            "version": "5.5",
+            "platform": "plf",
+            "ud_value": "aa"*32,
+            "best_block": "bb"*32,
+            "last_signed_tx": "cc"*8,
+            "timestamp": 171,
+        }, values["signer"])
+
+    @patch("admin.verify_ledger_attestation.head")
+    @patch("admin.verify_ledger_attestation.verify_attestation_batch")
+    @patch("admin.verify_ledger_attestation.load_pubkeys")
+    def test_verify_attestation_batch_invalid_pubkeys(self, load_pubkeys_mock,
+                                                      verify_attestation_batch_mock,
+                                                      head_mock, _):
+        load_pubkeys_mock.side_effect = ValueError("pubkeys-error")
+
+        with self.assertRaises(AdminError) as e:
+            do_verify_attestation_batch(self.default_options)
+        self.assertEqual("pubkeys-error", str(e.exception))
+        verify_attestation_batch_mock.assert_not_called()
+
+    @patch("admin.verify_ledger_attestation.head")
+    @patch("admin.verify_ledger_attestation.verify_attestation_batch")
+    def test_verify_attestation_batch_invalid_root(self, verify_attestation_batch_mock,
+                                                   head_mock, _):
+        self.default_options.root_authority = "not-a-root"
+
+        with self.assertRaises(AdminError) as e:
+            do_verify_attestation_batch(self.default_options)
+        self.assertEqual("Invalid root authority", str(e.exception))
+        verify_attestation_batch_mock.assert_not_called()
@@ -26,7 +26,8 @@ from unittest.mock import Mock, patch
 from parameterized import parameterized
 from admin.misc import AdminError
 from admin.pubkeys import PATHS
-from admin.verify_sgx_attestation import do_verify_attestation, DEFAULT_ROOT_AUTHORITY
+from admin.verify_sgx_attestation import do_verify_attestation, \
+    do_verify_attestation_batch, DEFAULT_ROOT_AUTHORITY
 import ecdsa
 import secp256k1 as ec
 import hashlib
@@ -279,3 +280,63 @@ class TestVerifySgxAttestation(TestCase):
         HSMCertificate.from_jsonfile.assert_called_with(self.certification_path)
         self.mock_certificate.validate_and_get_values \
             .assert_called_with(self.root_of_trust)
+
+    @patch("admin.verify_sgx_attestation.HSMCertificateV2ElementX509")
+    @patch("admin.verify_sgx_attestation.verify_attestation_batch")
+    def test_verify_attestation_batch(self, verify_attestation_batch,
+                                      HSMCertificateV2ElementX509, get_root_of_trust,
+                                      load_pubkeys, HSMCertificate, head, _):
+        self.configure_mocks(get_root_of_trust, load_pubkeys, HSMCertificate, head)
+        self.root_of_trust.to_dict.return_value = "the-root-dict"
+        self.options.workers = 3
+
+        do_verify_attestation_batch(self.options)
+
+        get_root_of_trust.assert_called_once_with(DEFAULT_ROOT_AUTHORITY)
+        self.root_of_trust.is_valid.assert_called_with(self.root_of_trust)
+        load_pubkeys.assert_called_once_with(self.pubkeys_path)
+        HSMCertificate.from_jsonfile.assert_not_called()
+
+        options, make_verifier, context = verify_attestation_batch.call_args[0]
+        self.assertEqual(self.options, options)
+        self.assertEqual({
+            "root_authority": DEFAULT_ROOT_AUTHORITY,
+            "root_of_trust": "the-root-dict",
+            "pubkeys_hash": self.expected_pubkeys_hash,
+        }, context)
+
+        # The per worker verifier rebuilds the root of trust just once
+        verify = make_verifier(context)
+        HSMCertificateV2ElementX509.assert_called_once_with("the-root-dict")
+        self.assertEqual({
+            "mrenclave": "aabbccdd",
+            "mrsigner": "1122334455",
+            "version": "5.5",
+            "platform": "plf",
+            "ud_value": "aa"*32,
+            "best_block": "bb"*32,
+            "last_signed_tx": "cc"*8,
+            "timestamp": 205,
+        }, verify(self.mock_certificate))
+        self.mock_certificate.validate_and_get_values.assert_called_with(
+            HSMCertificateV2ElementX509.return_value, {})
+        HSMCertificateV2ElementX509.assert_called_once()
+
+        self.public_keys.popitem()
+        context["pubkeys_hash"] = "00"*32
+        with self.assertRaises(AdminError) as e:
+            make_verifier(context)(self.mock_certificate)
+        self.assertIn("hash mismatch", str(e.exception))
+
+    @patch("admin.verify_sgx_attestation.verify_attestation_batch")
+    def test_verify_attestation_batch_no_certificates(self, verify_attestation_batch,
+                                                      get_root_of_trust, load_pubkeys,
+                                                      HSMCertificate, head, _):
+        self.configure_mocks(get_root_of_trust, load_pubkeys, HSMCertificate, head)
+        self.options.attestation_certificate_file_path = None
+
+        with self.assertRaises(AdminError):
+            do_verify_attestation_batch(self.options)
+
+        get_root_of_trust.assert_not_called()
+        verify_attestation_batch.assert_not_called()
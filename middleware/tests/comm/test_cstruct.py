@@ -88,6 +88,50 @@ class ValidWithInvalid(CStruct):
     """
 
 
+class ReservedName(CStruct):
+    """
+    reserved_name
+
+    uint8_t to_dict
+    """
+
+
+class CollidingMethod(CStruct):
+    """
+    colliding_method_t
+
+    uint8_t number
+    """
+
+    def number(self):
+        return 1
+
+
+class CollidingProperty(CStruct):
+    """
+    colliding_property_t
+
+    uint8_t number
+    """
+
+    @property
+    def number(self):
+        return 1
+
+
+class OverridingStruct(CStruct):
+    """
+    overriding_t
+
+    uint8_t name 3
+    uint16_t number
+    """
+
+    def __init__(self, value, offset=0, little=True):
+        super().__init__(value, offset, little)
+        self.name = self.name.decode("ASCII")
+
+
 class TestCStruct(TestCase):
     def setUp(self):
         self.packed = bytes.fromhex(
@@ -221,3 +265,78 @@ class TestCStruct(TestCase):
 
         with self.assertRaises(ValueError):
             kls(b'somethingtoparse')
+
+    def test_invalid_field_name(self):
+        with self.assertRaises(ValueError):
+            ReservedName.get_bytelength()
+
+    @parameterized.expand([
+        ("method", CollidingMethod),
+        ("property", CollidingProperty),
+    ])
+    def test_field_name_collision(self, _, kls):
+        number = kls.__dict__["number"]
+
+        with self.assertRaises(ValueError):
+            kls.get_bytelength()
+
+        self.assertIs(number, kls.__dict__["number"])
+
+    def test_accessors_installed_on_class(self):
+        RandomStruct.get_bytelength()
+
+        for name in ["single_val", "double_val", "quad_val", "oct_val",
+                     "other_random", "yet_other_random"]:
+            self.assertIn(name, RandomStruct.__dict__)
+
+    def test_nested_parsed_lazily(self):
+        parsed = RandomStruct(self.packed)
+
+        self.assertEqual({}, parsed._nested_values)
+        other_random = parsed.other_random
+        self.assertIsInstance(other_random, RandomBisStruct)
+        self.assertIs(other_random, parsed.other_random)
+        self.assertEqual(["other_random"], list(parsed._nested_values.keys()))
+        self.assertEqual(self.packed[15:31], other_random.get_raw_data())
+
+    def test_parsing_memoryview_no_copy(self):
+        buffer = b"thisisrandom" + self.packed
+        parsed = RandomStruct(memoryview(buffer), offset=12)
+
+        self.assertEqual(0x99, parsed.single_val)
+        self.assertEqual(bytes.fromhex("ccddee"), parsed.yet_other_random.arr_two)
+        self.assertIsInstance(parsed.get_raw_data(), memoryview)
+        self.assertEqual(self.packed, parsed.get_raw_data())
+
+        # Nested structs are parsed from the very same buffer
+        self.assertIs(buffer, parsed.other_random._raw_value.obj)
+
+    @parameterized.expand([
+        ("bytearray", lambda b: b),
+        ("memoryview", memoryview),
+    ])
+    def test_parsing_mutable_buffer_copies(self, _, wrap):
+        buffer = bytearray(b"thisisrandom" + self.packed)
+        parsed = RandomStruct(wrap(buffer), offset=12)
+
+        # Changes to the caller's buffer don't affect lazily parsed nested structs
+        buffer[12 + 15] = 0x77
+        self.assertEqual(0x9988, parsed.other_random.another_double)
+        self.assertEqual(self.packed, parsed.get_raw_data())
+
+    def test_parsing_non_bytes_like(self):
+        with self.assertRaises(ValueError):
+            RandomStruct("not bytes")
+
+    def test_instance_override(self):
+        parsed = OverridingStruct(b"abc" + bytes.fromhex("0102"))
+
+        self.assertEqual("abc", parsed.name)
+        self.assertEqual(0x0201, parsed.number)
+        self.assertEqual({"name": "616263", "number": 0x0201}, parsed.to_dict())
+
+    def test_unknown_property(self):
+        parsed = RandomStruct(self.packed)
+
+        with self.assertRaises(NameError):
+            parsed.does_not_exist
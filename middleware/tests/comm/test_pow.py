@@ -0,0 +1,164 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 RSK Labs Ltd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from unittest import TestCase
+from comm.bitcoin import get_block_hash_as_int, get_merkle_root
+import comm.pow as pow
+import hashlib
+
+import logging
+
+logging.disable(logging.CRITICAL)
+
+COINBASE_TX = ("0000000000000400f1f2c62bc5bfded2c12c1696ff5ecd3d8ee4867bf5b0b5d4"
+               "2b8ed2433fe4dec552534b424c4f434b3ad5d88f5f3b7bddc4ab6ed59a7f771e"
+               "7974a31ad60000000000000000000004e2ffffffff0100f2052a010000002321"
+               "03afcefd7798b549c7d178bac0ecb93c270f39d688a439a642a6b2458962e5cd"
+               "65ac00000000")
+
+
+def make_proof(coinbase_tx_hash_hex, nodes):
+    current_left = bytes.fromhex(coinbase_tx_hash_hex)
+    merkle_proof = b""
+    for i in range(nodes):
+        right = hashlib.sha256(bytes([i])).digest()
+        merkle_proof += right
+        current_left = pow.combine_left_right(current_left, right)
+    return merkle_proof.hex(), bytes(reversed(current_left)).hex()
+
+
+def make_btc_header(merkle_root_hex, nonce):
+    return ("711101000000000000000000000000000000000000000000000000000000000000000"
+            f"000{merkle_root_hex}22c0355fffff7f21") + \
+        nonce.to_bytes(4, byteorder="big", signed=False).hex()
+
+
+class TestIsValidMerkleProof(TestCase):
+    def setUp(self):
+        self.cb_hash = pow.coinbase_tx_get_hash(COINBASE_TX)
+
+    def test_valid(self):
+        for nodes in [0, 1, 2, 5, 30]:
+            merkle_proof, root = make_proof(self.cb_hash, nodes)
+            self.assertTrue(pow.is_valid_merkle_proof(merkle_proof, root, self.cb_hash))
+
+    def test_invalid_root(self):
+        merkle_proof, root = make_proof(self.cb_hash, 3)
+        self.assertFalse(pow.is_valid_merkle_proof(merkle_proof, "aa"*32, self.cb_hash))
+
+    def test_invalid_length(self):
+        merkle_proof, root = make_proof(self.cb_hash, 3)
+        self.assertFalse(pow.is_valid_merkle_proof(merkle_proof + "aa", root,
+                                                   self.cb_hash))
+
+    def test_invalid_hex(self):
+        with self.assertRaises(ValueError):
+            pow.is_valid_merkle_proof("not-a-hex", "aa"*32, self.cb_hash)
+
+
+class TestAreValidMerkleProofs(TestCase):
+    def setUp(self):
+        self.cb_hash = pow.coinbase_tx_get_hash(COINBASE_TX)
+
+    def test_mixed(self):
+        mp1, root1 = make_proof(self.cb_hash, 1)
+        mp2, root2 = make_proof(self.cb_hash, 7)
+        mp3, root3 = make_proof(self.cb_hash, 4)
+
+        result = pow.are_valid_merkle_proofs([
+            (mp1, root1, self.cb_hash),
+            (bytes.fromhex(mp2), bytes.fromhex(root2), bytes.fromhex(self.cb_hash)),
+            (mp3, root1, self.cb_hash),
+            (mp3 + "aabb", root3, self.cb_hash),
+            ("not-a-hex", root3, self.cb_hash),
+            (memoryview(bytes.fromhex(mp3)), root3, self.cb_hash),
+        ])
+        self.assertEqual([True, True, False, False, False, True], result)
+
+    def test_empty(self):
+        self.assertEqual([], pow.are_valid_merkle_proofs([]))
+
+
+class TestBtcHeader(TestCase):
+    def test_hash_as_int(self):
+        header = make_btc_header("bb"*32, 123)
+        self.assertEqual(get_block_hash_as_int(header),
+                         pow.btc_header_hash_as_int(header))
+        self.assertEqual(get_block_hash_as_int(header),
+                         pow.btc_header_hash_as_int(bytes.fromhex(header)))
+
+    def test_merkle_root(self):
+        header = make_btc_header("0102"*16, 123)
+        self.assertEqual(get_merkle_root(header),
+                         pow.btc_header_merkle_root(header).hex())
+
+    def test_invalid_length(self):
+        with self.assertRaises(ValueError):
+            pow.btc_header_hash_as_int("aa"*79)
+
+        with self.assertRaises(ValueError):
+            pow.btc_header_merkle_root("aa"*81)
+
+
+class TestPowBatch(TestCase):
+    def setUp(self):
+        cb_hash = pow.coinbase_tx_get_hash(COINBASE_TX)
+        self.merkle_proof, merkle_root = make_proof(cb_hash, 5)
+
+        # Find a nonce that satisfies difficulty 2
+        nonce = 0
+        while True:
+            self.header = make_btc_header(merkle_root, nonce)
+            if get_block_hash_as_int(self.header) <= pow.difficulty_to_target(2):
+                break
+            nonce += 1
+
+        # Difficulty that certainly won't be met
+        self.hard_difficulty = (pow.difficulty_to_target(1) //
+                                (get_block_hash_as_int(self.header) + 1)) + 10
+
+    def test_all_valid(self):
+        entries = [
+            (self.header, self.merkle_proof, COINBASE_TX, 2),
+            (bytes.fromhex(self.header), bytes.fromhex(self.merkle_proof),
+             bytes.fromhex(COINBASE_TX), 1),
+        ]
+        self.assertEqual([True, True], pow.validate_pow_batch(entries))
+        self.assertTrue(pow.is_valid_pow_batch(entries))
+
+    def test_invalid_entries(self):
+        entries = [
+            (self.header, self.merkle_proof, COINBASE_TX, 2),
+            (self.header, self.merkle_proof, COINBASE_TX, self.hard_difficulty),
+            (self.header, self.merkle_proof[:-64], COINBASE_TX, 2),
+            (self.header, self.merkle_proof + "aa", COINBASE_TX, 2),
+            (self.header, self.merkle_proof, COINBASE_TX[:-2] + "01", 2),
+            (self.header[:-2], self.merkle_proof, COINBASE_TX, 2),
+            ("not-a-hex", self.merkle_proof, COINBASE_TX, 2),
+        ]
+        self.assertEqual([True, False, False, False, False, False, False],
+                         pow.validate_pow_batch(entries))
+        self.assertFalse(pow.is_valid_pow_batch(entries))
+
+    def test_empty(self):
+        self.assertEqual([], pow.validate_pow_batch([]))
+        self.assertTrue(pow.is_valid_pow_batch([]))
@@ -59,6 +59,52 @@ class TestTCPServer(TestCase):
         self.assertEqual(self.server.server.serve_forever.call_count, 1)
         self.assertEqual(self.server.server.server_close.call_count, 1)
 
+    @patch("socketserver.TCPServer")
+    def test_run_on_ready(self, TCPServerMock):
+        TCPServerMock.return_value = Mock()
+        on_ready = Mock()
+        self.server = TCPServer("a-host", 1234, self.protocol, on_ready=on_ready)
+
+        self.server.run()
+
+        self.assert_server_setup_ok(TCPServerMock)
+        self.assertEqual(on_ready.call_args_list, [call()])
+        self.assertEqual(self.server.server.serve_forever.call_count, 1)
+
+    @patch("comm.server.os.unlink")
+    @patch("socketserver.TCPServer")
+    @patch("socketserver.UnixStreamServer")
+    def test_run_unix_socket(self, UnixStreamServerMock, TCPServerMock, unlink):
+        UnixStreamServerMock.return_value = Mock()
+        unlink.side_effect = [None, FileNotFoundError()]
+        self.server = TCPServer("a-host", 1234, self.protocol,
+                                unix_socket_path="/a/socket/path")
+
+        self.server.run()
+
+        self.assertEqual(self.protocol.initialize_device.call_count, 1)
+        self.assertEqual(UnixStreamServerMock.call_args_list,
+                         [call("/a/socket/path", ANY)])
+        TCPServerMock.assert_not_called()
+        self.assertEqual(self.server.server.serve_forever.call_count, 1)
+        self.assertEqual(self.server.server.server_close.call_count, 1)
+        # Stale socket file removed before binding, and socket file
+        # removed on termination
+        self.assertEqual([call("/a/socket/path"), call("/a/socket/path")],
+                         unlink.call_args_list)
+
+    @patch("socketserver.TCPServer")
+    def test_run_initialize_device_error_not_ready(self, TCPServerMock):
+        TCPServerMock.return_value = Mock()
+        on_ready = Mock()
+        self.server = TCPServer("a-host", 1234, self.protocol, on_ready=on_ready)
+        self.protocol.initialize_device.side_effect = NotImplementedError()
+
+        with self.assertRaises(TCPServerError):
+            self.server.run()
+
+        self.assertFalse(on_ready.called)
+
     @patch("socketserver.TCPServer")
     def test_run_interrupt(self, TCPServerMock):
         TCPServerMock.return_value = Mock()
@@ -132,6 +178,16 @@ class TestTCPServerRequestHandler(TestCase):
             [call(self.client_address[0], self.handler.rfile, self.handler.wfile)],
         )
 
+    def test_handles_unix_client_ok(self, RequestHandlerMock, TCPServerMock):
+        self.prepare(RequestHandlerMock, TCPServerMock)
+        self.client_address = ""
+        self.handle(RequestHandlerMock, TCPServerMock)
+
+        self.assertEqual(
+            RequestHandlerMock.return_value.handle.call_args_list,
+            [call("unix", self.handler.rfile, self.handler.wfile)],
+        )
+
     def test_handler_correct_subclass(self, RequestHandlerMock, TCPServerMock):
         self.prepare(RequestHandlerMock, TCPServerMock)
         self.handle(RequestHandlerMock, TCPServerMock)
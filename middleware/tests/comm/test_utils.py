@@ -20,8 +20,10 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import io
+import json
 from unittest import TestCase
-from comm.utils import bitwise_and_bytes, keccak_256
+from comm.utils import bitwise_and_bytes, keccak_256, iter_json_array
 from parameterized import parameterized
 
 import logging
@@ -1251,3 +1253,44 @@ class TestKeccak256(TestCase):
             return keccak_256(b).hex()
 
         self.assertEqual(expected_hash, kb(bs))
+
+
+class TestIterJsonArray(TestCase):
+    @parameterized.expand([
+        ("empty", []),
+        ("single", [1]),
+        ("numbers", list(range(100))),
+        ("mixed", [12345, "ab,]c", {"x": [1, 2]}, None, 1.5e10, [[]], True]),
+        ("hex strings", ["aa"*100, "bb"*200, "cc"]),
+    ])
+    def test_ok(self, _, data):
+        for text in [json.dumps(data), json.dumps(data, indent=3)]:
+            for read_size in [1, 3, 64*1024]:
+                self.assertEqual(data, list(iter_json_array(io.StringIO(text),
+                                                            read_size)))
+
+    def test_number_split_across_reads(self):
+        # "1.5e10" is read as "1.5e" and "10": the first part decodes
+        # as 1.5 followed by more data, but it's not the whole element
+        self.assertEqual([1.5e10, 2], list(iter_json_array(
+            io.StringIO("[1.5e10, 2]"), read_size=5)))
+
+    def test_lazy(self):
+        datafile = io.StringIO(json.dumps(list(range(1000))))
+        elements = iter_json_array(datafile, read_size=10)
+
+        self.assertEqual([0, 1, 2], [next(elements) for _ in range(3)])
+        self.assertLess(datafile.tell(), 50)
+
+    @parameterized.expand([
+        ("empty", ""),
+        ("not an array", "{}"),
+        ("unterminated", "[1, 2"),
+        ("unterminated after separator", "[1,"),
+        ("missing separator", "[1 2]"),
+        ("trailing separator", "[1,]"),
+        ("invalid element", "[1, nope]"),
+    ])
+    def test_invalid(self, _, text):
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO(text), read_size=2))
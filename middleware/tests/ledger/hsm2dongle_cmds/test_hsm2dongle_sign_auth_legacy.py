@@ -20,13 +20,14 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-from unittest.mock import Mock, patch, call
+from unittest.mock import Mock, patch
 from parameterized import parameterized
 from tests.ledger.test_hsm2dongle import TestHSM2DongleBase, HSM2DongleTestMode
 from ledger.hsm2dongle import (
     HSM2DongleError,
     SighashComputationMode,
 )
+from ledger.version import HSM2FirmwareVersion
 from ledgerblue.commException import CommException
 
 import logging
@@ -77,10 +78,9 @@ class TestHSM2DongleSignAuthorizedLegacy(TestHSM2DongleBase):
             self.do_sign_auth(spec)
         )
         self.assert_exchange(spec["requests"])
-        self.assertEqual(
-            [call(bytes.fromhex("aabbccdd"))],
-            HSM2DongleSignatureMock.call_args_list,
-        )
+        self.assertEqual(1, HSM2DongleSignatureMock.call_count)
+        response, offset = HSM2DongleSignatureMock.call_args[0]
+        self.assertEqual(bytes.fromhex("aabbccdd"), bytes(response[offset:]))
 
     @parameterized.expand([
         ("data_size", 0x6A87, -4),
@@ -275,3 +275,80 @@ class TestHSM2DongleSignAuthorizedLegacy(TestHSM2DongleBase):
 class TestHSM2DongleSGXSignAuthorizedLegacy(TestHSM2DongleSignAuthorizedLegacy):
     def get_test_mode(self):
         return HSM2DongleTestMode.SGX
+
+    def setUp(self):
+        super().setUp()
+
+        self.hsm2dongle.version = HSM2FirmwareVersion(5, 5, 2)
+        self.CHUNKED_LEGACY_SPEC = self.LEGACY_SPEC
+
+        # Each payload goes in full, so the chunked exchanges the inherited
+        # tests stop at map to the single exchange that replaces them
+        self.LEGACY_SPEC = {
+            **self.LEGACY_SPEC,
+            "exchanges": [
+                "q-path >02 01 11223344 D2040000",
+                "a-tx0  <02 02 0C",
+                "q-tx0  >02 02 0F000000 00 0000 AABBCCDDEE FF7788",
+                "a-rc0  <02 04 04",
+                "q-rc0  >02 04 00112233 445566778899",
+                "a-mp0  <02 08 04",
+                "q-mp0  >02 08 03 03 3344 55 02 66 77 05 aabbccddee",
+                "a-sig  <02 81 AABBCCDD",
+            ],
+            "stops": {
+                "a-tx1": "a-rc0",
+                "a-rc1": "a-mp0",
+                "a-mp2": "a-sig",
+            },
+        }
+
+    @patch("ledger.hsm2dongle.HSM2DongleSignature")
+    def test_receipt_too_big_for_full_data(self, HSM2DongleSignatureMock):
+        # Payloads that don't fit in a single APDU are sent in chunks
+        receipt = self.buf(2051)
+        exchanges = [
+            "q-path >02 01 11223344 D2040000",
+            "a-tx0  <02 02 0C",
+            "q-tx0  >02 02 0F000000 00 0000 AABBCCDDEEFF7788",
+        ]
+        for index, offset in enumerate(range(0, len(receipt), 80)):
+            chunk = receipt[offset:offset+80]
+            exchanges.append(f"a-rc{index} <02 04 {len(chunk):02x}")
+            exchanges.append(f"q-rc{index} >02 04 {chunk.hex()}")
+        exchanges += [
+            "a-mp0  <02 08 04",
+            "q-mp0  >02 08 03 03 334455 02 6677 05 aabbccddee",
+            "a-sig  <02 81 AABBCCDD",
+        ]
+        pex = self.parse_exchange_spec(exchanges)
+        self.dongle.exchange.side_effect = pex["responses"]
+        key_id = Mock(**{"to_binary.return_value": bytes.fromhex("11223344")})
+        HSM2DongleSignatureMock.return_value = "the-signature"
+
+        self.assertEqual(
+            (True, "the-signature"),
+            self.do_sign_auth({
+                **self.LEGACY_SPEC, "keyid": key_id, "receipt": receipt.hex()
+            })
+        )
+        self.assert_exchange(pex["requests"])
+        self.assertEqual(1 + 1 + 26 + 1, len(pex["requests"]))
+
+    @parameterized.expand([
+        ("unknown", None),
+        ("former", HSM2FirmwareVersion(5, 5, 1)),
+    ])
+    @patch("ledger.hsm2dongle.HSM2DongleSignature")
+    def test_chunked_before_full_data_version(self, _, version,
+                                              HSM2DongleSignatureMock):
+        self.hsm2dongle.version = version
+        key_id = Mock(**{"to_binary.return_value": bytes.fromhex("11223344")})
+        spec = self.process_sign_auth_spec({**self.CHUNKED_LEGACY_SPEC, "keyid": key_id})
+        HSM2DongleSignatureMock.return_value = "the-signature"
+
+        self.assertEqual(
+            (True, "the-signature"),
+            self.do_sign_auth(spec)
+        )
+        self.assert_exchange(spec["requests"])
@@ -20,13 +20,14 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-from unittest.mock import Mock, patch, call
+from unittest.mock import Mock, patch
 from parameterized import parameterized
 from tests.ledger.test_hsm2dongle import TestHSM2DongleBase, HSM2DongleTestMode
 from ledger.hsm2dongle import (
     HSM2DongleError,
     SighashComputationMode,
 )
+from ledger.version import HSM2FirmwareVersion
 from ledgerblue.commException import CommException
 
 import logging
@@ -81,10 +82,9 @@ class TestHSM2DongleSignAuthorizedSegwit(TestHSM2DongleBase):
             self.do_sign_auth(spec)
         )
         self.assert_exchange(spec["requests"])
-        self.assertEqual(
-            [call(bytes.fromhex("aabbccdd"))],
-            HSM2DongleSignatureMock.call_args_list,
-        )
+        self.assertEqual(1, HSM2DongleSignatureMock.call_count)
+        response, offset = HSM2DongleSignatureMock.call_args[0]
+        self.assertEqual(bytes.fromhex("aabbccdd"), bytes(response[offset:]))
 
     def test_long_witness_script_length(self):
         exchanges = [
@@ -152,3 +152,68 @@ class TestHSM2DongleSignAuthorizedSegwit(TestHSM2DongleBase):
 class TestHSM2DongleSGXSignAuthorizedSegwit(TestHSM2DongleSignAuthorizedSegwit):
     def get_test_mode(self):
         return HSM2DongleTestMode.SGX
+
+    def setUp(self):
+        super().setUp()
+
+        self.hsm2dongle.version = HSM2FirmwareVersion(5, 5, 2)
+        self.CHUNKED_SEGWIT_SPEC = self.SEGWIT_SPEC
+
+        # Each payload goes in full, so the chunked exchanges the inherited
+        # tests stop at map to the single exchange that replaces them
+        self.SEGWIT_SPEC = {
+            **self.SEGWIT_SPEC,
+            "exchanges": [
+                "q-path >02 01 11223344 D2040000",
+                "a-tx0  <02 02 0C",
+                "q-tx0  >02 02 0F000000 01 0E00 AABBCCDDEE FF7788 0522446688 "
+                "AA 992C0A0000000000",
+                "a-rc0  <02 04 04",
+                "q-rc0  >02 04 00112233 445566778899",
+                "a-mp0  <02 08 04",
+                "q-mp0  >02 08 03 03 3344 55 02 66 77 05 aabbccddee",
+                "a-sig  <02 81 AABBCCDD",
+            ],
+            "stops": {
+                "a-tx1": "a-rc0",
+                "a-tx2": "a-rc0",
+                "a-tx3": "a-rc0",
+            },
+        }
+
+    def test_long_witness_script_length(self):
+        exchanges = [
+                "q-path >02 01 11223344 D2040000",
+                "a-tx0  <02 02 0C",
+                "q-tx0  >02 02 0F000000 01 0D01 AABBCCDDEE FF7788 FD0201 " +
+                self.buf(258).hex() + " 992C0A0000000000",
+                "a-rc0  <FF",
+        ]
+        key_id = Mock(**{"to_binary.return_value": bytes.fromhex("11223344")})
+        spec = self.process_sign_auth_spec({
+                **self.SEGWIT_SPEC, "exchanges": exchanges,
+                "keyid": key_id, "ws": self.buf(258).hex()
+            }, stop="a-rc0", replace=CommException("forced-stop", 0xFFFF)
+        )
+
+        with self.assertRaises(HSM2DongleError):
+            self.do_sign_auth(spec)
+        self.assert_exchange(spec["requests"])
+
+    @parameterized.expand([
+        ("unknown", None),
+        ("former", HSM2FirmwareVersion(5, 5, 1)),
+    ])
+    @patch("ledger.hsm2dongle.HSM2DongleSignature")
+    def test_chunked_before_full_data_version(self, _, version,
+                                              HSM2DongleSignatureMock):
+        self.hsm2dongle.version = version
+        key_id = Mock(**{"to_binary.return_value": bytes.fromhex("11223344")})
+        spec = self.process_sign_auth_spec({**self.CHUNKED_SEGWIT_SPEC, "keyid": key_id})
+        HSM2DongleSignatureMock.return_value = "the-signature"
+
+        self.assertEqual(
+            (True, "the-signature"),
+            self.do_sign_auth(spec)
+        )
+        self.assert_exchange(spec["requests"])
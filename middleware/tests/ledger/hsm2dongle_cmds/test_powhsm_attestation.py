@@ -62,6 +62,30 @@ class TestPowHsmAttestation(TestHSM2DongleBase):
             bytes.fromhex("5003"),
         ])
 
+    def test_ok_on_page(self):
+        self.dongle.exchange.side_effect = [
+            bytes.fromhex("aabbcc" + self.SIG),
+            bytes.fromhex("aabbcc01112233445566778899"),
+            bytes.fromhex("aabbcc00aabbccddeeff"),
+            bytes.fromhex("aabbcc0112345678"),
+            bytes.fromhex("aabbcc001122334455"),
+            bytes.fromhex("aabbcc334455667788aabbccdd"),
+        ]
+
+        pages = []
+        result = self.hsm2dongle.get_powhsm_attestation(
+            "aa" + "bb"*30 + "cc",
+            lambda name, page: pages.append((name, bytes(page).hex())))
+
+        self.assertEqual("112233445566778899aabbccddeeff", result["message"])
+        self.assertEqual("123456781122334455", result["envelope"])
+        self.assertEqual([
+            ("message", "112233445566778899"),
+            ("message", "aabbccddeeff"),
+            ("envelope", "12345678"),
+            ("envelope", "1122334455"),
+        ], pages)
+
     def test_legacy_ok(self):
         self.dongle.exchange.side_effect = [
             bytes.fromhex("aabbcc" + self.SIG),
@@ -0,0 +1,146 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 RSK Labs Ltd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+import rlp
+from ledger.block_batch import BlockBatchReader, BlockBatchWriter, BlockBatchError, \
+                               write_block_batch
+
+import logging
+
+logging.disable(logging.CRITICAL)
+
+
+def make_block(n, mm_fields=True):
+    fields = [bytes([n])*32] + [bytes([n, i]) for i in range(16)]
+    if mm_fields:
+        fields += [b"btc-header-%d" % n, b"merkle-proof", b"coinbase-%d" % n]
+    return rlp.encode(fields)
+
+
+def fake_coinbase_tx_hash(cbtx_hex):
+    return (bytes.fromhex(cbtx_hex) + bytes(32))[:32].hex()
+
+
+@patch("ledger.block_utils.coinbase_tx_get_hash", new=fake_coinbase_tx_hash)
+class TestBlockBatch(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "blocks.bin")
+        self.blocks = [make_block(n) for n in range(5)]
+        self.brothers = [[]] + [[make_block(100 + 10*i + n) for n in range(i)]
+                                for i in range(1, 5)]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_roundtrip(self):
+        write_block_batch(self.path, map(lambda b: b.hex(), self.blocks),
+                          self.brothers)
+
+        with BlockBatchReader(self.path) as reader:
+            self.assertEqual(5, len(reader))
+            entries = list(reader)
+
+        self.assertEqual(self.blocks, list(map(lambda e: e.header, entries)))
+        self.assertEqual(self.brothers, list(map(lambda e: e.brothers, entries)))
+
+    def test_random_access(self):
+        write_block_batch(self.path, self.blocks, self.brothers)
+
+        with BlockBatchReader(self.path) as reader:
+            self.assertEqual(self.blocks[3], reader[3].header)
+            self.assertEqual(self.brothers[3], reader[3].brothers)
+            self.assertEqual(self.blocks[4], reader[-1].header)
+            self.assertEqual(self.blocks[2], reader.header(2))
+            self.assertEqual(2, reader.brothers_count(2))
+            with self.assertRaises(IndexError):
+                reader[5]
+            with self.assertRaises(IndexError):
+                reader.header(-6)
+
+    def test_without_brothers_nor_mm_fields(self):
+        blocks = [make_block(n, mm_fields=False) for n in range(3)]
+        write_block_batch(self.path, blocks)
+
+        with BlockBatchReader(self.path) as reader:
+            entries = list(reader)
+
+        self.assertEqual(blocks, list(map(lambda e: e.header, entries)))
+        self.assertEqual([[]]*3, list(map(lambda e: e.brothers, entries)))
+
+    def test_empty(self):
+        write_block_batch(self.path, [])
+
+        with BlockBatchReader(self.path) as reader:
+            self.assertEqual(0, len(reader))
+            self.assertEqual([], list(reader))
+
+    def test_writer_invalid_block(self):
+        with self.assertRaises(BlockBatchError):
+            with BlockBatchWriter(self.path) as writer:
+                writer.add(rlp.encode([b"too", b"few", b"fields"]))
+
+    def test_brothers_length_mismatch(self):
+        with self.assertRaises(ValueError):
+            write_block_batch(self.path, self.blocks, self.brothers[:-1])
+
+    def test_reader_incomplete_file(self):
+        writer = BlockBatchWriter(self.path)
+        writer.add(self.blocks[0])
+        writer.file.close()
+
+        with self.assertRaises(BlockBatchError):
+            BlockBatchReader(self.path)
+
+    def test_reader_invalid_magic(self):
+        write_block_batch(self.path, self.blocks)
+        with open(self.path, "r+b") as f:
+            f.write(b"XXXX")
+
+        with self.assertRaises(BlockBatchError):
+            BlockBatchReader(self.path)
+
+    def test_reader_unsupported_version(self):
+        write_block_batch(self.path, self.blocks)
+        with open(self.path, "r+b") as f:
+            f.seek(4)
+            f.write(b"\x01")
+
+        with self.assertRaises(BlockBatchError):
+            BlockBatchReader(self.path)
+
+    def test_reader_empty_file(self):
+        open(self.path, "wb").close()
+
+        with self.assertRaises(BlockBatchError):
+            BlockBatchReader(self.path)
+
+    def test_reader_too_short(self):
+        with open(self.path, "wb") as f:
+            f.write(b"HSMB")
+
+        with self.assertRaises(BlockBatchError):
+            BlockBatchReader(self.path)
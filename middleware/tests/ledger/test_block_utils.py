@@ -21,7 +21,7 @@
 # SOFTWARE.
 
 from unittest import TestCase
-from unittest.mock import Mock, call
+from unittest.mock import Mock, call, patch
 from parameterized import parameterized
 import rlp
 import ledger.block_utils as bu
@@ -111,5 +111,72 @@ class TestBlockUtils(TestCase):
 
         self.assertEqual(self._makeblock(expected_fields), rlp.decode(result_bytes))
 
+    @parameterized.expand([
+        ("", 0),
+        ("single byte", 1),
+        ("single byte, high", 1, 0x80),
+        ("short", 55),
+        ("long", 56),
+        ("very long", 70000),
+    ])
+    def test_rlp_encoded_length(self, _, length, value=0x01):
+        item = bytes([value])*length
+        self.assertEqual(len(rlp.encode(item)), bu.rlp_encoded_length(item))
+
+    def test_rlp_encoded_length_list(self):
+        item = [b"a", [b"bb", b"c"*100]]
+        self.assertEqual(len(rlp.encode(item)), bu.rlp_encoded_length(item))
+
+    @parameterized.expand([
+        ("empty", 0),
+        ("short", 55),
+        ("long", 56),
+        ("very long", 70000),
+    ])
+    def test_rlp_list_prefix_and_payload_offset(self, _, length):
+        encoded = rlp.encode([b"\x01"*length]) if length > 0 else rlp.encode([])
+        payload_length = len(rlp.encode(b"\x01"*length)) if length > 0 else 0
+        prefix = bu.rlp_list_prefix(payload_length)
+
+        self.assertEqual(encoded[:len(prefix)], prefix)
+        self.assertEqual(len(prefix), bu.rlp_list_payload_offset(encoded))
+
+    @parameterized.expand([
+        ("17 elements", 17, 17, 16, False),
+        ("18 elements", 18, 18, 17, False),
+        ("19 elements", 19, 17, 16, True),
+        ("20 elements", 20, 18, 17, True),
+    ])
+    @patch("ledger.block_utils.coinbase_tx_get_hash")
+    def test_get_block_metadata(self, _, num_fields, hash_fields, mm_fields,
+                                has_coinbase, coinbase_tx_get_hash):
+        coinbase_tx_get_hash.side_effect = lambda h: "cb-hash-of-" + h
+        block = self._makeblock(num_fields)
+        block[7] = bytes.fromhex("ff00")
+        block[8] = bytes.fromhex("0102")
+        raw_block = rlp.encode(block)
+
+        metadata = bu.get_block_metadata(raw_block)
+
+        self.assertEqual(len(raw_block), metadata.size)
+        self.assertEqual(0x0102, metadata.number)
+        self.assertEqual(0xff00, metadata.difficulty)
+        self.assertEqual(bu.keccak_256(rlp.encode(block[:hash_fields])).hex(),
+                         metadata.hash)
+        self.assertEqual(sum(map(lambda f: len(rlp.encode(f)), block[:mm_fields])),
+                         metadata.mm_payload_size)
+        if has_coinbase:
+            self.assertEqual("cb-hash-of-" + block[-1].hex(), metadata.coinbase_tx_hash)
+        else:
+            self.assertIsNone(metadata.coinbase_tx_hash)
+            coinbase_tx_get_hash.assert_not_called()
+
+    def test_get_block_metadata_invalid(self):
+        with self.assertRaises(ValueError):
+            bu.get_block_metadata(b"not rlp")
+
+        with self.assertRaises(ValueError):
+            bu.get_block_metadata(rlp.encode(self._makeblock(16)))
+
     def _makeblock(self, num_fields):
         return list(map(lambda e: bytes([e])*e, range(num_fields)))
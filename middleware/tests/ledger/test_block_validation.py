@@ -0,0 +1,393 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 RSK Labs Ltd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from unittest import TestCase
+from unittest.mock import patch
+from parameterized import parameterized
+import hashlib
+import rlp
+import comm.pow as pow
+from comm.bitcoin import get_block_hash_as_int
+from comm.utils import keccak_256
+from ledger.block_validation import AdvanceBlockchainValidator
+from ledger.hsm2dongle import HSM2Dongle
+from ledger.parameters import HSM2FirmwareParameters
+
+import logging
+
+logging.disable(logging.CRITICAL)
+
+RESPONSE = HSM2Dongle.RESPONSE.ADVANCE
+
+Network = HSM2FirmwareParameters.Network
+
+COINBASE_TX_TEMPLATE = ("0000000000000400f1f2c62bc5bfded2c12c1696ff5ecd3d8ee4867bf5b0b5d4"
+                        "2b8ed2433fe4dec552534b424c4f434b3a%sffffffff"
+                        "0100f2052a01000000232103afcefd7798b549c7d178bac0ecb93c270f39d688"
+                        "a439a642a6b2458962e5cd65ac00000000")
+
+
+# Build and mine a UMM (20 fields) block header,
+# or a non UMM (19 fields) one if umm_root is None
+def make_block(parent_hash, number, umm_root=b"", uncles_hash=b"\x11"*32,
+               difficulty=1, mm_mp_nodes=2, mm_hash_override=None):
+    fields = [parent_hash, uncles_hash, b"\x22"*20, b"\x33"*32, b"\x44"*32,
+              b"\x55"*32, b"\x00"*256, difficulty.to_bytes(4, byteorder="big"),
+              number.to_bytes(4, byteorder="big"), b"\x01", b"", b"\x02", b"",
+              b"", b"\x01", b""]
+    if umm_root is not None:
+        fields.append(umm_root)
+
+    hash_for_mm = keccak_256(rlp.encode(fields))[:20]
+    if umm_root is not None and len(umm_root) > 0:
+        hash_for_mm = keccak_256(hash_for_mm + umm_root)[:20]
+    hash_for_mm += bytes(8) + number.to_bytes(4, byteorder="big")
+    if mm_hash_override is not None:
+        hash_for_mm = mm_hash_override
+
+    cbtx = COINBASE_TX_TEMPLATE % hash_for_mm.hex()
+    current_left = bytes.fromhex(pow.coinbase_tx_get_hash(cbtx))
+    merkle_proof = b""
+    for i in range(mm_mp_nodes):
+        right = hashlib.sha256(bytes([i])).digest()
+        merkle_proof += right
+        current_left = pow.combine_left_right(current_left, right)
+    merkle_root = bytes(reversed(current_left)).hex()
+
+    nonce = 0
+    while True:
+        btc_header = ("71110100" + "00"*32 + merkle_root + "22c0355fffff7f21" +
+                      nonce.to_bytes(4, byteorder="big").hex())
+        if get_block_hash_as_int(btc_header) <= pow.difficulty_to_target(difficulty):
+            break
+        nonce += 1
+
+    return rlp.encode(fields + [bytes.fromhex(btc_header), merkle_proof,
+                                bytes.fromhex(cbtx)]).hex()
+
+
+def block_hash(block_hex):
+    return keccak_256(rlp.encode(rlp.decode(bytes.fromhex(block_hex))[:-2]))
+
+
+def replace_field(block_hex, index, value):
+    fields = rlp.decode(bytes.fromhex(block_hex))
+    fields[index] = value
+    return rlp.encode(fields).hex()
+
+
+def signer_parameters(network=Network.REGTEST, min_required_difficulty=1000):
+    return HSM2FirmwareParameters(min_required_difficulty, "aa"*32, network)
+
+
+def blockchain_state(best_block="00"*32, newest_valid_block="00"*32,
+                     in_progress=False, next_expected_block="00"*32,
+                     total_difficulty=0, already_validated=False,
+                     found_best_block=False):
+    return {
+        "best_block": best_block,
+        "newest_valid_block": newest_valid_block,
+        "ancestor_block": "00"*32,
+        "ancestor_receipts_root": "00"*32,
+        "updating.best_block": "00"*32,
+        "updating.newest_valid_block": "00"*32,
+        "updating.next_expected_block": next_expected_block,
+        "updating.total_difficulty": total_difficulty,
+        "updating.in_progress": in_progress,
+        "updating.already_validated": already_validated,
+        "updating.found_best_block": found_best_block,
+    }
+
+
+class TestAdvanceBlockchainValidator(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Chain of 4 blocks, newest to oldest
+        cls.blocks = [make_block(b"\xaa"*32, 100)]
+        for number in [101, 102, 103]:
+            umm_root = b"\x99"*20 if number == 102 else b""
+            cls.blocks.insert(0, make_block(block_hash(cls.blocks[0]), number,
+                                            umm_root=umm_root))
+
+        # Two brothers for the newest block
+        parent_hash = block_hash(cls.blocks[1])
+        cls.brothers = [[make_block(parent_hash, 103, uncles_hash=bytes([i])*32)
+                         for i in range(2)], [], [], []]
+
+    def setUp(self):
+        self.validator = AdvanceBlockchainValidator()
+
+    def validate(self, blocks, brothers, validator=None, parameters=None, **state):
+        return (validator or self.validator).validate(
+            blocks, brothers, parameters or signer_parameters(),
+            blockchain_state(**state))
+
+    def test_valid(self):
+        self.assertEqual((True, None), self.validate(self.blocks, self.brothers))
+
+    def test_valid_no_brothers(self):
+        self.assertEqual((True, None), self.validate(self.blocks, [[]]*4))
+
+    def test_valid_parallel(self):
+        validator = AdvanceBlockchainValidator(workers=2)
+        try:
+            self.assertEqual((True, None), self.validate(self.blocks, self.brothers,
+                                                         validator=validator))
+            blocks = self.blocks[:]
+            blocks[2] = replace_field(blocks[2], 18, b"\x01"*32)
+            self.assertEqual((False, RESPONSE.ERROR_POW_INVALID),
+                             self.validate(blocks, self.brothers, validator=validator))
+        finally:
+            validator.stop()
+
+    @patch("ledger.block_validation.ProcessPoolExecutor")
+    def test_parallel_spawns_workers(self, ProcessPoolExecutorMock):
+        ProcessPoolExecutorMock.return_value.map.side_effect = map
+        validator = AdvanceBlockchainValidator(workers=2)
+
+        self.assertEqual((True, None), self.validate(self.blocks, self.brothers,
+                                                     validator=validator))
+        self.assertEqual(1, ProcessPoolExecutorMock.call_count)
+        self.assertEqual(2, ProcessPoolExecutorMock.call_args.kwargs["max_workers"])
+        self.assertEqual(
+            "spawn",
+            ProcessPoolExecutorMock.call_args.kwargs["mp_context"].get_start_method())
+
+    @patch("ledger.block_validation.ProcessPoolExecutor")
+    def test_stop(self, ProcessPoolExecutorMock):
+        ProcessPoolExecutorMock.return_value.map.side_effect = map
+        validator = AdvanceBlockchainValidator(workers=2)
+        self.validate(self.blocks, self.brothers, validator=validator)
+
+        validator.stop()
+        validator.stop()
+
+        self.assertEqual(1, ProcessPoolExecutorMock.return_value.shutdown.call_count)
+
+    def test_stop_without_workers(self):
+        validator = AdvanceBlockchainValidator(workers=2)
+        validator.stop()
+        self.assertIsNone(validator._executor)
+
+    def test_chaining_mismatch(self):
+        blocks = self.blocks[:1] + self.blocks[2:]
+        self.assertEqual((False, RESPONSE.ERROR_CHAINING_MISMATCH),
+                         self.validate(blocks, [[]]*3))
+
+    @parameterized.expand([
+        ("not_rlp", "zz"),
+        ("too_few_fields", rlp.encode([b"\x01"]*18).hex()),
+        ("nested_list", rlp.encode([b"\x01"]*18 + [[b"\x01"], b""]).hex()),
+    ])
+    def test_invalid_block(self, _, block):
+        self.assertEqual((False, RESPONSE.ERROR_INVALID_BLOCK),
+                         self.validate([block], [[]]))
+
+    @parameterized.expand([
+        ("parent_hash", 0, b"\xaa"*31),
+        ("umm_root", 16, b"\x99"*19),
+        ("number", 8, b"\x01"*5),
+        ("difficulty_too_big", 7, b"\x01"*33),
+    ])
+    def test_invalid_field(self, _, index, value):
+        self.assertEqual((False, RESPONSE.ERROR_INVALID_BLOCK),
+                         self.validate(
+                             [replace_field(self.blocks[0], index, value)], [[]]))
+
+    @parameterized.expand([
+        ("merkle_proof", 18, b"\x01"*32),
+        ("merkle_proof_length", 18, b"\x01"*33),
+        ("coinbase", 19, b"\x01"*100),
+        ("btc_header", 17, b"\x01"*80),
+        ("mm_hash", 1, b"\x01"*32),
+        ("difficulty", 7, (2**64).to_bytes(9, byteorder="big")),
+        ("difficulty_high_bit", 7, b"\x80"),
+    ])
+    def test_pow_invalid(self, _, index, value):
+        self.assertEqual((False, RESPONSE.ERROR_POW_INVALID),
+                         self.validate(
+                             [replace_field(self.blocks[0], index, value)], [[]]))
+
+    def test_zero_difficulty(self):
+        self.assertEqual((False, RESPONSE.ERROR_INVALID_BLOCK),
+                         self.validate([replace_field(self.blocks[0], 7, b"")], [[]]))
+
+    def test_zero_difficulty_already_validated(self):
+        block = replace_field(self.blocks[0], 7, b"")
+        self.assertEqual((True, None), self.validate(
+            [block], [[]], newest_valid_block=block_hash(block).hex()))
+
+    def test_mm_hash_mismatch(self):
+        block = make_block(b"\xaa"*32, 100, mm_hash_override=b"\x01"*32)
+        self.assertEqual((False, RESPONSE.ERROR_POW_INVALID),
+                         self.validate([block], [[]]))
+
+    def test_brothers_length_mismatch(self):
+        self.assertEqual((False, RESPONSE.ERROR_INVALID_BROTHERS),
+                         self.validate(self.blocks, self.brothers[:3]))
+
+    def test_too_many_brothers(self):
+        self.assertEqual((False, RESPONSE.ERROR_INVALID_BROTHERS),
+                         self.validate(self.blocks[:1], [self.brothers[0]*6]))
+
+    def test_brother_not_brother(self):
+        brother = make_block(b"\xbb"*32, 103)
+        self.assertEqual((False, RESPONSE.ERROR_INVALID_BROTHERS),
+                         self.validate(self.blocks[:1], [[brother]]))
+
+    def test_brother_same_as_block(self):
+        self.assertEqual((False, RESPONSE.ERROR_INVALID_BROTHERS),
+                         self.validate(self.blocks[:1], [[self.blocks[0]]]))
+
+    def test_brother_repeated(self):
+        self.assertEqual((False, RESPONSE.ERROR_INVALID_BROTHERS),
+                         self.validate(self.blocks[:1], [[self.brothers[0][0]]*2]))
+
+    def test_brother_invalid_block(self):
+        self.assertEqual((False, RESPONSE.ERROR_INVALID_BLOCK),
+                         self.validate(self.blocks[:1], [["aabbcc"]]))
+
+    def test_brother_pow_invalid(self):
+        brother = replace_field(self.brothers[0][0], 18, b"\x01"*32)
+        self.assertEqual((False, RESPONSE.ERROR_POW_INVALID),
+                         self.validate(self.blocks[:1], [[brother]]))
+
+    def test_brothers_any_order(self):
+        self.assertEqual((True, None),
+                         self.validate(self.blocks[:1],
+                                       [list(reversed(self.brothers[0]))]))
+
+    @parameterized.expand([
+        ("before_wasabi", Network.MAINNET, 1_500_000, None),
+        ("umm_before_papyrus", Network.MAINNET, 2_000_000, b""),
+        ("non_umm_after_papyrus", Network.REGTEST, 100, None),
+    ])
+    def test_network_upgrade_invalid_block(self, _, network, number, umm_root):
+        block = make_block(b"\xaa"*32, number, umm_root=umm_root)
+        self.assertEqual((False, RESPONSE.ERROR_INVALID_BLOCK),
+                         self.validate([block], [[]],
+                                       parameters=signer_parameters(network)))
+
+    def test_network_upgrade_valid_non_umm_block(self):
+        block = make_block(b"\xaa"*32, 2_000_000, umm_root=None)
+        self.assertEqual((True, None),
+                         self.validate([block], [[]],
+                                       parameters=signer_parameters(Network.MAINNET)))
+
+    def test_merkle_proof_too_long_after_iris(self):
+        block = make_block(b"\xaa"*32, 100, mm_mp_nodes=31)
+        self.assertEqual((False, RESPONSE.ERROR_INVALID_BLOCK),
+                         self.validate([block], [[]]))
+
+    def test_merkle_proof_long_before_iris(self):
+        block = make_block(b"\xaa"*32, 1_000_000, mm_mp_nodes=31)
+        self.assertEqual((True, None),
+                         self.validate([block], [[]],
+                                       parameters=signer_parameters(Network.TESTNET)))
+
+    def test_stops_at_best_block(self):
+        # Everything past the block chaining to the best block is ignored
+        blocks = self.blocks[:]
+        blocks[2] = replace_field(blocks[2], 18, b"\x01"*32)
+        blocks[3] = "aabbcc"
+        brothers = [[], [], ["aabbcc"], []]
+        self.assertEqual((True, None),
+                         self.validate(blocks, brothers,
+                                       best_block=block_hash(self.blocks[2]).hex()))
+
+    def test_before_best_block_validated(self):
+        blocks = self.blocks[:]
+        blocks[1] = replace_field(blocks[1], 18, b"\x01"*32)
+        self.assertEqual((False, RESPONSE.ERROR_POW_INVALID),
+                         self.validate(blocks, [[]]*4,
+                                       best_block=block_hash(self.blocks[2]).hex()))
+
+    def test_already_validated_skips_pow(self):
+        # Merkle proof and coinbase are not part of the block hash
+        blocks = self.blocks[:]
+        blocks[1] = replace_field(blocks[1], 18, b"\x01"*32)
+        blocks[3] = replace_field(blocks[3], 19, b"\x01"*100)
+        self.assertEqual((True, None),
+                         self.validate(blocks, [[]]*4,
+                                       newest_valid_block=block_hash(
+                                           self.blocks[1]).hex()))
+
+    def test_already_validated_in_progress_skips_pow(self):
+        blocks = self.blocks[:]
+        blocks[0] = replace_field(blocks[0], 18, b"\x01"*32)
+        self.assertEqual((True, None),
+                         self.validate(blocks, [[]]*4, in_progress=True,
+                                       already_validated=True,
+                                       next_expected_block=block_hash(
+                                           self.blocks[0]).hex()))
+
+    def test_already_validated_invalid_block(self):
+        blocks = self.blocks[:]
+        blocks[1] = replace_field(blocks[1], 18, b"\x01"*992)
+        self.assertEqual((False, RESPONSE.ERROR_INVALID_BLOCK),
+                         self.validate(blocks, [[]]*4,
+                                       newest_valid_block=block_hash(
+                                           self.blocks[0]).hex()))
+
+    def test_already_validated_brothers_validated(self):
+        brother = replace_field(self.brothers[0][0], 18, b"\x01"*32)
+        self.assertEqual((False, RESPONSE.ERROR_POW_INVALID),
+                         self.validate(self.blocks[:1], [[brother]],
+                                       newest_valid_block=block_hash(
+                                           self.blocks[0]).hex()))
+
+    def test_in_progress_next_expected_block(self):
+        self.assertEqual((True, None),
+                         self.validate(self.blocks, self.brothers, in_progress=True,
+                                       next_expected_block=block_hash(
+                                           self.blocks[0]).hex()))
+
+    def test_in_progress_chaining_mismatch(self):
+        self.assertEqual((False, RESPONSE.ERROR_CHAINING_MISMATCH),
+                         self.validate(self.blocks, self.brothers, in_progress=True,
+                                       next_expected_block=block_hash(
+                                           self.blocks[1]).hex()))
+
+    def test_brothers_not_requested_once_best_block_found(self):
+        self.assertEqual((True, None),
+                         self.validate(self.blocks[:1], [["aabbcc"]], in_progress=True,
+                                       found_best_block=True,
+                                       next_expected_block=block_hash(
+                                           self.blocks[0]).hex()))
+
+    def test_brothers_not_requested_once_difficulty_reached(self):
+        self.assertEqual((True, None),
+                         self.validate(self.blocks[:1], [["aabbcc"]],
+                                       parameters=signer_parameters(
+                                           min_required_difficulty=1)))
+
+    def test_brothers_requested_until_difficulty_reached(self):
+        self.assertEqual((False, RESPONSE.ERROR_INVALID_BLOCK),
+                         self.validate(self.blocks[:2], [[], ["aabbcc"]],
+                                       parameters=signer_parameters(
+                                           min_required_difficulty=3)))
+
+    def test_brothers_difficulty_accumulated(self):
+        self.assertEqual((True, None),
+                         self.validate(self.blocks[:2], [self.brothers[0], ["aabbcc"]],
+                                       parameters=signer_parameters(
+                                           min_required_difficulty=4)))
@@ -207,7 +207,10 @@ class TestHSM2DongleBase(TestCase):
             outpoint_value=spec["ov"],
         )
 
+    # A spec can map stop names to its own exchange names under "stops"
+    # (e.g., when several chunked exchanges are a single one in that spec)
     def process_sign_auth_spec(self, spec, stop=None, replace=None):
+        stop = spec.get("stops", {}).get(stop, stop)
         pex = self.parse_exchange_spec(spec["exchanges"], stop=stop, replace=replace)
         spec["requests"] = pex["requests"]
         spec["responses"] = pex["responses"]
@@ -231,6 +234,39 @@ class TestHSM2Dongle(TestHSM2DongleBase):
     def test_connects_ok(self):
         self.assertEqual([call("a-debug-value")], self.getDongleMock.call_args_list)
 
+    def test_send_commands_sequential(self):
+        self.dongle.exchange.side_effect = [
+            bytes.fromhex("aabb11"),
+            CommException("an-error-result", 0x6b00),
+            bytes.fromhex("aabb33"),
+        ]
+
+        results = self.hsm2dongle.send_commands(
+            0x12, [(0x34, b"\x01"), (0x34, b"\x02"), (0x34, b"\x03")])
+
+        self.assertEqual(3, len(results))
+        self.assertEqual(bytes.fromhex("aabb11"), results[0])
+        self.assertIsInstance(results[1], HSM2DongleErrorResult)
+        self.assertEqual(0x6b00, results[1].error_code)
+        self.assertEqual(bytes.fromhex("aabb33"), results[2])
+        self.assertEqual([
+            call(bytes.fromhex("80123401"), timeout=10),
+            call(bytes.fromhex("80123402"), timeout=10),
+            call(bytes.fromhex("80123403"), timeout=10),
+        ], self.dongle.exchange.call_args_list)
+
+    def test_send_commands_error_raised(self):
+        self.dongle.exchange.side_effect = [
+            bytes.fromhex("aabb11"),
+            CommException("an-exception"),
+        ]
+
+        with self.assertRaises(HSM2DongleError):
+            self.hsm2dongle.send_commands(
+                0x12, [(0x34, b"\x01"), (0x34, b"\x02"), (0x34, b"\x03")])
+
+        self.assertEqual(2, self.dongle.exchange.call_count)
+
     @patch("ledger.hsm2dongle.getDongle")
     def test_connects_error_comm(self, getDongleMock):
         getDongleMock.side_effect = CommException("a-message")
@@ -448,10 +484,9 @@ class TestHSM2DongleSignUnauthorized(TestHSM2DongleBase):
                 0xFF,
             ],  # Path and hash
         ])
-        self.assertEqual(
-            [call(bytes([0x55, 0x66, 0x77, 0x88]))],
-            HSM2DongleSignatureMock.call_args_list,
-        )
+        self.assertEqual(1, HSM2DongleSignatureMock.call_count)
+        response, offset = HSM2DongleSignatureMock.call_args[0]
+        self.assertEqual(bytes([0x55, 0x66, 0x77, 0x88]), bytes(response[offset:]))
 
     @patch("ledger.hsm2dongle.HSM2DongleSignature")
     def test_sign_unauthorized_invalid_signature(self, HSM2DongleSignatureMock):
@@ -481,10 +516,9 @@ class TestHSM2DongleSignUnauthorized(TestHSM2DongleBase):
                 0xFF,
             ],  # Path and hash
         ])
-        self.assertEqual(
-            [call(bytes([0x55, 0x66, 0x77, 0x88]))],
-            HSM2DongleSignatureMock.call_args_list,
-        )
+        self.assertEqual(1, HSM2DongleSignatureMock.call_count)
+        response, offset = HSM2DongleSignatureMock.call_args[0]
+        self.assertEqual(bytes([0x55, 0x66, 0x77, 0x88]), bytes(response[offset:]))
 
     @parameterized.expand([
         ("data_size", 0x6A87, -5),
@@ -688,6 +722,107 @@ class TestHSM2DongleBlockchainState(TestHSM2DongleBase):
             [0x20, 0x03],
         ])
 
+    def bulk_state(self):
+        return bytes.fromhex("11"*32 + "22"*32 + "33"*32 + "44"*32 +
+                             "55"*32 + "66"*32 + "77"*32 + "000101" +
+                             "00"*30 + "112233445566")
+
+    def set_version(self, major, minor, patch):
+        self.dongle.exchange.side_effect = [bytes([0, 0, major, minor, patch])]
+        self.hsm2dongle.get_version()
+        self.dongle.exchange.reset_mock()
+
+    def expected_bulk_state(self):
+        return {
+            "best_block": "11"*32,
+            "newest_valid_block": "22"*32,
+            "ancestor_block": "33"*32,
+            "ancestor_receipts_root": "44"*32,
+            "updating.best_block": "55"*32,
+            "updating.newest_valid_block": "66"*32,
+            "updating.next_expected_block": "77"*32,
+            "updating.total_difficulty": 0x112233445566,
+            "updating.in_progress": False,
+            "updating.already_validated": True,
+            "updating.found_best_block": True,
+        }
+
+    # Responses as the firmware gives them, i.e., as much of the state
+    # as fits in the APDU buffer's data for each requested offset
+    def bulk_state_responses(self, data_size):
+        state = self.bulk_state()
+        return [bytes([0, 0, 0x04]) + state[offset:offset+data_size]
+                for offset in range(0, len(state), data_size)]
+
+    @parameterized.expand([
+        ("ledger_tcpsigner", (5, 5, 2), 80, [0, 80, 160, 240]),
+        ("sgx", (5, 5, 2), 2048, [0]),
+        ("newer_version", (5, 6, 0), 80, [0, 80, 160, 240]),
+    ])
+    def test_get_blockchain_state_bulk(self, _, version, data_size, offsets):
+        self.set_version(*version)
+        self.dongle.exchange.side_effect = self.bulk_state_responses(data_size)
+
+        self.assertEqual(self.expected_bulk_state(),
+                         self.hsm2dongle.get_blockchain_state())
+
+        self.assert_exchange([
+            [0x20, 0x04, offset >> 8, offset & 0xff] for offset in offsets
+        ])
+
+    @parameterized.expand([
+        ("unexpected_op", bytes([0, 0, 0x03, 0xAA])),
+        ("no_data", bytes([0, 0, 0x04])),
+    ])
+    def test_get_blockchain_state_bulk_invalid_response(self, _, response):
+        self.set_version(5, 5, 2)
+        self.dongle.exchange.side_effect = [
+            self.bulk_state_responses(80)[0],
+            response,
+        ]
+
+        with self.assertRaises(HSM2DongleError):
+            self.hsm2dongle.get_blockchain_state()
+
+        self.assert_exchange([
+            [0x20, 0x04, 0x00, 0x00],
+            [0x20, 0x04, 0x00, 80],
+        ])
+
+    def test_get_blockchain_state_bulk_too_long(self):
+        self.set_version(5, 5, 2)
+        self.dongle.exchange.side_effect = [
+            bytes([0, 0, 0x04]) + self.bulk_state() + b"\xaa",
+        ]
+
+        with self.assertRaises(HSM2DongleError):
+            self.hsm2dongle.get_blockchain_state()
+
+        self.assert_exchange([
+            [0x20, 0x04, 0x00, 0x00],
+        ])
+
+    @parameterized.expand([
+        ("older_patch", (5, 5, 1)),
+        ("older_minor", (5, 4, 9)),
+        ("other_major", (6, 0, 0)),
+    ])
+    def test_get_blockchain_state_bulk_unsupported_version(self, _, version):
+        self.set_version(*version)
+        self.dongle.exchange.side_effect = [
+            bytes([0, 0, 0x01, 0x01]) + bytes.fromhex("11"*32),
+            bytes([0, 0, 0xAA]),
+        ]
+
+        # Per-field ops are used instead
+        with self.assertRaises(HSM2DongleError):
+            self.hsm2dongle.get_blockchain_state()
+
+        self.assert_exchange([
+            [0x20, 0x01, 0x01],
+            [0x20, 0x01, 0x02],
+        ])
+
     def test_reset_advance_blockchain_ok(self):
         self.dongle.exchange.side_effect = [
             bytes([0, 0, 0x02]),  # Response
@@ -0,0 +1,61 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 RSK Labs Ltd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from unittest import TestCase
+from unittest.mock import Mock, patch, call
+from ledger.hsm2dongle import HSM2DongleErrorResult
+from ledger.hsm2dongle_tcp import HSM2DongleTCP
+from ledgerblue.commException import CommException
+
+import logging
+
+logging.disable(logging.CRITICAL)
+
+
+class TestHSM2DongleTCP(TestCase):
+    @patch("ledger.hsm2dongle_tcp.getDongle")
+    def setUp(self, getDongleMock):
+        self.dongle = Mock()
+        getDongleMock.return_value = self.dongle
+        self.hsm2dongle = HSM2DongleTCP("a-host", 1234, "a-debug-value")
+        self.hsm2dongle.connect()
+
+    def test_no_pipelining(self):
+        self.assertEqual(1, self.hsm2dongle.PIPELINE_DEPTH)
+
+    def test_send_commands_one_exchange_at_a_time(self):
+        # The TCPSigner reads a single frame per exchange, so a batch
+        # must never be written upfront
+        self.dongle.exchange.side_effect = [
+            bytes.fromhex("801211"),
+            CommException("an-error-result", 0x6b00),
+        ]
+
+        results = self.hsm2dongle.send_commands(0x12, [(0x34, b"\x01"), (0x34, b"\x02")])
+
+        self.assertEqual(bytes.fromhex("801211"), results[0])
+        self.assertIsInstance(results[1], HSM2DongleErrorResult)
+        self.assertEqual([
+            call(bytes.fromhex("80123401"), timeout=10),
+            call(bytes.fromhex("80123402"), timeout=10),
+        ], self.dongle.exchange.call_args_list)
+        self.dongle.socket.sendall.assert_not_called()
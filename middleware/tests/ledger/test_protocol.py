@@ -23,7 +23,7 @@
 from unittest import TestCase
 from unittest.mock import Mock, call, patch
 from parameterized import parameterized
-from comm.protocol import HSM2ProtocolError
+from comm.protocol import HSM2ProtocolError, HSM2ProtocolInterrupt
 from ledger.protocol import HSM2ProtocolLedger
 from ledger.hsm2dongle import (
     HSM2Dongle,
@@ -1223,6 +1223,8 @@ class TestHSM2ProtocolLedger(TestCase):
             self.dongle.advance_blockchain.call_args_list,
         )
         self.assertFalse(self.dongle.disconnect.called)
+        # No pre-validation, so no blockchain state read
+        self.assertFalse(self.dongle.get_blockchain_state.called)
 
     def test_advance_blockchain_timeout(self):
         self.dongle.advance_blockchain.side_effect = HSM2DongleTimeoutError()
@@ -1305,6 +1307,80 @@ class TestHSM2ProtocolLedger(TestCase):
         )
         self.assertFalse(self.dongle.disconnect.called)
 
+    def test_advance_blockchain_prevalidation_ok(self):
+        validator = Mock()
+        validator.validate.return_value = (True, None)
+        self.protocol.block_validator = validator
+        self.dongle.get_blockchain_state.return_value = "the-state"
+        self.dongle.advance_blockchain.return_value = (True, 1)
+
+        self.assertEqual(
+            {"errorcode": 0},
+            self.protocol.handle_request({
+                "version": 5,
+                "command": "advanceBlockchain",
+                "blocks": ["aabbcc", "ddeeff"],
+                "brothers": [["bb11"], ["bb21", "bb22"]],
+            }),
+        )
+
+        self.assertEqual(
+            [call(["aabbcc", "ddeeff"], [["bb11"], ["bb21", "bb22"]],
+                  self.dongle.get_signer_parameters.return_value, "the-state")],
+            validator.validate.call_args_list,
+        )
+        self.assertEqual(
+            [call(["aabbcc", "ddeeff"], [["bb11"], ["bb21", "bb22"]])],
+            self.dongle.advance_blockchain.call_args_list,
+        )
+
+    @parameterized.expand([
+        ("invalid_block", -5, -204),
+        ("pow_invalid", -6, -202),
+        ("chaining_mismatch", -7, -201),
+        ("invalid_brothers", -9, -205),
+    ])
+    def test_advance_blockchain_prevalidation_fails(self, _, response, expected_code):
+        validator = Mock()
+        validator.validate.return_value = (False, response)
+        self.protocol.block_validator = validator
+        self.dongle.get_blockchain_state.return_value = "the-state"
+
+        self.assertEqual(
+            {"errorcode": expected_code},
+            self.protocol.handle_request({
+                "version": 5,
+                "command": "advanceBlockchain",
+                "blocks": ["aabbcc", "ddeeff"],
+                "brothers": [["bb11"], ["bb21", "bb22"]],
+            }),
+        )
+
+        self.assertEqual(
+            [call(["aabbcc", "ddeeff"], [["bb11"], ["bb21", "bb22"]],
+                  self.dongle.get_signer_parameters.return_value, "the-state")],
+            validator.validate.call_args_list,
+        )
+        self.assertFalse(self.dongle.advance_blockchain.called)
+
+    def test_advance_blockchain_prevalidation_state_error(self):
+        validator = Mock()
+        self.protocol.block_validator = validator
+        self.dongle.get_blockchain_state.side_effect = HSM2DongleError("a-message")
+
+        self.assertEqual(
+            {"errorcode": -905},
+            self.protocol.handle_request({
+                "version": 5,
+                "command": "advanceBlockchain",
+                "blocks": ["aabbcc", "ddeeff"],
+                "brothers": [["bb11"], ["bb21", "bb22"]],
+            }),
+        )
+
+        self.assertFalse(validator.validate.called)
+        self.assertFalse(self.dongle.advance_blockchain.called)
+
     @parameterized.expand([
         ("success", (True, 1), 0),
         ("init", (False, -1), -905),
@@ -1404,6 +1480,7 @@ class TestHSM2ProtocolLedger(TestCase):
         self.assertFalse(self.dongle.disconnect.called)
 
     def test_get_blockchain_parameters_ok(self):
+        self.protocol.clear_device_identity()
         self.dongle.get_signer_parameters.return_value = HSM2FirmwareParameters(
             0x32,
             "the-checkpoint",
@@ -1425,7 +1502,33 @@ class TestHSM2ProtocolLedger(TestCase):
             }),
         )
 
+    def test_get_blockchain_parameters_cached(self):
+        self.dongle.get_signer_parameters.reset_mock()
+        self.dongle.get_signer_parameters.side_effect = HSM2DongleTimeoutError()
+        self.protocol._signer_parameters = HSM2FirmwareParameters(
+            0x32,
+            "the-checkpoint",
+            HSM2FirmwareParameters.Network.TESTNET
+        )
+
+        self.assertEqual(
+            {
+                "errorcode": 0,
+                "parameters": {
+                    "checkpoint": "the-checkpoint",
+                    "minimum_difficulty": 0x32,
+                    "network": "testnet",
+                },
+            },
+            self.protocol.handle_request({
+                "version": 5,
+                "command": "blockchainParameters"
+            }),
+        )
+        self.assertFalse(self.dongle.get_signer_parameters.called)
+
     def test_get_blockchain_parameters_dongle_timeout(self):
+        self.protocol.clear_device_identity()
         self.dongle.get_signer_parameters.side_effect = HSM2DongleTimeoutError()
 
         self.assertEqual(
@@ -1437,6 +1540,7 @@ class TestHSM2ProtocolLedger(TestCase):
         )
 
     def test_get_blockchain_parameters_exception(self):
+        self.protocol.clear_device_identity()
         self.dongle.get_signer_parameters.side_effect = HSM2DongleError("a-message")
 
         self.assertEqual(
@@ -1745,6 +1849,94 @@ class TestHSM2ProtocolLedger(TestCase):
 
         self.assertFalse(self.dongle.exit_app.called)
 
+    def test_initialize_device_caches_identity(self):
+        self.assertEqual(1, self.dongle.is_onboarded.call_count)
+        self.assertEqual(1, self.dongle.get_signer_parameters.call_count)
+        self.assertEqual(HSM2FirmwareVersion(5, 5, 1), self.protocol._dongle_app_version)
+        self.assertEqual(self.dongle.get_signer_parameters.return_value,
+                         self.protocol._signer_parameters)
+
+    def test_reinitialize_device_verifies_identity(self):
+        self.dongle.reset_mock()
+
+        self.protocol.initialize_device()
+
+        self.assertEqual([call()], self.dongle.connect.call_args_list)
+        self.assertEqual([call()], self.dongle.get_current_mode.call_args_list)
+        self.assertEqual([call()], self.dongle.get_version.call_args_list)
+        self.assertFalse(self.dongle.is_onboarded.called)
+        self.assertFalse(self.dongle.get_signer_parameters.called)
+
+    def test_reinitialize_device_version_changed(self):
+        self.dongle.reset_mock()
+        self.dongle.get_version.return_value = HSM2FirmwareVersion(5, 5, 0)
+
+        self.protocol.initialize_device()
+
+        self.assertEqual(1, self.dongle.is_onboarded.call_count)
+        self.assertEqual(2, self.dongle.get_current_mode.call_count)
+        self.assertEqual(2, self.dongle.get_version.call_count)
+        self.assertEqual(1, self.dongle.get_signer_parameters.call_count)
+        self.assertEqual(HSM2FirmwareVersion(5, 5, 0), self.protocol._dongle_app_version)
+
+    def test_reinitialize_device_mode_changed(self):
+        self.dongle.reset_mock()
+        self.dongle.get_current_mode.side_effect = [
+            HSM2Dongle.MODE.UNKNOWN, HSM2Dongle.MODE.SIGNER]
+
+        self.protocol.initialize_device()
+
+        self.assertEqual(1, self.dongle.is_onboarded.call_count)
+        self.assertEqual(2, self.dongle.get_current_mode.call_count)
+        self.assertEqual(1, self.dongle.get_version.call_count)
+        self.assertEqual(1, self.dongle.get_signer_parameters.call_count)
+
+    def test_reinitialize_device_mode_changed_fails(self):
+        self.dongle.reset_mock()
+        self.dongle.get_current_mode.return_value = HSM2Dongle.MODE.UNKNOWN
+
+        with self.assertRaises(HSM2ProtocolInterrupt):
+            self.protocol.initialize_device()
+
+        self.assertIsNone(self.protocol._dongle_app_version)
+        self.assertIsNone(self.protocol._signer_parameters)
+
     def _assert_reconnected(self):
         self.assertTrue(self.dongle.disconnect.called)
         self.assertEqual(2, self.dongle.connect.call_count)
+
+
+class TestHSM2ProtocolLedgerDeviceLock(TestCase):
+    def setUp(self):
+        self.dongle = Mock()
+        self.protocol = HSM2ProtocolLedger(Mock(), self.dongle)
+
+    @patch("ledger.protocol.time")
+    def test_handle_request_holds_lock_and_records_time(self, time):
+        time.monotonic.return_value = 123
+        self.protocol.device_lock = Mock()
+        self.protocol.device_lock.__enter__ = Mock()
+        self.protocol.device_lock.__exit__ = Mock(return_value=None)
+
+        def get_public_key(key_id):
+            self.assertTrue(self.protocol.device_lock.__enter__.called)
+            self.assertFalse(self.protocol.device_lock.__exit__.called)
+            return "a-public-key"
+
+        self.dongle.get_public_key.side_effect = get_public_key
+
+        self.assertEqual(
+            {"errorcode": 0, "pubKey": "a-public-key"},
+            self.protocol.handle_request({
+                "version": 5,
+                "command": "getPubKey",
+                "keyId": "m/44'/1'/0'/0/0"
+            }),
+        )
+        self.assertTrue(self.protocol.device_lock.__exit__.called)
+        self.assertEqual(123, self.protocol.last_request_time)
+
+    def test_comm_issue(self):
+        self.assertFalse(self.protocol.has_comm_issue)
+        self.protocol.report_comm_issue()
+        self.assertTrue(self.protocol.has_comm_issue)
@@ -0,0 +1,264 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 RSK Labs Ltd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from unittest import TestCase
+from parameterized import parameterized
+import hashlib
+import rlp
+import comm.pow as pow
+from comm.bitcoin import get_block_hash_as_int
+from comm.utils import keccak_256
+from ledger.rsk_block import RskBlockHeader
+from ledger.rsk_netparams import NetworkParameters
+
+import logging
+
+logging.disable(logging.CRITICAL)
+
+COINBASE_TX_TEMPLATE = ("0000000000000400f1f2c62bc5bfded2c12c1696ff5ecd3d8ee4867bf5b0b5d4"
+                        "2b8ed2433fe4dec552534b424c4f434b3a%sffffffff"
+                        "0100f2052a01000000232103afcefd7798b549c7d178bac0ecb93c270f39d688"
+                        "a439a642a6b2458962e5cd65ac00000000")
+
+
+# Header fields up to (and excluding) the UMM root
+def base_fields(number, difficulty=1):
+    return [b"\xaa"*32, b"\x11"*32, b"\x22"*20, b"\x33"*32, b"\x44"*32,
+            b"\x55"*32, b"\x00"*256, difficulty.to_bytes(4, byteorder="big"),
+            number.to_bytes(4, byteorder="big"), b"\x01", b"", b"\x02", b"",
+            b"", b"\x01", b""]
+
+
+# Build and mine a block header from the given non merge mining fields
+# (which include the UMM root, if any), with a merge mining merkle proof
+# of the given number of nodes
+def mine(fields, number, umm_root=None, difficulty=1, mm_mp_nodes=2):
+    hash_for_mm = keccak_256(rlp.encode(fields))[:20]
+    if umm_root is not None and len(umm_root) > 0:
+        hash_for_mm = keccak_256(hash_for_mm + umm_root)[:20]
+    hash_for_mm += bytes(8) + number.to_bytes(4, byteorder="big")
+
+    cbtx = COINBASE_TX_TEMPLATE % hash_for_mm.hex()
+    current_left = bytes.fromhex(pow.coinbase_tx_get_hash(cbtx))
+    merkle_proof = b""
+    for i in range(mm_mp_nodes):
+        right = hashlib.sha256(bytes([i])).digest()
+        merkle_proof += right
+        current_left = pow.combine_left_right(current_left, right)
+    merkle_root = bytes(reversed(current_left)).hex()
+
+    nonce = 0
+    while True:
+        btc_header = ("71110100" + "00"*32 + merkle_root + "22c0355fffff7f21" +
+                      nonce.to_bytes(4, byteorder="big").hex())
+        if get_block_hash_as_int(btc_header) <= pow.difficulty_to_target(difficulty):
+            break
+        nonce += 1
+
+    return fields + [bytes.fromhex(btc_header), merkle_proof, bytes.fromhex(cbtx)]
+
+
+# A UMM (20 fields) block header, or a non UMM (19 fields) one
+# if umm_root is None
+def make_block(number, umm_root=b"", mm_mp_nodes=2):
+    fields = base_fields(number)
+    if umm_root is not None:
+        fields.append(umm_root)
+    return mine(fields, number, umm_root, mm_mp_nodes=mm_mp_nodes)
+
+
+def encode(fields):
+    return rlp.encode(fields).hex()
+
+
+class TestRskBlockHeader(TestCase):
+    def test_decodes_fields(self):
+        fields = make_block(123)
+        block = RskBlockHeader(encode(fields), NetworkParameters.REGTEST)
+
+        self.assertEqual(NetworkParameters.REGTEST, block.network_parameters)
+        self.assertEqual("aa"*32, block.parent_hash)
+        self.assertEqual("55"*32, block.receipts_trie_root)
+        self.assertEqual(1, block.difficulty)
+        self.assertEqual(123, block.number)
+        self.assertEqual(fields[-3].hex(), block.mm_header)
+        self.assertEqual(fields[-2].hex(), block.mm_merkleproof)
+        self.assertEqual(fields[-1].hex(), block.mm_coinbasetx)
+        self.assertTrue(block.pow_is_valid())
+
+    @parameterized.expand([
+        ("too_few", 16),
+        ("too_many", 21),
+    ])
+    def test_invalid_field_count(self, _, count):
+        with self.assertRaises(ValueError):
+            RskBlockHeader(encode([b"\x01"]*count), NetworkParameters.REGTEST)
+
+    def test_invalid_rlp(self):
+        with self.assertRaises(ValueError):
+            RskBlockHeader("f9ffff01", NetworkParameters.REGTEST)
+
+    @parameterized.expand([
+        ("parent_hash", 0),
+        ("receipts_trie_root", 5),
+    ])
+    def test_invalid_hash_field(self, _, index):
+        fields = make_block(123)
+        fields[index] = b"\xaa"*31
+
+        with self.assertRaises(ValueError):
+            RskBlockHeader(encode(fields), NetworkParameters.REGTEST)
+
+    def test_difficulty_unsigned(self):
+        fields = make_block(123)
+        fields[7] = b"\xff"
+
+        self.assertEqual(255, RskBlockHeader(encode(fields),
+                                             NetworkParameters.REGTEST).difficulty)
+
+    def test_mm_fields_mandatory(self):
+        fields = base_fields(123) + [b""]
+
+        with self.assertRaises(ValueError):
+            RskBlockHeader(encode(fields), NetworkParameters.REGTEST)
+
+    def test_mm_fields_optional(self):
+        fields = base_fields(123) + [b"", b"\x66"*80]
+        block = RskBlockHeader(encode(fields), NetworkParameters.REGTEST, False)
+
+        self.assertEqual(123, block.number)
+        self.assertEqual("66"*80, block.mm_header)
+        self.assertIsNone(block.mm_merkleproof)
+        self.assertIsNone(block.mm_coinbasetx)
+        self.assertIsNone(block.hash_for_merge_mining)
+        self.assertIsNone(block.hash_for_merge_mining_mask)
+        self.assertFalse(block.hash_for_merge_mining_matches("00"*32))
+        self.assertFalse(block.pow_is_valid())
+        self.assertEqual(keccak_256(rlp.encode(fields)).hex(), block.hash)
+
+    def test_before_wasabi(self):
+        with self.assertRaises(ValueError):
+            RskBlockHeader(encode(make_block(1_590_999, umm_root=None)),
+                           NetworkParameters.MAINNET)
+
+    @parameterized.expand([
+        ("umm_before_papyrus", 2_392_699, b""),
+        ("non_umm_from_papyrus", 2_392_700, None),
+    ])
+    def test_umm_field_count_mismatch(self, _, number, umm_root):
+        with self.assertRaises(ValueError):
+            RskBlockHeader(encode(make_block(number, umm_root=umm_root)),
+                           NetworkParameters.MAINNET)
+
+    def test_non_umm_before_papyrus(self):
+        block = RskBlockHeader(encode(make_block(2_392_699, umm_root=None)),
+                               NetworkParameters.MAINNET)
+
+        self.assertEqual(2_392_699, block.number)
+        self.assertFalse(block.is_umm)
+        self.assertIsNone(block.umm_root)
+        self.assertTrue(block.pow_is_valid())
+
+    def test_umm_root_empty(self):
+        block = RskBlockHeader(encode(make_block(123, umm_root=b"")),
+                               NetworkParameters.REGTEST)
+
+        self.assertFalse(block.is_umm)
+        self.assertIsNone(block.umm_root)
+        self.assertTrue(block.pow_is_valid())
+
+    def test_umm_root_present(self):
+        block = RskBlockHeader(encode(make_block(123, umm_root=b"\x77"*20)),
+                               NetworkParameters.REGTEST)
+
+        self.assertTrue(block.is_umm)
+        self.assertEqual("77"*20, block.umm_root)
+        self.assertTrue(block.pow_is_valid())
+
+    def test_umm_root_invalid_length(self):
+        with self.assertRaises(ValueError):
+            RskBlockHeader(encode(make_block(123, umm_root=b"\x77"*19)),
+                           NetworkParameters.REGTEST)
+
+    def test_iris_merkle_proof_limit(self):
+        # 30 nodes of 32 bytes make up the maximum 960 bytes
+        block = RskBlockHeader(encode(make_block(123, mm_mp_nodes=30)),
+                               NetworkParameters.REGTEST)
+        self.assertTrue(block.pow_is_valid())
+
+        with self.assertRaises(ValueError):
+            RskBlockHeader(encode(make_block(123, mm_mp_nodes=31)),
+                           NetworkParameters.REGTEST)
+
+    def test_merkle_proof_unlimited_before_iris(self):
+        block = RskBlockHeader(encode(make_block(2_060_499, mm_mp_nodes=31)),
+                               NetworkParameters.TESTNET)
+
+        self.assertEqual(31*32, len(bytes.fromhex(block.mm_merkleproof)))
+        self.assertTrue(block.pow_is_valid())
+
+    @parameterized.expand([
+        ("non_umm", 2_000_000, None, NetworkParameters.MAINNET),
+        ("umm_empty_root", 123, b"", NetworkParameters.REGTEST),
+        ("umm_root", 123, b"\x77"*20, NetworkParameters.REGTEST),
+    ])
+    def test_hashes(self, _, number, umm_root, network_parameters):
+        fields = make_block(number, umm_root=umm_root)
+        block = RskBlockHeader(encode(fields), network_parameters)
+
+        self.assertEqual(keccak_256(rlp.encode(fields[:-2])).hex(), block.hash)
+        expected_mm_hash = keccak_256(rlp.encode(fields[:-3]))[:20]
+        if umm_root:
+            expected_mm_hash = keccak_256(expected_mm_hash + umm_root)[:20]
+        self.assertEqual((expected_mm_hash + bytes(8) +
+                          number.to_bytes(4, byteorder="big")).hex(),
+                         block.hash_for_merge_mining)
+        self.assertEqual("ff"*20 + "00"*8 + "ff"*4, block.hash_for_merge_mining_mask)
+
+    def test_hash_for_merge_mining_matches_masked(self):
+        fields = make_block(123)
+        block = RskBlockHeader(encode(fields), NetworkParameters.REGTEST)
+        mm_hash = bytes.fromhex(block.hash_for_merge_mining)
+
+        # Middle bytes are ignored
+        self.assertTrue(block.hash_for_merge_mining_matches(
+            (mm_hash[:20] + b"\x99"*8 + mm_hash[28:]).hex()))
+        # Any other byte isn't
+        self.assertFalse(block.hash_for_merge_mining_matches(
+            (b"\x99" + mm_hash[1:]).hex()))
+        self.assertFalse(block.hash_for_merge_mining_matches(
+            (mm_hash[:-1] + b"\x99").hex()))
+
+    def test_pow_invalid_merge_mining_hash(self):
+        fields = make_block(123)
+        other = make_block(124)
+        fields[-1] = other[-1]
+        block = RskBlockHeader(encode(fields), NetworkParameters.REGTEST)
+
+        self.assertFalse(block.pow_is_valid())
+
+    def test_pow_invalid_merkle_proof(self):
+        fields = make_block(123)
+        fields[-2] = b"\x99"*64
+        block = RskBlockHeader(encode(fields), NetworkParameters.REGTEST)
+
+        self.assertFalse(block.pow_is_valid())
@@ -90,3 +90,52 @@ class TestHSM2DongleSignature(TestCase):
         sig1 = HSM2DongleSignature(bs1)
         sig2 = HSM2DongleSignature(bs2)
         self.assertNotEqual(sig1, sig2)
+
+    def test_signature_offset(self):
+        bs = bytes.fromhex(
+            "aabbcc"
+            "3045022100e719a1a379143ee7b598390305f4f1a991d6e26f175545c739f89728e270671"
+            "402207fcc41e525508a27bdcf9bd82f4b75709e8771dde714d0cf3d362056ed1bb07c9000"
+        )
+        self.assertEqual(HSM2DongleSignature(bs[3:]), HSM2DongleSignature(bs, 3))
+        self.assertEqual(HSM2DongleSignature(bs[3:]),
+                         HSM2DongleSignature(bytearray(bs), 3))
+
+    def test_signature_invalid_offset(self):
+        with self.assertRaises(ValueError):
+            HSM2DongleSignature(bytes.fromhex("300c0205aabbccddee0203112233"), 1)
+
+    def test_der_excludes_rubbish(self):
+        bs = bytes.fromhex("300c0205aabbccddee0203112233" "9000")
+        signature = HSM2DongleSignature(bs)
+        self.assertEqual(bytes.fromhex("300c0205aabbccddee0203112233"),
+                         signature.der)
+        self.assertEqual("aabbccddee", signature.r)
+        self.assertEqual("112233", signature.s)
+
+    def test_canonical_low_s_unchanged(self):
+        bs = bytes.fromhex(
+            "3045022100e719a1a379143ee7b598390305f4f1a991d6e26f175545c739f89728e270671"
+            "402207fcc41e525508a27bdcf9bd82f4b75709e8771dde714d0cf3d362056ed1bb07c9000"
+        )
+        self.assertEqual(
+            "7fcc41e525508a27bdcf9bd82f4b75709e8771dde714d0cf3d362056ed1bb07c",
+            HSM2DongleSignature(bs, canonical=True).s)
+
+    def test_canonical_high_s_normalized(self):
+        n = HSM2DongleSignature.CURVE_ORDER
+        high_s = n - 0x112233
+        sbytes = bytes([0]) + high_s.to_bytes(32, byteorder="big")
+        bs = bytes([0x30, 4 + 5 + len(sbytes), 0x02, 0x05]) + \
+            bytes.fromhex("aabbccddee") + bytes([0x02, len(sbytes)]) + sbytes
+        self.assertEqual(sbytes.hex(), HSM2DongleSignature(bs).s)
+        signature = HSM2DongleSignature(bs, canonical=True)
+        self.assertEqual("aabbccddee", signature.r)
+        self.assertEqual("112233", signature.s)
+        self.assertEqual(bs, signature.der)
+
+    def test_slots(self):
+        signature = HSM2DongleSignature(
+            bytes.fromhex("300c0205aabbccddee0203112233"))
+        with self.assertRaises(AttributeError):
+            signature.something = 1
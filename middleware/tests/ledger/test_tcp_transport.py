@@ -0,0 +1,202 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 RSK Labs Ltd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from unittest import TestCase
+import os
+import socket
+import struct
+import tempfile
+import threading
+from ledger.tcp_transport import TCPTransport
+from ledgerblue.commException import CommException
+
+import logging
+
+logging.disable(logging.CRITICAL)
+
+
+# Minimal TCP "dongle": for every framed request received, answers
+# with the next of the given (response, status word) pairs
+class FakeTCPDongle:
+    def __init__(self, responses, delay=None, unix_socket_path=None):
+        self.responses = list(responses)
+        self.requests = []
+        self.delay = delay
+        if unix_socket_path is not None:
+            self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.server.bind(unix_socket_path)
+            self.port = None
+        else:
+            self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.server.bind(("127.0.0.1", 0))
+            self.port = self.server.getsockname()[1]
+        self.server.listen(1)
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _recv(self, conn, size):
+        buf = b""
+        while len(buf) < size:
+            chunk = conn.recv(size - len(buf))
+            if not chunk:
+                return None
+            buf += chunk
+        return buf
+
+    def _serve(self):
+        conn, _ = self.server.accept()
+        self.conn = conn
+        for (response, sw) in self.responses:
+            header = self._recv(conn, 4)
+            if header is None:
+                break
+            self.requests.append(self._recv(conn, struct.unpack(">I", header)[0]))
+            if self.delay is not None:
+                self.delay.wait()
+            conn.sendall(struct.pack(">I", len(response)) + response +
+                         struct.pack(">H", sw))
+
+    def stop(self):
+        self.thread.join(timeout=5)
+        self.server.close()
+
+
+class TestTCPTransport(TestCase):
+    def connect(self, responses, **kwargs):
+        self.dongle = FakeTCPDongle(responses)
+        self.transport = TCPTransport("127.0.0.1", self.dongle.port, **kwargs)
+
+    def tearDown(self):
+        if hasattr(self, "transport") and self.transport.opened:
+            self.transport.close()
+        if hasattr(self, "dongle"):
+            self.dongle.stop()
+
+    def test_socket_options(self):
+        self.connect([])
+        self.assertTrue(self.transport.opened)
+        self.assertEqual(1, self.transport.socket.getsockopt(
+            socket.IPPROTO_TCP, socket.TCP_NODELAY))
+        self.assertEqual(1, self.transport.socket.getsockopt(
+            socket.SOL_SOCKET, socket.SO_KEEPALIVE))
+
+    def test_exchange_ok(self):
+        self.connect([(b"\x80\x01first", 0x9000), (b"\x80\x02second", 0x9000)])
+
+        self.assertEqual(b"\x80\x01first", self.transport.exchange(b"\x80\x01req"))
+        self.assertEqual(b"\x80\x02second", self.transport.exchange(b"\x80\x02"))
+        self.dongle.stop()
+        self.assertEqual([b"\x80\x01req", b"\x80\x02"], self.dongle.requests)
+
+    def test_exchange_writev(self):
+        self.connect([(b"\x80\x01resp", 0x9000)], use_writev=True)
+
+        self.assertEqual(b"\x80\x01resp", self.transport.exchange(b"\x80\x01req"))
+        self.dongle.stop()
+        self.assertEqual([b"\x80\x01req"], self.dongle.requests)
+
+    def test_exchange_grows_buffer(self):
+        big = b"\x80\x01" + bytes(range(256))*40
+        self.connect([(big, 0x9000), (b"\x80\x02", 0x9000)])
+
+        self.assertEqual(big, self.transport.exchange(b"\x80\x01"))
+        self.assertEqual(b"\x80\x02", self.transport.exchange(b"\x80\x02"))
+
+    def test_exchange_error_status(self):
+        self.connect([(b"\x80\x01", 0x6b87)])
+
+        with self.assertRaises(CommException) as e:
+            self.transport.exchange(b"\x80\x01")
+        self.assertEqual(0x6b87, e.exception.sw)
+
+    def test_exchange_connection_closed(self):
+        self.connect([])
+        self.dongle.stop()
+        self.dongle.conn.close()
+
+        with self.assertRaises(CommException) as e:
+            self.transport.exchange(b"\x80\x01")
+        self.assertIn("Communication error", e.exception.message)
+
+    def test_exchange_timeout_enforced(self):
+        self.dongle = FakeTCPDongle([(b"\x80\x01", 0x9000)],
+                                    delay=threading.Event())
+        self.transport = TCPTransport("127.0.0.1", self.dongle.port,
+                                      enforce_timeouts=True)
+
+        with self.assertRaises(CommException) as e:
+            self.transport.exchange(b"\x80\x01", timeout=0.05)
+        self.assertEqual(0x6F00, e.exception.sw)
+        self.assertEqual("Timeout", e.exception.message)
+        self.dongle.delay.set()
+
+    def test_exchange_timeout_not_enforced_by_default(self):
+        self.connect([(b"\x80\x01", 0x9000)])
+
+        self.transport.exchange(b"\x80\x01", timeout=0.05)
+        self.assertIsNone(self.transport.socket.gettimeout())
+
+    def test_is_alive(self):
+        self.connect([])
+        self.assertTrue(self.transport.is_alive())
+
+        self.dongle.stop()
+        self.dongle.conn.close()
+        # Wait for the FIN to arrive
+        self.transport.socket.settimeout(5)
+        self.transport.socket.recv(1, socket.MSG_PEEK)
+        self.assertFalse(self.transport.is_alive())
+
+    def test_is_alive_closed(self):
+        self.connect([])
+        self.transport.close()
+        self.assertFalse(self.transport.opened)
+        self.assertFalse(self.transport.is_alive())
+
+    def test_connection_fails(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(("127.0.0.1", 0))
+        port = server.getsockname()[1]
+        server.close()
+
+        with self.assertRaises(CommException) as e:
+            TCPTransport("127.0.0.1", port)
+        self.assertIn("connection failed", e.exception.message)
+
+    def test_exchange_unix_socket(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "dongle.sock")
+            self.dongle = FakeTCPDongle([(b"\x80\x01resp", 0x9000)],
+                                        unix_socket_path=path)
+            self.transport = TCPTransport("ignored-host", 1234, unix_socket_path=path)
+
+            self.assertEqual(socket.AF_UNIX, self.transport.socket.family)
+            self.assertEqual(b"\x80\x01resp", self.transport.exchange(b"\x80\x01req"))
+            self.assertTrue(self.transport.is_alive())
+            self.transport.close()
+            self.dongle.stop()
+            self.assertEqual([b"\x80\x01req"], self.dongle.requests)
+
+    def test_unix_socket_connection_fails(self):
+        with self.assertRaises(CommException) as e:
+            TCPTransport("a-host", 1234, unix_socket_path="/non/existent.sock")
+        self.assertIn("connection failed", e.exception.message)
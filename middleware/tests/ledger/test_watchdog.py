@@ -0,0 +1,193 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 RSK Labs Ltd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from unittest import TestCase
+from unittest.mock import Mock, patch
+from comm.protocol import HSM2ProtocolInterrupt
+from ledger.protocol import HSM2ProtocolLedger
+from ledger.watchdog import ConnectionWatchdog
+from ledger.hsm2dongle import (
+    HSM2Dongle,
+    HSM2DongleError,
+    HSM2DongleCommError,
+    HSM2DongleTimeoutError,
+)
+from ledger.version import HSM2FirmwareVersion
+
+import logging
+
+logging.disable(logging.CRITICAL)
+
+
+@patch("ledger.watchdog.time")
+class TestConnectionWatchdog(TestCase):
+    def setUp(self):
+        self.dongle = Mock()
+        self.dongle.is_onboarded.return_value = True
+        self.dongle.get_current_mode.return_value = HSM2Dongle.MODE.SIGNER
+        self.dongle.get_version.return_value = HSM2FirmwareVersion(5, 5, 1)
+        self.dongle.get_signer_parameters.return_value = Mock(
+            min_required_difficulty=123)
+        self.protocol = HSM2ProtocolLedger(Mock(), self.dongle)
+        self.protocol.initialize_device()
+        self.protocol.last_request_time = 100
+        self.dongle.reset_mock()
+        self.watchdog = ConnectionWatchdog(self.protocol, 10)
+
+    def test_skips_when_not_idle(self, time):
+        time.monotonic.return_value = 105
+
+        self.assertIsNone(self.watchdog.check())
+        self.assertFalse(self.dongle.get_current_mode.called)
+        self.assertEqual(0, self.watchdog.metrics["probes"])
+
+    def test_skips_when_device_busy(self, time):
+        time.monotonic.return_value = 110
+        self.protocol.device_lock = Mock()
+        self.protocol.device_lock.acquire.return_value = False
+
+        self.assertIsNone(self.watchdog.check())
+        self.protocol.device_lock.acquire.assert_called_with(blocking=False)
+        self.assertFalse(self.protocol.device_lock.release.called)
+        self.assertFalse(self.dongle.get_current_mode.called)
+
+    def test_probe_ok(self, time):
+        time.monotonic.return_value = 110
+
+        self.assertTrue(self.watchdog.check())
+        self.assertEqual(1, self.dongle.get_current_mode.call_count)
+        self.assertFalse(self.dongle.disconnect.called)
+        self.assertFalse(self.protocol.has_comm_issue)
+        self.assertEqual({
+            "probes": 1,
+            "probe_failures": 0,
+            "reconnections": 0,
+            "reconnection_failures": 0,
+            "last_reconnection_time": None,
+            "total_reconnection_time": 0,
+        }, self.watchdog.metrics)
+
+    def test_probe_comm_error_reconnects(self, time):
+        time.monotonic.side_effect = [110, 200, 203.5]
+        self.dongle.get_current_mode.side_effect = [
+            HSM2DongleCommError("oops"), HSM2Dongle.MODE.SIGNER]
+
+        self.assertTrue(self.watchdog.check())
+        self.assertEqual(1, self.dongle.disconnect.call_count)
+        self.assertEqual(1, self.dongle.connect.call_count)
+        # Device identity is only verified upon reconnection
+        self.assertEqual(2, self.dongle.get_current_mode.call_count)
+        self.assertEqual(1, self.dongle.get_version.call_count)
+        self.assertFalse(self.dongle.is_onboarded.called)
+        self.assertFalse(self.dongle.get_signer_parameters.called)
+        self.assertFalse(self.protocol.has_comm_issue)
+        metrics = self.watchdog.metrics
+        self.assertEqual(1, metrics["probe_failures"])
+        self.assertEqual(1, metrics["reconnections"])
+        self.assertEqual(3.5, metrics["last_reconnection_time"])
+        self.assertEqual(3.5, metrics["total_reconnection_time"])
+
+    def test_probe_unexpected_mode_reconnects(self, time):
+        time.monotonic.side_effect = [110, 200, 201]
+        self.dongle.get_current_mode.side_effect = [
+            HSM2Dongle.MODE.UNKNOWN, HSM2Dongle.MODE.SIGNER]
+
+        self.assertTrue(self.watchdog.check())
+        self.assertEqual(1, self.dongle.disconnect.call_count)
+        self.assertEqual(1, self.watchdog.metrics["probe_failures"])
+        self.assertEqual(1, self.watchdog.metrics["reconnections"])
+
+    def test_dead_connection_reconnects_without_exchanging(self, time):
+        time.monotonic.side_effect = [110, 200, 201]
+        self.dongle.is_connection_alive.side_effect = [False, True]
+
+        self.assertTrue(self.watchdog.check())
+        # Only called as part of the reconnection's identity verification
+        self.assertEqual(1, self.dongle.get_current_mode.call_count)
+        self.assertEqual(1, self.dongle.disconnect.call_count)
+        self.assertEqual(1, self.watchdog.metrics["probe_failures"])
+        self.assertEqual(1, self.watchdog.metrics["reconnections"])
+
+    def test_comm_issue_reconnects_without_probing(self, time):
+        time.monotonic.side_effect = [110, 200, 201]
+        self.protocol.report_comm_issue()
+
+        self.assertTrue(self.watchdog.check())
+        self.assertEqual(1, self.dongle.get_current_mode.call_count)
+        self.assertEqual(1, self.dongle.disconnect.call_count)
+        self.assertEqual(0, self.watchdog.metrics["probes"])
+        self.assertEqual(1, self.watchdog.metrics["reconnections"])
+        self.assertFalse(self.protocol.has_comm_issue)
+
+    def test_reconnection_fails(self, time):
+        time.monotonic.side_effect = [110, 200, 201]
+        self.dongle.get_current_mode.side_effect = HSM2DongleTimeoutError()
+        self.dongle.connect.side_effect = HSM2DongleCommError("no device")
+
+        self.assertFalse(self.watchdog.check())
+        self.assertTrue(self.protocol.has_comm_issue)
+        self.assertEqual(0, self.watchdog.metrics["reconnections"])
+        self.assertEqual(1, self.watchdog.metrics["reconnection_failures"])
+
+    def test_reconnection_interrupted(self, time):
+        time.monotonic.side_effect = [110, 200, 201]
+        self.protocol.report_comm_issue()
+        self.dongle.get_current_mode.return_value = HSM2Dongle.MODE.UNKNOWN
+        self.dongle.is_onboarded.side_effect = HSM2DongleError("unknown")
+
+        self.assertFalse(self.watchdog.check())
+        # Left for the next request to deal with
+        self.assertTrue(self.protocol.has_comm_issue)
+        self.assertEqual(1, self.watchdog.metrics["reconnection_failures"])
+        with self.assertRaises(HSM2ProtocolInterrupt):
+            self.protocol.ensure_connection()
+
+
+class TestConnectionWatchdogThread(TestCase):
+    def test_start_stop(self):
+        protocol = Mock()
+        watchdog = ConnectionWatchdog(protocol, 0.01)
+        checked = []
+        watchdog.check = Mock(side_effect=lambda: checked.append(True))
+
+        self.assertFalse(watchdog.running)
+        watchdog.start()
+        self.assertTrue(watchdog.running)
+        while len(checked) < 2:
+            pass
+        watchdog.stop()
+        self.assertFalse(watchdog.running)
+
+    def test_survives_unexpected_errors(self):
+        watchdog = ConnectionWatchdog(Mock(), 0.01)
+        calls = []
+
+        def check():
+            calls.append(True)
+            raise ValueError("unexpected")
+
+        watchdog.check = check
+        watchdog.start()
+        while len(calls) < 2:
+            pass
+        self.assertTrue(watchdog.running)
+        watchdog.stop()
@@ -55,6 +55,13 @@ class TestSgxQeAuthData(TestCase):
         with self.assertRaises(ValueError):
             SgxQeAuthData(bytes.fromhex("0a0baabbcc"))
 
+    def test_data_is_a_view(self):
+        buf = bytearray.fromhex("ff0a00112233445566778899aa")
+        parsed = SgxQeAuthData(buf, 1)
+        self.assertIsInstance(parsed.data, memoryview)
+        buf[4] = 0x99
+        self.assertEqual(bytes.fromhex("119933445566778899aa"), parsed.data)
+
 
 class TestSgxQeCertData(TestCase):
     def test_parses_ok(self):
@@ -74,7 +81,39 @@ this is certificate two
         )
         self.assertEqual(0x2211, parsed.type)
         self.assertEqual(certs, parsed.data)
-        self.assertEqual(2, len(parsed.certs))
+        self.assertEqual([
+            b"this is certificate one",
+            b"this is certificate two",
+        ], parsed.certs)
+
+    def make_cert_data(self, certs):
+        return bytes.fromhex("1122") + \
+            len(certs).to_bytes(4, byteorder="little", signed=False) + \
+            certs
+
+    def test_certs_extracted_lazily(self):
+        parsed = SgxQeCertData(self.make_cert_data(
+            b"-----BEGIN CERTIFICATE-----\none\n-----END CERTIFICATE-----\n"))
+        self.assertIsNone(parsed._certs)
+        certs = parsed.certs
+        self.assertEqual([b"one"], certs)
+        self.assertIs(certs, parsed.certs)
+
+    def test_certs_ignores_surrounding_garbage(self):
+        parsed = SgxQeCertData(self.make_cert_data(
+            b"garbage-----BEGIN CERTIFICATE-----\none\n-----END CERTIFICATE-----\n"
+            b"more garbage\x00\x00"))
+        self.assertEqual([b"one"], parsed.certs)
+
+    def test_certs_unterminated_last(self):
+        parsed = SgxQeCertData(self.make_cert_data(
+            b"-----BEGIN CERTIFICATE-----\none\n-----END CERTIFICATE-----\n"
+            b"-----BEGIN CERTIFICATE-----\ntwo"))
+        self.assertEqual([b"one", b"two"], parsed.certs)
+
+    def test_certs_none(self):
+        parsed = SgxQeCertData(self.make_cert_data(b"no certificates here"))
+        self.assertEqual([], parsed.certs)
 
     def test_parses_error_tooshort(self):
         with self.assertRaises(ValueError):
@@ -90,6 +129,16 @@ class TestSgxEnvelope(TestCase):
 
         self.assertEqual(TEST_MESSAGE, envelope.custom_message.hex())
 
+    def test_parses_ok_offset_bytearray(self):
+        envelope = SgxEnvelope(
+            bytearray.fromhex("aabbcc" + TEST_ENVELOPE.strip()),
+            bytes.fromhex(TEST_MESSAGE),
+            offset=3,
+        )
+
+        self.assertEqual(TEST_MESSAGE, envelope.custom_message.hex())
+        self.assertIsInstance(envelope.qe_cert_data.data, memoryview)
+
     def test_parsing_fails_if_message_mismatch(self):
         with self.assertRaises(ValueError):
             SgxEnvelope(bytes.fromhex(TEST_ENVELOPE), b"some-other-message")
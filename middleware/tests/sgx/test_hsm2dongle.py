@@ -22,8 +22,12 @@
 
 from unittest import TestCase
 from unittest.mock import Mock, patch, call
+import socket
+import struct
 from sgx.hsm2dongle import HSM2DongleSGX
-from ledger.hsm2dongle import HSM2DongleError
+from ledger.hsm2dongle import HSM2DongleError, HSM2DongleErrorResult, \
+                              HSM2DongleCommError, HSM2DongleTimeoutError
+from ledgerblue.commException import CommException
 from tests.ledger.test_hsm2dongle import \
     TestHSM2DongleBase, HSM2DongleTestMode  # noqa: F401
 
@@ -260,6 +264,72 @@ class TestHSM2DongleSGX(TestCase):
         self.assert_xchg_called_ith(5, bytes([0x80, 0xA6, 0x04]) + b"6"*80)
         self.assert_xchg_called_ith(6, bytes([0x80, 0xA6, 0x04]) + b"7"*56)
 
+    def test_migrate_db_get_evidence_progress(self):
+        self.dongle.exchange.side_effect = [
+            bytes([0xAA, 0xBB, 0x01]) + b"a"*3,
+            bytes([0xAA, 0xBB, 0x00]) + b"b"*5,
+        ]
+        on_progress = Mock()
+
+        self.assertEqual(b"aaabbbbb",
+                         self.hsm2dongle.migrate_db_get_evidence(on_progress))
+
+        self.assertEqual([call(3, None), call(8, None)], on_progress.call_args_list)
+
+    def test_migrate_db_send_evidence_chunk_size_progress(self):
+        self.dongle.exchange.side_effect = [
+            bytes([0xAA, 0xBB, 0x01]),
+            bytes([0xAA, 0xBB, 0x00]),
+        ]
+        on_progress = Mock()
+
+        self.hsm2dongle.migrate_db_send_evidence(
+            b"1"*1000 + b"2"*500, chunk_size=1000, on_progress=on_progress)
+
+        self.assertEqual(2, self.dongle.exchange.call_count)
+        self.assert_xchg_called_ith(0, bytes([0x80, 0xA6, 0x04, 0x05, 0xdc]) + b"1"*1000)
+        self.assert_xchg_called_ith(1, bytes([0x80, 0xA6, 0x04]) + b"2"*500)
+        self.assertEqual([call(1000, 1500), call(1500, 1500)],
+                         on_progress.call_args_list)
+
+    def test_migrate_db_send_evidence_invalid_chunk_size(self):
+        for chunk_size in [0, 2049]:
+            with self.assertRaises(HSM2DongleError) as e:
+                self.hsm2dongle.migrate_db_send_evidence(b"1"*100, chunk_size)
+            self.assertIn("chunk size", e.exception.message)
+
+        self.dongle.exchange.assert_not_called()
+
+    def test_migrate_db_send_evidence_ack_lost(self):
+        # The device processes the second chunk but its ack is lost
+        self.dongle.exchange.side_effect = [
+            bytes([0xAA, 0xBB, 0x01]),
+            CommException("Timeout", 0x6F00),
+        ]
+
+        with self.assertRaises(HSM2DongleTimeoutError):
+            self.hsm2dongle.migrate_db_send_evidence(b"1"*80 + b"2"*80 + b"3"*30)
+
+        # Nothing else is sent: the chunk can't be resent
+        # without corrupting the evidence on the device
+        self.assertEqual(2, self.dongle.exchange.call_count)
+        self.assert_xchg_called_ith(1, bytes([0x80, 0xA6, 0x04]) + b"2"*80)
+
+    def test_migrate_db_reset_ok(self):
+        self.dongle.exchange.return_value = bytes([0x80, 0xA4, 0x41, 0x42, 0x43])
+
+        self.hsm2dongle.migrate_db_reset()
+
+        self.assert_exchange_called(bytes([0x80, 0xA4, 0x41, 0x42, 0x43]))
+
+    def test_migrate_db_reset_unexpected_response(self):
+        self.dongle.exchange.return_value = bytes([1, 2, 3])
+
+        with self.assertRaises(HSM2DongleError) as e:
+            self.hsm2dongle.migrate_db_reset()
+
+        self.assertIn("reset the migration state", e.exception.message)
+
     def test_migrate_db_send_evidence_noack(self):
         self.dongle.exchange.side_effect = [
             bytes([0xAA, 0xBB, 0x01]),
@@ -356,3 +426,274 @@ class TestHSM2DongleSGX(TestCase):
         self.assertEqual(1, self.dongle.exchange.call_count)
         self.assert_xchg_called_ith(
             0, bytes([0x80, 0xA6, 0x05]) + b"aabbccddeeff44556677")
+
+
+class TestHSM2DongleSGXNativeTransport(TestCase):
+    @patch("ledger.hsm2dongle_tcp.getDongle")
+    @patch("ledger.hsm2dongle_tcp.TCPTransport")
+    def test_connects_native(self, TCPTransportMock, getDongleMock):
+        hsm2dongle = HSM2DongleSGX("a-host", 1234, "a-debug-value",
+                                   native_transport=True, use_writev=True)
+        hsm2dongle.connect()
+
+        TCPTransportMock.assert_called_with("a-host", 1234, "a-debug-value", True,
+                                            unix_socket_path=None)
+        getDongleMock.assert_not_called()
+        self.assertEqual(TCPTransportMock.return_value, hsm2dongle.dongle)
+
+    @patch("ledger.hsm2dongle_tcp.getDongle")
+    @patch("ledger.hsm2dongle_tcp.TCPTransport")
+    def test_connects_native_error(self, TCPTransportMock, getDongleMock):
+        TCPTransportMock.side_effect = CommException("Proxy connection failed")
+        hsm2dongle = HSM2DongleSGX("a-host", 1234, "a-debug-value",
+                                   native_transport=True)
+
+        with self.assertRaises(HSM2DongleCommError):
+            hsm2dongle.connect()
+
+    @patch("ledger.hsm2dongle_tcp.getDongle")
+    @patch("ledger.hsm2dongle_tcp.TCPTransport")
+    def test_connects_unix_socket(self, TCPTransportMock, getDongleMock):
+        hsm2dongle = HSM2DongleSGX("a-host", 1234, "a-debug-value",
+                                   unix_socket_path="/a/socket")
+        hsm2dongle.connect()
+
+        TCPTransportMock.assert_called_with("a-host", 1234, "a-debug-value", False,
+                                            unix_socket_path="/a/socket")
+        getDongleMock.assert_not_called()
+        self.assertEqual(TCPTransportMock.return_value, hsm2dongle.dongle)
+
+    @patch("ledger.hsm2dongle_tcp.getDongle")
+    def test_connection_alive_commtcp(self, getDongleMock):
+        hsm2dongle = HSM2DongleSGX("a-host", 1234, "a-debug-value")
+        hsm2dongle.connect()
+
+        self.assertTrue(hsm2dongle.is_connection_alive())
+
+    @patch("ledger.hsm2dongle_tcp.TCPTransport")
+    def test_connection_alive_native(self, TCPTransportMock):
+        hsm2dongle = HSM2DongleSGX("a-host", 1234, "a-debug-value",
+                                   native_transport=True)
+        hsm2dongle.connect()
+
+        TCPTransportMock.return_value.is_alive.return_value = False
+        self.assertFalse(hsm2dongle.is_connection_alive())
+        TCPTransportMock.return_value.is_alive.return_value = True
+        self.assertTrue(hsm2dongle.is_connection_alive())
+
+
+class FakeDongleSocket:
+    def __init__(self, responses):
+        self.sent = []
+        self.timeouts = []
+        self.buffer = bytearray()
+        for (response, sw) in responses:
+            self.buffer += struct.pack(">I", len(response)) + response + \
+                struct.pack(">H", sw)
+
+    def settimeout(self, timeout):
+        self.timeouts.append(timeout)
+
+    def sendall(self, data):
+        self.sent.append(bytes(data))
+
+    def recv(self, size):
+        # Serve in small pieces to exercise partial reads
+        size = min(size, 3)
+        chunk = bytes(self.buffer[:size])
+        self.buffer = self.buffer[size:]
+        return chunk
+
+
+class TestHSM2DongleSGXPipelining(TestCase):
+    @patch("ledger.hsm2dongle_tcp.getDongle")
+    def setUp(self, getDongleMock):
+        self.dongle = Mock()
+        getDongleMock.return_value = self.dongle
+        self.hsm2dongle = HSM2DongleSGX("a-host", 1234, "a-debug-value")
+        self.hsm2dongle.connect()
+
+    def frame(self, bs):
+        return struct.pack(">I", len(bs)) + bs
+
+    def test_send_commands_pipelined(self):
+        self.dongle.socket = FakeDongleSocket([
+            (bytes.fromhex("801211"), 0x9000),
+            (b"", 0x6b00),
+            (bytes.fromhex("801233"), 0x9000),
+        ])
+
+        results = self.hsm2dongle.send_commands(
+            0x12, [(0x34, b"\x01"), (0x34, b"\x02"), (0x34, b"\x03")])
+
+        self.assertEqual(bytes.fromhex("801211"), results[0])
+        self.assertIsInstance(results[1], HSM2DongleErrorResult)
+        self.assertEqual(0x6b00, results[1].error_code)
+        self.assertEqual(bytes.fromhex("801233"), results[2])
+        self.assertEqual([
+            self.frame(bytes.fromhex("80123401")) +
+            self.frame(bytes.fromhex("80123402")) +
+            self.frame(bytes.fromhex("80123403"))
+        ], self.dongle.socket.sent)
+        self.assertEqual([10, None], self.dongle.socket.timeouts)
+        self.assertEqual(b"", self.dongle.socket.buffer)
+        self.dongle.exchange.assert_not_called()
+
+    def test_send_commands_single_uses_exchange(self):
+        self.dongle.socket = FakeDongleSocket([])
+        self.dongle.exchange.return_value = bytes.fromhex("801211")
+
+        self.assertEqual([bytes.fromhex("801211")],
+                         self.hsm2dongle.send_commands(0x12, [(0x34, b"\x01")]))
+
+        self.dongle.exchange.assert_called_with(bytes.fromhex("80123401"), timeout=10)
+        self.assertEqual([], self.dongle.socket.sent)
+
+    def test_send_commands_unexpected_status(self):
+        self.dongle.socket = FakeDongleSocket([
+            (b"", 0x6f00),
+            (bytes.fromhex("801222"), 0x9000),
+        ])
+
+        with self.assertRaises(HSM2DongleError):
+            self.hsm2dongle.send_commands(0x12, [(0x34, b"\x01"), (0x34, b"\x02")])
+
+        # All responses consumed
+        self.assertEqual(b"", self.dongle.socket.buffer)
+
+    def test_send_commands_connection_closed(self):
+        self.dongle.socket = FakeDongleSocket([
+            (bytes.fromhex("801211"), 0x9000),
+        ])
+
+        with self.assertRaises(HSM2DongleCommError):
+            self.hsm2dongle.send_commands(0x12, [(0x34, b"\x01"), (0x34, b"\x02")])
+
+    def test_send_commands_timeout(self):
+        self.dongle.socket = FakeDongleSocket([])
+        self.dongle.socket.recv = Mock(side_effect=socket.timeout("timed out"))
+
+        with self.assertRaises(HSM2DongleTimeoutError):
+            self.hsm2dongle.send_commands(0x12, [(0x34, b"\x01"), (0x34, b"\x02")])
+
+        self.assertEqual([10, None], self.dongle.socket.timeouts)
+
+    def test_powhsm_attestation_pipelined(self):
+        device = FakeAttestationDevice(bytes.fromhex("11223344"),
+                                       bytes.fromhex("44556677889900"))
+        self.hsm2dongle.dongle = device
+
+        self.assertEqual({
+            "app_hash": "334455",
+            "envelope": "44556677889900",
+            "message": "11223344",
+            "signature": "aabbcc",
+        }, self.hsm2dongle.get_powhsm_attestation("aabb"))
+
+        self.assertEqual(0, device.resets)
+        self.assertEqual([
+            "01aabb", "0200", "0201", "0400", "0401", "0402", "03",
+        ], device.requests)
+        # Second message page and first envelope page pipelined
+        self.assertEqual([
+            self.frame(bytes.fromhex("80500201")) +
+            self.frame(bytes.fromhex("80500400"))
+        ], device.sent)
+
+    def test_powhsm_attestation_never_requests_missing_pages(self):
+        device = FakeAttestationDevice(bytes.fromhex("112233"),
+                                       bytes.fromhex("4455"))
+        self.hsm2dongle.dongle = device
+
+        self.assertEqual({
+            "app_hash": "334455",
+            "envelope": "4455",
+            "message": "112233",
+            "signature": "aabbcc",
+        }, self.hsm2dongle.get_powhsm_attestation("aabb"))
+
+        self.assertEqual(0, device.resets)
+        self.assertEqual(["01aabb", "0200", "0400", "03"], device.requests)
+        self.assertEqual([], device.sent)
+
+    def test_fake_attestation_device_resets_on_missing_page(self):
+        device = FakeAttestationDevice(bytes.fromhex("112233"),
+                                       bytes.fromhex("4455"))
+        self.hsm2dongle.dongle = device
+
+        self.hsm2dongle.send_command(0x50, 0x01, bytes.fromhex("aabb"))
+        results = self.hsm2dongle.send_commands(0x50, [(0x02, b"\x00"),
+                                                       (0x02, b"\x01"),
+                                                       (0x03, b"")])
+
+        self.assertEqual(bytes.fromhex("80500200112233"), results[0])
+        self.assertIsInstance(results[1], HSM2DongleErrorResult)
+        # The attestation is gone after the missing page
+        self.assertIsInstance(results[2], HSM2DongleErrorResult)
+        self.assertEqual(2, device.resets)
+
+
+# Mimics the device side of the powHSM attestation protocol over the SGX
+# framed transport (both single exchanges and pipelined batches), including
+# that any error (e.g., requesting a page past the last one) resets the
+# whole device state, attestation included
+class FakeAttestationDevice:
+    PAGE_SIZE = 3
+
+    def __init__(self, message, envelope):
+        self.message = message
+        self.envelope = envelope
+        self.ready = False
+        self.resets = 0
+        self.requests = []
+        self.sent = []
+        self.buffer = bytearray()
+        self.socket = self
+
+    def process(self, apdu):
+        self.requests.append(apdu[2:].hex())
+        op, data = apdu[2], apdu[3:]
+        if op == 0x01:
+            self.ready = True
+            return (apdu[:3] + bytes.fromhex("aabbcc"), 0x9000)
+        if not self.ready:
+            return self.error()
+        if op == 0x03:
+            return (apdu[:3] + bytes.fromhex("334455"), 0x9000)
+
+        buf = self.envelope if op == 0x04 else self.message
+        pages = (len(buf) + self.PAGE_SIZE - 1)//self.PAGE_SIZE
+        if len(data) != 1 or data[0] >= pages:
+            return self.error()
+        page = data[0]
+        chunk = buf[page*self.PAGE_SIZE:(page + 1)*self.PAGE_SIZE]
+        return (apdu[:3] + bytes([page < pages - 1]) + chunk, 0x9000)
+
+    def error(self):
+        self.ready = False
+        self.resets += 1
+        return (b"", 0x6b00)
+
+    def exchange(self, apdu, timeout):
+        (response, sw) = self.process(apdu)
+        if sw != 0x9000:
+            raise CommException("Invalid status %04x" % sw, sw)
+        return response
+
+    def settimeout(self, timeout):
+        pass
+
+    def sendall(self, data):
+        self.sent.append(bytes(data))
+        offset = 0
+        while offset < len(data):
+            size = struct.unpack(">I", data[offset:offset+4])[0]
+            (response, sw) = self.process(data[offset+4:offset+4+size])
+            self.buffer += struct.pack(">I", len(response)) + response + \
+                struct.pack(">H", sw)
+            offset += 4 + size
+
+    def recv(self, size):
+        chunk = bytes(self.buffer[:size])
+        self.buffer = self.buffer[size:]
+        return chunk
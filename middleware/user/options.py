@@ -65,6 +65,12 @@ class UserOptionParser:
             help=f"IP to bind to. (default '{self.default_host}')",
             default=self.default_host,
         )
+        parser.add_argument(
+            "--unix-socket",
+            dest="unix_socket_path",
+            help="Listen on a Unix domain socket at this path instead of "
+                 "on the TCP port and IP.",
+        )
         parser.add_argument(
             "-D",
             "--iodebug",
@@ -103,6 +109,30 @@ class UserOptionParser:
             action="store_true",
             help="Run in version 1 mode. (defaults to no)",
         )
+        parser.add_argument(
+            "--prevalidate-blocks",
+            dest="prevalidate_blocks",
+            action="store_true",
+            help="Validate advance blockchain batches before sending them to the "
+            "device. Each batch then also reads the device's blockchain state. "
+            "(defaults to no)",
+        )
+        parser.add_argument(
+            "--prevalidate-workers",
+            dest="prevalidate_workers",
+            help="Number of worker processes for advance blockchain "
+            "pre-validation. (default 1)",
+            type=int,
+            default=1,
+        )
+        parser.add_argument(
+            "--watchdog-interval",
+            dest="watchdog_interval",
+            help="Probe the device every this many seconds while idle, "
+            "reconnecting proactively when needed. (default 0, disabled)",
+            type=float,
+            default=0,
+        )
 
         if self.with_tcpconn:
             parser.add_argument(
@@ -121,6 +151,26 @@ class UserOptionParser:
                 help=f"{self.host_name} host. (default '{self.default_tcpconn_host}')",
                 default=self.default_tcpconn_host,
             )
+            parser.add_argument(
+                f"--{self.host_name.lower()}-unix-socket",
+                dest="tcpconn_unix_socket_path",
+                help=f"Connect to {self.host_name} through a Unix domain socket at "
+                     "this path instead of through TCP (implies --native-transport).",
+            )
+            parser.add_argument(
+                "--native-transport",
+                dest="native_transport",
+                action="store_true",
+                help=f"Use the native transport to connect to {self.host_name} "
+                     "(TCP_NODELAY, keepalive, preallocated buffers).",
+            )
+            parser.add_argument(
+                "--writev",
+                dest="use_writev",
+                action="store_true",
+                help="Write each command's length prefix and payload with a single "
+                     "vectored write (only with --native-transport).",
+            )
 
         options = parser.parse_args()
 